@@ -27,6 +27,7 @@ if os.path.exists(web_app_path):
     sys.path.append(web_app_path)
 
 from ensemble_trading_model import SchwabDataFetcher, EnsembleTradingModel
+from candle_store import CandleStore
 from ml_trading.pipeline.multi_timeframe_system import EVClassifier
 
 load_dotenv()
@@ -46,6 +47,144 @@ except ImportError:
     scan_momentum_stocks = momentum_scanner.scan_momentum_stocks
 
 
+class PointInTimeData:
+    """
+    Loads each symbol's daily history once and hands out as-of-date views
+
+    Every simulated day used to refetch history from the API; instead the full
+    history is fetched on first use and sliced by position (no copy, no look-ahead).
+    """
+    
+    # periods (years) accepted by the price history endpoint
+    _API_YEAR_PERIODS = [1, 2, 3, 5, 10, 15, 20]
+    
+    def __init__(self, fetcher, start_date, lookback_days=730):
+        """
+        Args:
+            fetcher: SchwabDataFetcher used for the one-time loads
+            start_date: First simulated date (history is loaded back to start_date - lookback_days)
+            lookback_days: Training window handed out by as_of()
+        """
+        self.fetcher = fetcher
+        self.lookback_days = lookback_days
+        
+        years_needed = ((datetime.now() - start_date).days + lookback_days) / 365.0
+        self.period_years = next((p for p in self._API_YEAR_PERIODS if p >= years_needed), self._API_YEAR_PERIODS[-1])
+        
+        self._history = {}  # {symbol: df or None}
+        self._times = {}    # {symbol: int64 ns index values, for searchsorted}
+    
+    def load(self, symbol):
+        """Full daily history for symbol (fetched once, None if unavailable)"""
+        if symbol not in self._history:
+            df = None
+            try:
+                df = self.fetcher.get_price_history(
+                    symbol,
+                    periodType='year',
+                    period=self.period_years,
+                    frequencyType='daily',
+                    frequency=1
+                )
+            except Exception as e:
+                # the symbol is skipped for the whole run, so say why
+                print(f"   ⚠️ Failed to load history for {symbol}: {e}")
+            if df is not None and len(df) > 0:
+                df = df.sort_index()
+                self._times[symbol] = df.index.values
+            else:
+                df = None
+            self._history[symbol] = df
+        return self._history[symbol]
+    
+    def preload(self, symbols):
+        """Load several symbols up front"""
+        for symbol in symbols:
+            self.load(symbol)
+    
+    def as_of(self, symbol, current_date, lookback_days=None):
+        """
+        View of the history with bars in (current_date - lookback_days, current_date]
+        
+        Returns:
+            DataFrame slice (positional, shares memory with the loaded history) or None
+        """
+        df = self.load(symbol)
+        if df is None:
+            return None
+        lookback_days = self.lookback_days if lookback_days is None else lookback_days
+        times = self._times[symbol]
+        current = np.datetime64(pd.Timestamp(current_date))
+        hi = np.searchsorted(times, current, side='right')
+        lo = np.searchsorted(times, current - np.timedelta64(lookback_days, 'D'), side='right')
+        return df.iloc[lo:hi]
+
+
+class WalkForwardModelCache:
+    """
+    Walk-forward training scheduler for per-symbol models
+
+    A symbol's model is refit only once its training window has gained
+    `retrain_every` new bars since the last fit; in between the fitted model
+    is reused. Fitted models are memoized by (symbol, train window end).
+
+    Only the most recent fit per symbol is kept: the backtest walks forward in
+    time, so an older fit is never asked for again, and each fitted ensemble
+    holds several hundred trees. A request whose window ends before the kept
+    fit refits from scratch rather than reuse a model trained on later data.
+    """
+    
+    def __init__(self, build_model, retrain_every=5):
+        """
+        Args:
+            build_model: Callable returning a fresh, unfitted model (with fit(X, y))
+            retrain_every: New training bars required before refitting (5 = weekly on daily bars, 1 = every bar)
+        """
+        self.build_model = build_model
+        self.retrain_every = max(1, int(retrain_every))
+        self._models = {}  # {(symbol, train_end): fitted model}
+        self._latest = {}  # {symbol: train_end of the most recent fit}
+        self.fits = 0
+        self.reuses = 0
+    
+    def get_model(self, symbol, X_train, y_train, train_index):
+        """
+        Fitted model for symbol whose training window ends at train_index[-1]
+        
+        Args:
+            symbol: Stock symbol
+            X_train: Training features
+            y_train: Training targets
+            train_index: DatetimeIndex of the training rows (sorted)
+        
+        Returns:
+            Fitted model (reused or newly trained)
+        """
+        train_end = train_index[-1]
+        key = (symbol, train_end)
+        if key in self._models:
+            self.reuses += 1
+            return self._models[key]
+        
+        latest = self._latest.get(symbol)
+        if latest is not None and latest <= train_end:  # never reuse a model fit on later data
+            new_bars = len(train_index) - train_index.searchsorted(latest, side='right')
+            if new_bars < self.retrain_every:
+                self.reuses += 1
+                return self._models[(symbol, latest)]
+        
+        model = self.build_model()
+        model.fit(X_train, y_train)
+        self.fits += 1
+        
+        # only the most recent fit per symbol is kept (each holds several hundred trees)
+        if latest is not None:
+            self._models.pop((symbol, latest), None)
+        self._models[key] = model
+        self._latest[symbol] = train_end
+        return model
+
+
 class FullSystemBacktester:
     """
     Backtest the complete momentum + EV system
@@ -53,7 +192,8 @@ class FullSystemBacktester:
     
     def __init__(self, initial_capital=10000, risk_per_trade=0.02,
                  max_positions=3, tp_multiplier=1.5, sl_multiplier=2.0,
-                 min_ev=0.0003, min_confidence=0.48):
+                 min_ev=0.0003, min_confidence=0.48, candle_store=None,
+                 retrain_every=5):
         """
         Initialize backtester
         
@@ -65,6 +205,8 @@ class FullSystemBacktester:
             sl_multiplier: Stop loss multiplier (ATR)
             min_ev: Minimum EV for BUY signal
             min_confidence: Minimum win probability for BUY signal
+            candle_store: Optional CandleStore so history survives across backtest runs
+            retrain_every: Refit a symbol's EV classifier after this many new bars (1 = every day)
         """
         self.initial_capital = initial_capital
         self.capital = initial_capital
@@ -79,6 +221,15 @@ class FullSystemBacktester:
         self.equity_curve = []
         self.open_positions = {}  # {symbol: position_dict}
         self.daily_scans = []
+        self.data = None  # PointInTimeData, created in run_backtest
+        self.models = WalkForwardModelCache(
+            lambda: EVClassifier(
+                min_ev=self.min_ev,
+                min_confidence=self.min_confidence,
+                use_timeframe_features=False
+            ),
+            retrain_every=retrain_every
+        )
         
         # Initialize Schwab client
         try:
@@ -87,7 +238,7 @@ class FullSystemBacktester:
                 os.getenv('app_secret'),
                 os.getenv('callback_url', 'https://127.0.0.1')
             )
-            self.fetcher = SchwabDataFetcher(self.client)
+            self.fetcher = SchwabDataFetcher(self.client, store=candle_store)
         except Exception as e:
             print(f"❌ Failed to initialize Schwab client: {e}")
             self.client = None
@@ -152,24 +303,12 @@ class FullSystemBacktester:
             dict or None: Signal information if BUY, None otherwise
         """
         try:
-            # Fetch data up to current date
-            df = self.fetcher.get_price_history(
-                symbol,
-                periodType='year',
-                period=2,  # 2 years for training
-                frequencyType='daily',
-                frequency=1
-            )
+            # 2 years of data up to current_date (no look-ahead)
+            df = self.data.as_of(symbol, current_date)
             
             if df is None or len(df) < 100:
                 return None
             
-            # Only use data up to current_date (no look-ahead)
-            df = df[df.index <= current_date]
-            
-            if len(df) < 100:
-                return None
-            
             # Create features
             features_df = self.fetcher.create_features(df)
             
@@ -198,14 +337,8 @@ class FullSystemBacktester:
             if len(X_train) < 50:
                 return None
             
-            # Train classifier with configurable thresholds
-            ev_classifier = EVClassifier(
-                min_ev=self.min_ev,
-                min_confidence=self.min_confidence,
-                use_timeframe_features=False
-            )
-            
-            ev_classifier.fit(X_train, y_train)
+            # Walk-forward: refit on the retrain cadence, reuse the fitted classifier in between
+            ev_classifier = self.models.get_model(symbol, X_train, y_train, common_idx[:train_size])
             
             # Get signal for latest bar
             signal, confidence, ev_metrics = ev_classifier.predict_signal(X_values[-1])
@@ -379,6 +512,9 @@ class FullSystemBacktester:
         # Generate trading days
         trading_days = pd.date_range(start=start_date, end=end_date, freq='B')  # Business days
         
+        # Histories are loaded once per symbol and sliced per simulated day
+        self.data = PointInTimeData(self.fetcher, start_date)
+        
         print(f"\n🔄 Running backtest on {len(trading_days)} trading days...")
         
         last_scan_date = None
@@ -395,6 +531,7 @@ class FullSystemBacktester:
             if last_scan_date is None or (current_date - last_scan_date).days >= scan_frequency_days:
                 momentum_stocks = self.run_momentum_scan(min_price, max_price, top_n)
                 last_scan_date = current_date
+                self.data.preload(s['symbol'] for s in momentum_stocks)
                 
                 self.daily_scans.append({
                     'date': current_date,
@@ -407,18 +544,9 @@ class FullSystemBacktester:
             
             # Get data for open positions
             for symbol in self.open_positions.keys():
-                try:
-                    df = self.fetcher.get_price_history(
-                        symbol,
-                        periodType='month',
-                        period=1,
-                        frequencyType='daily',
-                        frequency=1
-                    )
-                    if df is not None:
-                        price_data[symbol] = df
-                except:
-                    pass
+                df = self.data.as_of(symbol, current_date, lookback_days=31)
+                if df is not None:
+                    price_data[symbol] = df
             
             # Check exits for open positions
             self.check_exits(current_date, price_data)
@@ -461,6 +589,9 @@ class FullSystemBacktester:
                 'positions': len(self.open_positions)
             })
         
+        print(f"\n🧠 EV classifier fits: {self.models.fits}, reused: {self.models.reuses} "
+              f"(retrain every {self.models.retrain_every} bar(s))")
+        
         # Close remaining positions at end
         print(f"\n📊 Closing {len(self.open_positions)} remaining positions...")
         for symbol in list(self.open_positions.keys()):
@@ -604,6 +735,8 @@ def main():
     parser.add_argument('--days', type=int, default=90, help='Backtest period (days)')
     parser.add_argument('--min-ev', type=float, default=0.0003, help='Min EV threshold (e.g., 0.0003 = 0.03%)')
     parser.add_argument('--min-confidence', type=float, default=0.48, help='Min win probability (e.g., 0.48 = 48%)')
+    parser.add_argument('--retrain-every', type=int, default=5, help='Refit EV classifier after N new bars (1 = daily)')
+    parser.add_argument('--cache-dir', type=str, default=None, help='Candle store directory (reuse history across runs)')
     
     args = parser.parse_args()
     
@@ -616,7 +749,9 @@ def main():
         risk_per_trade=args.risk,
         max_positions=args.positions,
         min_ev=args.min_ev,
-        min_confidence=args.min_confidence
+        min_confidence=args.min_confidence,
+        candle_store=CandleStore(args.cache_dir) if args.cache_dir else None,
+        retrain_every=args.retrain_every
     )
     
     results = backtester.run_backtest(
@@ -0,0 +1,224 @@
+"""
+Broadcast Hub
+Fans stream updates out to websocket clients through bounded, conflating per-client queues
+
+Stream handlers run on the stream's (or dispatcher's) thread, while client sockets live
+on the server's event loop. The hub encodes each update once on the publishing thread,
+hands a whole batch to the loop with one thread-safe call, and appends it to the queue
+of every client that wants the symbol. Each client has its own sender task, so a slow
+browser tab only backs up its own queue.
+
+Queued updates with the same key (e.g. the quote of one symbol) are conflated: a slow
+client gets the latest quote per symbol instead of every intermediate one. Updates
+without a key (candles) are kept in order; a full queue drops its oldest update.
+
+Usage:
+    hub = BroadcastHub()
+    hub.attach(asyncio.get_running_loop())             # in the server's event loop
+    websockets.serve(lambda ws: hub.serve(ws, on_message), ...)
+    hub.publish(quote, key=('quote', 'AAPL'), symbol='AAPL')   # from any thread
+"""
+
+import asyncio
+import itertools
+from collections import OrderedDict
+
+import websockets
+
+from schwabdev.records import dumps
+
+
+class HubClient:
+    """
+    One connected websocket: symbol filter, pending updates and the task sending them
+    """
+
+    def __init__(self, websocket, max_queue):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.symbols = None                     # None = every symbol
+        self.pending = OrderedDict()            # key -> encoded update, oldest first
+        self.ready = asyncio.Event()
+        self.task = None
+
+        self.sent = 0
+        self.conflated = 0
+        self.dropped = 0
+
+    def wants(self, symbol):
+        return symbol is None or self.symbols is None or symbol in self.symbols
+
+    def put(self, payload, key):
+        """Queue an encoded update (runs on the loop)"""
+        pending = self.pending
+        if key in pending:
+            pending[key] = payload              # keeps its place in the queue
+            self.conflated += 1
+            return
+        if len(pending) >= self.max_queue:
+            pending.popitem(last=False)
+            self.dropped += 1
+        pending[key] = payload
+        self.ready.set()
+
+    async def run(self):
+        """Send queued updates until the socket closes"""
+        pending = self.pending
+        try:
+            while True:
+                if not pending:
+                    self.ready.clear()
+                    await self.ready.wait()
+                    continue
+                _, payload = pending.popitem(last=False)
+                await self.websocket.send(payload)
+                self.sent += 1
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+
+class BroadcastHub:
+    """
+    Thread-safe fan-out of encoded updates to websocket clients
+    """
+
+    def __init__(self, max_queue=1000, encoder=dumps):
+        """
+        Initialize an empty hub
+
+        Args:
+            max_queue: Updates held per client before its oldest is dropped
+            encoder: Function turning an update (dict) into the text sent to clients
+        """
+        self.max_queue = max_queue
+        self.encoder = encoder
+        self.loop = None
+        self.clients = {}                       # websocket -> HubClient
+        self._sequence = itertools.count()      # keys for updates that are never conflated
+
+        self.published = 0
+
+    def attach(self, loop):
+        """
+        Set the event loop the clients are served on
+
+        Args:
+            loop: Server event loop
+        """
+        self.loop = loop
+
+    # ========== PUBLISHING (any thread) ==========
+
+    def publish(self, update, key=None, symbol=None):
+        """
+        Encode an update once and queue it for every client that wants it
+
+        Args:
+            update: Message dict (or already encoded text)
+            key: Conflation key (updates with the same key replace each other while queued),
+                 None to always deliver
+            symbol: Symbol for per-client filtering (None sends to every client)
+        """
+        self.publish_many([(update, key, symbol)])
+
+    def publish_many(self, updates):
+        """
+        Publish several (update, key, symbol) tuples with one hand-off to the loop
+        """
+        if self.loop is None or not updates:
+            return
+        batch = [(update if isinstance(update, str) else self.encoder(update),
+                  key if key is not None else next(self._sequence), symbol)
+                 for update, key, symbol in updates]
+        try:
+            self.loop.call_soon_threadsafe(self._fan_out, batch)
+        except RuntimeError:                    # loop closed (shutting down)
+            pass
+
+    def _fan_out(self, batch):
+        self.published += len(batch)
+        clients = list(self.clients.values())
+        for payload, key, symbol in batch:
+            for client in clients:
+                if client.wants(symbol):
+                    client.put(payload, key)
+
+    def send_to(self, websocket, update, key=None):
+        """
+        Queue an update for one client (on the loop)
+
+        Args:
+            websocket: Client websocket
+            update: Message dict (or already encoded text)
+            key: Conflation key
+        """
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.put(update if isinstance(update, str) else self.encoder(update),
+                       key if key is not None else next(self._sequence))
+
+    # ========== CLIENTS (event loop) ==========
+
+    async def serve(self, websocket, on_message=None, on_connect=None):
+        """
+        Serve one websocket: run its sender and pass incoming messages to on_message
+
+        Args:
+            websocket: Client websocket
+            on_message: Coroutine function called with (websocket, text) for each client message
+            on_connect: Function called with the websocket once it is registered (e.g. to queue a snapshot)
+
+        Returns:
+            The client's symbol filter when it disconnected (None = no filter), so the caller
+            can release symbols no remaining client wants (see unwanted)
+        """
+        client = HubClient(websocket, self.max_queue)
+        client.task = asyncio.create_task(client.run())
+        self.clients[websocket] = client
+        try:
+            if on_connect is not None:
+                on_connect(websocket)
+            async for message in websocket:
+                if on_message is not None:
+                    await on_message(websocket, message)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            del self.clients[websocket]
+            client.task.cancel()
+        return client.symbols
+
+    def add_symbols(self, websocket, symbols):
+        """Add symbols to a client's filter (a client without a filter gets every symbol)"""
+        client = self.clients.get(websocket)
+        if client is not None:
+            client.symbols = set(symbols) if client.symbols is None else client.symbols | set(symbols)
+
+    def remove_symbols(self, websocket, symbols):
+        """Remove symbols from a client's filter"""
+        client = self.clients.get(websocket)
+        if client is not None and client.symbols is not None:
+            client.symbols -= set(symbols)
+
+    def subscribers(self, symbol):
+        """Number of clients receiving the symbol (a client without a filter receives every symbol)"""
+        return sum(1 for client in self.clients.values() if client.wants(symbol))
+
+    def unwanted(self, symbols, keep=()):
+        """
+        Symbols no connected client receives, e.g. to release their upstream subscriptions
+
+        Args:
+            symbols: Candidate symbols (e.g. those a client just dropped)
+            keep: Symbols to hold on to regardless of clients (e.g. the server's default watchlist)
+
+        Returns:
+            List of the symbols that can be released
+        """
+        return [s for s in symbols if s not in keep and self.subscribers(s) == 0]
+
+    def stats(self):
+        """Published updates and per-client queue depth / sent / conflated / dropped counters"""
+        return {'published': self.published, 'clients': [
+            {'depth': len(c.pending), 'sent': c.sent, 'conflated': c.conflated, 'dropped': c.dropped,
+             'symbols': None if c.symbols is None else len(c.symbols)} for c in self.clients.values()]}
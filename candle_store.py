@@ -0,0 +1,269 @@
+"""
+Candle Store
+Persistent on-disk OHLCV cache keyed by symbol and frequency
+
+Candles are kept as one structured NumPy array per (symbol, frequencyType, frequency)
+and opened memory-mapped, so repeated history requests are answered from disk and
+only the missing tail is fetched from the Schwab API.
+
+Layout:
+    <root>/<frequencyType>_<frequency>/<SYMBOL>.npy    candles (datetime ms, OHLCV)
+    <root>/<frequencyType>_<frequency>/<SYMBOL>.json   coverage metadata
+"""
+
+import os
+import json
+import time
+import tempfile
+from operator import itemgetter
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional, faster decoding
+    orjson = None
+
+
+CANDLE_DTYPE = np.dtype([
+    ('datetime', '<i8'),   # epoch milliseconds (as returned by the API)
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<i8'),
+])
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+
+class CandleStore:
+    """
+    Columnar candle cache backed by memory-mapped .npy files
+    """
+
+    def __init__(self, root='~/.schwabdev/candles', refresh_interval=900):
+        """
+        Initialize the candle store
+
+        Args:
+            root: Directory holding the cached candles
+            refresh_interval: Seconds after a fetch up to the present during which
+                the stored candles are considered current (no API call at all)
+        """
+        self.root = os.path.expanduser(root)
+        self.refresh_interval = refresh_interval
+        os.makedirs(self.root, exist_ok=True)
+
+    # ========== PATHS ==========
+
+    def _key_dir(self, frequencyType, frequency):
+        return os.path.join(self.root, f"{frequencyType}_{frequency}")
+
+    def _paths(self, symbol, frequencyType, frequency):
+        # '/' and '$' appear in futures and index symbols
+        safe_symbol = symbol.upper().replace('/', '_').replace('$', '_')
+        key_dir = self._key_dir(frequencyType, frequency)
+        return (os.path.join(key_dir, f"{safe_symbol}.npy"),
+                os.path.join(key_dir, f"{safe_symbol}.json"))
+
+    # ========== READ ==========
+
+    def load(self, symbol, frequencyType='daily', frequency=1):
+        """
+        Load the raw candle array for a symbol (memory-mapped, read-only)
+
+        Returns:
+            Structured ndarray with CANDLE_DTYPE, or None if nothing is stored
+        """
+        data_path, _ = self._paths(symbol, frequencyType, frequency)
+        if not os.path.exists(data_path):
+            return None
+        try:
+            return np.load(data_path, mmap_mode='r')
+        except (ValueError, OSError) as e:
+            print(f"Warning: Corrupt candle file for {symbol} ({e}), ignoring")
+            return None
+
+    def metadata(self, symbol, frequencyType='daily', frequency=1):
+        """
+        Get coverage metadata for a symbol
+
+        Returns:
+            dict with 'covered_from' / 'covered_to' (epoch ms, the span already fetched
+            from the API), 'refreshed_at' (epoch seconds of the last fetch up to the
+            present) and 'updated_at' (epoch seconds of the last write)
+        """
+        _, meta_path = self._paths(symbol, frequencyType, frequency)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def read(self, symbol, frequencyType='daily', frequency=1, start=None, end=None):
+        """
+        Read stored candles as a DataFrame
+
+        Args:
+            symbol: Stock symbol
+            frequencyType: Frequency type ('minute', 'daily', 'weekly', 'monthly')
+            frequency: Frequency (int)
+            start: Optional first timestamp (inclusive, UTC-naive like the API index)
+            end: Optional last timestamp (inclusive)
+
+        Returns:
+            DataFrame with OHLCV columns indexed by datetime, or None
+        """
+        candles = self.load(symbol, frequencyType, frequency)
+        if candles is None or len(candles) == 0:
+            return None
+
+        times = candles['datetime']
+        lo = 0 if start is None else int(np.searchsorted(times, _to_ms(start), side='left'))
+        hi = len(times) if end is None else int(np.searchsorted(times, _to_ms(end), side='right'))
+        if hi <= lo:
+            return None
+
+        return candles_to_frame(candles[lo:hi])
+
+    # ========== WRITE ==========
+
+    def write(self, symbol, df, frequencyType='daily', frequency=1, covered_from=None, covered_to=None,
+              refreshed=False):
+        """
+        Merge candles into the store (newer rows win on duplicate timestamps)
+
+        Args:
+            symbol: Stock symbol
+            df: DataFrame with OHLCV columns indexed by datetime
+            frequencyType: Frequency type
+            frequency: Frequency (int)
+            covered_from: Earliest timestamp the API was asked for; lets the store
+                know history before the first candle simply does not exist
+            covered_to: Latest timestamp the API was asked for
+            refreshed: Whether the fetch ran up to the present (starts refresh_interval)
+        """
+        new = frame_to_candles(df)
+        existing = self.load(symbol, frequencyType, frequency)
+
+        if existing is not None and len(existing) > 0:
+            merged = np.concatenate([np.asarray(existing), new])
+            # keep the last occurrence of each timestamp so a refetched partial bar replaces the old one
+            _, rev_idx = np.unique(merged['datetime'][::-1], return_index=True)
+            merged = merged[len(merged) - 1 - rev_idx]
+        else:
+            merged = np.sort(new, order='datetime')
+
+        data_path, meta_path = self._paths(symbol, frequencyType, frequency)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        _atomic_save(data_path, merged)
+
+        meta = self.metadata(symbol, frequencyType, frequency)
+        old_from, old_to = meta.get('covered_from'), meta.get('covered_to')
+        new_from = _to_ms(covered_from) if covered_from is not None else old_from
+        new_to = _to_ms(covered_to) if covered_to is not None else old_to
+        if None not in (old_from, old_to, new_from, new_to) and (new_from > old_to or new_to < old_from):
+            # the fetch does not touch the covered span, so the span would have a gap: start over from it
+            old_from = old_to = None
+        if new_from is not None:
+            meta['covered_from'] = min(new_from, old_from) if old_from is not None else new_from
+        if new_to is not None:
+            meta['covered_to'] = max(new_to, old_to) if old_to is not None else new_to
+        if refreshed:
+            meta['refreshed_at'] = time.time()
+        meta['updated_at'] = time.time()
+        with open(meta_path, 'w') as f:
+            json.dump(meta, f)
+
+    def is_fresh(self, symbol, frequencyType='daily', frequency=1):
+        """Whether candles up to the present were fetched within refresh_interval"""
+        refreshed_at = self.metadata(symbol, frequencyType, frequency).get('refreshed_at')
+        return refreshed_at is not None and (time.time() - refreshed_at) < self.refresh_interval
+
+    def covers(self, symbol, start, frequencyType='daily', frequency=1):
+        """Whether history back to `start` has already been requested from the API"""
+        covered_from = self.metadata(symbol, frequencyType, frequency).get('covered_from')
+        return covered_from is not None and covered_from <= _to_ms(start)
+
+    def covered_to(self, symbol, frequencyType='daily', frequency=1):
+        """Latest timestamp already requested from the API (pd.Timestamp, UTC-naive), or None"""
+        covered_to = self.metadata(symbol, frequencyType, frequency).get('covered_to')
+        return pd.to_datetime(covered_to, unit='ms') if covered_to is not None else None
+
+    def symbols(self, frequencyType='daily', frequency=1):
+        """List symbols stored for a frequency"""
+        key_dir = self._key_dir(frequencyType, frequency)
+        if not os.path.isdir(key_dir):
+            return []
+        return sorted(f[:-4] for f in os.listdir(key_dir) if f.endswith('.npy'))
+
+
+# ========== CONVERSIONS ==========
+
+def _to_ms(ts):
+    """Convert a timestamp (datetime, pd.Timestamp, or epoch ms) to epoch ms"""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    return int(pd.Timestamp(ts).value // 1_000_000)
+
+
+def frame_to_candles(df):
+    """Convert an OHLCV DataFrame (datetime index) to a structured candle array"""
+    candles = np.empty(len(df), dtype=CANDLE_DTYPE)
+    candles['datetime'] = df.index.values.astype('datetime64[ms]').astype('<i8')
+    for col in OHLCV_COLUMNS:
+        candles[col] = df[col].to_numpy(dtype=CANDLE_DTYPE[col])
+    return candles
+
+
+def candles_to_frame(candles):
+    """Convert a structured candle array to an OHLCV DataFrame (datetime index)"""
+    index = pd.DatetimeIndex(np.asarray(candles['datetime']).astype('datetime64[ms]'), name='datetime')
+    return pd.DataFrame({col: np.asarray(candles[col]) for col in OHLCV_COLUMNS}, index=index)
+
+
+def decode_candles(payload):
+    """
+    Decode a price_history response straight into an OHLCV DataFrame (datetime index)
+
+    The body is parsed once (orjson when installed) and each candle field is read into a
+    preallocated typed column (int64 epoch ms, float64 OHLC, int64 volume); the frame wraps
+    those columns and the index without copying them.
+
+    Args:
+        payload: Response body (bytes or str) or an already decoded response dict
+
+    Returns:
+        (data, df): the decoded response and its frame; df is None when the response has no
+        candles or they are not in the standard shape (missing fields, nulls), so the caller
+        can fall back to a generic conversion without decoding again
+    """
+    data = _loads(payload) if isinstance(payload, (bytes, bytearray, memoryview, str)) else payload
+    candles = data.get('candles') if isinstance(data, dict) else None
+    if not candles or 'error' in data:
+        return data, None
+    n = len(candles)
+    try:
+        ms = np.fromiter(map(itemgetter('datetime'), candles), dtype='<i8', count=n)
+        columns = {col: np.fromiter(map(itemgetter(col), candles), dtype=CANDLE_DTYPE[col], count=n)
+                   for col in OHLCV_COLUMNS}
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return data, None
+    index = pd.DatetimeIndex(ms.view('datetime64[ms]'), name='datetime', copy=False)
+    return data, pd.DataFrame(columns, index=index, copy=False)
+
+
+def _atomic_save(path, array):
+    """Write the array next to `path` and rename over it so readers never see a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.npy.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -13,6 +13,9 @@ This module implements various ensemble methods:
 import sys
 from pathlib import Path
 import os
+import queue
+import asyncio
+import threading
 from dotenv import load_dotenv
 import numpy as np
 import pandas as pd
@@ -25,6 +28,8 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 import schwabdev
+from panel_features import rolling_rank_pct, rolling_median, rolling_mean_abs_dev
+from candle_store import decode_candles
 
 # Scikit-learn ensemble models
 from sklearn.ensemble import (
@@ -72,11 +77,72 @@ except ImportError:
 load_dotenv()
 
 
+# how far back the API serves minute candles
+_MINUTE_HISTORY = timedelta(days=48)
+
+
+def _period_start(now, periodType, period):
+    """Start of the window the API returns for a periodType/period request"""
+    defaults = {'day': 10, 'month': 1, 'year': 1, 'ytd': 1}
+    period = period if period is not None else defaults.get(periodType, 1)
+    if periodType == 'day':
+        # 'day' periods count trading days, including today
+        today = pd.Timestamp(now).normalize()
+        return (pd.offsets.BDay().rollback(today) - pd.offsets.BDay(period - 1)).to_pydatetime()
+    elif periodType == 'month':
+        return now - timedelta(days=31 * period)
+    elif periodType == 'ytd':
+        return datetime(now.year, 1, 1)
+    else:  # year
+        return now - timedelta(days=366 * period)
+
+
+def _to_utc_naive(dt):
+    """Convert a local (or tz-aware) datetime to a UTC-naive pandas Timestamp"""
+    ts = pd.Timestamp(dt)
+    if ts.tzinfo is None:
+        # local offset at that date (DST), as the client's .timestamp() conversion uses
+        ts = pd.Timestamp(ts.to_pydatetime(warn=False).astimezone())
+    return ts.tz_convert('UTC').tz_localize(None)
+
+
+def _rolling_rank_pct(series, window):
+    """
+    Percentile rank of the last value within each rolling window
+    Same as rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    """
+    return pd.Series(rolling_rank_pct(series.to_numpy(dtype='f8'), window), index=series.index)
+
+
+def _rolling_median(series, window):
+    """
+    Rolling median (linear interpolation)
+    Same as rolling(window).apply(lambda x: pd.Series(x).quantile(0.5))
+    """
+    return pd.Series(rolling_median(series.to_numpy(dtype='f8'), window), index=series.index)
+
+
+def _rolling_mean_abs_dev(series, window):
+    """
+    Rolling mean absolute deviation around the window mean
+    Same as rolling(window).apply(lambda x: np.abs(x - x.mean()).mean())
+    """
+    return pd.Series(rolling_mean_abs_dev(series.to_numpy(dtype='f8'), window), index=series.index)
+
+
 class SchwabDataFetcher:
     """Fetches and processes data from Schwab API"""
     
-    def __init__(self, client):
+    def __init__(self, client, store=None):
+        """
+        Args:
+            client: Schwab API client instance
+            store: Optional CandleStore; when given, price history is served from disk
+                   and only the missing tail is fetched from the API
+        """
         self.client = client
+        self.store = store
+        self._quotes = None
     
     def get_price_history(self, symbol, periodType='year', period=1, frequencyType='daily', frequency=1, startDate=None, endDate=None):
         """
@@ -94,6 +160,92 @@ class SchwabDataFetcher:
         Returns:
             DataFrame with OHLCV data
         """
+        if self.store is not None:
+            return self._get_price_history_cached(symbol, periodType, period, frequencyType, frequency, startDate, endDate)
+        return self._fetch_price_history(symbol, periodType, period, frequencyType, frequency, startDate, endDate)
+    
+    def _get_price_history_cached(self, symbol, periodType, period, frequencyType, frequency, startDate, endDate):
+        """
+        Serve price history from the candle store, fetching only what is missing
+        
+        - History older than anything requested before triggers one full API fetch
+        - Otherwise only candles after the last stored bar are fetched (the last bar
+          is refetched too, so a partial intraday bar gets completed); minute candles
+          older than the API's minute history are fetched in full instead
+        - No API call is made for windows already fetched, nor within the store's
+          refresh_interval after a fetch up to the present
+        """
+        plan = self._cache_plan(symbol, periodType, period, frequencyType, frequency, startDate, endDate)
+        if plan['fetch'] is not None:
+            df = self._fetch_price_history(symbol, **plan['fetch'])
+            if not self._cache_store(symbol, df, plan):
+                return None
+        return self._cache_read(symbol, plan)
+    
+    def _cache_plan(self, symbol, periodType, period, frequencyType, frequency, startDate, endDate):
+        """
+        Work out what the candle store is missing for a request
+        
+        Returns:
+            dict with the UTC window to read back, 'fetch' - the price_history
+            kwargs still needed from the API (None when the store can answer alone) -
+            and the coverage ('covered_to', 'refreshed') a successful fetch records
+        """
+        now = datetime.now()
+        start = startDate if startDate is not None else _period_start(now, periodType, period)
+        end = endDate if endDate is not None else now
+        # the API index is UTC-naive; request bounds are local datetimes
+        plan = {'frequencyType': frequencyType, 'frequency': frequency,
+                'start_utc': _to_utc_naive(start), 'end_utc': _to_utc_naive(end),
+                'full': False, 'fetch': None, 'refreshed': endDate is None}
+        plan['covered_to'] = plan['end_utc']
+        
+        store = self.store
+        covered_to = store.covered_to(symbol, frequencyType, frequency)
+        if covered_to is not None and store.covers(symbol, plan['start_utc'], frequencyType, frequency):
+            if plan['end_utc'] <= covered_to or store.is_fresh(symbol, frequencyType, frequency):
+                return plan
+            # refetch from the last stored bar (it may have been partial) or the end of what was fetched
+            candles = store.load(symbol, frequencyType, frequency)
+            tail_from = covered_to
+            if candles is not None and len(candles) > 0:
+                tail_from = min(tail_from, pd.to_datetime(int(candles['datetime'][-1]), unit='ms'))
+            # past the API's minute history a tail request would leave a gap: fetch the request in full
+            if frequencyType != 'minute' or tail_from >= _to_utc_naive(now - _MINUTE_HISTORY):
+                tail_period_type = 'day' if frequencyType == 'minute' else 'year'
+                plan['fetch'] = dict(periodType=tail_period_type, period=None, frequencyType=frequencyType, frequency=frequency,
+                                     startDate=datetime.fromtimestamp(tail_from.tz_localize('UTC').timestamp()), endDate=now)
+                plan['covered_to'] = _to_utc_naive(now)
+                plan['refreshed'] = True
+                return plan
+        
+        plan['full'] = True
+        plan['fetch'] = dict(periodType=periodType, period=period, frequencyType=frequencyType,
+                             frequency=frequency, startDate=startDate, endDate=endDate)
+        return plan
+    
+    def _cache_store(self, symbol, df, plan):
+        """Write fetched candles for a plan; False if a required full fetch failed"""
+        coverage = dict(covered_to=plan['covered_to'], refreshed=plan['refreshed'])
+        if plan['full']:
+            if df is None:
+                return False
+            self.store.write(symbol, df, plan['frequencyType'], plan['frequency'], covered_from=plan['start_utc'], **coverage)
+        elif df is not None and len(df) > 0:
+            self.store.write(symbol, df, plan['frequencyType'], plan['frequency'], **coverage)
+        return True
+    
+    def _cache_read(self, symbol, plan):
+        df = self.store.read(symbol, plan['frequencyType'], plan['frequency'], start=plan['start_utc'], end=plan['end_utc'])
+        if df is None or len(df) == 0:
+            print(f"Error fetching price history for {symbol}: no stored candles in requested range")
+            return None
+        return df
+    
+    def _fetch_price_history(self, symbol, periodType='year', period=1, frequencyType='daily', frequency=1, startDate=None, endDate=None):
+        """
+        Fetch price history for a symbol straight from the Schwab API (see get_price_history)
+        """
         try:
             response = self.client.price_history(
                 symbol, 
@@ -109,77 +261,211 @@ class SchwabDataFetcher:
             if response.status_code != 200:
                 raise ValueError(f"API returned status {response.status_code}: {response.text}")
             
-            data = response.json()
-            
-            # Check for API errors
-            if 'error' in data:
-                error_msg = data.get('error', 'Unknown error')
-                raise ValueError(f"API error for {symbol}: {error_msg}")
-            
-            if 'candles' not in data:
-                # Log the actual response for debugging
-                print(f"Warning: Unexpected response structure for {symbol}. Keys: {list(data.keys())}")
-                if 'empty' in str(data).lower() or len(data) == 0:
-                    raise ValueError(f"No data available for {symbol} (symbol may be invalid or market closed)")
-                raise ValueError(f"No candle data found for {symbol}. Response keys: {list(data.keys())}")
-            
-            candles = data['candles']
-            if not candles or len(candles) == 0:
-                raise ValueError(f"Empty candle data for {symbol}")
-            
-            df = pd.DataFrame(candles)
-            
-            # Check if datetime column exists
-            if 'datetime' not in df.columns:
-                # Try alternative column names
-                if 'time' in df.columns:
-                    df['datetime'] = df['time']
-                elif 'timestamp' in df.columns:
-                    df['datetime'] = df['timestamp']
-                else:
-                    raise ValueError(f"No datetime column found in response. Columns: {df.columns.tolist()}")
-            
-            # Convert datetime to pandas datetime
-            df['datetime'] = pd.to_datetime(df['datetime'], unit='ms', errors='coerce')
-            
-            # Remove any rows with invalid datetime
-            df = df.dropna(subset=['datetime'])
-            
-            if len(df) == 0:
-                raise ValueError(f"No valid datetime data for {symbol}")
-            
-            df.set_index('datetime', inplace=True)
-            
-            # Rename columns to standard names (handle different column names)
-            column_mapping = {
-                'open': 'open',
-                'high': 'high',
-                'low': 'low',
-                'close': 'close',
-                'volume': 'volume'
-            }
-            
-            # Check actual column names and map them
-            actual_cols = df.columns.tolist()
-            for i, col in enumerate(['open', 'high', 'low', 'close', 'volume']):
-                if i < len(actual_cols):
-                    column_mapping[actual_cols[i]] = col
-            
-            df.rename(columns=column_mapping, inplace=True)
-            
-            # Ensure we have the required columns
-            required_cols = ['open', 'high', 'low', 'close', 'volume']
-            missing_cols = [col for col in required_cols if col not in df.columns]
-            if missing_cols:
-                raise ValueError(f"Missing required columns: {missing_cols}. Available: {df.columns.tolist()}")
-            
-            return df[required_cols]
+            return self._price_history_frame(symbol, response.content)
         except Exception as e:
             print(f"Error fetching price history for {symbol}: {e}")
             import traceback
             traceback.print_exc()
             return None
     
+    def _price_history_frame(self, symbol, data):
+        """
+        Convert a price_history response (raw body or decoded dict) to an OHLCV DataFrame
+        
+        Standard candles are decoded straight into typed columns (see candle_store.decode_candles);
+        anything else goes through the generic conversion below.
+        
+        Raises:
+            ValueError: if the response holds no usable candles
+        """
+        data, df = decode_candles(data)
+        if df is not None:
+            return df
+        
+        # Check for API errors
+        if 'error' in data:
+            error_msg = data.get('error', 'Unknown error')
+            raise ValueError(f"API error for {symbol}: {error_msg}")
+        
+        if 'candles' not in data:
+            # Log the actual response for debugging
+            print(f"Warning: Unexpected response structure for {symbol}. Keys: {list(data.keys())}")
+            if 'empty' in str(data).lower() or len(data) == 0:
+                raise ValueError(f"No data available for {symbol} (symbol may be invalid or market closed)")
+            raise ValueError(f"No candle data found for {symbol}. Response keys: {list(data.keys())}")
+        
+        candles = data['candles']
+        if not candles or len(candles) == 0:
+            raise ValueError(f"Empty candle data for {symbol}")
+        
+        df = pd.DataFrame(candles)
+        
+        # Check if datetime column exists
+        if 'datetime' not in df.columns:
+            # Try alternative column names
+            if 'time' in df.columns:
+                df['datetime'] = df['time']
+            elif 'timestamp' in df.columns:
+                df['datetime'] = df['timestamp']
+            else:
+                raise ValueError(f"No datetime column found in response. Columns: {df.columns.tolist()}")
+        
+        # Convert datetime to pandas datetime
+        df['datetime'] = pd.to_datetime(df['datetime'], unit='ms', errors='coerce')
+        
+        # Remove any rows with invalid datetime
+        df = df.dropna(subset=['datetime'])
+        
+        if len(df) == 0:
+            raise ValueError(f"No valid datetime data for {symbol}")
+        
+        df.set_index('datetime', inplace=True)
+        
+        # Rename columns to standard names (handle different column names)
+        column_mapping = {
+            'open': 'open',
+            'high': 'high',
+            'low': 'low',
+            'close': 'close',
+            'volume': 'volume'
+        }
+        
+        # Check actual column names and map them
+        actual_cols = df.columns.tolist()
+        for i, col in enumerate(['open', 'high', 'low', 'close', 'volume']):
+            if i < len(actual_cols):
+                column_mapping[actual_cols[i]] = col
+        
+        df.rename(columns=column_mapping, inplace=True)
+        
+        # Ensure we have the required columns
+        required_cols = ['open', 'high', 'low', 'close', 'volume']
+        missing_cols = [col for col in required_cols if col not in df.columns]
+        if missing_cols:
+            raise ValueError(f"Missing required columns: {missing_cols}. Available: {df.columns.tolist()}")
+        
+        return df[required_cols]
+    
+    # ========== BULK (CONCURRENT) FETCHING ==========
+    
+    def iter_price_history(self, symbols, periodType='year', period=1, frequencyType='daily', frequency=1,
+                           startDate=None, endDate=None, max_concurrency=8, retries=3):
+        """
+        Fetch price history for many symbols concurrently, yielding each as it completes
+        
+        Args:
+            symbols: Iterable of stock symbols
+            periodType, period, frequencyType, frequency, startDate, endDate: As in get_price_history
+            max_concurrency: Maximum requests in flight
+            retries: Retries per symbol for 5xx / connection errors (the client's request
+                     scheduler handles the rate limit and 429s)
+        
+        Yields:
+            (symbol, DataFrame or None) in completion order
+        """
+        params = dict(periodType=periodType, period=period, frequencyType=frequencyType,
+                      frequency=frequency, startDate=startDate, endDate=endDate)
+        requests = {symbol: dict(params, symbol=symbol) for symbol in symbols}
+        yield from self.iter_price_history_requests(requests, max_concurrency, retries)
+    
+    def get_price_history_many(self, symbols, **kwargs):
+        """
+        Fetch price history for many symbols concurrently (see iter_price_history)
+        
+        Returns:
+            Dictionary {symbol: DataFrame} for the symbols that returned data
+        """
+        return {symbol: df for symbol, df in self.iter_price_history(symbols, **kwargs) if df is not None}
+    
+    def iter_price_history_requests(self, requests, max_concurrency=8, retries=3):
+        """
+        Run arbitrary price_history requests concurrently (e.g. several timeframes of one symbol)
+        
+        Args:
+            requests: Dictionary {key: get_price_history kwargs including 'symbol'}
+            max_concurrency, retries: See iter_price_history
+        
+        Yields:
+            (key, DataFrame or None) in completion order
+        """
+        defaults = dict(periodType='year', period=1, frequencyType='daily', frequency=1, startDate=None, endDate=None)
+        to_fetch = {}
+        plans = {}
+        for key, kwargs in requests.items():
+            kwargs = dict(defaults, **kwargs)
+            symbol = kwargs.pop('symbol')
+            if self.store is not None:
+                plan = self._cache_plan(symbol, **kwargs)
+                if plan['fetch'] is None:
+                    yield key, self._cache_read(symbol, plan)
+                    continue
+                plans[key] = plan
+                kwargs = plan['fetch']
+            to_fetch[key] = dict(kwargs, symbol=symbol)
+        
+        for key, data in self._fetch_concurrently(to_fetch, max_concurrency, retries):
+            symbol = to_fetch[key]['symbol']
+            df = None
+            if isinstance(data, Exception):
+                print(f"Error fetching price history for {symbol}: {data}")
+            else:
+                try:
+                    df = self._price_history_frame(symbol, data)
+                except ValueError as e:
+                    print(f"Error fetching price history for {symbol}: {e}")
+            if key in plans:
+                df = self._cache_read(symbol, plans[key]) if self._cache_store(symbol, df, plans[key]) else None
+            yield key, df
+    
+    def _fetch_concurrently(self, requests, max_concurrency, retries):
+        """
+        Run price_history requests through schwabdev.ClientAsync on a background event loop
+        
+        Yields:
+            (key, decoded response dict or Exception) in completion order
+        """
+        if not requests:
+            return
+        if not isinstance(self.client, schwabdev.Client):
+            # no async transport for other clients (e.g. test doubles): plain sequential calls
+            for key, kwargs in requests.items():
+                kwargs = dict(kwargs)
+                try:
+                    response = self.client.price_history(kwargs.pop('symbol'), **kwargs)
+                    if response.status_code != 200:
+                        raise ValueError(f"API returned status {response.status_code}: {response.text}")
+                    yield key, response.content
+                except Exception as e:
+                    yield key, e
+            return
+        
+        results = queue.Queue()
+        done = object()
+        
+        async def run():
+            async with schwabdev.ClientAsync.from_client(self.client) as client:
+                async for key, data in client.price_history_many(requests, max_concurrency, retries):
+                    results.put((key, data))
+        
+        def worker():
+            try:
+                asyncio.run(run())
+            except Exception as e:
+                results.put((done, e))
+            else:
+                results.put((done, None))
+        
+        threading.Thread(target=worker, daemon=True).start()
+        remaining = set(requests)
+        while True:
+            key, data = results.get()
+            if key is done:
+                for key in remaining:
+                    yield key, data if data is not None else RuntimeError("request was not completed")
+                return
+            remaining.discard(key)
+            yield key, data
+    
     def get_intraday_data(self, symbol, period=1, frequency=5):
         """
         Get intraday (minute-level) data for high-frequency trading
@@ -350,26 +636,49 @@ class SchwabDataFetcher:
             '1day': {'periodType': 'year', 'period': 1, 'frequencyType': 'daily', 'frequency': 1}
         }
         
-        for tf in timeframes:
-            if tf in timeframe_map:
-                params = timeframe_map[tf]
-                df = self.get_price_history(symbol, **params)
-                if df is not None:
-                    data[tf] = df
-                    print(f"  ✓ Fetched {len(df)} bars for {tf} timeframe")
+        requests = {tf: dict(timeframe_map[tf], symbol=symbol) for tf in timeframes if tf in timeframe_map}
+        fetched = dict(self.iter_price_history_requests(requests))
+        
+        # Report in the requested timeframe order
+        for tf in requests:
+            df = fetched.get(tf)
+            if df is not None:
+                data[tf] = df
+                print(f"  ✓ Fetched {len(df)} bars for {tf} timeframe")
         
         return data
     
+    @property
+    def quote_coalescer(self):
+        """Shared QuoteCoalescer: concurrent get_quote calls go out as one quotes request"""
+        if self._quotes is None:
+            self._quotes = schwabdev.QuoteCoalescer(self.client)
+        return self._quotes
+    
     def get_quote(self, symbol):
         """Get current quote for a symbol"""
         try:
-            response = self.client.quote(symbol)
-            data = response.json()
-            return data.get(symbol, {})
+            return self.quote_coalescer.quote(symbol)
         except Exception as e:
             print(f"Error fetching quote for {symbol}: {e}")
             return {}
     
+    def get_quotes(self, symbols):
+        """
+        Get current quotes for many symbols in as few API calls as possible
+        
+        Args:
+            symbols: List of stock symbols
+        
+        Returns:
+            Dictionary {symbol: quote data} for the symbols that returned data
+        """
+        try:
+            return self.quote_coalescer.quotes(symbols)
+        except Exception as e:
+            print(f"Error fetching quotes: {e}")
+            return {}
+    
     def create_features(self, df, lookback_periods=[5, 10, 20, 50]):
         """
         Create technical features from price data
@@ -561,7 +870,7 @@ class SchwabDataFetcher:
         # Commodity Channel Index (CCI)
         tp = (features_df['high'] + features_df['low'] + features_df['close']) / 3
         sma_tp = tp.rolling(window=20).mean()
-        mad = tp.rolling(window=20).apply(lambda x: np.abs(x - x.mean()).mean())
+        mad = _rolling_mean_abs_dev(tp, 20)
         features_df['cci'] = (tp - sma_tp) / (0.015 * mad + 1e-10)
         
         # ========== ALPHA FACTORS (From "Finding Alphas" Book) ==========
@@ -579,22 +888,14 @@ class SchwabDataFetcher:
         # 3. Time-series Rank (Ts_Rank) - Rank within time window
         for period in [5, 10, 20]:
             # Rank over time window (0 to 1, where 1 is highest)
-            features_df[f'alpha_ts_rank_close_{period}'] = features_df['close'].rolling(window=period).apply(
-                lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False
-            )
-            features_df[f'alpha_ts_rank_volume_{period}'] = features_df['volume'].rolling(window=period).apply(
-                lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False
-            )
-            features_df[f'alpha_ts_rank_returns_{period}'] = features_df['returns'].rolling(window=period).apply(
-                lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False
-            )
+            features_df[f'alpha_ts_rank_close_{period}'] = _rolling_rank_pct(features_df['close'], period)
+            features_df[f'alpha_ts_rank_volume_{period}'] = _rolling_rank_pct(features_df['volume'], period)
+            features_df[f'alpha_ts_rank_returns_{period}'] = _rolling_rank_pct(features_df['returns'], period)
         
         # 4. Cross-sectional Rank (Rank) - For single stock, use rolling quantile as proxy
         for period in [10, 20]:
             # Use rolling quantile as proxy for rank
-            features_df[f'alpha_quantile_close_{period}'] = features_df['close'].rolling(window=period).apply(
-                lambda x: pd.Series(x).quantile(0.5), raw=False
-            ) / (features_df['close'] + 1e-10)
+            features_df[f'alpha_quantile_close_{period}'] = _rolling_median(features_df['close'], period) / (features_df['close'] + 1e-10)
         
         # 5. Correlation patterns (trend detection)
         for period in [5, 10, 20]:
@@ -612,12 +913,10 @@ class SchwabDataFetcher:
         features_df['alpha_mean_reversion_delay3'] = -features_df['returns'].shift(3)
         
         # 7. Trend with Volume Rank: (price/delay(price,3)) * rank(volume)
+        # Use rolling rank as proxy for volume rank (same for every delay)
+        volume_rank = _rolling_rank_pct(features_df['volume'], 20)
         for delay in [3, 5]:
             price_trend = features_df['close'] / (features_df['close'].shift(delay) + 1e-10)
-            # Use rolling quantile as proxy for volume rank
-            volume_rank = features_df['volume'].rolling(window=20).apply(
-                lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False
-            )
             features_df[f'alpha_trend_volume_rank_{delay}'] = price_trend * volume_rank
         
         # 8. Time-series Mean/Std (Sharpe-like ratios)
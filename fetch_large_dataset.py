@@ -111,36 +111,24 @@ def fetch_multiple_stocks_large_dataset(symbols, frequency='daily'):
     
     results = {}
     
-    for i, symbol in enumerate(symbols, 1):
-        print(f"\n[{i}/{len(symbols)}] Fetching {symbol}...")
-        
-        try:
-            if frequency == 'daily':
-                df = fetcher.get_price_history(
-                    symbol,
-                    periodType='year',
-                    period=20,  # 20 years
-                    frequencyType='daily',
-                    frequency=1
-                )
-            else:
-                df = fetcher.get_price_history(
-                    symbol,
-                    periodType='year',
-                    period=10,  # 10 years
-                    frequencyType='daily',
-                    frequency=1
-                )
-            
-            if df is not None and len(df) > 0:
-                results[symbol] = df
-                timespan = (df.index.max() - df.index.min()).days
-                print(f"   ✓ {len(df)} bars ({timespan} days)")
-            else:
-                print(f"   ✗ No data")
-        
-        except Exception as e:
-            print(f"   ✗ Error: {e}")
+    # 20 years of daily bars for 'daily', 10 years otherwise; symbols are fetched concurrently
+    period = 20 if frequency == 'daily' else 10
+    history = fetcher.iter_price_history(
+        symbols,
+        periodType='year',
+        period=period,
+        frequencyType='daily',
+        frequency=1
+    )
+    
+    for i, (symbol, df) in enumerate(history, 1):
+        print(f"\n[{i}/{len(symbols)}] {symbol}")
+        if df is not None and len(df) > 0:
+            results[symbol] = df
+            timespan = (df.index.max() - df.index.min()).days
+            print(f"   ✓ {len(df)} bars ({timespan} days)")
+        else:
+            print(f"   ✗ No data")
     
     print("\n" + "=" * 80)
     print(f"✅ Fetched data for {len(results)}/{len(symbols)} stocks")
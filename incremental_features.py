@@ -0,0 +1,643 @@
+"""
+Incremental Features
+Streaming feature state for live bars
+
+The batch path (SchwabDataFetcher.create_features) recomputes every column over the
+whole history, which is wasteful when a single new candle arrives. IncrementalFeatures
+keeps the rolling state for one symbol - EMA accumulators, bounded windows of recent
+values, OBV/VPT running totals, RSI gain/loss windows and the return tails used for
+winsorizing - and produces the feature vector for the newest bar in constant time
+(independent of how much history has been seen).
+
+The vector has the same columns, in the same order, as create_features (see
+panel_features.feature_columns) and matches the last row the batch path would produce
+for the same history. During warm-up, columns that need more history are NaN.
+
+Usage:
+    engine = FeatureEngine()
+    engine.seed('AAPL', history_df)           # replay stored history once
+    engine.on_chart_equity(message)           # CHART_EQUITY stream message
+    engine.latest('AAPL')                     # pd.Series of the newest feature vector
+"""
+
+import json
+import math
+import bisect
+import calendar
+from collections import deque
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+from panel_features import feature_columns, LAG_PERIODS, LAGGED_RETURN_PERIODS
+
+
+NAN = float('nan')
+SQRT_252 = math.sqrt(252)
+PARKINSON_FACTOR = 1 / (4 * math.log(2))
+
+# Extra order statistics kept in the winsorizing tails beyond what the quantile needs.
+# The needed count grows by one every 10,000 returns, so the tails stay exact for
+# SLACK * 10,000 returns after the last trim.
+WINSOR_SLACK = 16
+
+
+# ========== WINDOW HELPERS (plain floats, NaN for incomplete windows) ==========
+
+def _mean(values, n):
+    if len(values) < n:
+        return NAN
+    return sum(values[-n:]) / n
+
+
+def _std(values, n):
+    """Sample standard deviation (ddof=1) of the last n values"""
+    if len(values) < n:
+        return NAN
+    window = values[-n:]
+    mean = sum(window) / n
+    if mean != mean:
+        return NAN
+    return math.sqrt(sum((x - mean) ** 2 for x in window) / (n - 1))
+
+
+def _rank_pct(values, n):
+    """Percentile rank (average method) of the last value within the last n values"""
+    if len(values) < n:
+        return NAN
+    window = values[-n:]
+    if math.isnan(sum(window)):
+        return NAN
+    last = window[-1]
+    below = 0
+    ties = 0
+    for x in window:
+        if x < last:
+            below += 1
+        elif x == last:
+            ties += 1
+    return (below + (ties + 1) / 2) / n
+
+
+def _median(values, n):
+    if len(values) < n:
+        return NAN
+    window = sorted(values[-n:])
+    mid = n // 2
+    if n % 2:
+        return window[mid]
+    low, high = window[mid - 1], window[mid]
+    return low + (high - low) * 0.5
+
+
+def _mean_abs_dev(values, n):
+    if len(values) < n:
+        return NAN
+    window = values[-n:]
+    mean = sum(window) / n
+    return sum(abs(x - mean) for x in window) / n
+
+
+def _corr(xs, ys):
+    n = len(xs)
+    mx = sum(xs) / n
+    my = sum(ys) / n
+    if mx != mx or my != my:
+        return NAN
+    cov = var_x = var_y = 0.0
+    for x, y in zip(xs, ys):
+        dx = x - mx
+        dy = y - my
+        cov += dx * dy
+        var_x += dx * dx
+        var_y += dy * dy
+    denom = math.sqrt(var_x * var_y)
+    return cov / denom if denom > 0 else NAN
+
+
+def _central_moments(values, n):
+    """Second, third and fourth central moments of the last n values (NaN if undefined)"""
+    if len(values) < n:
+        return NAN, NAN, NAN
+    window = values[-n:]
+    mean = sum(window) / n
+    if mean != mean:
+        return NAN, NAN, NAN
+    m2 = m3 = m4 = 0.0
+    for x in window:
+        d = x - mean
+        d2 = d * d
+        m2 += d2
+        m3 += d2 * d
+        m4 += d2 * d2
+    m2 /= n
+    if m2 <= 1e-14:
+        return NAN, NAN, NAN
+    return m2, m3 / n, m4 / n
+
+
+def _skew(values, n):
+    m2, m3, _ = _central_moments(values, n)
+    return math.sqrt(n * (n - 1)) * m3 / ((n - 2) * m2 ** 1.5)
+
+
+def _kurt(values, n):
+    m2, _, m4 = _central_moments(values, n)
+    return ((n * n - 1) * m4 / (m2 * m2) - 3 * (n - 1) ** 2) / ((n - 2) * (n - 3))
+
+
+def _flag(condition):
+    return 1.0 if condition else 0.0
+
+
+# ========== PER-SYMBOL STATE ==========
+
+class IncrementalFeatures:
+    """
+    Rolling feature state for one symbol, updated one candle at a time
+    """
+
+    def __init__(self, lookback_periods=(5, 10, 20, 50), include_time=True):
+        """
+        Initialize empty state
+
+        Args:
+            lookback_periods: Periods for the simple moving averages (as in create_features)
+            include_time: Whether the calendar columns are produced (needs timestamps)
+        """
+        self.lookback_periods = list(lookback_periods)
+        self.include_time = include_time
+        self.columns = feature_columns(self.lookback_periods, include_time)
+
+        close_window = max(max(LAG_PERIODS), max(self.lookback_periods)) + 1
+        self.closes = deque(maxlen=close_window)
+        self.highs = deque(maxlen=20)
+        self.lows = deque(maxlen=20)
+        self.volumes = deque(maxlen=50)
+        self.returns = deque(maxlen=30)
+        self.true_ranges = deque(maxlen=14)
+        self.parkinson = deque(maxlen=14)
+        self.gains = deque(maxlen=14)
+        self.losses = deque(maxlen=14)
+        self.obv = deque(maxlen=20)
+        self.vpt = deque(maxlen=20)
+        self.price_volume = deque(maxlen=20)
+        self.typical_price = deque(maxlen=20)
+        self.stoch_k = deque(maxlen=3)
+        self.lagged_returns = {lag: deque(maxlen=5 * lag + 1) for lag in LAGGED_RETURN_PERIODS}
+
+        self.ema = {12: NAN, 26: NAN, 50: NAN}
+        self.macd_signal = NAN
+        self.obv_total = 0.0
+        self.vpt_total = 0.0
+
+        # smallest / largest returns seen, for the 0.01% / 99.99% winsorizing quantiles
+        self.return_count = 0
+        self.low_tail = []
+        self.high_tail = []
+
+        self.bars = 0
+        self.last_time = None
+        self.values = None
+
+    # ========== STATE UPDATES ==========
+
+    @staticmethod
+    def _ewm(state, value, span):
+        """One step of ewm(span, adjust=False).mean()"""
+        if state != state:
+            return value
+        if value != value:
+            return state
+        alpha = 2.0 / (span + 1.0)
+        return ((1 - alpha) * state + alpha * value) / ((1 - alpha) + alpha)
+
+    def _winsor_bounds(self, ret):
+        """Add a return to the tails and get the (q_low, q_high) quantiles of all returns"""
+        if ret == ret:
+            self.return_count += 1
+            keep = int(0.0001 * self.return_count) + 2 + WINSOR_SLACK
+            bisect.insort(self.low_tail, ret)
+            if len(self.low_tail) > keep:
+                self.low_tail.pop()
+            bisect.insort(self.high_tail, ret)
+            if len(self.high_tail) > keep:
+                self.high_tail.pop(0)
+
+        n = self.return_count
+        if n == 0:
+            return NAN, NAN
+        if n == 1:
+            return self.low_tail[0], self.low_tail[0]
+
+        # linear interpolation between order statistics (Series.quantile default)
+        pos = 0.0001 * (n - 1)
+        i = int(pos)
+        frac = pos - i
+        lo_a, lo_b = self.low_tail[i], self.low_tail[i + 1]
+        q_low = lo_a + (lo_b - lo_a) * frac
+
+        pos = 0.9999 * (n - 1)
+        i = int(pos)
+        frac = pos - i
+        # index i counted from the smallest equals n - 1 - i counted from the largest
+        hi_a = self.high_tail[len(self.high_tail) - (n - i)]
+        hi_b = self.high_tail[len(self.high_tail) - (n - i - 1)] if frac else hi_a
+        q_high = hi_a + (hi_b - hi_a) * frac
+        return q_low, q_high
+
+    def update(self, open_, high, low, close, volume, timestamp=None):
+        """
+        Add one completed candle and compute its feature vector
+
+        Args:
+            open_, high, low, close, volume: Candle values
+            timestamp: Bar time (datetime / pd.Timestamp, UTC-naive like the API index);
+                       required for the calendar columns
+
+        Returns:
+            np.ndarray of feature values in self.columns order
+        """
+        o, h, l, c, v = float(open_), float(high), float(low), float(close), float(volume)
+        self.bars += 1
+        self.last_time = timestamp
+
+        self.closes.append(c)
+        self.highs.append(h)
+        self.lows.append(l)
+        self.volumes.append(v)
+        closes = list(self.closes)
+        highs = list(self.highs)
+        lows = list(self.lows)
+        volumes = list(self.volumes)
+
+        def back(k):
+            return closes[-1 - k] if len(closes) > k else NAN
+
+        prev = back(1)
+        ret = c / prev - 1
+        self.returns.append(ret)
+        returns = list(self.returns)
+
+        out = [o, h, l, c, v]
+        append = out.append
+
+        # ========== RETURNS & TRANSFORMATIONS ==========
+        append(ret)
+        append(math.log(c / prev) if prev == prev else NAN)
+        q_low, q_high = self._winsor_bounds(ret)
+        append(min(max(ret, q_low), q_high) if ret == ret else NAN)
+
+        # ========== LAGGED RETURNS ==========
+        for lag in LAG_PERIODS:
+            ret_lag = ((c / back(lag) - 1) + 1) ** (1 / lag) - 1
+            append(ret_lag)
+            if lag in self.lagged_returns:
+                history = self.lagged_returns[lag]
+                history.append(ret_lag)
+                for s in [1, 2, 3, 4, 5]:
+                    append(history[-1 - s * lag] if len(history) > s * lag else NAN)
+
+        # ========== MOVING AVERAGES ==========
+        for period in self.lookback_periods:
+            ma = _mean(closes, period)
+            append(ma)
+            append(c / ma)
+            append(c - ma)
+            append((c - ma) / ma)
+
+        for period in [12, 26, 50]:
+            self.ema[period] = self._ewm(self.ema[period], c, period)
+            append(self.ema[period])
+            append(c / self.ema[period])
+
+        # ========== MOMENTUM INDICATORS ==========
+        for period in [5, 10, 20]:
+            append((c / back(period) - 1) * 100)
+        for period in [5, 10, 20]:
+            past = back(period)
+            append(c - past)
+            append((c - past) / past)
+
+        # ========== VOLATILITY MEASURES ==========
+        for period in [5, 10, 20, 30]:
+            vol = _std(returns, period)
+            append(vol)
+            append(vol * SQRT_252)
+
+        tr = h - l if prev != prev else max(h - l, abs(h - prev), abs(l - prev))
+        self.true_ranges.append(tr)
+        atr = _mean(list(self.true_ranges), 14)
+        append(atr)
+        append(atr / c)
+        parkinson = math.sqrt(PARKINSON_FACTOR * math.log(h / l) ** 2)
+        self.parkinson.append(parkinson)
+        append(parkinson)
+        append(_mean(list(self.parkinson), 14))
+
+        # ========== RSI ==========
+        delta = c - prev
+        self.gains.append(delta if delta > 0 else 0.0)
+        self.losses.append(-delta if delta < 0 else 0.0)
+        rs = _mean(list(self.gains), 14) / (_mean(list(self.losses), 14) + 1e-10)
+        rsi = 100 - (100 / (1 + rs))
+        append(rsi)
+        append(_flag(rsi > 70))
+        append(_flag(rsi < 30))
+
+        # ========== MACD ==========
+        macd = self.ema[12] - self.ema[26]
+        self.macd_signal = self._ewm(self.macd_signal, macd, 9)
+        append(macd)
+        append(self.macd_signal)
+        append(macd - self.macd_signal)
+        append(_flag(macd > self.macd_signal))
+
+        # ========== BOLLINGER BANDS ==========
+        bb_ma = _mean(closes, 20)
+        bb_std = _std(closes, 20)
+        bb_upper = bb_ma + bb_std * 2
+        bb_lower = bb_ma - bb_std * 2
+        append(bb_upper)
+        append(bb_lower)
+        append(bb_upper - bb_lower)
+        append((c - bb_lower) / (bb_upper - bb_lower + 1e-10))
+        append(math.log1p((bb_upper - c) / bb_upper) if bb_upper == bb_upper else NAN)
+        append(math.log1p((c - bb_lower) / c) if bb_lower == bb_lower else NAN)
+        append(_flag(c >= bb_upper * 0.98))
+        append(_flag(c <= bb_lower * 1.02))
+
+        # ========== VOLUME FEATURES ==========
+        for period in [10, 20, 50]:
+            volume_ma = _mean(volumes, period)
+            append(volume_ma)
+            append(v / (volume_ma + 1e-10))
+
+        append(delta)
+        if delta == delta:
+            self.obv_total += math.copysign(v, delta) if delta != 0 else 0.0
+        self.obv.append(self.obv_total)
+        obv_ma = _mean(list(self.obv), 20)
+        append(self.obv_total)
+        append(obv_ma)
+        append(self.obv_total / (obv_ma + 1e-10))
+
+        if ret == ret:
+            self.vpt_total += ret * v
+        self.vpt.append(self.vpt_total)
+        vpt_ma = _mean(list(self.vpt), 20)
+        append(self.vpt_total)
+        append(vpt_ma)
+        append(_flag(self.vpt_total > vpt_ma))
+
+        pv = c * v
+        self.price_volume.append(pv)
+        pv_ma = _mean(list(self.price_volume), 20)
+        append(pv)
+        append(pv_ma)
+        append(pv / (pv_ma + 1e-10))
+
+        # ========== PRICE PATTERNS ==========
+        hl_range = h - l
+        body = abs(c - o)
+        append(hl_range)
+        append(hl_range / c)
+        append((c - l) / (h - l + 1e-10))
+        append((c - h) / c)
+        append((c - l) / c)
+        append(h / (l + 1e-10))
+        append(body)
+        append(h - max(o, c))
+        append(min(o, c) - l)
+        append(body / (hl_range + 1e-10))
+
+        # ========== TIME-BASED FEATURES ==========
+        if self.include_time:
+            if timestamp is None:
+                out.extend([NAN] * 7)
+            else:
+                month_end = timestamp.day == calendar.monthrange(timestamp.year, timestamp.month)[1]
+                append(float(timestamp.weekday()))
+                append(float(timestamp.day))
+                append(float(timestamp.month))
+                append(float((timestamp.month - 1) // 3 + 1))
+                append(_flag(month_end))
+                append(_flag(timestamp.day == 1))
+                append(_flag(month_end and timestamp.month % 3 == 0))
+
+        # ========== ADDITIONAL TECHNICAL PATTERNS ==========
+        if len(lows) >= 14:
+            low_14 = min(lows[-14:])
+            high_14 = max(highs[-14:])
+        else:
+            low_14 = high_14 = NAN
+        stoch_k = 100 * (c - low_14) / (high_14 - low_14 + 1e-10)
+        self.stoch_k.append(stoch_k)
+        stoch_d = _mean(list(self.stoch_k), 3)
+        append(stoch_k)
+        append(stoch_d)
+        append(_flag(stoch_k > stoch_d))
+        append(-100 * (high_14 - c) / (high_14 - low_14 + 1e-10))
+
+        tp = (h + l + c) / 3
+        self.typical_price.append(tp)
+        typical = list(self.typical_price)
+        append((tp - _mean(typical, 20)) / (0.015 * _mean_abs_dev(typical, 20) + 1e-10))
+
+        # ========== ALPHA FACTORS ==========
+        append(1.0 / (c + 1e-10))
+        for delay in [1, 3, 5]:
+            past = back(delay)
+            append(c - past)
+            append((c - past) / (past + 1e-10))
+            append(c / (past + 1e-10))
+
+        for period in [5, 10, 20]:
+            append(_rank_pct(closes, period))
+            append(_rank_pct(volumes, period))
+            append(_rank_pct(returns, period))
+
+        for period in [10, 20]:
+            append(_median(closes, period) / (c + 1e-10))
+
+        for period in [5, 10, 20]:
+            append(_corr(closes[-period:], closes[-period - 1:-1]) if len(closes) > period else NAN)
+            append(_corr(returns[-period:], volumes[-period:]) if len(returns) >= period else NAN)
+
+        append(-ret)
+        append(-returns[-2] if len(returns) > 1 else NAN)
+        append(-returns[-4] if len(returns) > 3 else NAN)
+
+        volume_rank = _rank_pct(volumes, 20)
+        for delay in [3, 5]:
+            append(c / (back(delay) + 1e-10) * volume_rank)
+
+        for period in [5, 10, 20]:
+            append(_mean(returns, period) / (_std(returns, period) + 1e-10))
+            append(_mean(closes, period) / (_std(closes, period) + 1e-10))
+
+        for period in [10, 20]:
+            append(_skew(returns, period))
+            append(_kurt(returns, period))
+
+        append(c - h)
+        append((h + l) / 2 - c)
+        if ret == ret:
+            clipped = min(max(ret, -0.999), 0.999)
+            append(0.5 * math.log((1 + clipped) / (1 - clipped + 1e-10)))
+        else:
+            append(NAN)
+
+        for period in [10, 20]:
+            append((c - _mean(closes, period)) / (_std(closes, period) + 1e-10))
+
+        for delay in [1, 3, 5]:
+            past = back(delay)
+            append((c - past) / (past + 1e-10))
+
+        for period in [10, 20]:
+            if len(lows) >= period:
+                low_period = min(lows[-period:])
+                high_period = max(highs[-period:])
+                append((c - low_period) / (high_period - low_period + 1e-10))
+            else:
+                append(NAN)
+
+        vwap = (h + l + c) / 3
+        append(c - vwap)
+        append(c / (vwap + 1e-10))
+
+        self.values = np.array(out)
+        return self.values
+
+    def as_series(self):
+        """Newest feature vector as a Series (None before the first candle)"""
+        if self.values is None:
+            return None
+        return pd.Series(self.values, index=self.columns, name=self.last_time)
+
+    def is_warm(self):
+        """Whether every column of the newest vector is defined (the batch path would keep the row)"""
+        return self.values is not None and not np.isnan(self.values).any()
+
+
+# ========== MULTI-SYMBOL ENGINE ==========
+
+class FeatureEngine:
+    """
+    Incremental feature state for many symbols, fed from history and CHART_EQUITY
+    """
+
+    def __init__(self, lookback_periods=(5, 10, 20, 50), include_time=True):
+        self.lookback_periods = lookback_periods
+        self.include_time = include_time
+        self.states = {}
+
+    def _state(self, symbol):
+        state = self.states.get(symbol)
+        if state is None:
+            state = IncrementalFeatures(self.lookback_periods, self.include_time)
+            self.states[symbol] = state
+        return state
+
+    def seed(self, symbol, df):
+        """
+        Replay stored history for a symbol (replaces any existing state)
+
+        Args:
+            symbol: Stock symbol
+            df: DataFrame with OHLCV columns indexed by datetime (as from get_price_history)
+
+        Returns:
+            Number of candles replayed
+        """
+        self.states.pop(symbol, None)
+        if df is None or len(df) == 0:
+            return 0
+        state = self._state(symbol)
+        index = df.index if isinstance(df.index, pd.DatetimeIndex) else [None] * len(df)
+        for ts, o, h, l, c, v in zip(index, df['open'].to_numpy(), df['high'].to_numpy(),
+                                     df['low'].to_numpy(), df['close'].to_numpy(),
+                                     df['volume'].to_numpy()):
+            state.update(o, h, l, c, v, ts)
+        return len(df)
+
+    def update(self, symbol, open_, high, low, close, volume, timestamp=None):
+        """
+        Add one candle for a symbol
+
+        Candles not newer than the last one seen are ignored (stream replays after a
+        reconnect), so the state never double counts a bar.
+
+        Returns:
+            np.ndarray feature vector, or None if the candle was ignored
+        """
+        state = self._state(symbol)
+        if timestamp is not None and state.last_time is not None and timestamp <= state.last_time:
+            return None
+        return state.update(open_, high, low, close, volume, timestamp)
+
+    def on_chart_equity(self, message):
+        """
+        Feed a stream message; CHART_EQUITY candles update their symbol's state
+
+        Args:
+            message: Raw stream message (JSON string), the decoded dict, or a
+                     schwabdev.StreamMessage (stream started with parsed=True)
+
+        Returns:
+            Dictionary {symbol: feature vector} for the candles that were applied
+        """
+        if isinstance(message, (str, bytes)):
+            message = json.loads(message)
+
+        updated = {}
+        if not isinstance(message, dict):
+            for record in message.data:
+                if record.service == 'CHART_EQUITY':
+                    values = self.on_chart_record(record)
+                    if values is not None:
+                        updated[record.key] = values
+            return updated
+
+        for item in message.get('data', []):
+            if item.get('service') != 'CHART_EQUITY':
+                continue
+            for candle in item.get('content', []):
+                # 0=key, 1=Sequence, 2=Open, 3=High, 4=Low, 5=Close, 6=Volume, 7=ChartTime
+                try:
+                    symbol = candle['key']
+                    timestamp = datetime.fromtimestamp(int(candle['7']) / 1000, tz=timezone.utc).replace(tzinfo=None)
+                    values = self.update(symbol, candle['2'], candle['3'], candle['4'],
+                                         candle['5'], candle['6'], timestamp)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if values is not None:
+                    updated[symbol] = values
+        return updated
+
+    def on_chart_record(self, record):
+        """
+        Apply one CHART_EQUITY record (schwabdev.StreamRecord)
+
+        Returns:
+            np.ndarray feature vector, or None if the candle was incomplete or ignored
+        """
+        try:
+            timestamp = datetime.fromtimestamp(int(record.chart_time) / 1000, tz=timezone.utc).replace(tzinfo=None)
+            if None in (record.open_price, record.high_price, record.low_price, record.close_price, record.volume):
+                return None
+            return self.update(record.key, record.open_price, record.high_price, record.low_price,
+                               record.close_price, record.volume, timestamp)
+        except (TypeError, ValueError):
+            return None
+
+    def latest(self, symbol):
+        """Newest feature vector for a symbol as a Series (None if unknown)"""
+        state = self.states.get(symbol)
+        return state.as_series() if state is not None else None
+
+    @property
+    def columns(self):
+        return feature_columns(self.lookback_periods, self.include_time)
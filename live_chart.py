@@ -13,7 +13,6 @@ import pandas as pd
 from datetime import datetime, timedelta
 from collections import deque
 import threading
-import json
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -52,6 +51,7 @@ sys.path.insert(0, str(project_root))
 
 import schwabdev
 from ensemble_trading_model import SchwabDataFetcher
+from quote_book import QuoteBook
 
 load_dotenv()
 
@@ -68,6 +68,7 @@ class StreamDataThread(QThread):
         self.running = False
         self.data_queue = deque(maxlen=1000)
         self.mutex = QMutex()
+        self.quote_book = QuoteBook('LEVELONE_EQUITIES')  # bid/ask/last persist across partial updates
         
     def run(self):
         """Start streaming"""
@@ -83,68 +84,34 @@ class StreamDataThread(QThread):
             )
             
             def handle_message(message):
-                """Process incoming stream messages"""
+                """Merge incoming quotes into the book and emit the full current quote"""
                 try:
-                    data = json.loads(message) if isinstance(message, str) else message
-                    
-                    if 'data' in data:
-                        for service in data['data']:
-                            if service.get('service') == 'LEVELONE_EQUITIES':
-                                content = service.get('content', [])
-                                for item in content:
-                                    symbol = item.get('key', '')
-                                    fields = item
-                                    
-                                    # Extract price data (field 3 = last price)
-                                    price = None
-                                    if '3' in fields:
-                                        try:
-                                            price = float(fields['3'])
-                                        except (ValueError, TypeError):
-                                            pass
-                                    
-                                    # Extract volume (field 8 = total volume)
-                                    volume = None
-                                    if '8' in fields:
-                                        try:
-                                            volume = int(float(fields['8']))
-                                        except (ValueError, TypeError):
-                                            pass
-                                    
-                                    # Extract bid/ask
-                                    bid = None
-                                    ask = None
-                                    if '0' in fields:
-                                        try:
-                                            bid = float(fields['0'])
-                                        except (ValueError, TypeError):
-                                            pass
-                                    if '1' in fields:
-                                        try:
-                                            ask = float(fields['1'])
-                                        except (ValueError, TypeError):
-                                            pass
-                                    
-                                    if price is not None and symbol in self.symbols:
-                                        timestamp = datetime.now()
-                                        data_packet = {
-                                            'symbol': symbol,
-                                            'price': price,
-                                            'bid': bid,
-                                            'ask': ask,
-                                            'volume': volume,
-                                            'timestamp': timestamp
-                                        }
-                                        
-                                        self.mutex.lock()
-                                        self.data_queue.append(data_packet)
-                                        self.mutex.unlock()
-                                        
-                                        self.data_received.emit(data_packet)
+                    for symbol in self.quote_book.apply(message):
+                        if symbol not in self.symbols:
+                            continue
+                        price = self.quote_book.get(symbol, 'last_price')
+                        if price is None:
+                            continue
+                        
+                        volume = self.quote_book.get(symbol, 'total_volume')
+                        data_packet = {
+                            'symbol': symbol,
+                            'price': price,
+                            'bid': self.quote_book.get(symbol, 'bid_price'),
+                            'ask': self.quote_book.get(symbol, 'ask_price'),
+                            'volume': int(volume) if volume is not None else None,
+                            'timestamp': datetime.now()
+                        }
+                        
+                        self.mutex.lock()
+                        self.data_queue.append(data_packet)
+                        self.mutex.unlock()
+                        
+                        self.data_received.emit(data_packet)
                 except Exception as e:
                     print(f"Error processing stream message: {e}")
             
-            self.streamer.start(handle_message, daemon=True)
+            self.streamer.start(handle_message, daemon=True, parsed=True)
             
             # Keep thread alive
             while self.running:
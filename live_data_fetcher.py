@@ -24,6 +24,7 @@ class LiveDataFetcher:
             client: Schwab API client instance
         """
         self.client = client
+        self.quote_coalescer = schwabdev.QuoteCoalescer(client)  # batches concurrent single-symbol requests
     
     def get_quote(self, symbol):
         """
@@ -44,21 +45,13 @@ class LiveDataFetcher:
             - etc.
         """
         try:
-            response = self.client.quotes(symbol)
-            data = response.json()
+            data = self.quote_coalescer.quote(symbol)
             
             if not data:
                 print(f"No quote data found for {symbol}")
                 return None
             
-            # Quotes API returns a dictionary keyed by symbol
-            if symbol in data:
-                return data[symbol]
-            else:
-                # If symbol not in response, try to get first entry
-                if len(data) > 0:
-                    return list(data.values())[0]
-                return None
+            return data
                 
         except Exception as e:
             print(f"Error fetching quote for {symbol}: {e}")
@@ -76,16 +69,12 @@ class LiveDataFetcher:
             Dictionary keyed by symbol with quote data
         """
         try:
-            # Convert list to comma-separated string if needed
-            if isinstance(symbols, list):
-                symbol_str = ','.join(symbols)
-            else:
-                symbol_str = symbols
-            
-            response = self.client.quotes(symbol_str)
-            data = response.json()
+            # Convert comma-separated string to list if needed
+            if isinstance(symbols, str):
+                symbols = [symbol.strip() for symbol in symbols.split(',') if symbol.strip()]
             
-            return data if data else {}
+            # Split into as few quotes calls as the URL length allows
+            return self.quote_coalescer.quotes(symbols)
             
         except Exception as e:
             print(f"Error fetching quotes: {e}")
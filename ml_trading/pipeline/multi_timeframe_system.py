@@ -24,6 +24,16 @@ except:
     print("⚠️ LSTM not available")
 
 
+# Map timeframe to Schwab API parameters
+TIMEFRAME_CONFIG = {
+    '1m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 1},
+    '5m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 5},
+    '30m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 30},
+    '1h': {'periodType': 'month', 'period': 1, 'frequencyType': 'minute', 'frequency': 60},
+    '1d': {'periodType': 'year', 'period': 10, 'frequencyType': 'daily', 'frequency': 1}
+}
+
+
 class MultiTimeframePredictor:
     """
     Predict on multiple timeframes and combine results
@@ -57,19 +67,10 @@ class MultiTimeframePredictor:
         Returns:
             df: OHLCV dataframe
         """
-        # Map timeframe to Schwab API parameters
-        timeframe_config = {
-            '1m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 1},
-            '5m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 5},
-            '30m': {'periodType': 'day', 'period': 10, 'frequencyType': 'minute', 'frequency': 30},
-            '1h': {'periodType': 'month', 'period': 1, 'frequencyType': 'minute', 'frequency': 60},
-            '1d': {'periodType': 'year', 'period': 10, 'frequencyType': 'daily', 'frequency': 1}
-        }
-        
-        if timeframe not in timeframe_config:
+        if timeframe not in TIMEFRAME_CONFIG:
             raise ValueError(f"Unsupported timeframe: {timeframe}")
         
-        config = timeframe_config[timeframe]
+        config = TIMEFRAME_CONFIG[timeframe]
         
         df = fetcher.get_price_history(
             symbol,
@@ -81,7 +82,23 @@ class MultiTimeframePredictor:
         
         return df
     
-    def predict_timeframe(self, fetcher, symbol, timeframe):
+    def fetch_all_timeframe_data(self, fetcher, symbol, timeframes=None):
+        """
+        Fetch data for several timeframes at once (requests run concurrently)
+        
+        Args:
+            fetcher: SchwabDataFetcher instance
+            symbol: Stock symbol
+            timeframes: Timeframes to fetch (None = self.timeframes)
+        
+        Returns:
+            Dictionary {timeframe: OHLCV dataframe or None}
+        """
+        timeframes = [tf for tf in (timeframes or self.timeframes) if tf in TIMEFRAME_CONFIG]
+        requests = {tf: dict(TIMEFRAME_CONFIG[tf], symbol=symbol) for tf in timeframes}
+        return dict(fetcher.iter_price_history_requests(requests))
+    
+    def predict_timeframe(self, fetcher, symbol, timeframe, df=None):
         """
         Generate prediction for specific timeframe
         
@@ -89,6 +106,7 @@ class MultiTimeframePredictor:
             fetcher: SchwabDataFetcher instance
             symbol: Stock symbol
             timeframe: Timeframe string
+            df: Optional pre-fetched OHLCV data for the timeframe (fetched if None)
         
         Returns:
             prediction: Dict with prediction results
@@ -96,7 +114,8 @@ class MultiTimeframePredictor:
         print(f"\n   Predicting {timeframe}...")
         
         # Fetch data
-        df = self.fetch_timeframe_data(fetcher, symbol, timeframe)
+        if df is None:
+            df = self.fetch_timeframe_data(fetcher, symbol, timeframe)
         
         if df is None or len(df) < 100:
             print(f"      ✗ Insufficient data")
@@ -195,9 +214,12 @@ class MultiTimeframePredictor:
         
         results = {}
         
+        # Fetch every timeframe concurrently up front
+        data = self.fetch_all_timeframe_data(fetcher, symbol)
+        
         for timeframe in self.timeframes:
             try:
-                result = self.predict_timeframe(fetcher, symbol, timeframe)
+                result = self.predict_timeframe(fetcher, symbol, timeframe, df=data.get(timeframe))
                 if result:
                     results[timeframe] = result
             except Exception as e:
@@ -285,9 +285,26 @@ class MultiTimeframePredictor:
         Returns:
             Dictionary of predictions by timeframe
         """
+        # Fetch current data for every trained timeframe concurrently
+        requests = {}
+        for timeframe, model_info in self.timeframe_models.items():
+            config = model_info['config']
+            requests[timeframe] = {
+                'symbol': symbol,
+                'periodType': config['periodType'],
+                'period': config['period'],
+                'frequencyType': config['frequencyType'],
+                'frequency': config['frequency'],
+            }
+        current = dict(self.fetcher.iter_price_history_requests(requests))
+        
         predictions = {}
         for timeframe in self.timeframe_models.keys():
-            pred = self.predict_timeframe(symbol, timeframe)
+            df = current.get(timeframe)
+            if df is None or len(df) < 10:
+                predictions[timeframe] = {'error': 'Insufficient current data'}
+                continue
+            pred = self.predict_timeframe(symbol, timeframe, current_data=df)
             if 'error' not in pred:
                 predictions[timeframe] = pred
             else:
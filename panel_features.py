@@ -0,0 +1,615 @@
+"""
+Panel Features
+Batch feature computation for a whole universe of symbols at once
+
+SchwabDataFetcher.create_features works on one DataFrame at a time: it copies the
+frame and appends every feature column one by one. For screening hundreds or
+thousands of symbols the per-DataFrame overhead dominates, so this module computes
+the same feature set on a stacked (symbol, time) OHLCV array instead. Every column
+is produced by one vectorized pass over all symbols and written straight into a
+preallocated float32 block.
+
+Layout:
+    ohlcv    (S, T, 5) float64   open, high, low, close, volume
+    times    (S, T)    datetime64[ns]  bar timestamps (NaT for padding)
+    block    (S, T, F) float32   features, columns in create_features order
+
+Each symbol's bars are right-aligned (its latest bar sits at T - 1) and shorter
+histories are left-padded with NaN. The time axis is therefore "bars back from the
+latest bar", not a shared calendar, which keeps every rolling window identical to
+what create_features computes on that symbol alone.
+
+Usage:
+    symbols, ohlcv, times = stack_ohlcv(stock_data)
+    block, columns = build_panel_features(ohlcv, times)
+    features = panel_to_frames(block, columns, symbols, times)
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+OHLCV_COLUMNS = ['open', 'high', 'low', 'close', 'volume']
+
+LAG_PERIODS = [1, 5, 10, 21, 42, 63]
+LAGGED_RETURN_PERIODS = [1, 5, 10, 21]
+TIME_COLUMNS = ['day_of_week', 'day_of_month', 'month', 'quarter',
+                'is_month_end', 'is_month_start', 'is_quarter_end']
+
+# create_features columns that are not float64 (volume, 0/1 flags and calendar fields)
+INTEGER_COLUMNS = {
+    'volume': 'int64', 'rsi_overbought': 'int64', 'rsi_oversold': 'int64', 'macd_signal_cross': 'int64',
+    'bb_touch_upper': 'int64', 'bb_touch_lower': 'int64', 'vpt_signal': 'int64', 'stoch_signal': 'int64',
+    'day_of_week': 'int32', 'day_of_month': 'int32', 'month': 'int32', 'quarter': 'int32',
+    'is_month_end': 'int64', 'is_month_start': 'int64', 'is_quarter_end': 'int64',
+}
+
+# Cells (symbols x bars) per chunk; bounds the size of the strided-window temporaries
+CHUNK_CELLS = 250_000
+
+
+# ========== ROLLING KERNELS (last axis, NaN for incomplete windows) ==========
+
+def _pad_windows(x, window, result):
+    """Left-pad a per-window result back to the length of x along the last axis"""
+    out = np.full(x.shape, np.nan)
+    if result is not None:
+        out[..., window - 1:] = result
+    return out
+
+
+def shift(x, periods):
+    """Shift along the last axis (like Series.shift), filling with NaN"""
+    out = np.full(x.shape, np.nan)
+    if periods < x.shape[-1]:
+        out[..., periods:] = x[..., :x.shape[-1] - periods]
+    return out
+
+
+def pct_change(x, periods=1):
+    """Same as Series.pct_change(periods) without filling"""
+    return x / shift(x, periods) - 1
+
+
+def rolling_sum(x, window):
+    """
+    Rolling sum; any NaN (or inf) in the window gives NaN (min_periods=window)
+
+    Uses differences of a running sum, so the cost does not grow with the window.
+    Callers that need variances center the data first (see _center).
+    """
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    finite = np.isfinite(x)
+    zeros = np.zeros(x.shape[:-1] + (1,))
+    totals = np.concatenate([zeros, np.where(finite, x, 0).cumsum(axis=-1)], axis=-1)
+    missing = np.concatenate([zeros, (~finite).cumsum(axis=-1)], axis=-1)
+    sums = totals[..., window:] - totals[..., :-window]
+    gaps = missing[..., window:] - missing[..., :-window]
+    return _pad_windows(x, window, np.where(gaps > 0, np.nan, sums))
+
+
+def rolling_mean(x, window):
+    return rolling_sum(x, window) / window
+
+
+def rolling_min(x, window):
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    return _pad_windows(x, window, sliding_window_view(x, window, axis=-1).min(axis=-1))
+
+
+def rolling_max(x, window):
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    return _pad_windows(x, window, sliding_window_view(x, window, axis=-1).max(axis=-1))
+
+
+def _center(x):
+    """Subtract each row's mean; rolling moments are shift invariant and this limits cancellation"""
+    with np.errstate(all='ignore'):
+        mean = np.nanmean(x, axis=-1, keepdims=True)
+    return x - np.nan_to_num(mean)
+
+
+def rolling_std(x, window):
+    """Rolling sample standard deviation (ddof=1)"""
+    x = _center(x)
+    s1 = rolling_sum(x, window)
+    s2 = rolling_sum(x * x, window)
+    var = (s2 - s1 * s1 / window) / (window - 1)
+    return np.sqrt(np.maximum(var, 0))
+
+
+def rolling_corr(x, y, window):
+    """Rolling Pearson correlation of x and y (NaN in either series invalidates the window)"""
+    x, y = _center(x), _center(y)
+    sx, sy = rolling_sum(x, window), rolling_sum(y, window)
+    cov = rolling_sum(x * y, window) - sx * sy / window
+    var_x = np.maximum(rolling_sum(x * x, window) - sx * sx / window, 0)
+    var_y = np.maximum(rolling_sum(y * y, window) - sy * sy / window, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return cov / np.sqrt(var_x * var_y)
+
+
+def _rolling_moments(x, window):
+    """Per-window mean (A), variance (B) and raw power sums for skew/kurt (pandas formulas)"""
+    x = _center(x)
+    x2 = x * x
+    n = window
+    A = rolling_sum(x, n) / n
+    B = rolling_sum(x2, n) / n - A * A
+    C = rolling_sum(x2 * x, n) / n - A ** 3 - 3 * A * B
+    D = rolling_sum(x2 * x2, n) / n - A ** 4 - 6 * B * A * A - 4 * C * A
+    # constant windows have no defined shape
+    B = np.where(B <= 1e-14, np.nan, B)
+    return B, C, D
+
+
+def rolling_skew(x, window):
+    """Rolling bias-corrected skewness (same as Rolling.skew)"""
+    B, C, _ = _rolling_moments(x, window)
+    n = window
+    return np.sqrt(n * (n - 1)) * C / ((n - 2) * B ** 1.5)
+
+
+def rolling_kurt(x, window):
+    """Rolling bias-corrected excess kurtosis (same as Rolling.kurt)"""
+    B, _, D = _rolling_moments(x, window)
+    n = window
+    K = (n * n - 1) * D / (B * B) - 3 * (n - 1) ** 2
+    return K / ((n - 2) * (n - 3))
+
+
+def rolling_rank_pct(x, window):
+    """
+    Percentile rank of the last value within each rolling window
+    Same as rolling(window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1])
+    """
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    windows = sliding_window_view(x, window, axis=-1)
+    last = windows[..., -1:]
+    below = (windows < last).sum(axis=-1)
+    ties = (windows == last).sum(axis=-1)
+    # average method: ties share the mean of their ranks
+    rank = _pad_windows(x, window, (below + (ties + 1) / 2) / window)
+    return np.where(np.isnan(rolling_sum(x, window)), np.nan, rank)
+
+
+def rolling_median(x, window):
+    """
+    Rolling median (linear interpolation)
+    Same as rolling(window).apply(lambda x: pd.Series(x).quantile(0.5))
+    """
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    # np.quantile propagates NaN, so incomplete windows stay NaN
+    return _pad_windows(x, window, np.quantile(sliding_window_view(x, window, axis=-1), 0.5, axis=-1))
+
+
+def rolling_mean_abs_dev(x, window):
+    """
+    Rolling mean absolute deviation around the window mean
+    Same as rolling(window).apply(lambda x: np.abs(x - x.mean()).mean())
+    """
+    if x.shape[-1] < window:
+        return _pad_windows(x, window, None)
+    windows = sliding_window_view(x, window, axis=-1)
+    mean = windows.mean(axis=-1, keepdims=True)
+    return _pad_windows(x, window, np.abs(windows - mean).mean(axis=-1))
+
+
+def ewm_mean(x, span):
+    """
+    Exponential moving average along the last axis
+    Same as ewm(span=span, adjust=False).mean(): starts at the first valid value
+    and carries the last average over missing bars
+    """
+    alpha = 2.0 / (span + 1.0)
+    out = np.empty(x.shape)
+    state = x[..., 0].copy()
+    out[..., 0] = state
+    for t in range(1, x.shape[-1]):
+        value = x[..., t]
+        blended = ((1 - alpha) * state + alpha * value) / ((1 - alpha) + alpha)
+        state = np.where(np.isnan(state), value, np.where(np.isnan(value), state, blended))
+        out[..., t] = state
+    return out
+
+
+# ========== COLUMN INDEX ==========
+
+def feature_columns(lookback_periods=(5, 10, 20, 50), include_time=True):
+    """
+    Feature column names in the same order as SchwabDataFetcher.create_features
+
+    Args:
+        lookback_periods: Periods for the simple moving averages
+        include_time: Whether the calendar columns are included (datetime index)
+
+    Returns:
+        List of column names
+    """
+    columns = list(OHLCV_COLUMNS) + ['returns', 'log_returns', 'returns_winsorized']
+    for lag in LAG_PERIODS:
+        columns.append(f'return_{lag}d')
+        if lag in LAGGED_RETURN_PERIODS:
+            columns += [f'return_{lag}d_lag{shift}' for shift in [1, 2, 3, 4, 5]]
+    for period in lookback_periods:
+        columns += [f'ma_{period}', f'ma_{period}_ratio', f'ma_{period}_diff', f'ma_{period}_pct']
+    for period in [12, 26, 50]:
+        columns += [f'ema_{period}', f'ema_{period}_ratio']
+    columns += [f'roc_{period}' for period in [5, 10, 20]]
+    for period in [5, 10, 20]:
+        columns += [f'momentum_{period}', f'momentum_{period}_pct']
+    for period in [5, 10, 20, 30]:
+        columns += [f'volatility_{period}', f'volatility_{period}_annualized']
+    columns += ['atr', 'atr_ratio', 'parkinson_vol', 'parkinson_vol_14',
+                'rsi', 'rsi_overbought', 'rsi_oversold',
+                'macd', 'macd_signal', 'macd_hist', 'macd_signal_cross',
+                'bb_upper_20', 'bb_lower_20', 'bb_width_20', 'bb_position_20',
+                'bb_high_log', 'bb_low_log', 'bb_touch_upper', 'bb_touch_lower']
+    for period in [10, 20, 50]:
+        columns += [f'volume_ma_{period}', f'volume_ratio_{period}']
+    columns += ['price_change', 'obv', 'obv_ma', 'obv_ratio', 'vpt', 'vpt_ma', 'vpt_signal',
+                'price_volume', 'price_volume_ma', 'price_volume_ratio',
+                'hl_range', 'hl_range_pct', 'price_position', 'close_vs_high', 'close_vs_low',
+                'high_low_ratio', 'body', 'upper_shadow', 'lower_shadow', 'body_ratio']
+    if include_time:
+        columns += TIME_COLUMNS
+    columns += ['stoch_k', 'stoch_d', 'stoch_signal', 'williams_r', 'cci', 'alpha_inv_price']
+    for delay in [1, 3, 5]:
+        columns += [f'alpha_price_delay_{delay}', f'alpha_price_delay_{delay}_pct',
+                    f'alpha_price_delay_ratio_{delay}']
+    for period in [5, 10, 20]:
+        columns += [f'alpha_ts_rank_close_{period}', f'alpha_ts_rank_volume_{period}',
+                    f'alpha_ts_rank_returns_{period}']
+    columns += [f'alpha_quantile_close_{period}' for period in [10, 20]]
+    for period in [5, 10, 20]:
+        columns += [f'alpha_corr_trend_{period}', f'alpha_corr_ret_vol_{period}']
+    columns += ['alpha_mean_reversion', 'alpha_mean_reversion_delay1', 'alpha_mean_reversion_delay3']
+    columns += [f'alpha_trend_volume_rank_{delay}' for delay in [3, 5]]
+    for period in [5, 10, 20]:
+        columns += [f'alpha_sharpe_{period}', f'alpha_price_mean_std_{period}']
+    for period in [10, 20]:
+        columns += [f'alpha_ts_skew_{period}', f'alpha_ts_kurt_{period}']
+    columns += ['alpha_close_minus_high', 'alpha_hl2_minus_close', 'alpha_fisher_transform']
+    columns += [f'alpha_zscore_{period}' for period in [10, 20]]
+    columns += [f'alpha_normalized_momentum_{delay}' for delay in [1, 3, 5]]
+    columns += [f'alpha_price_range_{period}' for period in [10, 20]]
+    columns += ['alpha_price_vwap_diff', 'alpha_price_vwap_ratio']
+    return columns
+
+
+# ========== STACKING ==========
+
+def stack_ohlcv(frames, symbols=None):
+    """
+    Stack per-symbol OHLCV DataFrames into a right-aligned panel
+
+    Args:
+        frames: Dictionary {symbol: DataFrame with OHLCV columns}
+        symbols: Optional symbol order (default: dictionary order, empty frames skipped)
+
+    Returns:
+        (symbols, ohlcv, times) - ohlcv is (S, T, 5) float64 left-padded with NaN,
+        times is (S, T) datetime64[ns] left-padded with NaT (None if no frame has a
+        datetime index)
+    """
+    if symbols is None:
+        symbols = list(frames.keys())
+    symbols = [s for s in symbols if frames.get(s) is not None and len(frames[s]) > 0]
+
+    T = max((len(frames[s]) for s in symbols), default=0)
+    ohlcv = np.full((len(symbols), T, len(OHLCV_COLUMNS)), np.nan)
+    has_times = any(isinstance(frames[s].index, pd.DatetimeIndex) for s in symbols)
+    times = np.full((len(symbols), T), np.datetime64('NaT'), dtype='datetime64[ns]') if has_times else None
+
+    for i, symbol in enumerate(symbols):
+        df = frames[symbol]
+        n = len(df)
+        ohlcv[i, T - n:] = df[OHLCV_COLUMNS].to_numpy(dtype='f8')
+        if has_times and isinstance(df.index, pd.DatetimeIndex):
+            index = df.index.tz_localize(None) if df.index.tz is not None else df.index
+            times[i, T - n:] = index.values.astype('datetime64[ns]')
+
+    return symbols, ohlcv, times
+
+
+def feature_dtypes(columns):
+    """
+    Column dtypes of SchwabDataFetcher.create_features, for casting panel frames back
+
+    Args:
+        columns: Feature column names
+
+    Returns:
+        Dictionary {column: dtype}
+    """
+    return {col: INTEGER_COLUMNS.get(col, 'float64') for col in columns}
+
+
+def panel_to_frames(block, columns, symbols, times=None, dropna=True):
+    """
+    Split a feature block back into per-symbol DataFrames
+
+    Args:
+        block: (S, T, F) feature block from build_panel_features
+        columns: Column index from build_panel_features
+        symbols: Symbols matching the first axis
+        times: (S, T) timestamps from stack_ohlcv (None = integer index)
+        dropna: Drop rows with any NaN, like create_features does
+
+    Returns:
+        Dictionary {symbol: features DataFrame}; each frame is a single float32
+        block (no per-column allocation)
+    """
+    frames = {}
+    for i, symbol in enumerate(symbols):
+        values = block[i]
+        keep = ~np.isnan(values).any(axis=1) if dropna else ~np.isnan(values[:, columns.index('close')])
+        if times is not None:
+            index = pd.DatetimeIndex(times[i][keep], name='datetime')
+        else:
+            index = pd.RangeIndex(values.shape[0])[keep]
+        frames[symbol] = pd.DataFrame(values[keep], index=index, columns=columns)
+    return frames
+
+
+# ========== FEATURE BUILDER ==========
+
+def build_panel_features(ohlcv, times=None, lookback_periods=(5, 10, 20, 50), chunk_cells=CHUNK_CELLS):
+    """
+    Compute the create_features column set for every symbol in one pass
+
+    Args:
+        ohlcv: (S, T, 5) array of open, high, low, close, volume (NaN = no bar)
+        times: Optional (S, T) datetime64 array; adds the calendar columns
+        lookback_periods: Periods for the simple moving averages
+        chunk_cells: Symbols are processed in chunks of about this many cells
+            to bound the memory used by rolling-window temporaries
+
+    Returns:
+        (block, columns) - (S, T, F) float32 block and the list of F column names.
+        Rows without a bar (padding) are NaN; warm-up rows keep their NaN values
+        so callers can apply create_features' dropna or not.
+    """
+    ohlcv = np.asarray(ohlcv, dtype='f8')
+    S, T = ohlcv.shape[:2]
+    columns = feature_columns(lookback_periods, include_time=times is not None)
+    # stored feature-major so every column is one contiguous write; callers see (S, T, F)
+    storage = np.empty((len(columns), S, T), dtype=np.float32)
+
+    chunk = max(1, chunk_cells // max(T, 1))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for start in range(0, S, chunk):
+            stop = min(start + chunk, S)
+            _fill_chunk(storage[:, start:stop], columns, ohlcv[start:stop],
+                        None if times is None else times[start:stop], lookback_periods)
+
+    return storage.transpose(1, 2, 0), columns
+
+
+def _fill_chunk(out, columns, ohlcv, times, lookback_periods):
+    """Write every feature column for a chunk of symbols into out (F, symbols, T)"""
+    position = {name: j for j, name in enumerate(columns)}
+
+    def put(name, values):
+        out[position[name]] = values
+
+    o, h, l, c, v = (ohlcv[:, :, k] for k in range(5))
+    live = ~np.isnan(c)
+    for k, name in enumerate(OHLCV_COLUMNS):
+        put(name, ohlcv[:, :, k])
+
+    # ========== RETURNS & TRANSFORMATIONS ==========
+    returns = pct_change(c)
+    put('returns', returns)
+    put('log_returns', np.log(c / shift(c, 1)))
+    q_low, q_high = np.nanquantile(returns, [0.0001, 0.9999], axis=1, keepdims=True)
+    put('returns_winsorized', np.clip(returns, q_low, q_high))
+
+    # ========== LAGGED RETURNS ==========
+    for lag in LAG_PERIODS:
+        ret_lag = (pct_change(c, lag) + 1) ** (1 / lag) - 1
+        put(f'return_{lag}d', ret_lag)
+        if lag in LAGGED_RETURN_PERIODS:
+            for s in [1, 2, 3, 4, 5]:
+                put(f'return_{lag}d_lag{s}', shift(ret_lag, s * lag))
+
+    # ========== MOVING AVERAGES ==========
+    for period in lookback_periods:
+        ma = rolling_mean(c, period)
+        put(f'ma_{period}', ma)
+        put(f'ma_{period}_ratio', c / ma)
+        put(f'ma_{period}_diff', c - ma)
+        put(f'ma_{period}_pct', (c - ma) / ma)
+
+    emas = {}
+    for period in [12, 26, 50]:
+        emas[period] = ewm_mean(c, period)
+        put(f'ema_{period}', emas[period])
+        put(f'ema_{period}_ratio', c / emas[period])
+
+    # ========== MOMENTUM INDICATORS ==========
+    for period in [5, 10, 20]:
+        put(f'roc_{period}', pct_change(c, period) * 100)
+    for period in [5, 10, 20]:
+        prev = shift(c, period)
+        put(f'momentum_{period}', c - prev)
+        put(f'momentum_{period}_pct', (c - prev) / prev)
+
+    # ========== VOLATILITY MEASURES ==========
+    for period in [5, 10, 20, 30]:
+        vol = rolling_std(returns, period)
+        put(f'volatility_{period}', vol)
+        put(f'volatility_{period}_annualized', vol * np.sqrt(252))
+
+    prev_close = shift(c, 1)
+    tr = np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+    atr = rolling_mean(tr, 14)
+    put('atr', atr)
+    put('atr_ratio', atr / c)
+    parkinson = np.sqrt((1 / (4 * np.log(2))) * np.log(h / l) ** 2)
+    put('parkinson_vol', parkinson)
+    put('parkinson_vol_14', rolling_mean(parkinson, 14))
+
+    # ========== RSI ==========
+    # where(delta > 0, 0) turns the first (NaN) delta into 0 but padding must stay NaN
+    delta = np.diff(c, axis=1, prepend=np.nan)
+    gain = np.where(live, np.where(delta > 0, delta, 0), np.nan)
+    loss = np.where(live, np.where(delta < 0, -delta, 0), np.nan)
+    rsi = 100 - (100 / (1 + rolling_mean(gain, 14) / (rolling_mean(loss, 14) + 1e-10)))
+    put('rsi', rsi)
+    put('rsi_overbought', rsi > 70)
+    put('rsi_oversold', rsi < 30)
+
+    # ========== MACD ==========
+    macd = emas[12] - emas[26]
+    macd_signal = ewm_mean(macd, 9)
+    put('macd', macd)
+    put('macd_signal', macd_signal)
+    put('macd_hist', macd - macd_signal)
+    put('macd_signal_cross', macd > macd_signal)
+
+    # ========== BOLLINGER BANDS ==========
+    bb_ma = rolling_mean(c, 20)
+    close_std_20 = rolling_std(c, 20)
+    bb_upper = bb_ma + close_std_20 * 2
+    bb_lower = bb_ma - close_std_20 * 2
+    put('bb_upper_20', bb_upper)
+    put('bb_lower_20', bb_lower)
+    put('bb_width_20', bb_upper - bb_lower)
+    put('bb_position_20', (c - bb_lower) / (bb_upper - bb_lower + 1e-10))
+    put('bb_high_log', np.log1p((bb_upper - c) / bb_upper))
+    put('bb_low_log', np.log1p((c - bb_lower) / c))
+    put('bb_touch_upper', c >= bb_upper * 0.98)
+    put('bb_touch_lower', c <= bb_lower * 1.02)
+
+    # ========== VOLUME FEATURES ==========
+    for period in [10, 20, 50]:
+        volume_ma = rolling_mean(v, period)
+        put(f'volume_ma_{period}', volume_ma)
+        put(f'volume_ratio_{period}', v / (volume_ma + 1e-10))
+
+    price_change = np.diff(c, axis=1, prepend=np.nan)
+    put('price_change', price_change)
+    # fillna(0).cumsum() starts at each symbol's first bar; padding stays NaN
+    obv = np.where(live, np.nan_to_num(np.sign(price_change) * v).cumsum(axis=1), np.nan)
+    obv_ma = rolling_mean(obv, 20)
+    put('obv', obv)
+    put('obv_ma', obv_ma)
+    put('obv_ratio', obv / (obv_ma + 1e-10))
+
+    vpt = np.where(live, np.nan_to_num(returns * v).cumsum(axis=1), np.nan)
+    vpt_ma = rolling_mean(vpt, 20)
+    put('vpt', vpt)
+    put('vpt_ma', vpt_ma)
+    put('vpt_signal', vpt > vpt_ma)
+
+    price_volume = c * v
+    price_volume_ma = rolling_mean(price_volume, 20)
+    put('price_volume', price_volume)
+    put('price_volume_ma', price_volume_ma)
+    put('price_volume_ratio', price_volume / (price_volume_ma + 1e-10))
+
+    # ========== PRICE PATTERNS ==========
+    hl_range = h - l
+    put('hl_range', hl_range)
+    put('hl_range_pct', hl_range / c)
+    put('price_position', (c - l) / (h - l + 1e-10))
+    put('close_vs_high', (c - h) / c)
+    put('close_vs_low', (c - l) / c)
+    put('high_low_ratio', h / (l + 1e-10))
+    body = np.abs(c - o)
+    put('body', body)
+    put('upper_shadow', h - np.fmax(o, c))
+    put('lower_shadow', np.fmin(o, c) - l)
+    put('body_ratio', body / (hl_range + 1e-10))
+
+    # ========== TIME-BASED FEATURES ==========
+    if times is not None:
+        index = pd.DatetimeIndex(np.asarray(times, dtype='datetime64[ns]').ravel())
+        shape = c.shape
+        put('day_of_week', np.asarray(index.dayofweek, dtype='f8').reshape(shape))
+        put('day_of_month', np.asarray(index.day, dtype='f8').reshape(shape))
+        put('month', np.asarray(index.month, dtype='f8').reshape(shape))
+        put('quarter', np.asarray(index.quarter, dtype='f8').reshape(shape))
+        put('is_month_end', np.asarray(index.is_month_end).reshape(shape))
+        put('is_month_start', np.asarray(index.is_month_start).reshape(shape))
+        put('is_quarter_end', np.asarray(index.is_quarter_end).reshape(shape))
+
+    # ========== ADDITIONAL TECHNICAL PATTERNS ==========
+    low_14 = rolling_min(l, 14)
+    high_14 = rolling_max(h, 14)
+    stoch_k = 100 * (c - low_14) / (high_14 - low_14 + 1e-10)
+    stoch_d = rolling_mean(stoch_k, 3)
+    put('stoch_k', stoch_k)
+    put('stoch_d', stoch_d)
+    put('stoch_signal', stoch_k > stoch_d)
+    put('williams_r', -100 * (high_14 - c) / (high_14 - low_14 + 1e-10))
+
+    tp = (h + l + c) / 3
+    put('cci', (tp - rolling_mean(tp, 20)) / (0.015 * rolling_mean_abs_dev(tp, 20) + 1e-10))
+
+    # ========== ALPHA FACTORS ==========
+    put('alpha_inv_price', 1.0 / (c + 1e-10))
+    for delay in [1, 3, 5]:
+        prev = shift(c, delay)
+        put(f'alpha_price_delay_{delay}', c - prev)
+        put(f'alpha_price_delay_{delay}_pct', (c - prev) / (prev + 1e-10))
+        put(f'alpha_price_delay_ratio_{delay}', c / (prev + 1e-10))
+
+    for period in [5, 10, 20]:
+        put(f'alpha_ts_rank_close_{period}', rolling_rank_pct(c, period))
+        put(f'alpha_ts_rank_volume_{period}', rolling_rank_pct(v, period))
+        put(f'alpha_ts_rank_returns_{period}', rolling_rank_pct(returns, period))
+
+    for period in [10, 20]:
+        put(f'alpha_quantile_close_{period}', rolling_median(c, period) / (c + 1e-10))
+
+    for period in [5, 10, 20]:
+        put(f'alpha_corr_trend_{period}', rolling_corr(c, prev_close, period))
+        put(f'alpha_corr_ret_vol_{period}', rolling_corr(returns, v, period))
+
+    put('alpha_mean_reversion', -returns)
+    put('alpha_mean_reversion_delay1', -shift(returns, 1))
+    put('alpha_mean_reversion_delay3', -shift(returns, 3))
+
+    volume_rank = rolling_rank_pct(v, 20)
+    for delay in [3, 5]:
+        put(f'alpha_trend_volume_rank_{delay}', c / (shift(c, delay) + 1e-10) * volume_rank)
+
+    for period in [5, 10, 20]:
+        put(f'alpha_sharpe_{period}', rolling_mean(returns, period) / (rolling_std(returns, period) + 1e-10))
+        put(f'alpha_price_mean_std_{period}', rolling_mean(c, period) / (rolling_std(c, period) + 1e-10))
+
+    for period in [10, 20]:
+        put(f'alpha_ts_skew_{period}', rolling_skew(returns, period))
+        put(f'alpha_ts_kurt_{period}', rolling_kurt(returns, period))
+
+    put('alpha_close_minus_high', c - h)
+    put('alpha_hl2_minus_close', (h + l) / 2 - c)
+    returns_clipped = np.clip(returns, -0.999, 0.999)
+    put('alpha_fisher_transform', 0.5 * np.log((1 + returns_clipped) / (1 - returns_clipped + 1e-10)))
+
+    for period in [10, 20]:
+        put(f'alpha_zscore_{period}', (c - rolling_mean(c, period)) / (rolling_std(c, period) + 1e-10))
+
+    for delay in [1, 3, 5]:
+        prev = shift(c, delay)
+        put(f'alpha_normalized_momentum_{delay}', (c - prev) / (prev + 1e-10))
+
+    for period in [10, 20]:
+        low_period = rolling_min(l, period)
+        high_period = rolling_max(h, period)
+        put(f'alpha_price_range_{period}', (c - low_period) / (high_period - low_period + 1e-10))
+
+    vwap = (h + l + c) / 3
+    put('alpha_price_vwap_diff', c - vwap)
+    put('alpha_price_vwap_ratio', c / (vwap + 1e-10))
+
+    # padding rows (no bar) are NaN in every column, including the 0/1 flags
+    out[:, ~live] = np.nan
@@ -0,0 +1,240 @@
+"""
+Quote Book
+Array-backed current state of a LEVELONE stream service
+
+Level one messages only carry the fields that changed. QuoteBook merges each update in
+place into a preallocated row per symbol, so the full current quote is always
+available: one symbol's fields in O(1), or a whole column (bid, ask, last, ...) for
+every symbol as a NumPy array without walking dicts.
+
+Numeric fields live in a float64 matrix (NaN until first sent); text fields
+(description, exchange names, ...) live in a parallel object matrix. Columns are
+named like the schwabdev parsed records (bid_price, ask_price, last_price, ...).
+
+Usage:
+    book = QuoteBook('LEVELONE_EQUITIES')
+    stream.start(book.wrap(handler))           # or call book(message) from a handler
+    book.get('AAPL', 'last_price')
+    book.snapshot('AAPL')                      # {'bid_price': ..., 'ask_price': ..., ...}
+    book.column('last_price')                  # ndarray aligned with book.symbols
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+
+from schwabdev.records import loads, record_types
+
+
+class QuoteBook:
+    """
+    Delta-merged quotes for one LEVELONE service
+    """
+
+    def __init__(self, service='LEVELONE_EQUITIES', capacity=2048):
+        """
+        Initialize an empty book
+
+        Args:
+            service: LEVELONE_EQUITIES, LEVELONE_OPTIONS, LEVELONE_FUTURES,
+                LEVELONE_FUTURES_OPTIONS or LEVELONE_FOREX
+            capacity: Symbols preallocated (the book grows by doubling past this)
+        """
+        if not service.startswith('LEVELONE_') or service not in record_types:
+            raise ValueError(f"QuoteBook needs a LEVELONE service, got {service!r}")
+        self.service = service
+        record_type = record_types[service]
+        self.fields = record_type.fields
+        self._columns = {name: i for i, name in enumerate(self.fields)}
+        self._field_columns = {field: self._columns[name] for field, name in record_type.field_names.items()}
+
+        self.values = np.full((capacity, len(self.fields)), np.nan)     # numeric fields
+        self.text = np.full((capacity, len(self.fields)), None, dtype=object)
+        self.updated = np.zeros(capacity, dtype=np.int64)                # message timestamp (ms) of the last update
+        self.symbols = []                                                # slot -> symbol
+        self._slots = {}                                                 # symbol -> slot
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._slots
+
+    # ========== RECEIVER ==========
+
+    def __call__(self, message, **kwargs):
+        self.apply(message)
+
+    def apply(self, message):
+        """
+        Merge the book's service updates from one stream message
+
+        Args:
+            message: Raw stream message (JSON string), the decoded dict, or a
+                     schwabdev.StreamMessage (stream started with parsed=True)
+
+        Returns:
+            List of symbols that were updated
+        """
+        if isinstance(message, (str, bytes)):
+            message = loads(message)
+        if isinstance(message, dict):
+            items = [(item.get('timestamp'), item.get('content', ()))
+                     for item in message.get('data', ()) if item.get('service') == self.service]
+        else:
+            items = [(record.timestamp, (record.content,)) for record in message.data if record.service == self.service]
+
+        updated = []
+        field_columns = self._field_columns
+        with self._lock:
+            for timestamp, contents in items:
+                for content in contents:
+                    symbol = content.get('key')
+                    slot = self._slots.get(symbol)
+                    if slot is None:
+                        slot = self._add(symbol)
+                    values, text = self.values[slot], self.text[slot]
+                    for field, value in content.items():
+                        column = field_columns.get(field)
+                        if column is None:
+                            continue
+                        if value.__class__ is str:
+                            text[column] = value
+                        else:
+                            values[column] = value
+                    if timestamp is not None:
+                        self.updated[slot] = timestamp
+                    updated.append(symbol)
+            self.updates += len(updated)
+        return updated
+
+    def wrap(self, receiver):
+        """
+        Receiver that merges each message into the book, then calls receiver with it
+
+        Args:
+            receiver: Function (or coroutine function) to call after the merge
+
+        Returns:
+            Receiver to pass to Stream.start (a coroutine function if receiver is one)
+        """
+        if asyncio.iscoroutinefunction(receiver):
+            async def wrapper(message, **kwargs):
+                self.apply(message)
+                await receiver(message, **kwargs)
+        else:
+            def wrapper(message, **kwargs):
+                self.apply(message)
+                receiver(message, **kwargs)
+        return wrapper
+
+    def _add(self, symbol):
+        slot = len(self.symbols)
+        if slot == len(self.values):
+            self.values = np.concatenate([self.values, np.full_like(self.values, np.nan)])
+            self.text = np.concatenate([self.text, np.full_like(self.text, None)])
+            self.updated = np.concatenate([self.updated, np.zeros_like(self.updated)])
+        self.symbols.append(symbol)
+        self._slots[symbol] = slot
+        return slot
+
+    # ========== READS ==========
+
+    def slot(self, symbol):
+        """Row of a symbol in values/text/updated (None if never updated)"""
+        return self._slots.get(symbol)
+
+    def get(self, symbol, field, default=None):
+        """
+        Current value of one field (O(1))
+
+        Args:
+            symbol: Symbol
+            field: Field name ('bid_price') or stream field number ('1')
+            default: Returned when the symbol or field has not been sent
+        """
+        slot = self._slots.get(symbol)
+        column = self._column(field)
+        if slot is None:
+            return default
+        text = self.text[slot, column]
+        if text is not None:
+            return text
+        value = self.values[slot, column]
+        return default if value != value else float(value)
+
+    def snapshot(self, symbol, fields=None):
+        """
+        Current quote of a symbol
+
+        Args:
+            symbol: Symbol
+            fields: Field names to include (default: every field that has been sent)
+
+        Returns:
+            Dictionary {field name: value} (None if the symbol has never been updated)
+        """
+        with self._lock:
+            slot = self._slots.get(symbol)
+            if slot is None:
+                return None
+            values, text = self.values[slot].tolist(), self.text[slot].tolist()
+        columns = range(len(self.fields)) if fields is None else [self._column(f) for f in fields]
+        quote = {}
+        for column in columns:
+            if text[column] is not None:
+                quote[self.fields[column]] = text[column]
+            elif values[column] == values[column]:
+                quote[self.fields[column]] = values[column]
+        return quote
+
+    def column(self, field, copy=False):
+        """
+        One numeric field for every symbol, aligned with book.symbols
+
+        Args:
+            field: Field name ('last_price') or stream field number ('3')
+            copy: Return a copy instead of a view (views track later updates but are
+                replaced when the book grows past its capacity)
+
+        Returns:
+            float64 ndarray (NaN where the field has not been sent)
+        """
+        view = self.values[:len(self.symbols), self._column(field)]
+        return view.copy() if copy else view
+
+    def array(self, fields):
+        """
+        Several numeric fields for every symbol
+
+        Returns:
+            float64 ndarray of shape (len(book), len(fields)), a copy
+        """
+        with self._lock:
+            return self.values[:len(self.symbols)][:, [self._column(f) for f in fields]]
+
+    def frame(self, fields=None):
+        """
+        Numeric fields for every symbol as a DataFrame indexed by symbol
+
+        Args:
+            fields: Field names (default: every field sent for at least one symbol)
+        """
+        with self._lock:
+            values = self.values[:len(self.symbols)]
+            if fields is None:
+                fields = [name for i, name in enumerate(self.fields) if not np.isnan(values[:, i]).all()]
+            data = values[:, [self._column(f) for f in fields]]
+            return pd.DataFrame(data, index=pd.Index(list(self.symbols), name='symbol'), columns=list(fields))
+
+    def _column(self, field):
+        column = self._columns.get(field)
+        if column is None:
+            column = self._field_columns.get(str(field))
+        if column is None:
+            raise KeyError(f"{self.service} has no field {field!r}")
+        return column
@@ -1,3 +1,13 @@
+from .broker import BrokerTokens, TokenBroker
+from .cache import ResponseCache
 from .client import Client, ClientAsync
+from .coalescer import QuoteCoalescer
+from .dispatcher import StreamDispatcher
+from .enums import Priority
+from .latency import LatencyHistogram, StreamLatency
+from .pool import StreamPool
+from .records import StreamMessage, StreamRecord, parse_message
+from .scheduler import RequestScheduler
 from .stream import Stream, StreamAsync
-from .translate import stream_fields
\ No newline at end of file
+from .subscriptions import SubscriptionManager
+from .translate import stream_fields
@@ -0,0 +1,302 @@
+"""
+Schwabdev Token Broker Module.
+Shares one set of tokens between processes over a Unix socket: the broker refreshes, subscribers get new tokens pushed.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import threading
+import time
+
+from .tokens import Tokens
+
+DEFAULT_SOCKET = "~/.schwabdev/tokens.sock"
+
+
+def _snapshot(tokens) -> bytes:
+    return (json.dumps({'access_token': tokens.access_token, 'id_token': tokens.id_token,
+                        'expires_in': tokens.access_token_expires_in()}) + "\n").encode()
+
+
+class TokenBroker:
+
+    def __init__(self, tokens: Tokens, socket_path: str = DEFAULT_SOCKET, logger: logging.Logger = None):
+        """
+        Serve a Tokens object to other processes over a Unix socket. The broker's tokens are renewed in this process
+        (by their background refresher) and every new access token is pushed to all connected BrokerTokens, so only
+        one process calls the OAuth endpoint and writes the tokens database.
+
+        Args:
+            tokens (Tokens): tokens to share (e.g. client.tokens)
+            socket_path (str): path of the Unix socket (owner-only permissions)
+            logger (logging.Logger): logger, the tokens' logger if None
+        """
+        self.tokens = tokens
+        self.socket_path = os.path.expanduser(socket_path)
+        self._logger = logger or tokens._logger
+        self._writers = set()                           # connected subscribers
+        self._handlers = set()                          # their tasks
+        self._loop = None
+        self._stop = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._refreshing = None                         # task renewing tokens for subscriber requests
+        self.pushes = 0                                 # tokens pushed to subscribers
+        self.refreshes = 0                              # renewals requested by subscribers
+        tokens.add_listener(self._on_update)
+
+    """
+    Lifecycle
+    """
+
+    def start(self, daemon: bool = True):
+        """
+        Start serving on a background thread
+
+        Args:
+            daemon (bool): run the thread as a daemon
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._claim_socket()
+        self._ready.clear()
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._serve()), name="Schwabdev-TokenBroker", daemon=daemon)
+        self._thread.start()
+        if not self._ready.wait(5):
+            raise RuntimeError("[Schwabdev] Token broker did not start.")
+        self._logger.info(f"Token broker serving {self.socket_path}")
+
+    def stop(self):
+        """
+        Stop serving and disconnect subscribers (they keep their last token and reconnect to the next broker)
+        """
+        if self._loop is not None:
+            try:
+                self._loop.call_soon_threadsafe(self._stop.set)
+            except RuntimeError:                        # loop already closed
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._loop = None
+
+    def _claim_socket(self):
+        """Remove a socket file left by a broker that is no longer running, raise if one is"""
+        _dir = os.path.dirname(self.socket_path)
+        if _dir:
+            os.makedirs(_dir, exist_ok=True)
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"[Schwabdev] A token broker is already serving {self.socket_path}.")
+
+    async def _serve(self):
+        self._loop = asyncio.get_running_loop()
+        self._stop = asyncio.Event()
+        server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)               # tokens are credentials
+        self._ready.set()
+        async with server:
+            await self._stop.wait()
+            for writer in list(self._writers):
+                writer.close()                          # the handlers see end of stream and return
+            if self._handlers:
+                await asyncio.wait(self._handlers, timeout=5)
+        try:
+            os.unlink(self.socket_path)
+        except OSError:
+            pass
+
+    """
+    Subscribers
+    """
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._writers.add(writer)
+        self._handlers.add(asyncio.current_task())
+        try:
+            writer.write(_snapshot(self.tokens))
+            while line := await reader.readline():
+                request = json.loads(line)
+                if request.get('op') == 'refresh':
+                    await self._refresh(request.get('access_token'), bool(request.get('refresh_token')))
+                    writer.write(_snapshot(self.tokens))  # answers the request even if the token did not change
+        except (ConnectionError, json.JSONDecodeError) as e:
+            self._logger.debug(f"Token broker subscriber dropped ({e})")
+        finally:
+            self._writers.discard(writer)
+            self._handlers.discard(asyncio.current_task())
+            writer.close()
+
+    async def _refresh(self, seen_token: str | None, refresh_token: bool):
+        """Renew once for all subscribers reporting the same token (e.g. every worker getting a 401 at once)"""
+        if not refresh_token and seen_token != self.tokens.access_token:
+            return                                      # already renewed and pushed
+        if self._refreshing is None or self._refreshing.done():
+            self.refreshes += 1
+            self._refreshing = asyncio.ensure_future(asyncio.to_thread(self.tokens.update_tokens, not refresh_token, refresh_token))
+        try:
+            await asyncio.shield(self._refreshing)
+        except Exception as e:
+            self._logger.error(f"[Schwabdev] Token broker could not renew tokens ({e})")
+
+    def _on_update(self, tokens: Tokens):
+        # called on whichever thread renewed the tokens
+        loop = self._loop
+        if loop is not None:
+            try:
+                loop.call_soon_threadsafe(self._push, _snapshot(tokens))
+            except RuntimeError:                        # loop closed (stopping)
+                pass
+
+    def _push(self, payload: bytes):
+        self.pushes += 1
+        for writer in list(self._writers):
+            writer.write(payload)                       # a few hundred bytes, subscribers read continuously
+
+    def stats(self) -> dict:
+        """
+        Broker counters
+
+        Returns:
+            dict: subscribers, pushes, refreshes (renewals requested by subscribers)
+        """
+        return {'subscribers': len(self._writers), 'pushes': self.pushes, 'refreshes': self.refreshes}
+
+
+class BrokerTokens:
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET, logger: logging.Logger = None, timeout: float = 30.0):
+        """
+        Tokens received from a TokenBroker in another process, used by clients and streams in place of Tokens
+        (pass token_broker=socket_path to the client). A reader thread applies each token the broker pushes, so
+        update_tokens() only does work when forced. If the broker goes away the last token is kept and the reader
+        reconnects until a broker is back.
+
+        Args:
+            socket_path (str): path of the broker's Unix socket
+            logger (logging.Logger): logger
+            timeout (float): seconds to wait for the broker when connecting or renewing
+
+        Raises:
+            ConnectionError: no broker answered
+        """
+        self.access_token = None                        # access token from the broker
+        self.refresh_token = None                       # stays with the broker
+        self.id_token = None
+        self._socket_path = os.path.expanduser(socket_path)
+        self._logger = logger or logging.getLogger("Schwabdev")
+        self._timeout = timeout
+        self._changed = threading.Condition()           # notified on every message from the broker
+        self._version = 0                               # messages received
+        self._access_expiry = 0.0
+        self._send_lock = threading.Lock()
+        self._sock = None
+        self._closed = False
+        try:
+            self._connect()
+        except OSError as e:
+            raise ConnectionError(f"[Schwabdev] Could not reach token broker at {self._socket_path} ({e})") from e
+        self._thread = threading.Thread(target=self._read_loop, name="Schwabdev-BrokerTokens", daemon=True)
+        self._thread.start()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self._timeout)
+            sock.connect(self._socket_path)
+            file = sock.makefile('rb')
+            self._apply(file.readline())                # current tokens
+            sock.settimeout(None)
+        except (OSError, ValueError):
+            sock.close()
+            raise
+        self._sock, self._file = sock, file
+
+    def _apply(self, line: bytes):
+        if not line:
+            raise ConnectionError("token broker closed the connection")
+        data = json.loads(line)
+        with self._changed:
+            self.access_token = data['access_token']
+            self.id_token = data.get('id_token')
+            self._access_expiry = time.monotonic() + data['expires_in']
+            self._version += 1
+            self._changed.notify_all()
+
+    def _read_loop(self):
+        backoff = 0.5
+        while not self._closed:
+            try:
+                self._apply(self._file.readline())
+                backoff = 0.5
+                continue
+            except (OSError, ValueError) as e:
+                if self._closed:
+                    return
+                self._logger.warning(f"[Schwabdev] Lost token broker ({e}), keeping the last token and reconnecting.")
+            self._sock.close()
+            while not self._closed:
+                time.sleep(backoff)
+                try:
+                    self._connect()
+                    self._logger.info("Reconnected to token broker.")
+                    break
+                except (OSError, ValueError):
+                    backoff = min(backoff * 2, 30)
+
+    def update_tokens(self, force_access_token: bool = False, force_refresh_token: bool = False) -> bool:
+        """
+        Ask the broker for new tokens if forced (new tokens are otherwise pushed by the broker)
+
+        Args:
+            force_access_token (bool): have the broker renew the access token (once for all processes reporting this token)
+            force_refresh_token (bool): have the broker get a new refresh token (runs the auth flow in the broker's process)
+
+        Returns:
+            bool: True if a new access token was received
+        """
+        if not (force_access_token or force_refresh_token):
+            return False
+        with self._changed:
+            version, token = self._version, self.access_token
+        request = {'op': 'refresh', 'access_token': token, 'refresh_token': force_refresh_token}
+        try:
+            with self._send_lock:
+                self._sock.sendall((json.dumps(request) + "\n").encode())
+        except OSError as e:
+            self._logger.error(f"[Schwabdev] Could not reach token broker ({e})")
+            return False
+        with self._changed:
+            self._changed.wait_for(lambda: self._version != version, None if force_refresh_token else self._timeout)
+            return self.access_token != token
+
+    def access_token_expires_in(self) -> float:
+        """
+        Seconds until the access token expires
+
+        Returns:
+            float: seconds (negative once expired)
+        """
+        return self._access_expiry - time.monotonic()
+
+    def close(self):
+        """
+        Disconnect from the broker
+        """
+        self._closed = True
+        try:
+            self._sock.shutdown(socket.SHUT_RDWR)
+            self._sock.close()
+        except OSError:
+            pass
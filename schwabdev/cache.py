@@ -0,0 +1,242 @@
+"""
+Schwabdev Response Cache Module.
+Time-to-live cache for reference data responses (market hours, instruments, preferences, ...).
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from cryptography.fernet import Fernet, InvalidToken
+
+_ENC_PREFIX = "enc:"
+
+# seconds responses of each endpoint are reused for (endpoints not listed are never cached)
+DEFAULT_TTL = {
+    'market_hours': 6 * 60 * 60,
+    'market_hour': 6 * 60 * 60,
+    'instruments': 24 * 60 * 60,
+    'instrument_cusip': 24 * 60 * 60,
+    'option_expiration_chain': 60 * 60,
+    'preferences': 60 * 60,
+    'linked_accounts': 24 * 60 * 60,
+    'streamer_info': 60 * 60,
+}
+
+
+class ResponseCache:
+
+    def __init__(self, ttl: dict | None = None, max_entries: int = 1024, path: str | None = None, bypass: callable = None,
+                 encryption: str | None = None, logger: logging.Logger | None = None):
+        """
+        Cache of successful responses for endpoints whose data changes at most daily, pass to Client(..., cache=ResponseCache())
+        or ClientAsync. Entries expire after the endpoint's TTL and the least recently used entry is dropped beyond max_entries.
+        Values are plain JSON data: Client stores status, headers and body (a new requests.Response is built on each hit),
+        ClientAsync stores the body (parsed calls only).
+
+        Args:
+            ttl (dict | None): seconds per endpoint (method name, e.g. {'instruments': 3600, 'preferences': 0}), merged with DEFAULT_TTL; 0 disables
+            max_entries (int): most responses held in memory
+            path (str | None): sqlite file to persist entries in, so other processes and later runs reuse them (owner-only permissions)
+            bypass (callable): function called with (endpoint, params) before each lookup, return True to skip the cache for that call
+            encryption (str | None): Fernet key to encrypt persisted responses with (a client created with encryption passes its key)
+            logger (logging.Logger | None): logger to use
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1.")
+        self.ttl = {**DEFAULT_TTL, **(ttl or {})}
+        self.max_entries = max_entries
+        self.bypass = bypass
+        self.logger = logger or logging.getLogger("Schwabdev")
+        self._entries = OrderedDict()                   # key -> (expires (epoch seconds), value), least recently used first
+        self._lock = threading.Lock()
+        self._conn = None
+        self._cipher_suite = None                       # encrypts persisted values
+        if encryption is not None:
+            self.set_encryption(encryption)
+        self.hits = 0
+        self.misses = 0
+        if path is not None:
+            self._open(os.path.expanduser(path))
+
+    def _open(self, path: str):
+        _dir = os.path.dirname(path)
+        if _dir:
+            os.makedirs(_dir, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        os.chmod(path, 0o600)                           # responses include account data
+        self._conn.execute("PRAGMA busy_timeout = 30000;")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, expires REAL NOT NULL, value TEXT NOT NULL)")
+        # rows of older versions (binary keys and values) are never read
+        self._conn.execute("DELETE FROM responses WHERE expires <= ? OR typeof(key) != 'text' OR typeof(value) != 'text'", (time.time(),))
+        self._conn.commit()
+        rows = self._conn.execute("SELECT key, expires, value FROM responses ORDER BY expires DESC LIMIT ?", (self.max_entries,)).fetchall()
+        for key, expires, value in reversed(rows):
+            try:
+                self._entries[_key_from_text(key)] = (expires, self._decode(value))
+            except Exception as e:
+                self.logger.debug(f"Skipping unreadable cached response ({e})")
+
+    def set_encryption(self, encryption: str):
+        """
+        Encrypt persisted values from now on (entries already in memory are kept)
+
+        Args:
+            encryption (str): Fernet key, e.g. the one passed to the client for the tokens
+        """
+        self._cipher_suite = Fernet(encryption)
+
+    @property
+    def encrypted(self) -> bool:
+        """
+        Whether persisted values are encrypted
+
+        Returns:
+            bool: True once an encryption key is set
+        """
+        return self._cipher_suite is not None
+
+    def _encode(self, value) -> str:
+        text = json.dumps(value)
+        if self._cipher_suite is None:
+            return text
+        return _ENC_PREFIX + self._cipher_suite.encrypt(text.encode()).decode()
+
+    def _decode(self, stored: str):
+        if stored.startswith(_ENC_PREFIX):
+            if self._cipher_suite is None:
+                raise ValueError("encrypted response, no encryption key provided")
+            try:
+                stored = self._cipher_suite.decrypt(stored[len(_ENC_PREFIX):].encode()).decode()
+            except InvalidToken:
+                raise ValueError("encrypted with another key")
+        return json.loads(stored)
+
+    """
+    Lookups (used by the clients)
+    """
+
+    def key(self, endpoint: str, path: str, params: dict | None = None, parsed: bool = False) -> tuple | None:
+        """
+        Cache key of a call, None if it should not be cached (endpoint without TTL or bypassed)
+
+        Args:
+            endpoint (str): client method name
+            path (str): request path
+            params (dict | None): query parameters
+            parsed (bool): value is a parsed body (ClientAsync) rather than a response
+
+        Returns:
+            tuple | None: key for get() and put()
+        """
+        if self.ttl.get(endpoint, 0) <= 0 or (self.bypass is not None and self.bypass(endpoint, params)):
+            return None
+        return (endpoint, path, tuple(sorted((name, str(value)) for name, value in (params or {}).items())), parsed)
+
+    def get(self, key: tuple):
+        """
+        Cached value if present and not expired
+
+        Args:
+            key (tuple): key from key()
+
+        Returns:
+            Any: cached value, None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+            if self._conn is not None:                  # stored by another process since this one loaded the file
+                row = self._conn.execute("SELECT expires, value FROM responses WHERE key = ? AND expires > ?",
+                                         (_key_to_text(key), time.time())).fetchone()
+                if row is not None:
+                    try:
+                        value = self._decode(row[1])
+                    except ValueError as e:
+                        self.logger.debug(f"Skipping unreadable cached response ({e})")
+                    else:
+                        self._entries[key] = (row[0], value)
+                        if len(self._entries) > self.max_entries:
+                            self._entries.popitem(last=False)
+                        self.hits += 1
+                        return value
+            self.misses += 1
+            return None
+
+    def put(self, key: tuple, value):
+        """
+        Store a value for the endpoint's TTL
+
+        Args:
+            key (tuple): key from key()
+            value: JSON-serializable data to store (lists come back as lists from the file)
+        """
+        expires = time.time() + self.ttl[key[0]]
+        with self._lock:
+            self._entries[key] = (expires, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            if self._conn is not None:
+                try:
+                    self._conn.execute("INSERT OR REPLACE INTO responses (key, endpoint, expires, value) VALUES (?, ?, ?, ?)",
+                                       (_key_to_text(key), key[0], expires, self._encode(value)))
+                    self._conn.commit()
+                except Exception as e:
+                    self.logger.warning(f"Could not persist cached response ({e})")
+
+    """
+    Management
+    """
+
+    def invalidate(self, endpoint: str | None = None):
+        """
+        Drop cached entries
+
+        Args:
+            endpoint (str | None): only this endpoint's entries, all if None
+        """
+        with self._lock:
+            for key in [k for k in self._entries if endpoint is None or k[0] == endpoint]:
+                del self._entries[key]
+            if self._conn is not None:
+                if endpoint is None:
+                    self._conn.execute("DELETE FROM responses")
+                else:
+                    self._conn.execute("DELETE FROM responses WHERE endpoint = ?", (endpoint,))
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        """
+        Cache counters
+
+        Returns:
+            dict: entries, hits, misses
+        """
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        """
+        Close the persistence file (if any)
+        """
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def _key_to_text(key: tuple) -> str:
+    return json.dumps(key)
+
+
+def _key_from_text(text: str) -> tuple:
+    endpoint, path, params, parsed = json.loads(text)
+    return (endpoint, path, tuple(tuple(param) for param in params), parsed)
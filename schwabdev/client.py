@@ -4,22 +4,28 @@ For connecting to the Schwab API.
 https://github.com/tylerebowers/Schwab-API-Python
 """
 import datetime
+import json
 import logging
 import asyncio
+import random
 import urllib.parse
 import threading
 import requests
 import aiohttp
 
-from .enums import TimeFormat
+from .enums import TimeFormat, Priority
+from .broker import BrokerTokens
+from .cache import ResponseCache
+from .scheduler import RequestScheduler, priority_for
 from .tokens import Tokens
 
 
 class ClientBase:
 
     _base_api_url = "https://api.schwabapi.com"
+    cache = None                                                            # ResponseCache for reference endpoints (opt-in)
 
-    def __init__(self, app_key, app_secret, callback_url="https://127.0.0.1", tokens_db="~/.schwabdev/tokens.db", encryption=None, timeout=10, call_on_auth=None):
+    def __init__(self, app_key, app_secret, callback_url="https://127.0.0.1", tokens_db="~/.schwabdev/tokens.db", encryption=None, timeout=10, call_on_auth=None, scheduler=None, token_broker=None, cache=None):
         """
         Initialize a client to access the Schwab API.
 
@@ -31,17 +37,39 @@ class ClientBase:
             timeout (int): Request timeout in seconds - how long to wait for a response.
             use_session (bool): Use a requests session for requests instead of creating a new session for each request.
             call_on_notify (function | None): Function to call when user needs to be notified (e.g. for input)
+            scheduler (RequestScheduler | None): Request scheduler (rate limit and priority lanes), share one instance between clients to share the rate limit.
+            token_broker (str | None): Unix socket of a TokenBroker to get tokens from (falls back to tokens_db if no broker answers).
+            cache (ResponseCache | None): Cache for reference endpoints (market hours, instruments, preferences, ...), None to always request.
         """
 
         # other checks are done in the tokens class
         if timeout <= 0:
             raise Exception("Timeout must be greater than 0 and is recommended to be 5 seconds or more.")
 
+        logger = logging.getLogger("Schwabdev")                             # init the logger
+        if cache is not None and encryption and len(encryption) > 16 and not cache.encrypted:
+            cache.set_encryption(encryption)                                # persisted responses include account numbers
+        tokens = None
+        if token_broker:
+            try:
+                tokens = BrokerTokens(token_broker, logger)
+            except ConnectionError as e:
+                logger.warning(f"{e}, using the tokens database directly.")
+        if tokens is None:
+            tokens = Tokens(app_key, app_secret, callback_url, logger, tokens_db, encryption, call_on_auth)
+        self._init_shared(timeout, logger, scheduler or RequestScheduler(logger=logger), tokens, cache)
+        self.tokens.update_tokens()                                               # ensure tokens are up to date on init
+
+    def _init_shared(self, timeout: int, logger: logging.Logger, scheduler: RequestScheduler, tokens, cache: ResponseCache | None):
+        """
+        Set the state every client has, from __init__ or from another client (ClientAsync.from_client)
+        """
         self.version = "Schwabdev 3.0.0"                                    # version of the client
         self.timeout = timeout                                              # timeout to use in requests
-        self.logger = logging.getLogger("Schwabdev")  # init the logger
-        self.tokens = Tokens(app_key, app_secret, callback_url, self.logger, tokens_db, encryption, call_on_auth)
-        self.tokens.update_tokens()                                               # ensure tokens are up to date on init
+        self.logger = logger                                                # the "Schwabdev" logger
+        self.scheduler = scheduler                                          # rate limit and priority lanes for requests
+        self.cache = cache                                                  # response cache (None = disabled)
+        self.tokens = tokens                                                # Tokens or BrokerTokens
 
     def _parse_params(self, params: dict):
         """
@@ -110,18 +138,35 @@ class ClientBase:
         else:
             return l
     
-    def _get_streamer_info(self):
+    def _get_streamer_info(self, refresh: bool = False):
+        """
+        Streamer info from the user preferences (reused from the response cache if configured)
+
+        Args:
+            refresh (bool): drop a cached entry and fetch it again (the stream does after a failed connect or login)
+
+        Returns:
+            dict | None: streamer info
+        """
+        key = self.cache.key('streamer_info', '/trader/v1/userPreference') if self.cache is not None else None
+        if key is not None and refresh:
+            self.cache.invalidate('streamer_info')
+        elif key is not None and (info := self.cache.get(key)) is not None:
+            return info
         self.tokens.update_tokens()
         response = requests.request("GET", f'{self._base_api_url}/trader/v1/userPreference', headers={'Authorization': f'Bearer {self.tokens.access_token}'})
         if response.ok:
-            return response.json().get('streamerInfo', None)[0]
+            info = response.json().get('streamerInfo', None)[0]
+            if key is not None:
+                self.cache.put(key, info)
+            return info
         else:
             self.logger.error("Could not get streamerInfo")
             return
 
 class Client(ClientBase):
 
-    def __init__(self, app_key:str, app_secret:str, callback_url:str="https://127.0.0.1", tokens_db: str="~/.schwabdev/tokens.db", encryption:str=None, timeout:int=10, call_on_auth:callable=None):
+    def __init__(self, app_key:str, app_secret:str, callback_url:str="https://127.0.0.1", tokens_db: str="~/.schwabdev/tokens.db", encryption:str=None, timeout:int=10, call_on_auth:callable=None, scheduler: RequestScheduler | None = None, pool_size: int = 10, token_broker: str | None = None, cache: ResponseCache | None = None):
         """
         Initialize a client to access the Schwab API.
 
@@ -132,31 +177,76 @@ class Client(ClientBase):
             tokens_db (str): Path to tokens file.
             timeout (int): Request timeout in seconds - how long to wait for a response.
             call_on_auth (function | None): Function to call for custom auth flow.
-        """
-        super().__init__(app_key, app_secret, callback_url, tokens_db, encryption, timeout, call_on_auth)
-
-        self._session = requests.Session()                                  # session to use in requests
-        self._session.headers.update({'Authorization': f'Bearer {self.tokens.access_token}'})
-        self._session_lock = threading.RLock()
+            scheduler (RequestScheduler | None): Request scheduler to use (shared with other clients to share the rate limit), a new one if None.
+            pool_size (int): Connections kept open for reuse, set to the number of threads making calls at the same time.
+            token_broker (str | None): Unix socket of a TokenBroker to get tokens from instead of the tokens database (e.g. "~/.schwabdev/tokens.sock").
+            cache (ResponseCache | None): Cache for market hours, instruments, option expirations, preferences and linked accounts (opt-in).
+        """
+        super().__init__(app_key, app_secret, callback_url, tokens_db, encryption, timeout, call_on_auth, scheduler, token_broker, cache)
+        self._init_session(pool_size)
+
+    def _init_session(self, pool_size: int):
+        if pool_size < 1:
+            raise ValueError("pool_size must be at least 1.")
+        self._session = requests.Session()                                  # session to use in requests (thread-safe connection pool)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount('https://', adapter)
+        self._session.mount('http://', adapter)
+        self._auth_token = self.tokens.access_token                          # token the headers were built from
+        self._auth_headers = {'Authorization': f'Bearer {self._auth_token}'}  # swapped (never mutated) on token updates
+        self._session_lock = threading.RLock()                              # only guards swapping the headers and closing
 
     def update_tokens(self, force_access_token:bool=False, force_refresh_token:bool=False) -> bool:
         """
-        Update tokens if needed.
+        Update tokens if needed (the access token is usually renewed ahead of expiry by the tokens' background refresher).
 
         Returns:
-            bool: True if tokens were updated, False otherwise.
+            bool: True if tokens were updated (here or in the background), False otherwise.
         """
-        if self.tokens.update_tokens(force_access_token, force_refresh_token):
+        updated = self.tokens.update_tokens(force_access_token, force_refresh_token)
+        token = self.tokens.access_token
+        if token is not self._auth_token:
             with self._session_lock:
-                self._session.headers['Authorization'] = f'Bearer {self.tokens.access_token}'
+                self._auth_headers = {'Authorization': f'Bearer {token}'}
+                self._auth_token = token
             return True
-        else:
-            return False
+        return updated
 
-    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+    def _request(self, method: str, path: str, priority: Priority | None = None, **kwargs) -> requests.Response:
         self.update_tokens()
-        with self._session_lock:
-            return self._session.request(method, f'{self._base_api_url}{path}', timeout=self.timeout, **kwargs)
+        headers = self._auth_headers                                        # one attribute read, the dict is never mutated
+        if 'headers' in kwargs:
+            headers = {**kwargs.pop('headers'), **headers}
+
+        def send():
+            # no lock held here: requests.Session/urllib3 pools connections across threads
+            return self._session.request(method, f'{self._base_api_url}{path}', headers=headers, timeout=self.timeout, **kwargs)
+
+        return self.scheduler.call(send, priority_for(method, path) if priority is None else priority)
+
+    def _cached_request(self, endpoint: str, method: str, path: str, **kwargs) -> requests.Response:
+        key = self.cache.key(endpoint, path, kwargs.get('params')) if self.cache is not None else None
+        if key is None:
+            return self._request(method, path, **kwargs)
+        stored = self.cache.get(key)
+        if stored is not None:
+            return self._response_from_cache(stored)
+        response = self._request(method, path, **kwargs)
+        if response.ok:
+            # plain data only: the request (with the access token) is not kept
+            self.cache.put(key, {'status': response.status_code, 'headers': dict(response.headers), 'url': response.url,
+                                 'encoding': response.encoding, 'body': response.content.decode('utf-8', 'surrogateescape')})
+        return response
+
+    @staticmethod
+    def _response_from_cache(stored: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = stored['status']
+        response.headers = requests.structures.CaseInsensitiveDict(stored['headers'])
+        response.url = stored['url']
+        response.encoding = stored['encoding']
+        response._content = stored['body'].encode('utf-8', 'surrogateescape')
+        return response
 
     def close(self):
         try:
@@ -186,7 +276,7 @@ class Client(ClientBase):
         Return:
             request.Response: All linked account numbers and hashes
         """
-        return self._request('GET', '/trader/v1/accounts/accountNumbers')
+        return self._cached_request('linked_accounts', 'GET', '/trader/v1/accounts/accountNumbers')
 
     def account_details_all(self, fields: str | None = None) -> requests.Response:
         """
@@ -363,7 +453,7 @@ class Client(ClientBase):
         Returns:
             request.Response: User preferences and streaming info
         """
-        return self._request("GET", '/trader/v1/userPreference')
+        return self._cached_request('preferences', "GET", '/trader/v1/userPreference')
 
     """
     Market Data
@@ -466,7 +556,7 @@ class Client(ClientBase):
         Returns:
             request.Response: Option expiration chain
         """
-        return self._request("GET", '/marketdata/v1/expirationchain', 
+        return self._cached_request('option_expiration_chain', "GET", '/marketdata/v1/expirationchain', 
                              params=self._parse_params({'symbol': symbol}))
 
     def price_history(self, symbol: str, periodType: str | None = None, period: str | None = None, frequencyType: str | None = None, 
@@ -531,7 +621,7 @@ class Client(ClientBase):
         Returns:
             request.Response: Market hours
         """
-        return self._request("GET", '/marketdata/v1/markets', 
+        return self._cached_request('market_hours', "GET", '/marketdata/v1/markets', 
                              params=self._parse_params({'markets': self._format_list(symbols), 
                                                          'date': self._time_convert(date, TimeFormat.YYYY_MM_DD)}))
 
@@ -546,7 +636,7 @@ class Client(ClientBase):
         Returns:
             request.Response: Market hours
         """
-        return self._request("GET", f'/marketdata/v1/markets/{market_id}', 
+        return self._cached_request('market_hour', "GET", f'/marketdata/v1/markets/{market_id}', 
                              params=self._parse_params({'date': self._time_convert(date, TimeFormat.YYYY_MM_DD)}))
 
     def instruments(self, symbols: str, projection: str) -> requests.Response:
@@ -560,7 +650,7 @@ class Client(ClientBase):
         Returns:
             request.Response: Instruments
         """
-        return self._request("GET", '/marketdata/v1/instruments', 
+        return self._cached_request('instruments', "GET", '/marketdata/v1/instruments', 
                              params={'symbol': self._format_list(symbols), 'projection': projection})
 
     def instrument_cusip(self, cusip_id: str | int) -> requests.Response:
@@ -573,33 +663,58 @@ class Client(ClientBase):
         Returns:
             request.Response: Instrument
         """
-        return self._request("GET", f'/marketdata/v1/instruments/{cusip_id}')
+        return self._cached_request('instrument_cusip', "GET", f'/marketdata/v1/instruments/{cusip_id}')
 
 class ClientAsync(ClientBase):
 
-    def __init__(self, app_key:str, app_secret:str, callback_url:str="https://127.0.0.1", tokens_db: str="~/.schwabdev/tokens.db", encryption:str=None, timeout:int=10, call_on_auth:callable=None, parsed: bool = False,):
+    def __init__(self, app_key:str, app_secret:str, callback_url:str="https://127.0.0.1", tokens_db: str="~/.schwabdev/tokens.db", encryption:str=None, timeout:int=10, call_on_auth:callable=None, parsed: bool = False, scheduler: RequestScheduler | None = None, token_broker: str | None = None, cache: ResponseCache | None = None):
         if aiohttp is None:
             raise ImportError("aiohttp is required to use ClientAsync")
-        super().__init__(app_key, app_secret, callback_url, tokens_db, encryption, timeout, call_on_auth)
+        super().__init__(app_key, app_secret, callback_url, tokens_db, encryption, timeout, call_on_auth, scheduler, token_broker, cache)
+        self._init_session(parsed)
+
+    def _init_session(self, parsed: bool):
         self._parsed = parsed
+        self._auth_token = self.tokens.access_token
         self._session = aiohttp.ClientSession(base_url=self._base_api_url,
-                                              headers={'Authorization': f'Bearer {self.tokens.access_token}'}, 
+                                              headers={'Authorization': f'Bearer {self._auth_token}'}, 
                                               timeout=aiohttp.ClientTimeout(total=self.timeout))
         self._session_lock = threading.RLock()
+
+    @classmethod
+    def from_client(cls, client: ClientBase, parsed: bool = False) -> "ClientAsync":
+        """
+        Create an async client that shares the tokens and request scheduler of an existing client (no second token database handle or auth flow).
+        Must be called from within a running event loop (the aiohttp session binds to it).
+
+        Args:
+            client (ClientBase): client whose tokens to share
+            parsed (bool): default for the parsed argument of requests
+
+        Returns:
+            ClientAsync: async client using the same tokens
+        """
+        self = cls.__new__(cls)
+        self._init_shared(client.timeout, client.logger, client.scheduler, client.tokens, client.cache)
+        self._base_api_url = client._base_api_url                           # same API host as the client
+        self._init_session(parsed)
+        return self
         
     def update_tokens(self, force_access_token:bool=False, force_refresh_token:bool=False) -> bool:
         """
         Update tokens if needed.
 
         Returns:
-            bool: True if tokens were updated, False otherwise.
+            bool: True if tokens were updated (here or in the background), False otherwise.
         """
-        if self.tokens.update_tokens(force_access_token, force_refresh_token):
+        updated = self.tokens.update_tokens(force_access_token, force_refresh_token)
+        token = self.tokens.access_token
+        if token is not self._auth_token:
             with self._session_lock:
-                self._session = self._session.headers['Authorization'] = f'Bearer {self.tokens.access_token}'
+                self._session.headers['Authorization'] = f'Bearer {token}'
+                self._auth_token = token
             return True
-        else:
-            return False
+        return updated
 
     async def _checker(self):
         while True:
@@ -618,6 +733,10 @@ class ClientAsync(ClientBase):
         retval = await self._task_group.__aexit__(exc_type, exc_val, exc_tb)
         return retval
     
+    async def _request(self, method: str, path: str, priority: Priority | None = None, **kwargs) -> aiohttp.ClientResponse:
+        return await self.scheduler.call_async(lambda: self._session.request(method, path, **kwargs),
+                                               priority_for(method, path) if priority is None else priority)
+
     async def _parse_response(self, response: aiohttp.ClientResponse, parsed: bool | None = None) -> aiohttp.ClientResponse | dict:
         if (parsed is None and self._parsed) or (parsed is True):
             content_type = response.headers.get("Content-Type", "").lower()
@@ -627,6 +746,22 @@ class ClientAsync(ClientBase):
                 return await response.text()
         else:
             return response
+
+    async def _cached_request(self, endpoint: str, parsed: bool | None, method: str, path: str, **kwargs):
+        # only parsed calls are cached: a ClientResponse cannot be read twice, the body is stored and decoded per hit
+        key = None
+        if self.cache is not None and ((parsed is None and self._parsed) or parsed is True):
+            key = self.cache.key(endpoint, path, kwargs.get('params'), parsed=True)
+        if key is None:
+            return await self._parse_response(await self._request(method, path, **kwargs), parsed)
+        body = self.cache.get(key)
+        if body is None:
+            response = await self._request(method, path, **kwargs)
+            body = (response.headers.get("Content-Type", "").lower().startswith("application/json"), await response.text())
+            if response.status == 200:
+                self.cache.put(key, body)
+        is_json, text = body
+        return json.loads(text) if is_json else text
             
     def _handle_aiohttp_bool(self, value: bool) -> str:
         if value is None: return None
@@ -644,10 +779,7 @@ class ClientAsync(ClientBase):
         Return:
             aiohttp.ClientResponse: All linked account numbers and hashes
         """
-        return await self._parse_response(
-            await self._session.get('/trader/v1/accounts/accountNumbers'),
-            parsed,
-        )
+        return await self._cached_request('linked_accounts', parsed, 'GET', '/trader/v1/accounts/accountNumbers')
 
     async def account_details_all(self, fields: str = None, parsed: bool | None = None) -> aiohttp.ClientResponse:
         """
@@ -660,8 +792,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: details for all linked accounts
         """
         return await self._parse_response(
-            await self._session.get(
-                '/trader/v1/accounts/',
+            await self._request(
+                'GET', '/trader/v1/accounts/',
                 params=self._parse_params({'fields': fields}),
             ),
             parsed,
@@ -679,8 +811,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: details for one linked account
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/trader/v1/accounts/{accountHash}',
+            await self._request(
+                'GET', f'/trader/v1/accounts/{accountHash}',
                 params=self._parse_params({'fields': fields}),
             ),
             parsed,
@@ -704,8 +836,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: orders for one linked account
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/trader/v1/accounts/{accountHash}/orders',
+            await self._request(
+                'GET', f'/trader/v1/accounts/{accountHash}/orders',
                 headers={"Accept": "application/json"},
                 params=self._parse_params(
                     {
@@ -731,8 +863,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: order number in response header (if immediately filled then order number not returned)
         """
         return await self._parse_response(
-            await self._session.post(
-                f'/trader/v1/accounts/{accountHash}/orders',
+            await self._request(
+                'POST', f'/trader/v1/accounts/{accountHash}/orders',
                 headers={"Accept": "application/json", "Content-Type": "application/json"},
                 json=order,
             ),
@@ -751,8 +883,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: order details
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
+            await self._request(
+                'GET', f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
             ),
             parsed,
         )
@@ -770,8 +902,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: response code
         """
         return await self._parse_response(
-            await self._session.delete(
-                f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
+            await self._request(
+                'DELETE', f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
             ),
             parsed,
         )
@@ -788,8 +920,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: response code
         """
         return await self._parse_response(
-            await self._session.put(
-                f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
+            await self._request(
+                'PUT', f'/trader/v1/accounts/{accountHash}/orders/{orderId}',
                 headers={"Accept": "application/json", "Content-Type": "application/json"},
                 json=order,
             ),
@@ -812,8 +944,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: all orders
         """
         return await self._parse_response(
-            await self._session.get(
-                '/trader/v1/orders',
+            await self._request(
+                'GET', '/trader/v1/orders',
                 headers={"Accept": "application/json"},
                 params=self._parse_params(
                     {
@@ -830,8 +962,8 @@ class ClientAsync(ClientBase):
 
     async def preview_order(self, accountHash: str, order: dict, parsed: bool | None = None) -> aiohttp.ClientResponse:
         return await self._parse_response(
-            await self._session.post(
-                f'/trader/v1/accounts/{accountHash}/previewOrder',
+            await self._request(
+                'POST', f'/trader/v1/accounts/{accountHash}/previewOrder',
                 headers={'Content-Type': 'application/json'},
                 json=order,
             ),            
@@ -856,8 +988,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: list of transactions for a specific account
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/trader/v1/accounts/{accountHash}/transactions',
+            await self._request(
+                'GET', f'/trader/v1/accounts/{accountHash}/transactions',
                 params=self._parse_params(
                     {
                         'startDate': self._time_convert(startDate, TimeFormat.ISO_8601),
@@ -882,8 +1014,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: transaction details of transaction id using accountHash
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/trader/v1/accounts/{accountHash}/transactions/{transactionId}',
+            await self._request(
+                'GET', f'/trader/v1/accounts/{accountHash}/transactions/{transactionId}',
             ),
             parsed,
         )
@@ -895,10 +1027,7 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: User preferences and streaming info
         """
-        return await self._parse_response(
-            await self._session.get('/trader/v1/userPreference'),
-            parsed,
-        )
+        return await self._cached_request('preferences', parsed, 'GET', '/trader/v1/userPreference')
 
 
     """
@@ -918,8 +1047,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: list of quotes
         """
         return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/quotes',
+            await self._request(
+                'GET', '/marketdata/v1/quotes',
                 params=self._parse_params(
                     {
                         'symbols': self._format_list(symbols),
@@ -943,8 +1072,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: quote for a single symbol
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/marketdata/v1/{urllib.parse.quote(symbol_id, safe="")}/quotes',
+            await self._request(
+                'GET', f'/marketdata/v1/{urllib.parse.quote(symbol_id, safe="")}/quotes',
                 params=self._parse_params({'fields': fields}),
             ),
             parsed,
@@ -987,8 +1116,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: option chain
         """
         return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/chains',
+            await self._request(
+                'GET', '/marketdata/v1/chains',
                 params=self._parse_params(
                     {
                         'symbol': symbol,
@@ -1025,12 +1154,10 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: Option expiration chain
         """
-        return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/expirationchain',
-                params=self._parse_params({'symbol': symbol}),
-            ),
-            parsed,
+        return await self._cached_request(
+            'option_expiration_chain', parsed,
+            'GET', '/marketdata/v1/expirationchain',
+            params=self._parse_params({'symbol': symbol}),
         )
         
     async def price_history(self, symbol: str, periodType: str | None = None, period: str | None = None, frequencyType: str | None = None, 
@@ -1054,8 +1181,8 @@ class ClientAsync(ClientBase):
                 aiohttp.ClientResponse: Dictionary containing candle history
             """
             return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/pricehistory',
+            await self._request(
+                'GET', '/marketdata/v1/pricehistory',
                 params=self._parse_params(
                     {
                         'symbol': symbol,
@@ -1073,6 +1200,59 @@ class ClientAsync(ClientBase):
             parsed,
         )
 
+    async def price_history_many(self, requests: dict | list, max_concurrency: int = 8, retries: int = 3, backoff: float = 1.0):
+        """
+        Fetch many price histories concurrently, yielding each result as soon as it completes.
+
+        Args:
+            requests (dict | list): {key: price_history kwargs (including "symbol")}, or a list of symbols
+            max_concurrency (int): maximum number of requests in flight
+            retries (int): retries for 5xx and connection errors (rate limiting and 429s are handled by self.scheduler)
+            backoff (float): base delay in seconds for exponential backoff (Retry-After is honored when sent)
+
+        Yields:
+            tuple: (key, dict) with the decoded candle response, or (key, Exception) if the request failed
+
+        Example:
+            async for symbol, data in client.price_history_many(["AAPL", "MSFT"]):
+                ...
+        """
+        if not isinstance(requests, dict):
+            requests = {symbol: {'symbol': symbol} for symbol in requests}
+        self.update_tokens()
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch(key, kwargs):
+            for attempt in range(retries + 1):
+                retry_after = None
+                async with semaphore:
+                    try:
+                        response = await self.price_history(**kwargs, parsed=False)
+                        if response.status == 200:
+                            return key, await response.json()
+                        retry_after = response.headers.get('Retry-After')
+                        error = aiohttp.ClientResponseError(response.request_info, response.history, status=response.status,
+                                                            message=await response.text(), headers=response.headers)
+                        retryable = response.status >= 500
+                    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                        error, retryable = e, True
+                if not retryable or attempt == retries:
+                    return key, error
+                try:
+                    delay = float(retry_after)
+                except (TypeError, ValueError):
+                    delay = backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+                self.logger.warning(f"price_history {kwargs.get('symbol')} failed ({error}), retry {attempt + 1}/{retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+        tasks = [asyncio.create_task(fetch(key, kwargs)) for key, kwargs in requests.items()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
     async def movers(self, symbol: str, sort: str = None, frequency: int | None = None, parsed: bool | None = None) -> aiohttp.ClientResponse:
         """
         Get movers in a specific index and direction
@@ -1089,8 +1269,8 @@ class ClientAsync(ClientBase):
             aiohttp.ClientResponse: Movers
         """
         return await self._parse_response(
-            await self._session.get(
-                f'/marketdata/v1/movers/{symbol}',
+            await self._request(
+                'GET', f'/marketdata/v1/movers/{symbol}',
                 headers={"accept": "application/json"},
                 params=self._parse_params({'sort': sort, 'frequency': frequency}),
             ),
@@ -1108,17 +1288,15 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: Market hours
         """
-        return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/markets',
-                params=self._parse_params(
-                    {
-                        'markets': symbols,
-                        'date': self._time_convert(date, TimeFormat.YYYY_MM_DD),
-                    }
-                ),
+        return await self._cached_request(
+            'market_hours', parsed,
+            'GET', '/marketdata/v1/markets',
+            params=self._parse_params(
+                {
+                    'markets': symbols,
+                    'date': self._time_convert(date, TimeFormat.YYYY_MM_DD),
+                }
             ),
-            parsed,
         )
 
     async def market_hour(self, market_id: str, date: datetime.datetime | str = None, parsed: bool | None = None) -> aiohttp.ClientResponse:
@@ -1132,12 +1310,10 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: Market hours
         """
-        return await self._parse_response(
-            await self._session.get(
-                f'/marketdata/v1/markets/{market_id}',
-                params=self._parse_params({'date': self._time_convert(date, TimeFormat.YYYY_MM_DD)}),
-            ),
-            parsed,
+        return await self._cached_request(
+            'market_hour', parsed,
+            'GET', f'/marketdata/v1/markets/{market_id}',
+            params=self._parse_params({'date': self._time_convert(date, TimeFormat.YYYY_MM_DD)}),
         )
 
     async def instruments(self, symbol: str, projection: str, parsed: bool | None = None) -> aiohttp.ClientResponse:
@@ -1151,12 +1327,10 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: Instruments
         """
-        return await self._parse_response(
-            await self._session.get(
-                '/marketdata/v1/instruments',
-                params={'symbol': symbol, 'projection': projection},
-            ),
-            parsed,
+        return await self._cached_request(
+            'instruments', parsed,
+            'GET', '/marketdata/v1/instruments',
+            params={'symbol': symbol, 'projection': projection},
         )
 
     async def instrument_cusip(self, cusip_id: str | int, parsed: bool | None = None) -> aiohttp.ClientResponse:
@@ -1169,9 +1343,7 @@ class ClientAsync(ClientBase):
         Returns:
             aiohttp.ClientResponse: Instrument
         """
-        return await self._parse_response(
-            await self._session.get(
-                f'/marketdata/v1/instruments/{cusip_id}',
-            ),
-            parsed,
+        return await self._cached_request(
+            'instrument_cusip', parsed,
+            'GET', f'/marketdata/v1/instruments/{cusip_id}',
         )
@@ -0,0 +1,136 @@
+"""
+Schwabdev Quote Coalescer Module.
+Batches single-symbol quote requests into shared Client.quotes calls.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import logging
+import threading
+import urllib.parse
+from concurrent.futures import Future
+
+
+class QuoteCoalescer:
+
+    def __init__(self, client, window: float = 0.01, max_symbols: int = 500, max_url_length: int = 6000, logger: logging.Logger | None = None):
+        """
+        Collects quote requests that arrive within a short window and sends them as one quotes call.
+        Thread-safe, results are fanned back out to each caller (symbols missing from the response resolve to {}).
+
+        Args:
+            client (Client): client used for the quotes calls
+            window (float): seconds to wait for more requests after the first one (5-20ms works well)
+            max_symbols (int): most symbols per quotes call
+            max_url_length (int): longest encoded symbols parameter per quotes call
+            logger (logging.Logger | None): logger to use (defaults to the client's logger)
+        """
+        self.client = client
+        self.window = window
+        self.max_symbols = max_symbols
+        self.max_url_length = max_url_length
+        self.logger = logger or getattr(client, 'logger', None) or logging.getLogger("Schwabdev")
+        self._lock = threading.Lock()
+        self._pending = {}                      # (fields, indicative) -> {symbol: [Future]}
+        self._timer = None
+        self.requests_sent = 0                  # quotes calls made
+        self.symbols_requested = 0              # single-symbol requests served
+
+    def submit(self, symbol: str, fields: str | None = None, indicative: bool = False) -> Future:
+        """
+        Queue a quote request.
+
+        Args:
+            symbol (str): ticker symbol
+            fields (str | None): fields to get ("all", "quote", "fundamental", ...)
+            indicative (bool): whether to get indicative quotes
+
+        Returns:
+            concurrent.futures.Future: resolves to the quote dict for the symbol
+        """
+        future = Future()
+        with self._lock:
+            self._pending.setdefault((fields, indicative), {}).setdefault(symbol, []).append(future)
+            self.symbols_requested += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def quote(self, symbol: str, fields: str | None = None, indicative: bool = False, timeout: float | None = None) -> dict:
+        """
+        Get the quote for one symbol (batched with any other requests in the same window).
+
+        Args:
+            symbol (str): ticker symbol
+            fields (str | None): fields to get
+            indicative (bool): whether to get indicative quotes
+            timeout (float | None): seconds to wait for the result
+
+        Returns:
+            dict: quote data for the symbol ({} if the symbol was not returned)
+        """
+        return self.submit(symbol, fields, indicative).result(timeout)
+
+    def quotes(self, symbols: list[str], fields: str | None = None, indicative: bool = False, timeout: float | None = None) -> dict:
+        """
+        Get quotes for many symbols, split into as few quotes calls as the limits allow.
+
+        Args:
+            symbols (list[str]): ticker symbols
+            fields (str | None): fields to get
+            indicative (bool): whether to get indicative quotes
+            timeout (float | None): seconds to wait for each result
+
+        Returns:
+            dict: {symbol: quote data} for the symbols that were returned (failed batches are logged and left out)
+        """
+        futures = {symbol: self.submit(symbol, fields, indicative) for symbol in dict.fromkeys(symbols)}
+        self.flush()
+        results = {}
+        for symbol, future in futures.items():
+            if future.exception(timeout) is None and future.result():
+                results[symbol] = future.result()
+        return results
+
+    def flush(self):
+        """
+        Send everything queued now (called by the window timer).
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        for (fields, indicative), waiters in pending.items():
+            for batch in self._batches(list(waiters)):
+                self._send(batch, {symbol: waiters[symbol] for symbol in batch}, fields, indicative)
+
+    def _batches(self, symbols: list[str]):
+        batch, length = [], 0
+        for symbol in symbols:
+            size = len(urllib.parse.quote(symbol, safe='')) + 3     # "%2C" separator
+            if batch and (len(batch) >= self.max_symbols or length + size > self.max_url_length):
+                yield batch
+                batch, length = [], 0
+            batch.append(symbol)
+            length += size
+        if batch:
+            yield batch
+
+    def _send(self, batch: list[str], waiters: dict, fields: str | None, indicative: bool):
+        with self._lock:
+            self.requests_sent += 1
+        try:
+            response = self.client.quotes(batch, fields=fields, indicative=indicative)
+            if response.status_code != 200:
+                raise ValueError(f"API returned status {response.status_code}: {response.text}")
+            data = response.json()
+        except Exception as e:
+            self.logger.error(f"Quotes request for {len(batch)} symbols failed: {e}")
+            for futures in waiters.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+        for symbol, futures in waiters.items():
+            for future in futures:
+                future.set_result(data.get(symbol, {}))
@@ -0,0 +1,247 @@
+"""
+Schwabdev Stream Dispatcher Module.
+Bounded queue and worker threads between the websocket receive loop and the receiver function.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import collections
+import json
+import logging
+import threading
+import time
+
+
+def message_key(message: str):
+    """
+    Default coalescing key: the services and keys a data message updates (None for other messages, never coalesced).
+
+    Args:
+        message (str | StreamMessage): raw stream message (or one already decoded by a StreamPool shard)
+
+    Returns:
+        tuple | None: ((service, (key, ...)), ...) or None
+    """
+    if hasattr(message, "data") and not isinstance(message, (str, bytes)):
+        if not message.data:
+            return None
+        grouped = {}
+        for record in message.data:
+            grouped.setdefault(record.service, []).append(record.key)
+        return tuple((service, tuple(keys)) for service, keys in grouped.items())
+    try:
+        data = json.loads(message).get("data")
+    except (ValueError, AttributeError):
+        return None
+    if not data:
+        return None
+    return tuple((service.get("service"), tuple(content.get("key") for content in service.get("content", []))) for service in data)
+
+
+class StreamDispatcher:
+
+    OVERFLOW_POLICIES = ("drop_oldest", "coalesce", "block")
+
+    def __init__(self, maxsize: int = 10000, workers: int = 1, overflow: str = "drop_oldest", key: callable = message_key,
+                 logger: logging.Logger | None = None):
+        """
+        Queue between the stream's websocket reads and the receiver so a slow receiver cannot stall reads (and trip the ping timeout).
+        Pass to Stream.start(..., dispatcher=StreamDispatcher()) or StreamAsync.start(...).
+
+        Args:
+            maxsize (int): most messages held before the overflow policy applies
+            workers (int): threads calling the receiver (messages are only delivered in order with 1 worker)
+            overflow (str): "drop_oldest" discards the oldest queued message,
+                            "coalesce" replaces a queued message with the same key (in place, also before the queue is full) and otherwise drops the oldest,
+                            "block" makes the reader wait for space (back-pressures the socket)
+            key (callable): message -> hashable key (or None to never coalesce) used by "coalesce".
+                            The default keys on service and symbols; LEVELONE messages only carry changed fields,
+                            so coalescing them drops older changes unless the receiver reads full state elsewhere.
+            logger (logging.Logger | None): logger to use (defaults to the "Schwabdev" logger)
+        """
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}")
+        if maxsize < 1 or workers < 1:
+            raise ValueError("maxsize and workers must be at least 1.")
+        self.maxsize = maxsize
+        self.workers = workers
+        self.overflow = overflow
+        self.key = key
+        self.logger = logger or logging.getLogger("Schwabdev")
+
+        self._queue = collections.deque()                  # entries: [key, message, enqueued_at, arrived]
+        self._latest = {}                                  # coalesce key -> queued entry
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._threads = []
+        self._running = False
+        self._receiver = None
+        self._is_async_receiver = False
+        self._kwargs = {}
+        self._loop = None
+
+        self.received = 0                                  # messages put
+        self.dispatched = 0                                # messages handed to the receiver
+        self.dropped = 0                                   # messages discarded by drop_oldest / coalesce overflow
+        self.coalesced = 0                                 # messages replaced by a newer one with the same key
+        self.blocked = 0                                   # puts that had to wait for space
+        self.errors = 0                                    # receiver exceptions
+        self.high_water = 0                                # largest queue depth seen
+        self.max_lag = 0.0                                 # longest enqueue -> dispatch time seen
+        self._last_lag = 0.0
+
+    """
+    Lifecycle
+    """
+
+    def start(self, receiver: callable, loop: asyncio.AbstractEventLoop | None = None, **kwargs):
+        """
+        Start the worker threads (called by the stream).
+
+        Args:
+            receiver (callable): function called with each message (coroutine functions are run on loop)
+            loop (asyncio.AbstractEventLoop | None): stream event loop for coroutine receivers
+            **kwargs: keyword arguments passed to the receiver
+        """
+        with self._lock:
+            self._receiver = receiver
+            self._is_async_receiver = asyncio.iscoroutinefunction(receiver)
+            self._kwargs = kwargs
+            self._loop = loop
+            if self._running:
+                return
+            self._running = True
+        self._threads = [threading.Thread(target=self._worker, name=f"StreamDispatcher-{i}", daemon=True) for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, drain_timeout: float = 5.0):
+        """
+        Stop the workers after the queue is drained (or drain_timeout seconds pass).
+
+        Args:
+            drain_timeout (float): seconds to wait for queued messages to be dispatched
+        """
+        deadline = time.monotonic() + drain_timeout
+        with self._lock:
+            while self._queue and self._running and time.monotonic() < deadline:
+                self._not_full.wait(max(0.0, deadline - time.monotonic()))
+            self._running = False
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=max(0.1, deadline - time.monotonic()))
+        self._threads = []
+
+    """
+    Producer side (websocket reader)
+    """
+
+    def put(self, message: str, arrived: tuple | None = None):
+        """
+        Queue a message, applying the overflow policy when full (blocks only with overflow="block").
+
+        Args:
+            message (str): raw stream message
+            arrived (tuple | None): StreamLatency.stamp() taken in the receive loop, passed to the receiver after the message
+        """
+        key = self.key(message) if self.overflow == "coalesce" and self.key is not None else None
+        with self._lock:
+            self.received += 1
+            if key is not None and key in self._latest:
+                entry = self._latest[key]
+                entry[1], entry[3] = message, arrived      # keep its place (and age) in the queue
+                self.coalesced += 1
+                return
+            if len(self._queue) >= self.maxsize:
+                if self.overflow == "block":
+                    self.blocked += 1
+                    while len(self._queue) >= self.maxsize and self._running:
+                        self._not_full.wait()
+                else:
+                    oldest = self._queue.popleft()
+                    if oldest[0] is not None and self._latest.get(oldest[0]) is oldest:
+                        del self._latest[oldest[0]]
+                    self.dropped += 1
+            entry = [key, message, time.monotonic(), arrived]
+            self._queue.append(entry)
+            if key is not None:
+                self._latest[key] = entry
+            self.high_water = max(self.high_water, len(self._queue))
+            self._not_empty.notify()
+
+    async def put_async(self, message: str, arrived: tuple | None = None):
+        """
+        Queue a message from the event loop, waiting for space in a thread (not on the loop) when overflow="block".
+
+        Args:
+            message (str): raw stream message
+            arrived (tuple | None): StreamLatency.stamp() taken in the receive loop
+        """
+        if self.overflow == "block" and len(self._queue) >= self.maxsize:
+            await asyncio.to_thread(self.put, message, arrived)
+        else:
+            self.put(message, arrived)
+
+    """
+    Consumer side (workers)
+    """
+
+    def _get(self):
+        with self._lock:
+            while not self._queue:
+                if not self._running:
+                    return None
+                self._not_empty.wait()
+            entry = self._queue.popleft()
+            key, message, enqueued_at, arrived = entry
+            if key is not None and self._latest.get(key) is entry:
+                del self._latest[key]
+            lag = time.monotonic() - enqueued_at
+            self._last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.dispatched += 1
+            self._not_full.notify()
+            return (message,) if arrived is None else (message, arrived)
+
+    def _worker(self):
+        while True:
+            args = self._get()
+            if args is None:
+                return
+            try:
+                if self._is_async_receiver:
+                    asyncio.run_coroutine_threadsafe(self._receiver(*args, **self._kwargs), self._loop).result()
+                else:
+                    self._receiver(*args, **self._kwargs)
+            except Exception as e:
+                self.errors += 1
+                self.logger.error(f"Stream receiver error: {e}")
+
+    """
+    Metrics
+    """
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the queue metrics.
+
+        Returns:
+            dict: depth, high_water, lag (seconds the oldest queued message has waited), last_lag and max_lag
+                  (enqueue -> dispatch seconds), and received/dispatched/dropped/coalesced/blocked/errors counters
+        """
+        with self._lock:
+            return {
+                'depth': len(self._queue),
+                'high_water': self.high_water,
+                'lag': time.monotonic() - self._queue[0][2] if self._queue else 0.0,
+                'last_lag': self._last_lag,
+                'max_lag': self.max_lag,
+                'received': self.received,
+                'dispatched': self.dispatched,
+                'dropped': self.dropped,
+                'coalesced': self.coalesced,
+                'blocked': self.blocked,
+                'errors': self.errors,
+            }
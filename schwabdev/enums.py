@@ -1,7 +1,7 @@
 
 from __future__ import annotations
 
-from enum import Enum
+from enum import Enum, IntEnum
 
 
 class TimeFormat(Enum):
@@ -9,3 +9,11 @@ class TimeFormat(Enum):
     EPOCH = "epoch"
     EPOCH_MS = "epoch_ms"
     YYYY_MM_DD = "YYYY-MM-DD"
+
+
+class Priority(IntEnum):
+    """Request scheduler lanes, lower values are served first."""
+    ORDER = 0
+    ACCOUNT = 1
+    MARKET_DATA = 2
+    BULK = 3
@@ -0,0 +1,269 @@
+"""
+Schwabdev Stream Latency Module.
+Histograms of stream message latency, decode time and receiver time.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import json
+import threading
+import time
+
+from .records import loads, parse_message
+from .translate import stream_fields
+
+# stream field holding the quote time (epoch ms) for each service that has one
+QUOTE_TIME_FIELDS = {service: str(field) for service, names in stream_fields.items()
+                     for field, name in enumerate(names) if name.strip() in ("Quote Time", "Quote Time in Long")}
+
+
+class LatencyHistogram:
+
+    SUB_BUCKET_BITS = 5                                 # 32 buckets per power of two, values within ~3%
+    MAX_VALUE = 1 << 40                                 # larger values are counted in the last bucket
+
+    def __init__(self):
+        """
+        Log-linear (HDR-style) histogram of non-negative integer values (microseconds). Recording is an index
+        computation and a list increment; percentiles are read from the bucket counts.
+        """
+        self.counts = [0] * (self._index(self.MAX_VALUE) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+        self.negative = 0                               # values below 0 (e.g. clock skew) recorded as 0
+
+    @classmethod
+    def _index(cls, value: int) -> int:
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if value < sub_buckets << 1:
+            return value
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        return (shift + 1) * sub_buckets + (value >> shift) - sub_buckets
+
+    @classmethod
+    def _value(cls, index: int) -> int:
+        """Middle of the range of values counted in a bucket"""
+        sub_buckets = 1 << cls.SUB_BUCKET_BITS
+        if index < sub_buckets << 1:
+            return index
+        shift = index // sub_buckets - 1
+        low = (index % sub_buckets + sub_buckets) << shift
+        return low + ((1 << shift) >> 1)
+
+    def record(self, value: int):
+        """
+        Record one value
+
+        Args:
+            value (int): value in microseconds
+        """
+        if value < 64:                                  # 2 * 32 sub buckets, exact
+            if value < 0:
+                self.negative += 1
+                value = 0
+            index = value
+        else:
+            if value > self.MAX_VALUE:
+                value = self.MAX_VALUE
+            shift = value.bit_length() - 6              # SUB_BUCKET_BITS + 1
+            index = ((shift + 1) << 5) + (value >> shift) - 32
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+        if self.max is None:
+            self.min = self.max = value
+        elif value > self.max:
+            self.max = value
+        elif value < self.min:
+            self.min = value
+
+    def percentile(self, q: float) -> int | None:
+        """
+        Value at a percentile
+
+        Args:
+            q (float): percentile (0-100)
+
+        Returns:
+            int | None: value (within the bucket precision), None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        target = max(1, -(-self.count * q // 100))   # rank of the value, rounded up
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(max(self._value(index), self.min), self.max)
+        return self.max
+
+    def merge(self, other: "LatencyHistogram"):
+        """Add the counts of another histogram"""
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.negative += other.negative
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def to_dict(self) -> dict:
+        """
+        Summary of the histogram.
+
+        Returns:
+            dict: count, min, mean, p50, p90, p99, p999, max (microseconds) and negative
+        """
+        return {
+            'count': self.count,
+            'min': self.min,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+            'p999': self.percentile(99.9),
+            'max': self.max,
+            'negative': self.negative,
+        }
+
+
+class StreamLatency:
+
+    def __init__(self, decoded: bool = False):
+        """
+        Latency collected from a stream: pass to Stream.start(..., latency=StreamLatency()) or StreamAsync.start(...).
+        Per service it records message latency (arrival in the stream's receive loop minus the message timestamp) and
+        quote latency (arrival minus the quote time field, for level one services); for every message it records queue
+        time (receive loop to receiver, e.g. waiting in a StreamDispatcher), decode time and receiver time. All values
+        are in microseconds; message timestamps and quote times have millisecond resolution and depend on the local
+        clock being in sync.
+
+        Each message is decoded to read its timestamps. With Stream.start(parsed=True) that decode is the one the
+        receiver needs anyway; with parsed=False a receiver that decodes the raw message again doubles the decode
+        cost, so prefer parsed=True, or decoded=True to receive the decoded dict.
+
+        Args:
+            decoded (bool, optional): with parsed=False, call the receiver with the decoded message (dict) instead of
+                                      the raw string. Defaults to False.
+        """
+        self.decoded = decoded
+        self.message = {}                               # service -> LatencyHistogram
+        self.quote = {}                                 # service -> LatencyHistogram
+        self.queue = LatencyHistogram()
+        self.decode = LatencyHistogram()
+        self.receiver = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def stamp() -> tuple:
+        """
+        Arrival stamp of a message, taken by the stream's receive loop right after the websocket read
+
+        Returns:
+            tuple: (time.time_ns(), time.perf_counter_ns())
+        """
+        return time.time_ns(), time.perf_counter_ns()
+
+    def wrap(self, receiver: callable, parsed: bool = False) -> callable:
+        """
+        Wrap a receiver so each message is measured (called by the stream).
+        Messages are decoded to read their timestamps; with parsed=False the receiver still gets the raw message
+        unless this StreamLatency was made with decoded=True.
+
+        Args:
+            receiver (callable): function (or coroutine function) called with each message
+            parsed (bool): call the receiver with a StreamMessage
+
+        Returns:
+            callable: receiver taking a raw message and optionally its stamp() from the receive loop as the second
+                      positional argument (stamped on the call if omitted); a coroutine function if receiver is one
+        """
+        pass_decoded = parsed or self.decoded
+        if asyncio.iscoroutinefunction(receiver):
+            async def wrapper(message, arrived=None, /, **kwargs):
+                arrived, decoded, start, parse_end = self._decode(message, parsed, arrived)
+                await receiver(decoded if pass_decoded else message, **kwargs)
+                self._record(arrived, decoded, parsed, start, parse_end, time.perf_counter_ns())
+        else:
+            def wrapper(message, arrived=None, /, **kwargs):
+                arrived, decoded, start, parse_end = self._decode(message, parsed, arrived)
+                receiver(decoded if pass_decoded else message, **kwargs)
+                self._record(arrived, decoded, parsed, start, parse_end, time.perf_counter_ns())
+        return wrapper
+
+    @staticmethod
+    def _decode(message, parsed: bool, arrived: tuple | None):
+        start = time.perf_counter_ns()
+        if arrived is None:
+            arrived = (time.time_ns(), start)
+        decoded = parse_message(message) if parsed else loads(message)
+        return arrived, decoded, start, time.perf_counter_ns()
+
+    def _record(self, arrived: tuple, decoded, parsed: bool, start: int, parse_end: int, receiver_end: int):
+        arrived_us = arrived[0] // 1000
+        if parsed:
+            items = {}
+            for record in decoded.data:
+                items.setdefault((record.service, record.timestamp), []).append(record.content)
+            items = [(service, timestamp, contents) for (service, timestamp), contents in items.items()]
+        else:
+            items = [(item.get('service'), item.get('timestamp'), item.get('content', ())) for item in decoded.get('data', ())]
+        with self._lock:
+            self.queue.record((start - arrived[1]) // 1000)
+            self.decode.record((parse_end - start) // 1000)
+            self.receiver.record((receiver_end - parse_end) // 1000)
+            for service, timestamp, contents in items:
+                if timestamp is not None:
+                    histogram = self.message.get(service) or self.message.setdefault(service, LatencyHistogram())
+                    histogram.record(arrived_us - int(timestamp) * 1000)
+                field = QUOTE_TIME_FIELDS.get(service)
+                if field is not None:
+                    histogram = None
+                    for content in contents:
+                        quote_time = content.get(field)
+                        if quote_time:
+                            histogram = histogram or self.quote.get(service) or self.quote.setdefault(service, LatencyHistogram())
+                            histogram.record(arrived_us - int(quote_time) * 1000)
+
+    """
+    Queries
+    """
+
+    def snapshot(self) -> dict:
+        """
+        Summaries of every histogram.
+
+        Returns:
+            dict: {'services': {service: {'message': {...}, 'quote': {...}}}, 'queue': {...}, 'decode': {...}, 'receiver': {...}}
+                  with each summary as in LatencyHistogram.to_dict() (microseconds)
+        """
+        with self._lock:
+            services = {}
+            for service, histogram in self.message.items():
+                services.setdefault(service, {})['message'] = histogram.to_dict()
+            for service, histogram in self.quote.items():
+                services.setdefault(service, {})['quote'] = histogram.to_dict()
+            return {'services': services, 'queue': self.queue.to_dict(), 'decode': self.decode.to_dict(),
+                    'receiver': self.receiver.to_dict()}
+
+    def to_json(self, **kwargs) -> str:
+        """
+        Snapshot as JSON.
+
+        Args:
+            **kwargs: keyword arguments to pass to json.dumps (e.g. indent=2)
+
+        Returns:
+            str: JSON of snapshot()
+        """
+        return json.dumps(self.snapshot(), **kwargs)
+
+    def reset(self):
+        """Clear every histogram (e.g. at the open)"""
+        with self._lock:
+            self.message = {}
+            self.quote = {}
+            self.queue = LatencyHistogram()
+            self.decode = LatencyHistogram()
+            self.receiver = LatencyHistogram()
@@ -0,0 +1,267 @@
+"""
+Schwabdev Stream Pool Module.
+Shards subscriptions across several stream sessions and merges their output into one receiver.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import threading
+import time
+
+from .dispatcher import StreamDispatcher
+from .records import parsed_receiver
+from .stream import Stream, StreamBase
+
+
+class StreamPool(StreamBase):
+
+    def __init__(self, client, shards: int = 2, check_interval: float = 1.0):
+        """
+        Several Stream sessions sharing one subscription set. Each (service, key) is assigned to the least loaded
+        shard the first time it is subscribed and stays there until unsubscribed, so every session only carries
+        (and re-sends on reconnect) its share. Each shard runs its own thread and event loop and reconnects on its own;
+        their messages are merged into one queue and handed to the receiver by a single thread.
+
+        Args:
+            client (Client): Client object needed to get streamer info
+            shards (int): number of stream sessions (Schwab limits concurrent streamer sessions per account)
+            check_interval (float): seconds between checks that restart shards that stopped
+        """
+        if shards < 1:
+            raise ValueError("shards must be at least 1.")
+        super().__init__(client.tokens, client._get_streamer_info, client.logger)
+        self.shards = [Stream(client) for _ in range(shards)]
+        self.check_interval = check_interval
+
+        self._assigned = {}                             # service -> {key: shard index}
+        self._load = [0] * shards                       # keys assigned per shard
+        self._lock = threading.Lock()                   # guards assignments and shard subscriptions
+        self._running = False
+        self._supervisor = None
+        self._wake = threading.Event()
+        self._dispatcher = None                         # merge queue in front of the receiver
+        self._shard_receiver = None
+        self._receiver_loop = None                      # event loop for coroutine receivers
+        self._start_kwargs = {}
+
+        self._backoff = [1.0] * shards                  # seconds before the next restart of each shard
+        self._retry_at = [0.0] * shards
+        self.restarts = [0] * shards                    # restarts per shard (not counting the first start)
+        self._started = [False] * shards
+
+    """
+    Lifecycle
+    """
+
+    def start(self, receiver=print, daemon: bool = True, ping_interval: int = 20, dispatcher: StreamDispatcher | None = None,
+              parsed: bool = False, **kwargs):
+        """
+        Start the shards that have subscriptions (others start once they get one) and the merged receiver
+
+        Args:
+            receiver (function, optional): function (or coroutine function) to call with each message from any shard. Defaults to print.
+            daemon (bool, optional): whether to run the threads in the background (as daemons). Defaults to True.
+            ping_interval (int, optional): interval in seconds to send pings to the streamer. Defaults to 20.
+            dispatcher (StreamDispatcher | None, optional): merge queue in front of the receiver (must have 1 worker to keep order).
+                                                            Defaults to StreamDispatcher() (10000 messages, drop_oldest).
+            parsed (bool, optional): call the receiver with a schwabdev.StreamMessage; messages are decoded on their shard's thread
+                                     before the merge. Defaults to False.
+            **kwargs: keyword arguments to pass to receiver
+        """
+        if self._running:
+            self._logger.warning("Stream pool already active.")
+            return
+        self._dispatcher = dispatcher if dispatcher is not None else StreamDispatcher(logger=self._logger)
+        if self._dispatcher.workers != 1:
+            self._logger.warning("Stream pool dispatcher has more than 1 worker, messages may be delivered out of order.")
+
+        if asyncio.iscoroutinefunction(receiver):
+            self._receiver_loop = asyncio.new_event_loop()
+            threading.Thread(target=self._receiver_loop.run_forever, name="StreamPool-receiver", daemon=daemon).start()
+        self._dispatcher.start(receiver, self._receiver_loop, **kwargs)
+
+        async def merge(message):
+            await self._dispatcher.put_async(message)
+        self._shard_receiver = parsed_receiver(merge) if parsed else merge
+        self._start_kwargs = {"daemon": daemon, "ping_interval": ping_interval}
+
+        self._running = True
+        self._wake.clear()
+        self._supervisor = threading.Thread(target=self._supervise, name="StreamPool-supervisor", daemon=daemon)
+        self._supervisor.start()
+
+    def stop(self, clear_subscriptions: bool = True):
+        """
+        Stop every shard, then deliver what is still queued
+
+        Args:
+            clear_subscriptions (bool, optional): clear records and shard assignments. Defaults to True.
+        """
+        self._running = False
+        self._wake.set()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout=10)
+            self._supervisor = None
+        for shard in self.shards:
+            shard.stop(clear_subscriptions=clear_subscriptions)
+        if clear_subscriptions:
+            with self._lock:
+                self.subscriptions = {}
+                self._assigned = {}
+                self._load = [0] * len(self.shards)
+        if self._dispatcher is not None:
+            self._dispatcher.stop()
+        if self._receiver_loop is not None:
+            self._receiver_loop.call_soon_threadsafe(self._receiver_loop.stop)
+            self._receiver_loop = None
+        self._started = [False] * len(self.shards)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @property
+    def active(self):
+        return any(shard.active for shard in self.shards)
+
+    @active.setter
+    def active(self, value):
+        pass                                            # set by StreamBase.__init__, derived from the shards
+
+    def _supervise(self):
+        """Start shards that have subscriptions and restart the ones whose session ended, each with its own backoff"""
+        while self._running:
+            now = time.monotonic()
+            for i, shard in enumerate(self.shards):
+                if shard.active:
+                    self._backoff[i] = 1.0
+                    continue
+                running = shard._thread is not None and shard._thread.is_alive()
+                with self._lock:
+                    has_subscriptions = any(shard.subscriptions.values())
+                if running or not has_subscriptions or now < self._retry_at[i] or not self._running:
+                    continue
+                if self._started[i]:
+                    self.restarts[i] += 1
+                    self._logger.warning(f"Stream pool shard {i} stopped, restarting (attempt {self.restarts[i]}).")
+                    self._retry_at[i] = now + self._backoff[i]
+                    self._backoff[i] = min(self._backoff[i] * 2, 120)
+                self._started[i] = True
+                try:
+                    shard.start(self._shard_receiver, **self._start_kwargs)
+                except Exception as e:
+                    self._logger.error(f"Stream pool shard {i} failed to start: {e}")
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+
+    """
+    Requests
+    """
+
+    def send(self, requests: list | dict, record: bool = True):
+        """
+        Split requests by key onto the shards that carry them and send (or queue) each part
+
+        Args:
+            requests (list | dict): list of requests or a single request
+            record (bool, optional): record the subscriptions (re-sent by each shard on reconnect). Defaults to True.
+        """
+        if not isinstance(requests, list):
+            requests = [requests]
+        per_shard = {}
+        with self._lock:
+            for request in requests:
+                if record:
+                    self._record_request(request)
+                for i, part in self._route(request):
+                    per_shard.setdefault(i, []).append(part)
+                    if record:
+                        self.shards[i]._record_request(part)
+        for i, parts in per_shard.items():
+            self.shards[i].send(parts, record=False)
+        self._wake.set()                                # start shards that just got their first subscription
+
+    async def send_async(self, requests: list | dict):
+        """
+        Send a request to the pool from a coroutine
+
+        Args:
+            requests (list | dict): list of requests or a single request
+        """
+        await asyncio.to_thread(self.send, requests)
+
+    def _route(self, request: dict) -> list[tuple[int, dict]]:
+        """
+        Split one request into per-shard requests, updating the key assignments
+
+        Args:
+            request (dict): stream request
+
+        Returns:
+            list[tuple[int, dict]]: (shard index, request) pairs
+        """
+        service = request.get("service")
+        command = request.get("command")
+        parameters = request.get("parameters") or {}
+        if "keys" not in parameters:                    # e.g. ADMIN requests
+            return [(i, request) for i in range(len(self.shards))]
+        keys = [key for key in self._list_to_string(parameters["keys"]).split(",") if key]
+        assigned = self._assigned.setdefault(service, {})
+
+        def part(keys, command=command):
+            return dict(request, command=command, parameters=dict(parameters, keys=",".join(keys)))
+
+        if command == "VIEW":
+            return [(i, request) for i in sorted(set(assigned.values()))]
+
+        if command == "UNSUBS":
+            grouped = {}
+            for key in keys:
+                i = assigned.pop(key, None)
+                if i is not None:
+                    self._load[i] -= 1
+                    grouped.setdefault(i, []).append(key)
+            return [(i, part(shard_keys)) for i, shard_keys in grouped.items()]
+
+        previous = {}
+        if command == "SUBS":                           # replaces the service's keys: release the ones not kept
+            for key, i in assigned.items():
+                previous.setdefault(i, []).append(key)
+            wanted = set(keys)
+            for key in [key for key in assigned if key not in wanted]:
+                self._load[assigned.pop(key)] -= 1
+
+        grouped = {}
+        for key in keys:
+            i = assigned.get(key)
+            if i is None:
+                i = min(range(len(self.shards)), key=self._load.__getitem__)
+                assigned[key] = i
+                self._load[i] += 1
+            grouped.setdefault(i, []).append(key)
+
+        parts = [(i, part(shard_keys)) for i, shard_keys in grouped.items()]
+        for i, old_keys in previous.items():            # shards left without keys for this service
+            if i not in grouped:
+                parts.append((i, part(old_keys, "UNSUBS")))
+        return parts
+
+    """
+    Metrics
+    """
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the pool.
+
+        Returns:
+            dict: shards (per shard: active, keys, restarts) and merge (the merge queue's StreamDispatcher.stats())
+        """
+        with self._lock:
+            keys = [sum(len(subs) for subs in shard.subscriptions.values()) for shard in self.shards]
+        return {
+            'shards': [{'active': shard.active, 'keys': keys[i], 'restarts': self.restarts[i]} for i, shard in enumerate(self.shards)],
+            'merge': self._dispatcher.stats() if self._dispatcher is not None else None,
+        }
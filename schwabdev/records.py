@@ -0,0 +1,160 @@
+"""
+Schwabdev Stream Records Module.
+Decodes stream messages once into compact per-service record objects named by translate.stream_fields.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import json
+import re
+
+from .translate import stream_fields
+
+try:
+    import orjson
+except ImportError:  # optional, faster decoding
+    orjson = None
+
+loads = orjson.loads if orjson is not None else json.loads
+dumps = (lambda obj: orjson.dumps(obj).decode()) if orjson is not None else json.dumps
+
+# content keys sent alongside the numbered fields
+_EXTRA_FIELDS = {"delayed": "delayed", "assetMainType": "asset_main_type", "assetSubType": "asset_sub_type", "cusip": "cusip"}
+
+
+def _attribute_name(field_name: str) -> str:
+    """
+    "Bid Price" -> "bid_price", "isPennyPilot" -> "is_penny_pilot", "52 Week High" -> "week_high_52"
+    """
+    words = re.sub(r"([a-z])([A-Z])", r"\1_\2", field_name.strip()).lower()
+    words = [word for word in re.split(r"[^a-z0-9]+", words) if word]
+    while words and words[0].isdigit():  # identifiers cannot start with a digit
+        words.append(words.pop(0))
+    return "_".join(words)
+
+
+class _Field:
+    """
+    Record attribute reading one numbered field from the content item (None when it was not sent).
+    """
+    __slots__ = ("field",)
+
+    def __init__(self, field: str):
+        self.field = field
+
+    def __get__(self, record, owner=None):
+        if record is None:
+            return self
+        return record.content.get(self.field)
+
+
+class StreamRecord:
+    """
+    One content item of a stream data message, read through named fields. Fields not sent in the
+    message read as None (level one messages only carry the fields that changed).
+    """
+    __slots__ = ("key", "timestamp", "content")
+    service = None              # service name
+    fields = ()                 # attribute names this record type can carry
+    field_names = {}            # content key (field number) -> attribute name
+
+    def __init__(self, content: dict, timestamp: int | None = None):
+        """
+        Args:
+            content (dict): decoded content item, e.g. {"key": "AMD", "1": 160.1, "2": 160.2} (kept, not copied)
+            timestamp (int | None): message timestamp in milliseconds
+        """
+        self.key = content.get("key")
+        self.timestamp = timestamp
+        self.content = content
+
+    def to_dict(self) -> dict:
+        """
+        Returns:
+            dict: {attribute name: value} for the fields that were sent
+        """
+        names = self.field_names
+        result = {"key": self.key, "timestamp": self.timestamp}
+        result.update((names[field], value) for field, value in self.content.items() if field in names)
+        return result
+
+    def __repr__(self):
+        if not self.field_names:
+            return f"{type(self).__name__}(service={self.service!r}, key={self.key!r}, timestamp={self.timestamp!r}, content={self.content!r})"
+        return f"{type(self).__name__}({', '.join(f'{name}={value!r}' for name, value in self.to_dict().items())})"
+
+
+def _record_type(service: str, mapping) -> type:
+    if isinstance(mapping, dict):
+        names = {field: _attribute_name(name) for field, name in mapping.items() if isinstance(name, str)}
+    else:
+        names = {str(index): _attribute_name(name) for index, name in enumerate(mapping)}
+    names.update(_EXTRA_FIELDS)
+    names = {field: name for field, name in names.items() if name not in StreamRecord.__slots__}  # e.g. "key", the screeners' "timestamp"
+    fields = tuple(dict.fromkeys(names.values()))
+    class_name = "".join(part.capitalize() for part in service.replace("LEVELONE", "LEVEL_ONE").split("_")) + "Record"
+    namespace = {"__slots__": (), "service": service, "fields": fields, "field_names": names}
+    namespace.update((name, _Field(field)) for field, name in names.items())
+    return type(class_name, (StreamRecord,), namespace)
+
+
+record_types = {service: _record_type(service, mapping) for service, mapping in stream_fields.items()}
+
+
+def _unknown_record_type(service: str) -> type:
+    record_type = type("StreamRecord", (StreamRecord,), {"__slots__": (), "service": service})
+    record_types[service] = record_type
+    return record_type
+
+
+class StreamMessage:
+    """
+    A decoded stream message: data records plus the (decoded) response and notify items.
+    """
+    __slots__ = ("data", "response", "notify")
+
+    def __init__(self, data: list, response: list, notify: list):
+        self.data = data            # list[StreamRecord]
+        self.response = response    # list[dict], replies to requests (LOGIN, SUBS, ...)
+        self.notify = notify        # list[dict], heartbeats
+
+    def __repr__(self):
+        return f"StreamMessage(data={self.data!r}, response={self.response!r}, notify={self.notify!r})"
+
+
+def parse_message(message: str | bytes | dict) -> StreamMessage:
+    """
+    Decode a raw stream message into records (uses orjson when installed).
+
+    Args:
+        message (str | bytes | dict): raw stream message (or already decoded dict)
+
+    Returns:
+        StreamMessage: decoded message
+    """
+    decoded = loads(message) if isinstance(message, (str, bytes)) else message
+    records = []
+    for item in decoded.get("data", ()):
+        service = item.get("service")
+        record_type = record_types.get(service) or _unknown_record_type(service)
+        timestamp = item.get("timestamp")
+        records.extend(record_type(content, timestamp) for content in item.get("content", ()))
+    return StreamMessage(records, decoded.get("response", []), decoded.get("notify", []))
+
+
+def parsed_receiver(receiver: callable) -> callable:
+    """
+    Wrap a receiver so it is called with a StreamMessage instead of the raw message.
+
+    Args:
+        receiver (callable): function (or coroutine function) taking a StreamMessage
+
+    Returns:
+        callable: receiver taking raw messages (a coroutine function if receiver is one)
+    """
+    if asyncio.iscoroutinefunction(receiver):
+        async def wrapper(message, **kwargs):
+            await receiver(parse_message(message), **kwargs)
+    else:
+        def wrapper(message, **kwargs):
+            receiver(parse_message(message), **kwargs)
+    return wrapper
@@ -0,0 +1,322 @@
+"""
+Schwabdev Request Scheduler Module.
+Client-side token bucket with priority lanes, shared by Client and ClientAsync.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+
+from .enums import Priority
+
+
+def priority_for(method: str, path: str) -> Priority:
+    """
+    Pick the scheduler lane for an API call.
+
+    Args:
+        method (str): HTTP method
+        path (str): API path (without the base url)
+
+    Returns:
+        Priority: ORDER for placing/replacing/cancelling orders, ACCOUNT for other trader calls,
+                  BULK for price history and option chains, MARKET_DATA for everything else
+    """
+    if path.startswith('/trader/'):
+        if method != 'GET' and ('/orders' in path or '/previewOrder' in path):
+            return Priority.ORDER
+        return Priority.ACCOUNT
+    if path.startswith(('/marketdata/v1/pricehistory', '/marketdata/v1/chains', '/marketdata/v1/expirationchain')):
+        return Priority.BULK
+    return Priority.MARKET_DATA
+
+
+class _Waiter:
+    __slots__ = ("priority", "granted", "cancelled", "event", "future", "loop")
+
+    def __init__(self, priority: Priority, event: threading.Event | None = None, future: asyncio.Future | None = None,
+                 loop: asyncio.AbstractEventLoop | None = None):
+        self.priority = priority
+        self.granted = False
+        self.cancelled = False
+        self.event = event
+        self.future = future
+        self.loop = loop
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class RequestScheduler:
+
+    def __init__(self, rate_per_minute: float | None = 120, burst: int = 20, max_retries: int = 3, cooldown: float = 1.0,
+                 max_cooldown: float = 60.0, min_rate_fraction: float = 0.25, recovery: float = 0.05, logger: logging.Logger | None = None):
+        """
+        Token bucket request scheduler with priority lanes.
+        One instance can be shared by any number of Client/ClientAsync objects and threads, queued requests are
+        granted lowest Priority value first (orders before account calls before market data before bulk history).
+
+        A 429 response pauses the bucket (for Retry-After seconds if sent, otherwise an exponential cooldown),
+        halves the effective rate and the request is re-queued; each successful response adds back part of the rate.
+
+        Args:
+            rate_per_minute (float | None): sustained request rate (None = no rate cap, 429s still pause the bucket)
+            burst (int): bucket capacity (requests that may go out back to back)
+            max_retries (int): times a 429'd request is re-queued before the 429 response is returned
+            cooldown (float): first pause in seconds after a 429 without Retry-After (doubles per consecutive 429)
+            max_cooldown (float): longest pause in seconds
+            min_rate_fraction (float): lowest fraction of rate_per_minute that 429s can reduce the rate to
+            recovery (float): fraction of rate_per_minute regained per successful response
+            logger (logging.Logger | None): logger to use (defaults to the "Schwabdev" logger)
+        """
+        if rate_per_minute is not None and rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be greater than 0 (or None for no cap).")
+        if burst < 1:
+            raise ValueError("burst must be at least 1.")
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self.max_retries = max_retries
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.min_rate_fraction = min_rate_fraction
+        self.recovery = recovery
+        self.logger = logger or logging.getLogger("Schwabdev")
+
+        self._lock = threading.Lock()
+        self._heap = []                                             # (priority, sequence, waiter)
+        self._sequence = itertools.count()                          # FIFO within a lane
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._factor = 1.0                                          # adaptive fraction of rate_per_minute
+        self._paused_until = 0.0
+        self._strikes = 0                                           # consecutive 429s
+        self._queued = {priority: 0 for priority in Priority}
+        self._in_flight = 0
+        self._completed = 0
+        self._throttled = 0
+        self._retried = 0
+
+    """
+    Token bucket (all called with self._lock held)
+    """
+
+    def _refill(self, now: float):
+        if self.rate_per_minute is not None:
+            rate = self.rate_per_minute * self._factor / 60
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * rate)
+        self._updated = now
+
+    def _dispatch(self) -> float | None:
+        """
+        Grant queued requests while tokens are available.
+
+        Returns:
+            float | None: seconds until another request could be granted, None if nothing is waiting
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now if self._heap else None
+        while self._heap:
+            if self.rate_per_minute is not None and self._tokens < 1:
+                return (1 - self._tokens) * 60 / (self.rate_per_minute * self._factor)
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.cancelled:
+                continue
+            self._queued[waiter.priority] -= 1
+            if self.rate_per_minute is not None:
+                self._tokens -= 1
+            self._in_flight += 1
+            waiter.granted = True
+            waiter.wake()
+        return None
+
+    def _enqueue(self, waiter: _Waiter):
+        with self._lock:
+            heapq.heappush(self._heap, (waiter.priority, next(self._sequence), waiter))
+            self._queued[waiter.priority] += 1
+
+    def _abandon(self, waiter: _Waiter):
+        # the caller gave up (cancelled / interrupted), return a granted slot or drop out of the queue
+        with self._lock:
+            if waiter.granted:
+                self._in_flight -= 1
+                if self.rate_per_minute is not None:
+                    self._tokens = min(self.burst, self._tokens + 1)
+            elif not waiter.cancelled:
+                waiter.cancelled = True
+                self._queued[waiter.priority] -= 1
+            self._dispatch()
+
+    """
+    Acquire / release
+    """
+
+    def acquire(self, priority: Priority = Priority.BULK):
+        """
+        Block until a request slot is granted (must be followed by release()).
+
+        Args:
+            priority (Priority): lane to queue in
+        """
+        waiter = _Waiter(priority, event=threading.Event())
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch()
+                if waiter.granted or waiter.event.wait(delay):
+                    return
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    async def acquire_async(self, priority: Priority = Priority.BULK):
+        """
+        Wait (without blocking the event loop) until a request slot is granted (must be followed by release()).
+
+        Args:
+            priority (Priority): lane to queue in
+        """
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, future=loop.create_future(), loop=loop)
+        self._enqueue(waiter)
+        try:
+            while True:
+                with self._lock:
+                    delay = self._dispatch()
+                if waiter.granted:
+                    return
+                try:
+                    await asyncio.wait_for(asyncio.shield(waiter.future), delay)
+                    return
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            self._abandon(waiter)
+            raise
+
+    def release(self, status: int | None = None, retry_after: str | None = None):
+        """
+        Return a slot and feed the response status into the adaptive rate.
+
+        Args:
+            status (int | None): HTTP status of the response (None if the request raised)
+            retry_after (str | None): Retry-After header of the response
+        """
+        with self._lock:
+            self._in_flight -= 1
+            self._completed += 1
+            now = time.monotonic()
+            if status == 429:
+                self._refill(now)
+                self._throttled += 1
+                self._strikes += 1
+                try:
+                    pause = float(retry_after)
+                except (TypeError, ValueError):
+                    pause = min(self.max_cooldown, self.cooldown * 2 ** (self._strikes - 1))
+                self._paused_until = max(self._paused_until, now + pause)
+                self._tokens = 0.0
+                self._factor = max(self.min_rate_fraction, self._factor / 2)
+            elif status is not None and status < 500:
+                self._refill(now)
+                self._strikes = 0
+                self._factor = min(1.0, self._factor + self.recovery)
+            self._dispatch()
+
+    """
+    Scheduled calls
+    """
+
+    def call(self, send: callable, priority: Priority = Priority.BULK):
+        """
+        Run a synchronous request through the scheduler, re-queueing it on 429.
+
+        Args:
+            send (callable): function that makes the request and returns a requests.Response
+            priority (Priority): lane to queue in
+
+        Returns:
+            requests.Response: the first non-429 response (or the last 429 once retries are used up)
+        """
+        for attempt in range(self.max_retries + 1):
+            self.acquire(priority)
+            try:
+                response = send()
+            except BaseException:
+                self.release()
+                raise
+            self.release(response.status_code, response.headers.get('Retry-After'))
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            self._note_retry(priority, attempt)
+            response.close()
+
+    async def call_async(self, send: callable, priority: Priority = Priority.BULK):
+        """
+        Run an asynchronous request through the scheduler, re-queueing it on 429.
+
+        Args:
+            send (callable): coroutine function that makes the request and returns an aiohttp.ClientResponse
+            priority (Priority): lane to queue in
+
+        Returns:
+            aiohttp.ClientResponse: the first non-429 response (or the last 429 once retries are used up)
+        """
+        for attempt in range(self.max_retries + 1):
+            await self.acquire_async(priority)
+            try:
+                response = await send()
+            except BaseException:
+                self.release()
+                raise
+            self.release(response.status, response.headers.get('Retry-After'))
+            if response.status != 429 or attempt == self.max_retries:
+                return response
+            self._note_retry(priority, attempt)
+            response.release()
+
+    def _note_retry(self, priority: Priority, attempt: int):
+        with self._lock:
+            self._retried += 1
+            paused = max(0.0, self._paused_until - time.monotonic())
+        self.logger.warning(f"Rate limited (429), {priority.name} request re-queued ({attempt + 1}/{self.max_retries}), pausing {paused:.1f}s")
+
+    """
+    Counters
+    """
+
+    def stats(self) -> dict:
+        """
+        Snapshot of the scheduler counters.
+
+        Returns:
+            dict: queued (total and per lane), in_flight, completed, throttled (429s seen), retried,
+                  current rate_per_minute, available tokens and seconds left in a 429 pause
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'queued': sum(self._queued.values()),
+                'queued_by_priority': {priority.name: count for priority, count in self._queued.items()},
+                'in_flight': self._in_flight,
+                'completed': self._completed,
+                'throttled': self._throttled,
+                'retried': self._retried,
+                'rate_per_minute': None if self.rate_per_minute is None else self.rate_per_minute * self._factor,
+                'tokens': self._tokens if self.rate_per_minute is not None else None,
+                'paused_for': max(0.0, self._paused_until - now),
+            }
@@ -14,6 +14,10 @@ import zoneinfo
 import websockets
 import websockets.exceptions
 
+from .dispatcher import StreamDispatcher
+from .latency import StreamLatency
+from .records import loads, parsed_receiver
+
 
 class StreamBase:
 
@@ -34,8 +38,10 @@ class StreamBase:
         self._loop_ready = threading.Event()            # event to signal that the loop is ready
         self._should_stop = True                        # main stream loop
         self._backoff_time = 2.0                        # default backoff time (time to wait before retrying)
+        self._min_session_time = 90                     # seconds a session must last for a dropped connection to be reconnected
 
         self._streamer_info = None                      # streamer info from api call
+        self._streamer_info_failed = False              # last streamer info failed to connect or log in (refetch past the response cache)
         self._request_id = 0                            # a counter for the request id
         
         self.active = False                             # whether the stream is active
@@ -43,33 +49,55 @@ class StreamBase:
 
 
 
-    async def _run_streamer(self, receiver_func=print, ping_timeout: int = 30, **kwargs):
+    async def _run_streamer(self, receiver_func=print, ping_timeout: int = 30, dispatcher: StreamDispatcher | None = None, parsed: bool = False,
+                            latency: StreamLatency | None = None, **kwargs):
         """
         Start the streamer
 
         Args:
             receiver_func (function, optional): function to call when data is received. Defaults to print.
             ping_timeout (int, optional): how long to wait for pongs from the server. Defaults to 30.
+            dispatcher (StreamDispatcher | None, optional): queue + worker threads that call receiver_func off the receive loop. Defaults to None (called inline).
+            parsed (bool, optional): call receiver_func with a decoded StreamMessage instead of the raw string. Defaults to False.
+            latency (StreamLatency | None, optional): record message latency (from arrival in the receive loop), queue, decode and receiver time. Defaults to None.
             **kwargs: keyword arguments to pass to receiver_func
         """
         self._event_loop = asyncio.get_running_loop()
+        if latency is not None:
+            receiver_func = latency.wrap(receiver_func, parsed)  # decoded and measured where the receiver runs (dispatcher workers if used)
+        elif parsed:
+            receiver_func = parsed_receiver(receiver_func)  # decoded where the receiver runs (dispatcher workers if used)
         is_async_receiver = True if asyncio.iscoroutinefunction(receiver_func) else False
+        if dispatcher is not None:
+            dispatcher.start(receiver_func, self._event_loop, **kwargs)
+        stamp = latency.stamp if latency is not None else None  # arrival is stamped here, before any dispatcher queue
         async def call_receiver(response, **kwargs):
-            if is_async_receiver:
-                await receiver_func(response, **kwargs)
+            args = (response,) if stamp is None else (response, stamp())
+            if dispatcher is not None:
+                await dispatcher.put_async(*args)
+            elif is_async_receiver:
+                await receiver_func(*args, **kwargs)
             else:
-                receiver_func(response, **kwargs)
+                receiver_func(*args, **kwargs)
         
         self._should_stop = False
         while not self._should_stop:
 
             try:
-                self._streamer_info = self._get_streamer_info()
+                if self._streamer_info is None:   # cached across reconnects, fetched again after a failed connect or login
+                    if self._streamer_info_failed:
+                        self._streamer_info = await asyncio.to_thread(self._get_streamer_info, refresh=True)
+                    else:
+                        self._streamer_info = await asyncio.to_thread(self._get_streamer_info)
+                    self._streamer_info_failed = False
+                else:
+                    await asyncio.to_thread(self._tokens.update_tokens)  # the login needs a current access token
             except Exception as e:
                 self._logger.error("Error getting streamer info, cannot start stream.")
                 self._logger.error(e)
-                return
+                break
             start_time = datetime.datetime.now(datetime.timezone.utc)
+            logged_in = False
             try:
                 self._logger.debug("Connecting to streaming server...")
                 async with websockets.connect(self._streamer_info.get('streamerSocketUrl'), ping_timeout=ping_timeout) as self._websocket:
@@ -82,52 +110,89 @@ class StreamBase:
                     await self._websocket.send(json.dumps(login_payload))
                     self._loop_ready.set()
                 
-                    await call_receiver(await self._websocket.recv(), **kwargs)  # receive login response
+                    login_response = await self._websocket.recv()
+                    await call_receiver(login_response, **kwargs)  # receive login response
+                    logged_in = self._login_succeeded(login_response)
+                    if not logged_in:
+                        self._streamer_info, self._streamer_info_failed = None, True
                     self.active = True
 
-                    # send subscriptions (that are recorded (queued or previously sent))
+                    # send subscriptions (that are recorded (queued or previously sent)) for every service in one frame,
+                    # their responses are handled by the listener loop
+                    reqs = []
                     for service, subs in self.subscriptions.items():
                         grouped: dict[str, list[str]] = {} # group subscriptions by fields for more efficient requests
                         for key, fields in subs.items():
                             grouped.setdefault(self._list_to_string(fields), []).append(key)
-                        reqs = [] # list of requests to send for this service
                         for fields, keys in grouped.items():
                             reqs.append(self.basic_request(service=service, command="ADD", parameters={"keys": self._list_to_string(keys), "fields": fields}))
-                        if reqs:
-                            self._logger.debug(f"Sending subscriptions: {reqs}")
-                            await self._websocket.send(json.dumps({"requests": reqs}))
-                            await call_receiver(await self._websocket.recv(), **kwargs)  # receive subscription response
+                    if reqs:
+                        self._logger.debug(f"Sending subscriptions: {reqs}")
+                        await self._websocket.send(json.dumps({"requests": reqs}))
 
                     # reset backoff time
                     self._backoff_time = 2.0
 
                     # main listener loop
-                    if is_async_receiver:
+                    if dispatcher is not None and dispatcher.overflow == "block":
+                        while self.active and not self._should_stop:
+                            message = await self._websocket.recv()
+                            await dispatcher.put_async(message, stamp() if stamp is not None else None)
+                    elif dispatcher is not None:
+                        while self.active and not self._should_stop:
+                            message = await self._websocket.recv()
+                            dispatcher.put(message, stamp() if stamp is not None else None)
+                    elif stamp is not None:
+                        while self.active and not self._should_stop:
+                            await call_receiver(await self._websocket.recv(), **kwargs)
+                    elif is_async_receiver:
                         while self.active and not self._should_stop:
                             await receiver_func(await self._websocket.recv(), **kwargs)
                     else:
                         while self.active and not self._should_stop:
                             receiver_func(await self._websocket.recv(), **kwargs)
 
-            except (websockets.exceptions.ConnectionClosedOK, websockets.exceptions.ConnectionClosed) as e: # "received 1000 (OK); then sent 1000 (OK)", "sent 1000 (OK); no close frame received"
-                self._logger.info(f"Stream connection closed. ({e})")
-                break
             except websockets.exceptions.ConnectionClosedError as e: # lost internet connection
                 elapsed = (datetime.datetime.now(datetime.timezone.utc) - start_time).total_seconds()
-                if elapsed <= 90:
-                    self._logger.warning(f"Stream has crashed within 90 seconds, likely no subscriptions, invalid login, or lost connection. Not restarting. {e}")
+                if not logged_in:
+                    self._streamer_info, self._streamer_info_failed = None, True
+                if elapsed <= self._min_session_time:
+                    self._logger.warning(f"Stream has crashed within {self._min_session_time} seconds, likely no subscriptions, invalid login, or lost connection. Not restarting. {e}")
                     break
                 else:
-                    self._logger.error(f"Stream connection Error. Reconnecting in {self._backoff_time} seconds...")
-                    await self._wait_for_backoff()
+                    self._logger.error(f"Stream connection Error. Reconnecting now... ({e})")  # healthy session dropped, no backoff
+            except websockets.exceptions.ConnectionClosed as e: # "received 1000 (OK); then sent 1000 (OK)", "sent 1000 (OK); no close frame received"
+                self._logger.info(f"Stream connection closed. ({e})")
+                break
             except Exception as e:  # stream has quit unexpectedly, try to reconnect
                 self._logger.error(e)
                 self._logger.warning(f"Stream connection lost to server, reconnecting...")
+                if not logged_in:
+                    self._streamer_info, self._streamer_info_failed = None, True
                 await self._wait_for_backoff()
             finally:
                 self.active = False
                 self._websocket = None
 
+        if dispatcher is not None:
+            await asyncio.to_thread(dispatcher.stop)  # deliver what is still queued
+
+    @staticmethod
+    def _login_succeeded(response: str) -> bool:
+        """
+        Whether a login response reports success (code 0)
+
+        Args:
+            response (str): raw login response
+
+        Returns:
+            bool: True if the login succeeded
+        """
+        try:
+            return loads(response)["response"][0]["content"]["code"] == 0
+        except (ValueError, TypeError, KeyError, IndexError):
+            return False
+
     async def _wait_for_backoff(self):
         """
         Wait for the backoff time
@@ -158,11 +223,12 @@ class StreamBase:
                 if service not in self.subscriptions:
                     self.subscriptions[service] = {}
                 if command == "ADD":
+                    new_fields = set(fields)
                     for key in keys:
                         if key not in self.subscriptions[service]:
                             self.subscriptions[service][key] = fields
-                        else:
-                            self.subscriptions[service][key] = list(set(fields) | set(self.subscriptions[service][key]))
+                        elif not new_fields.issubset(self.subscriptions[service][key]):
+                            self.subscriptions[service][key] = list(new_fields.union(self.subscriptions[service][key]))
                 elif command == "SUBS":
                     self.subscriptions[service] = {}
                     for key in keys:
@@ -445,7 +511,8 @@ class Stream(StreamBase):
     def __init__(self, client):
         super().__init__(client.tokens, client._get_streamer_info, client.logger)
 
-    def start(self, receiver=print, daemon: bool = True, ping_interval: int = 20, **kwargs):
+    def start(self, receiver=print, daemon: bool = True, ping_interval: int = 20, dispatcher: StreamDispatcher | None = None, parsed: bool = False,
+              latency: StreamLatency | None = None, **kwargs):
         """
         Start the stream
 
@@ -453,6 +520,9 @@ class Stream(StreamBase):
             receiver (function, optional): function to call when data is received. Defaults to print.
             daemon (bool, optional): whether to run the thread in the background (as a daemon). Defaults to True.
             ping_interval (int, optional): interval in seconds to send pings to the streamer. Defaults to 20.
+            dispatcher (StreamDispatcher | None, optional): call the receiver from worker threads behind a bounded queue instead of inline in the receive loop. Defaults to None.
+            parsed (bool, optional): call the receiver with a schwabdev.StreamMessage (typed records per service) instead of the raw JSON string. Defaults to False.
+            latency (StreamLatency | None, optional): record per-service message latency (from arrival in the receive loop), queue, decode and receiver time into its histograms. Each message is decoded to read its timestamps, so use parsed=True (or StreamLatency(decoded=True)) rather than decoding the raw message again in the receiver. Defaults to None.
         """
         if self.active and (self._thread and self._thread.is_alive()):
             self._logger.warning("Stream already active.")
@@ -461,7 +531,7 @@ class Stream(StreamBase):
             self._loop_ready.clear()
 
             def _start_asyncio():
-                asyncio.run(self._run_streamer(receiver, ping_interval, **kwargs))
+                asyncio.run(self._run_streamer(receiver, ping_interval, dispatcher, parsed, latency, **kwargs))
 
             self._thread = threading.Thread(target=_start_asyncio, daemon=daemon)
             self._thread.start()
@@ -599,9 +669,17 @@ class StreamAsync(StreamBase):
     async def __aexit__(self, exc_type, exc, tb):
         await self.stop()
 
-    async def start(self, receiver=print, ping_interval: int = 20, **kwargs):
+    async def start(self, receiver=print, ping_interval: int = 20, dispatcher: StreamDispatcher | None = None, parsed: bool = False,
+                    latency: StreamLatency | None = None, **kwargs):
         """
         Start the stream in the *current* event loop (no thread).
+
+        Args:
+            receiver (function, optional): function (or coroutine function) to call when data is received. Defaults to print.
+            ping_interval (int, optional): interval in seconds to send pings to the streamer. Defaults to 20.
+            dispatcher (StreamDispatcher | None, optional): call the receiver from worker threads behind a bounded queue instead of inline in the receive loop. Defaults to None.
+            parsed (bool, optional): call the receiver with a schwabdev.StreamMessage (typed records per service) instead of the raw JSON string. Defaults to False.
+            latency (StreamLatency | None, optional): record per-service message latency (from arrival in the receive loop), queue, decode and receiver time into its histograms. Each message is decoded to read its timestamps, so use parsed=True (or StreamLatency(decoded=True)) rather than decoding the raw message again in the receiver. Defaults to None.
         """
         if self.active or (self._task and not self._task.done()):
             self._logger.warning("Stream already active.")
@@ -612,6 +690,9 @@ class StreamAsync(StreamBase):
                 self._run_streamer(
                     receiver_func=receiver,
                     ping_timeout=ping_interval,
+                    dispatcher=dispatcher,
+                    parsed=parsed,
+                    latency=latency,
                     **kwargs,
                 )
             )
@@ -0,0 +1,219 @@
+"""
+Schwabdev Subscription Manager Module.
+Debounces subscription changes and sends only the net difference from the stream's subscriptions.
+https://github.com/tylerebowers/Schwab-API-Python
+"""
+import asyncio
+import logging
+import threading
+
+
+class SubscriptionManager:
+
+    def __init__(self, stream, window: float = 0.05, logger: logging.Logger | None = None):
+        """
+        Collects subscription changes for window seconds, then compares the result with the subscriptions the
+        stream already has (stream.subscriptions) and sends the fewest grouped requests in one frame.
+        Rapid ADD/UNSUBS churn on the same keys cancels out instead of reaching the streamer.
+
+        Args:
+            stream (Stream | StreamAsync | StreamPool): stream to send the requests on
+            window (float): seconds changes are held after the first one before they are sent (0 sends on every call)
+            logger (logging.Logger | None): logger to use (defaults to the "Schwabdev" logger)
+        """
+        self.stream = stream
+        self.window = window
+        self.logger = logger or logging.getLogger("Schwabdev")
+
+        self._desired = {}                              # service -> {key: set of fields}, services with pending changes
+        self._lock = threading.Lock()
+        self._timer = None
+
+        self.received = 0                               # requests and changes taken in
+        self.sent = 0                                   # requests sent to the stream
+        self.frames = 0                                 # stream sends (one frame each)
+
+    """
+    Changes
+    """
+
+    def send(self, requests: list | dict):
+        """
+        Queue stream requests (the dicts built by the stream's shortcut functions, e.g. stream.level_one_equities(...)).
+        Requests without keys (e.g. ADMIN) are sent immediately.
+
+        Args:
+            requests (list | dict): list of requests or a single request
+        """
+        if not isinstance(requests, list):
+            requests = [requests]
+        passthrough = []
+        with self._lock:
+            for request in requests:
+                parameters = request.get("parameters") or {}
+                if "keys" not in parameters or request.get("service") is None:
+                    passthrough.append(request)
+                    continue
+                self._apply(request["service"].upper(), request.get("command", "ADD").upper(),
+                            self._split(parameters["keys"]), self._split(parameters.get("fields", [])))
+        if passthrough:
+            self._send(passthrough, record=False)
+        self._schedule()
+
+    def add(self, service: str, keys: str | list, fields: str | list):
+        """
+        Subscribe keys (fields are added to those already subscribed)
+
+        Args:
+            service (str): service (e.g. "LEVELONE_EQUITIES")
+            keys (str | list): keys to add
+            fields (str | list): fields to subscribe
+        """
+        with self._lock:
+            self._apply(service.upper(), "ADD", self._split(keys), self._split(fields))
+        self._schedule()
+
+    def remove(self, service: str, keys: str | list):
+        """
+        Unsubscribe keys
+
+        Args:
+            service (str): service (e.g. "LEVELONE_EQUITIES")
+            keys (str | list): keys to remove
+        """
+        with self._lock:
+            self._apply(service.upper(), "UNSUBS", self._split(keys), [])
+        self._schedule()
+
+    def _apply(self, service: str, command: str, keys: list, fields: list):
+        """Apply one change to the pending state of a service (lock held)"""
+        self.received += 1
+        state = self._desired.get(service)
+        if state is None:
+            current = self.stream.subscriptions.get(service, {})
+            state = self._desired[service] = {key: set(current_fields) for key, current_fields in current.items()}
+        fields = set(fields)
+        if command == "ADD":
+            for key in keys:
+                if key in state:
+                    state[key] |= fields
+                else:
+                    state[key] = set(fields)
+        elif command == "SUBS":
+            state.clear()
+            for key in keys:
+                state[key] = set(fields)
+        elif command == "UNSUBS":
+            for key in keys:
+                state.pop(key, None)
+        elif command == "VIEW":
+            for key in state:
+                state[key] = set(fields)
+        else:
+            self.logger.warning(f"Subscription manager ignored unknown command {command}.")
+
+    @staticmethod
+    def _split(values: str | list) -> list:
+        if isinstance(values, str):
+            return [value for value in values.split(",") if value]
+        return [str(value) for value in values]
+
+    """
+    Sending
+    """
+
+    def _schedule(self):
+        if self.window <= 0:
+            self.flush()
+            return
+        with self._lock:
+            if self._timer is None and self._desired:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self) -> list:
+        """
+        Send the net difference of the pending changes now
+
+        Returns:
+            list: requests sent (in one frame)
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            pending, self._desired = self._desired, {}
+            requests = []
+            for service, desired in pending.items():
+                requests += self._diff(service, desired, self.stream.subscriptions.get(service, {}))
+        if requests:
+            self._send(requests)
+            self.sent += len(requests)
+            self.frames += 1
+        return requests
+
+    def close(self):
+        """Send what is pending and stop the timer"""
+        self.flush()
+
+    def _diff(self, service: str, desired: dict, current: dict) -> list:
+        """
+        Fewest requests turning the current subscriptions of a service into the desired ones
+
+        Args:
+            service (str): service
+            desired (dict): {key: set of fields} wanted
+            current (dict): {key: list of fields} the stream has
+
+        Returns:
+            list: requests (UNSUBS before ADD)
+        """
+        removed = [key for key in current if key not in desired]
+        groups = {}                                     # fields -> keys to (re)add with those fields
+        for key, fields in desired.items():
+            old = current.get(key)
+            if old is not None and fields == set(old):
+                continue
+            if old is not None and not fields >= set(old):
+                removed.append(key)                     # ADD only widens fields, narrow by removing first
+            groups.setdefault(frozenset(fields), []).append(key)
+
+        requests = []
+        if removed:
+            requests.append(self.stream.basic_request(service, "UNSUBS", parameters={"keys": ",".join(removed)}))
+        for fields, keys in groups.items():
+            requests.append(self.stream.basic_request(service, "ADD", parameters={"keys": ",".join(keys), "fields": self._fields_string(fields)}))
+
+        # one SUBS replaces everything when all keys share their fields and it names fewer keys
+        field_sets = {frozenset(fields) for fields in desired.values()}
+        if requests and len(field_sets) == 1 and len(desired) < len(removed) + sum(len(keys) for keys in groups.values()):
+            requests = [self.stream.basic_request(service, "SUBS", parameters={"keys": ",".join(desired), "fields": self._fields_string(field_sets.pop())})]
+        return requests
+
+    @staticmethod
+    def _fields_string(fields) -> str:
+        return ",".join(sorted(fields, key=lambda field: (len(field), field)))   # numeric order for field numbers
+
+    def _send(self, requests: list, record: bool = True):
+        if not asyncio.iscoroutinefunction(self.stream.send):
+            self.stream.send(requests, record=record)
+        elif self.stream._event_loop is not None:      # StreamAsync: send on its event loop
+            asyncio.run_coroutine_threadsafe(self.stream.send(requests, record=record), self.stream._event_loop)
+        elif record:                                    # not started yet, subscribed when it starts
+            for request in requests:
+                self.stream._record_request(request)
+
+    """
+    Metrics
+    """
+
+    def stats(self) -> dict:
+        """
+        Counters of the manager.
+
+        Returns:
+            dict: received (changes taken in), sent (requests sent), frames (sends), pending (services with changes)
+        """
+        with self._lock:
+            return {'received': self.received, 'sent': self.sent, 'frames': self.frames, 'pending': len(self._desired)}
@@ -12,12 +12,17 @@ import sqlite3
 import requests
 import urllib.parse
 import threading
+import time
+import weakref
 from cryptography.fernet import Fernet
 
 _ENC_PREFIX = "enc:"
 
 class Tokens:
-    def __init__(self,app_key: str, app_secret: str, callback_url: str, logger: logging.Logger, tokens_db: str="~/.schwabdev/tokens.db", encryption: str=None, call_for_auth=None):
+    _access_threshold = 61                                  # seconds before expiry the request path updates the access token
+    _refresh_threshold = 3630                               # seconds before expiry the refresh token is updated (60.5 minutes)
+
+    def __init__(self,app_key: str, app_secret: str, callback_url: str, logger: logging.Logger, tokens_db: str="~/.schwabdev/tokens.db", encryption: str=None, call_for_auth=None, background_refresh: bool=True):
         """
         Initialize a tokens manager
 
@@ -28,6 +33,7 @@ class Tokens:
             callback_url (str): Url for callback
             tokens_db (str): Path to tokens database file
             call_for_auth (function | None): Function to call for custom auth flow
+            background_refresh (bool): Renew the access token from a background thread ahead of expiry (so requests never wait on it)
         """
         #parameter validation
         if not app_key:
@@ -66,6 +72,16 @@ class Tokens:
         self._logger = logger                               # logger
         self._call_for_auth = call_for_auth                 # function to call for custom auth
         self._cipher_suite = Fernet(encryption) if (encryption and len(encryption) > 16) else None # encryption suite for tokens
+        self._update_due = 0.0                              # time.monotonic() at which update_tokens has work to do
+        self._access_expiry = 0.0                           # time.monotonic() at which the access token expires
+        self._refresh_lead = 5 * 60                         # seconds before expiry the background refresher renews the access token
+        self._refresher = None                              # background refresher thread
+        self._refresher_stop = threading.Event()            # set to stop the background refresher
+        self._listeners = []                                # functions called with this object when the access token changes
+        self._data_version = None                           # PRAGMA data_version when the row was last read
+        self._dec_memo = {}                                 # stored (encrypted) token -> token, for the current row
+        self._enc_memo = {}                                 # token -> stored (encrypted) token, for the current row
+        self._notified_token = None                         # access token the listeners last saw
 
         #init token database
         tokens_db = os.path.expanduser(tokens_db)
@@ -101,8 +117,11 @@ class Tokens:
         else:
             self._logger.warning("[Schwabdev] Could not load tokens from DB, starting authorization flow.")
             self.update_tokens(force_refresh_token=True)
+        if background_refresh:
+            self.start_refresher()
 
     def _close(self):
+        self.stop_refresher()
         try:
             self._conn.close()
         except Exception:
@@ -120,7 +139,10 @@ class Tokens:
     def _enc(self, s: str) -> str:
         if not self._cipher_suite:
             return s
-        return _ENC_PREFIX + self._cipher_suite.encrypt(s.encode()).decode()
+        stored = self._enc_memo.get(s) # unchanged tokens (e.g. the refresh token on access token updates) keep their ciphertext
+        if stored is None:
+            stored = _ENC_PREFIX + self._cipher_suite.encrypt(s.encode()).decode()
+        return stored
 
     def _dec(self, s: str) -> str:
         if not s:
@@ -130,8 +152,15 @@ class Tokens:
         elif not self._cipher_suite and s.startswith(_ENC_PREFIX): # no cipher but encrypted 
             raise Exception("Cannot decrypt token, no encryption key provided.")
         else: # cipher and encrypted
-            token = s[len(_ENC_PREFIX):]
-            return self._cipher_suite.decrypt(token.encode()).decode()
+            token = self._dec_memo.get(s)
+            if token is None:
+                token = self._cipher_suite.decrypt(s[len(_ENC_PREFIX):].encode()).decode()
+            return token
+
+    def _remember(self, stored: tuple, tokens: tuple):
+        """Memoize the stored (encrypted) form of the current row's tokens"""
+        self._dec_memo = dict(zip(stored, tokens))
+        self._enc_memo = dict(zip(tokens, stored))
 
 
     def _load_tokens_from_db(self) -> bool:
@@ -141,6 +170,10 @@ class Tokens:
         Returns:
             bool: True if tokens were loaded, False if no row exists.
         """
+        data_version = self._cur.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return True # no other connection has written since the last read (our own writes are already in memory)
+
         row = self._cur.execute(
             """
             SELECT
@@ -182,10 +215,14 @@ class Tokens:
         except Exception as e:
             self._logger.error(f"[Schwabdev] Could not decrypt tokens from sqlite database ({e})")
             return False
+        self._remember((access_token, refresh_token), (self.access_token, self.refresh_token))
+        self._data_version = data_version
         self.id_token = id_token
-        #self._expires_in = expires_in
+        if expires_in:
+            self._access_token_timeout = expires_in
         #self._token_type = token_type
         #self._scope = scope
+        self._set_deadlines()
 
         return True
         
@@ -215,8 +252,10 @@ class Tokens:
         self._access_token_timeout = token_dictionary.get("expires_in", 1800)
         token_type = token_dictionary.get("token_type", "Bearer")
         scope = token_dictionary.get("scope", "api")
+        self._set_deadlines()
 
         try:
+            stored = (self._enc(self.access_token), self._enc(self.refresh_token))
             self._cur.execute("DELETE FROM schwabdev")
             self._cur.execute(
                 """
@@ -234,8 +273,8 @@ class Tokens:
                 (
                     at_issued.isoformat(),
                     rt_issued.isoformat(),
-                    self._enc(self.access_token),
-                    self._enc(self.refresh_token),
+                    stored[0],
+                    stored[1],
                     self.id_token,
                     self._access_token_timeout,
                     token_type,
@@ -243,8 +282,10 @@ class Tokens:
                 ),
                 )
             self._conn.commit()
+            self._remember(stored, (self.access_token, self.refresh_token))
             return True
         except Exception as e:
+            self._data_version = None # memory no longer matches the row, read it next time
             self._logger.error(e)
             self._logger.error("[Schwabdev] Could not write tokens to sqlite database")
             return False
@@ -286,12 +327,15 @@ class Tokens:
         Returns:
             bool: True if tokens were updated and False otherwise
         """
+        if time.monotonic() < self._update_due and not (force_access_token or force_refresh_token):
+            return False # fast path: neither token is near expiry
+
         now = datetime.datetime.now(datetime.timezone.utc)
         rt_delta = datetime.timedelta(seconds=self._refresh_token_timeout) - (now - self._refresh_token_issued)
         at_delta = datetime.timedelta(seconds=self._access_token_timeout) - (now - self._access_token_issued)
 
-        refresh_threshold = datetime.timedelta(seconds=3630)  # 60.5 minutes
-        access_threshold = datetime.timedelta(seconds=61)     # 61 seconds
+        refresh_threshold = datetime.timedelta(seconds=self._refresh_threshold)
+        access_threshold = datetime.timedelta(seconds=self._access_threshold)
 
         # check if we need to update refresh (and access) token
         if (rt_delta < refresh_threshold) or force_refresh_token:
@@ -306,6 +350,85 @@ class Tokens:
         else:
             return False
 
+    def _set_deadlines(self):
+        """
+        Convert the token expiries to time.monotonic() deadlines (called after the tokens change).
+        The access token is assigned before this runs, so a reader passing the fast path always sees the new token.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        mono = time.monotonic()
+        at_left = self._access_token_timeout - (now - self._access_token_issued).total_seconds()
+        rt_left = self._refresh_token_timeout - (now - self._refresh_token_issued).total_seconds()
+        self._access_expiry = mono + at_left
+        self._update_due = mono + min(at_left - self._access_threshold, rt_left - self._refresh_threshold)
+        if self.access_token != self._notified_token:
+            self._notified_token = self.access_token
+            for listener in self._listeners:
+                try:
+                    listener(self)
+                except Exception as e:
+                    self._logger.error(f"[Schwabdev] Token listener failed ({e})")
+
+    def add_listener(self, listener: callable):
+        """
+        Call a function whenever the access token changes (from any thread, including the background refresher)
+
+        Args:
+            listener (callable): function called with this Tokens object
+        """
+        self._listeners.append(listener)
+
+    def access_token_expires_in(self) -> float:
+        """
+        Seconds until the access token expires
+
+        Returns:
+            float: seconds (negative once expired)
+        """
+        return self._access_expiry - time.monotonic()
+
+    """
+        Background refresher functions:
+    """
+
+    def start_refresher(self):
+        """
+        Start a daemon thread that renews the access token ahead of expiry (once per token lifetime, retrying every 15 seconds on failure).
+        Refresh tokens need the user, so they are still updated from update_tokens().
+        """
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._refresher_stop.clear()
+        self._refresher = threading.Thread(target=Tokens._refresh_loop, args=(weakref.ref(self), self._refresher_stop),
+                                           name="Schwabdev-TokenRefresher", daemon=True)
+        self._refresher.start()
+
+    def stop_refresher(self):
+        """
+        Stop the background refresher thread (if running)
+        """
+        self._refresher_stop.set()
+
+    @staticmethod
+    def _refresh_loop(ref: weakref.ref, stop: threading.Event):
+        # holds only a weak reference between wake ups so an unused Tokens object can still be collected
+        wait = 0.0
+        while not stop.wait(wait):
+            self = ref()
+            if self is None:
+                return
+            try:
+                wait = self._access_expiry - self._refresh_lead - time.monotonic()
+                if wait <= 0:
+                    expiry = self._access_expiry
+                    self._update_access_token()
+                    wait = 15.0 if self._access_expiry == expiry else 0.0  # retry later if nothing changed
+            except Exception as e:
+                self._logger.error(f"[Schwabdev] Background token refresh failed ({e})")
+                wait = 15.0
+            finally:
+                del self
+
     """
         Access Token functions:
     """
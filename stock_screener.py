@@ -23,6 +23,7 @@ sys.path.insert(0, str(project_root))
 
 import schwabdev
 from ensemble_trading_model import SchwabDataFetcher
+from panel_features import stack_ohlcv, build_panel_features, panel_to_frames, feature_dtypes, OHLCV_COLUMNS
 
 # Load environment variables
 load_dotenv()
@@ -56,7 +57,7 @@ class StockScreener:
         self.stock_features = {}  # Store features/indicators for each symbol
         self.stock_quotes = {}  # Store current quotes for each symbol
         
-    def fetch_stocks(self, symbols, periodType='year', period=1, frequencyType='daily', frequency=1):
+    def fetch_stocks(self, symbols, periodType='year', period=1, frequencyType='daily', frequency=1, max_concurrency=8):
         """
         Fetch data for multiple stocks
         
@@ -66,6 +67,7 @@ class StockScreener:
             period: Period (int)
             frequencyType: Frequency type ('minute', 'daily', 'weekly', 'monthly')
             frequency: Frequency (int)
+            max_concurrency: Number of symbols fetched at the same time
         
         Returns:
             Dictionary with symbol as key and DataFrame as value
@@ -75,26 +77,24 @@ class StockScreener:
         print(f"{'='*60}")
         
         results = {}
-        for i, symbol in enumerate(symbols, 1):
-            print(f"\n[{i}/{len(symbols)}] Fetching {symbol}...")
-            try:
-                df = self.fetcher.get_price_history(
-                    symbol,
-                    periodType=periodType,
-                    period=period,
-                    frequencyType=frequencyType,
-                    frequency=frequency
-                )
-                
-                if df is not None and len(df) > 0:
-                    results[symbol] = df
-                    self.stock_data[symbol] = df
-                    print(f"  ✓ Successfully fetched {len(df)} data points")
-                    print(f"  Date range: {df.index.min()} to {df.index.max()}")
-                else:
-                    print(f"  ✗ No data available for {symbol}")
-            except Exception as e:
-                print(f"  ✗ Error fetching {symbol}: {e}")
+        # Requests run concurrently; results are reported in completion order
+        history = self.fetcher.iter_price_history(
+            symbols,
+            periodType=periodType,
+            period=period,
+            frequencyType=frequencyType,
+            frequency=frequency,
+            max_concurrency=max_concurrency
+        )
+        for i, (symbol, df) in enumerate(history, 1):
+            print(f"\n[{i}/{len(symbols)}] Fetched {symbol}")
+            if df is not None and len(df) > 0:
+                results[symbol] = df
+                self.stock_data[symbol] = df
+                print(f"  ✓ Successfully fetched {len(df)} data points")
+                print(f"  Date range: {df.index.min()} to {df.index.max()}")
+            else:
+                print(f"  ✗ No data available for {symbol}")
         
         print(f"\n{'='*60}")
         print(f"Successfully fetched {len(results)}/{len(symbols)} stocks")
@@ -102,12 +102,15 @@ class StockScreener:
         
         return results
     
-    def calculate_indicators(self, symbols=None):
+    def calculate_indicators(self, symbols=None, panel=True):
         """
         Calculate indicators and alphas for stocks
         
         Args:
             symbols: List of symbols to process (None = process all fetched stocks)
+            panel: Compute all symbols in one batched pass (panel_features) instead of
+                   calling create_features per symbol. Same columns and dtypes (the panel
+                   is computed in float32 and cast back per symbol).
         
         Returns:
             Dictionary with symbol as key and features DataFrame as value
@@ -123,6 +126,13 @@ class StockScreener:
         print(f"Calculating indicators and alphas for {len(symbols)} stocks...")
         print(f"{'='*60}")
         
+        if panel:
+            results = self._calculate_indicators_panel(symbols)
+            print(f"\n{'='*60}")
+            print(f"Successfully processed {len(results)}/{len(symbols)} stocks")
+            print(f"{'='*60}\n")
+            return results
+        
         results = {}
         for i, symbol in enumerate(symbols, 1):
             print(f"\n[{i}/{len(symbols)}] Processing {symbol}...")
@@ -148,6 +158,42 @@ class StockScreener:
         
         return results
     
+    def _calculate_indicators_panel(self, symbols):
+        """
+        Calculate features for all symbols at once on a stacked (symbol, time) panel
+        
+        Args:
+            symbols: List of symbols to process
+        
+        Returns:
+            Dictionary with symbol as key and features DataFrame as value
+        """
+        missing = [s for s in symbols if s not in self.stock_data]
+        for symbol in missing:
+            print(f"  ✗ No data available for {symbol}")
+        
+        stacked_symbols, ohlcv, times = stack_ohlcv(self.stock_data, [s for s in symbols if s not in missing])
+        if not stacked_symbols:
+            return {}
+        
+        block, columns = build_panel_features(ohlcv, times)
+        frames = panel_to_frames(block, columns, stacked_symbols, times)
+        
+        results = {}
+        for symbol, features_df in frames.items():
+            if len(features_df) > 0:
+                # same dtypes as create_features, with the exact OHLCV values (float32 rounds volume and prices)
+                features_df = features_df.astype(feature_dtypes(features_df.columns))
+                features_df[OHLCV_COLUMNS] = self.stock_data[symbol].loc[features_df.index, OHLCV_COLUMNS]
+                results[symbol] = features_df
+                self.stock_features[symbol] = features_df
+            else:
+                print(f"  ✗ Not enough history to calculate features for {symbol}")
+        
+        print(f"  ✓ Calculated {len(columns)} features for {len(results)} stocks "
+              f"({ohlcv.shape[1]} bars max)")
+        return results
+    
     def get_current_quotes(self, symbols):
         """
         Get current quotes for symbols
@@ -159,16 +205,14 @@ class StockScreener:
             Dictionary with symbol as key and quote data as value
         """
         print(f"\nFetching current quotes for {len(symbols)} stocks...")
-        quotes = {}
         
-        for symbol in symbols:
-            try:
-                quote = self.fetcher.get_quote(symbol)
-                if quote:
-                    quotes[symbol] = quote
-                    self.stock_quotes[symbol] = quote
-            except Exception as e:
-                print(f"  ✗ Error fetching quote for {symbol}: {e}")
+        # One quotes call per few hundred symbols instead of one call per symbol
+        quotes = self.fetcher.get_quotes(symbols)
+        self.stock_quotes.update(quotes)
+        
+        missing = len(symbols) - len(quotes)
+        if missing:
+            print(f"  ✗ No quote returned for {missing} symbols")
         
         return quotes
     
@@ -0,0 +1,372 @@
+"""
+Stream Replay
+Drives stream receivers from captured frames instead of the Schwab streamer
+
+ReplayStream has the same start(receiver) / send / stop surface as schwabdev.Stream
+(and the same request builders), so handlers written for the live stream - the
+schwab_stream_server handler, the live_chart thread, strategy code - can be run and
+load-tested offline against a captured session. Frames are delivered at their
+recorded pace (speed=1), accelerated (speed=10), or as fast as the receiver takes
+them (speed=None).
+
+Frames come from a TickRecorder directory (ReplayStream.from_ticks) or any list of
+raw messages / (received_ms, message) pairs. Requests sent to the replay are answered
+with a success response and, once anything is subscribed, only subscribed services
+and keys are delivered (with no subscriptions every frame is delivered).
+
+Usage:
+    replay = ReplayStream.from_ticks('~/.schwabdev/ticks', '2026-10-16')
+    replay.start(handle_stream_data, speed=10, parsed=True)
+    replay.join()
+
+    stats = ReplayStream.from_ticks(root, day).benchmark(handle_stream_data, parsed=True)
+
+Run benchmark against a handler:
+    python stream_replay.py ~/.schwabdev/ticks 2026-10-16 --receiver module:function --parsed
+"""
+
+import asyncio
+import argparse
+import importlib
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from schwabdev.dispatcher import StreamDispatcher
+from schwabdev.records import dumps, loads, parsed_receiver
+from schwabdev.stream import StreamBase
+from tick_recorder import SCHEMAS, load_ticks
+
+
+REPLAY_STREAMER_INFO = {'streamerSocketUrl': 'replay://', 'schwabClientCustomerId': 'replay',
+                        'schwabClientCorrelId': 'replay', 'schwabClientChannel': 'replay',
+                        'schwabClientFunctionId': 'replay'}
+
+# Rows converted to frames per batch when replaying tick files
+FRAME_CHUNK_ROWS = 65536
+
+# Recorded columns that the streamer sends as integers
+INTEGER_COLUMNS = {'bid_size', 'ask_size', 'total_volume', 'last_size', 'quote_time_in_long',
+                   'trade_time_in_long', 'sequence', 'volume', 'chart_time', 'chart_day'}
+
+
+class ReplayStream(StreamBase):
+    """
+    Offline stand-in for schwabdev.Stream that replays captured frames
+    """
+
+    def __init__(self, frames, logger=None):
+        """
+        Initialize the replay
+
+        Args:
+            frames: List of raw messages (str or dict) or (received_ms, message) pairs, or a
+                zero-argument callable returning such an iterable (called on every start)
+            logger: Logger to use (defaults to the "Schwabdev" logger)
+        """
+        super().__init__(None, lambda: dict(REPLAY_STREAMER_INFO), logger or logging.getLogger('Schwabdev'))
+        self._frames = frames if callable(frames) else (lambda: iter(frames))
+        self._responses = deque()                   # answers to sent requests, delivered before the next frame
+        self.finished = threading.Event()
+        self.delivered = 0
+
+    @classmethod
+    def from_ticks(cls, root, day, services=None, symbols=None, logger=None):
+        """
+        Replay a day recorded by TickRecorder
+
+        Args:
+            root: TickRecorder root directory
+            day: Trading day ('YYYY-MM-DD')
+            services: Services to replay (default: every recorded service)
+            symbols: Optional symbols to keep
+
+        Returns:
+            ReplayStream delivering the recorded updates in receive order, grouped into one
+            frame per (receive time, service) like the stream sent them
+        """
+        return cls(lambda: tick_frames(root, day, services, symbols), logger)
+
+    # ========== STREAM SURFACE ==========
+
+    def start(self, receiver=print, daemon=True, speed=1.0, dispatcher: StreamDispatcher | None = None,
+              parsed=False, **kwargs):
+        """
+        Start replaying in a background thread
+
+        Args:
+            receiver: Function (or coroutine function) called with each message
+            daemon: Whether the replay thread is a daemon
+            speed: 1.0 for the recorded pace, >1 to accelerate, None (or 0) for max speed
+            dispatcher: Optional StreamDispatcher, as for Stream.start
+            parsed: Call the receiver with a schwabdev.StreamMessage, as for Stream.start
+            **kwargs: Keyword arguments passed to the receiver
+        """
+        if self._thread is not None and self._thread.is_alive():
+            self._logger.warning("Replay already active.")
+            return
+        self._loop_ready.clear()
+        self.finished.clear()
+        self._should_stop = False
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._run_replay(receiver, speed, dispatcher, parsed, kwargs)),
+            name='ReplayStream', daemon=daemon)
+        self._thread.start()
+        self._loop_ready.wait(timeout=4.0)
+
+    def send(self, requests, record=True):
+        """
+        Record requests into the subscriptions and queue a success response for each
+
+        Args:
+            requests: List of requests or a single request
+        """
+        if not isinstance(requests, list):
+            requests = [requests]
+        for request in requests:
+            if record:
+                self._record_request(request)
+            self._responses.append(json.dumps({'response': [{
+                'service': request.get('service'), 'command': request.get('command'),
+                'requestid': str(request.get('requestid')), 'SchwabClientCorrelId': 'replay',
+                'timestamp': int(time.time() * 1000),
+                'content': {'code': 0, 'msg': f"{request.get('command')} command succeeded"}}]}))
+
+    async def send_async(self, requests):
+        self.send(requests)
+
+    def stop(self, clear_subscriptions=True):
+        """
+        Stop the replay
+
+        Args:
+            clear_subscriptions: Clear the recorded subscriptions
+        """
+        if clear_subscriptions:
+            self.subscriptions = {}
+        self._should_stop = True
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def join(self, timeout=None):
+        """Wait for the replay to deliver every frame (or be stopped)"""
+        return self.finished.wait(timeout)
+
+    # ========== REPLAY LOOP ==========
+
+    async def _run_replay(self, receiver, speed, dispatcher, parsed, kwargs):
+        self._event_loop = asyncio.get_running_loop()
+        if parsed:
+            receiver = parsed_receiver(receiver)
+        is_async_receiver = asyncio.iscoroutinefunction(receiver)
+        if dispatcher is not None:
+            dispatcher.start(receiver, self._event_loop, **kwargs)
+
+        async def deliver(message):
+            if dispatcher is not None:
+                await dispatcher.put_async(message)
+            elif is_async_receiver:
+                await receiver(message, **kwargs)
+            else:
+                receiver(message, **kwargs)
+
+        self.delivered = 0
+        self.active = True
+        self._loop_ready.set()
+        try:
+            self.send(self.basic_request('ADMIN', 'LOGIN'), record=False)
+            first_received, wall_start = None, time.monotonic()
+            for frame in self._frames():
+                while self._responses:
+                    await deliver(self._responses.popleft())
+                if self._should_stop:
+                    break
+                received, message = frame if isinstance(frame, tuple) else (None, frame)
+                if speed and received is not None:
+                    if first_received is None:
+                        first_received = received
+                    delay = wall_start + (received - first_received) / 1000 / speed - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                message = self._subscribed(message)
+                if message is None:
+                    continue
+                await deliver(message)
+                self.delivered += 1
+            while self._responses and not self._should_stop:
+                await deliver(self._responses.popleft())
+        except Exception as e:
+            self._logger.error(f"Replay stopped: {e}")
+        finally:
+            self.active = False
+            if dispatcher is not None:
+                await asyncio.to_thread(dispatcher.stop)
+            self.finished.set()
+
+    def _subscribed(self, message):
+        """The message as a JSON string, keeping only subscribed services and keys (if any)"""
+        if not self.subscriptions:
+            return message if isinstance(message, str) else dumps(message)
+        if isinstance(message, (str, bytes)):
+            message = loads(message)
+        data = []
+        for item in message.get('data', ()):
+            keys = self.subscriptions.get(item.get('service'))
+            if not keys:
+                continue
+            content = [c for c in item.get('content', ()) if c.get('key') in keys]
+            if content:
+                data.append({**item, 'content': content})
+        if not data and 'data' in message:
+            return None
+        return dumps({**message, 'data': data} if data else message)
+
+    # ========== BENCHMARK ==========
+
+    def benchmark(self, receiver=None, parsed=False, dispatcher=None, timeout=None, **kwargs):
+        """
+        Replay at max speed and measure throughput and receiver latency
+
+        Args:
+            receiver: Receiver to drive (default: one that does nothing)
+            parsed: Decode messages for the receiver (decoding counts toward its latency)
+            dispatcher: Optional StreamDispatcher between the replay and the receiver
+            timeout: Seconds to wait for the replay to finish
+
+        Returns:
+            dict with messages, seconds, messages_per_second and latency_us
+            percentiles (p50, p90, p99, max) of the receiver calls
+        """
+        receiver = receiver or (lambda message, **kw: None)
+        if parsed:
+            receiver = parsed_receiver(receiver)
+        latencies = []
+
+        if asyncio.iscoroutinefunction(receiver):
+            async def timed(message, **kw):
+                start = time.perf_counter()
+                await receiver(message, **kw)
+                latencies.append(time.perf_counter() - start)
+        else:
+            def timed(message, **kw):
+                start = time.perf_counter()
+                receiver(message, **kw)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        self.start(timed, speed=None, dispatcher=dispatcher, **kwargs)
+        self.join(timeout)
+        seconds = time.perf_counter() - start
+        self.stop(clear_subscriptions=False)
+
+        latencies = np.array(latencies) * 1e6
+        percentiles = np.percentile(latencies, [50, 90, 99]) if len(latencies) else [np.nan] * 3
+        return {
+            'messages': len(latencies),
+            'seconds': seconds,
+            'messages_per_second': len(latencies) / seconds if seconds > 0 else np.nan,
+            'latency_us': {'p50': float(percentiles[0]), 'p90': float(percentiles[1]), 'p99': float(percentiles[2]),
+                           'max': float(latencies.max()) if len(latencies) else np.nan},
+        }
+
+
+# ========== TICK FILES ==========
+
+def tick_frames(root, day, services=None, symbols=None):
+    """
+    Rebuild stream frames from TickRecorder files
+
+    Yields:
+        (received_ms, message dict) in receive order, one frame per (receive time, service)
+    """
+    tables = []
+    for service in services or SCHEMAS:
+        rows = load_ticks(root, service, day)
+        if rows is None or len(rows) == 0:
+            continue
+        if symbols is not None:
+            rows = rows[np.isin(rows['symbol'], [s.encode() for s in symbols])]
+        if len(rows):
+            tables.append((service, rows))
+    if not tables:
+        return
+
+    received = np.concatenate([np.asarray(rows['received']) for _, rows in tables])
+    table_ids = np.concatenate([np.full(len(rows), i) for i, (_, rows) in enumerate(tables)])
+    row_ids = np.concatenate([np.arange(len(rows)) for _, rows in tables])
+    order = np.argsort(received, kind='stable')                 # ties keep service, then row order
+
+    fields = [[field for _, field in SCHEMAS[service]] for service, _ in tables]
+    frame_key, content, timestamp = None, [], None
+    for lo in range(0, len(order), FRAME_CHUNK_ROWS):
+        # pull the chunk's rows out of each table as Python values in one go
+        chunk = order[lo:lo + FRAME_CHUNK_ROWS]
+        chunk_tables, chunk_rows = table_ids[chunk], row_ids[chunk]
+        values = {}
+        for table_id, (service, rows) in enumerate(tables):
+            part = rows[chunk_rows[chunk_tables == table_id]]
+            if len(part):
+                values[table_id] = zip(np.char.decode(np.asarray(part['symbol']), 'ascii').tolist(),
+                                       np.asarray(part['timestamp']).tolist(),
+                                       *[_column_values(part, column) for column, _ in SCHEMAS[service]])
+
+        for table_id, row_received in zip(chunk_tables.tolist(), received[chunk].tolist()):
+            symbol, row_timestamp, *row = next(values[table_id])
+            key = (row_received, table_id)
+            if key != frame_key:
+                if content:
+                    yield frame_key[0], _frame(tables[frame_key[1]][0], timestamp, content)
+                frame_key, content, timestamp = key, [], row_timestamp
+            item = {field: value for field, value in zip(fields[table_id], row) if value == value}  # NaN: not sent
+            item['key'] = symbol
+            content.append(item)
+    if content:
+        yield frame_key[0], _frame(tables[frame_key[1]][0], timestamp, content)
+
+
+def _column_values(rows, column):
+    values = np.asarray(rows[column]).tolist()
+    if column in INTEGER_COLUMNS:
+        return [int(value) if value.is_integer() else value for value in values]
+    return values
+
+
+def _frame(service, timestamp, content):
+    return {'data': [{'service': service, 'timestamp': timestamp, 'command': 'SUBS', 'content': content}]}
+
+
+# ========== COMMAND LINE ==========
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded day through a stream receiver at max speed')
+    parser.add_argument('root', help='TickRecorder root directory')
+    parser.add_argument('day', help='Trading day (YYYY-MM-DD)')
+    parser.add_argument('--receiver', help='module:function to drive (default: no-op)')
+    parser.add_argument('--parsed', action='store_true', help='Deliver schwabdev.StreamMessage objects')
+    parser.add_argument('--symbols', nargs='*', help='Only replay these symbols')
+    args = parser.parse_args()
+
+    receiver = None
+    if args.receiver:
+        module, _, name = args.receiver.partition(':')
+        receiver = getattr(importlib.import_module(module), name)
+
+    replay = ReplayStream.from_ticks(args.root, args.day, symbols=args.symbols)
+    stats = replay.benchmark(receiver, parsed=args.parsed)
+    latency = stats['latency_us']
+    print(f"Replayed {args.day} from {args.root}")
+    print("=" * 80)
+    print(f"   messages:      {stats['messages']:,} in {stats['seconds']:.2f} s ({stats['messages_per_second']:,.0f} msg/s)")
+    print(f"   receiver p50:  {latency['p50']:10.1f} us")
+    print(f"   receiver p90:  {latency['p90']:10.1f} us")
+    print(f"   receiver p99:  {latency['p99']:10.1f} us")
+    print(f"   receiver max:  {latency['max']:10.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,267 @@
+"""
+Tests and benchmark for the websocket broadcast hub
+
+BroadcastHub encodes each update once on the publishing thread, hands batches to the
+server loop thread-safely and feeds every client from its own bounded queue, where
+quotes for the same symbol are conflated and the oldest update is dropped when full.
+The tests use fake websockets with a configurable send delay.
+
+Run tests:      python -m pytest test_broadcast_hub.py
+Run benchmark:  python test_broadcast_hub.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+from broadcast_hub import BroadcastHub
+
+
+class FakeWebSocket:
+    """Websocket whose send takes `delay` seconds; incoming messages are fed with push()"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.incoming = asyncio.Queue()
+
+    async def send(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        else:
+            await asyncio.sleep(0)
+        self.sent.append(json.loads(text))
+
+    def push(self, text):
+        self.incoming.put_nowait(text)
+
+    def close(self):
+        self.incoming.put_nowait(None)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        message = await self.incoming.get()
+        if message is None:
+            raise StopAsyncIteration
+        return message
+
+
+async def settle(condition, timeout=5):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+    return condition()
+
+
+def quote(symbol, price):
+    return {'type': 'quote', 'symbol': symbol, 'last': price}
+
+
+# ========== TESTS ==========
+
+def test_publish_from_another_thread():
+    async def main():
+        hub = BroadcastHub()
+        hub.attach(asyncio.get_running_loop())
+        websocket = FakeWebSocket()
+        serving = asyncio.create_task(hub.serve(websocket))
+        await asyncio.sleep(0)
+        publisher = threading.Thread(target=lambda: [hub.publish({'type': 'candle', 'i': i}, symbol='AAPL')
+                                                     for i in range(200)])
+        publisher.start()
+        await asyncio.to_thread(publisher.join)
+        assert await settle(lambda: len(websocket.sent) == 200)
+        assert [m['i'] for m in websocket.sent] == list(range(200))    # unkeyed updates keep their order
+        websocket.close()
+        await serving
+        assert hub.clients == {}
+
+    asyncio.run(main())
+
+
+def test_slow_client_gets_latest_quote_fast_client_gets_all():
+    async def main():
+        hub = BroadcastHub()
+        hub.attach(asyncio.get_running_loop())
+        fast, slow = FakeWebSocket(), FakeWebSocket(delay=0.05)
+        tasks = [asyncio.create_task(hub.serve(ws)) for ws in (fast, slow)]
+        await asyncio.sleep(0)
+        for price in range(1, 51):
+            hub.publish_many([(quote(s, price), ('quote', s), s) for s in ('AAPL', 'MSFT')])
+            await asyncio.sleep(0.001)
+        assert await settle(lambda: len(fast.sent) == 100)
+        for symbol in ('AAPL', 'MSFT'):
+            assert await settle(lambda: [m['last'] for m in slow.sent if m['symbol'] == symbol][-1:] == [50])
+        assert len(slow.sent) < 20 and hub.stats()['clients'][1]['conflated'] > 80
+        for ws in (fast, slow):
+            ws.close()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+def test_full_queue_drops_oldest():
+    async def main():
+        hub = BroadcastHub(max_queue=10)
+        hub.attach(asyncio.get_running_loop())
+        websocket = FakeWebSocket(delay=10)
+        serving = asyncio.create_task(hub.serve(websocket))
+        await asyncio.sleep(0)
+        hub.publish_many([({'i': i}, None, None) for i in range(25)])
+        assert await settle(lambda: hub.published == 25)
+        client = hub.clients[websocket]
+        assert await settle(lambda: len(client.pending) == 9)                # 15 is being sent
+        assert client.dropped == 15 and [json.loads(p)['i'] for p in client.pending.values()] == list(range(16, 25))
+        serving.cancel()
+        client.task.cancel()
+
+    asyncio.run(main())
+
+
+def test_symbol_filters_and_subscribers():
+    async def main():
+        hub = BroadcastHub()
+        hub.attach(asyncio.get_running_loop())
+        a, b, everything = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.serve(ws)) for ws in (a, b, everything)]
+        await asyncio.sleep(0)
+        hub.add_symbols(a, ['AAPL'])
+        hub.add_symbols(b, ['AAPL', 'MSFT'])
+        hub.remove_symbols(b, ['AAPL'])
+        assert hub.subscribers('AAPL') == 2 and hub.subscribers('MSFT') == 2 and hub.subscribers('TSLA') == 1
+        hub.publish_many([(quote(s, 1), ('quote', s), s) for s in ('AAPL', 'MSFT', 'TSLA')])
+        hub.send_to(a, {'type': 'latency'})
+        assert await settle(lambda: len(everything.sent) == 3)
+        assert await settle(lambda: len(a.sent) == 2 and len(b.sent) == 1)
+        assert sorted(m['type'] for m in a.sent) == ['latency', 'quote'] and b.sent[0]['symbol'] == 'MSFT'
+        a.close()
+        assert await tasks[0] == {'AAPL'}                                    # released by the caller
+        assert hub.subscribers('AAPL') == 1 and hub.subscribers('MSFT') == 2
+        for ws in (b, everything):
+            ws.close()
+        assert await asyncio.gather(*tasks[1:]) == [{'MSFT'}, None]
+
+    asyncio.run(main())
+
+
+def test_symbols_kept_for_unfiltered_clients_and_defaults():
+    async def main():
+        hub = BroadcastHub()
+        hub.attach(asyncio.get_running_loop())
+        filtered, unfiltered = FakeWebSocket(), FakeWebSocket()
+        tasks = [asyncio.create_task(hub.serve(ws)) for ws in (filtered, unfiltered)]
+        await asyncio.sleep(0)
+        hub.add_symbols(filtered, ['AAPL', 'GME'])
+        hub.remove_symbols(filtered, ['GME'])
+        assert hub.unwanted(['GME']) == []                              # the unfiltered client gets every symbol
+        filtered.close()
+        assert hub.unwanted(await tasks[0], keep=['SPY']) == []
+        unfiltered.close()
+        await tasks[1]
+        assert hub.unwanted(['AAPL', 'GME', 'SPY'], keep=['SPY']) == ['AAPL', 'GME']  # defaults are never released
+
+    asyncio.run(main())
+
+
+def test_encoded_once_and_messages_handled():
+    calls = []
+
+    def encoder(update):
+        calls.append(update)
+        return json.dumps(update)
+
+    async def main():
+        hub = BroadcastHub(encoder=encoder)
+        hub.attach(asyncio.get_running_loop())
+        handled = []
+
+        async def on_message(websocket, text):
+            handled.append(text)
+            hub.add_symbols(websocket, json.loads(text)['symbols'])
+
+        sockets = [FakeWebSocket() for _ in range(20)]
+        tasks = [asyncio.create_task(hub.serve(ws, on_message, on_connect=lambda ws: hub.send_to(ws, {'hello': 1})))
+                 for ws in sockets]
+        await asyncio.sleep(0)
+        sockets[0].push(json.dumps({'type': 'subscribe', 'symbols': ['AAPL']}))
+        assert await settle(lambda: handled)
+        hub.publish(quote('AAPL', 1), key=('quote', 'AAPL'), symbol='AAPL')
+        assert await settle(lambda: all(len(ws.sent) == 2 for ws in sockets))
+        assert sum(1 for update in calls if update.get('type') == 'quote') == 1
+        for ws in sockets:
+            ws.close()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_clients=50, n_batches=200, n_symbols=20, slow_clients=5):
+    """
+    A stream thread publishing quote batches to websocket clients (a few of them slow): the previous
+    path (json.dumps and asyncio.gather of every send per update, scheduled from the stream thread)
+    against the hub
+    """
+
+    def batches():
+        return [[quote(f'S{s:02d}', b) for s in range(n_symbols)] for b in range(n_batches)]
+
+    def sockets():
+        return [FakeWebSocket(delay=0.002 if i < slow_clients else 0.0) for i in range(n_clients)]
+
+    async def gather_path():
+        loop = asyncio.get_running_loop()
+        clients = sockets()
+        pending = []
+
+        async def broadcast(text):
+            await asyncio.gather(*(ws.send(text) for ws in clients), return_exceptions=True)
+
+        def publisher():
+            for batch in batches():
+                for update in batch:
+                    pending.append(asyncio.run_coroutine_threadsafe(broadcast(json.dumps(update)), loop))
+
+        start = time.perf_counter()
+        await asyncio.to_thread(publisher)
+        await asyncio.to_thread(lambda: [f.result() for f in pending])
+        return time.perf_counter() - start, clients
+
+    async def hub_path():
+        hub = BroadcastHub()
+        hub.attach(asyncio.get_running_loop())
+        clients = sockets()
+        tasks = [asyncio.create_task(hub.serve(ws)) for ws in clients]
+        await asyncio.sleep(0)
+
+        def publisher():
+            for batch in batches():
+                hub.publish_many([(update, ('quote', update['symbol']), update['symbol']) for update in batch])
+
+        start = time.perf_counter()
+        await asyncio.to_thread(publisher)
+        await settle(lambda: hub.published == n_batches * n_symbols and not any(c.pending for c in hub.clients.values()),
+                     timeout=120)
+        elapsed = time.perf_counter() - start
+        for ws in clients:
+            ws.close()
+        await asyncio.gather(*tasks)
+        return elapsed, clients
+
+    updates = n_batches * n_symbols
+    print(f"{updates} quote updates ({n_symbols} symbols) to {n_clients} clients, {slow_clients} of them 2 ms per send")
+    print("=" * 80)
+    for name, path in (('gather per update:', gather_path), ('BroadcastHub:', hub_path)):
+        elapsed, clients = asyncio.run(path())
+        fast = sum(len(ws.sent) for ws in clients[slow_clients:]) / (n_clients - slow_clients)
+        slow = sum(len(ws.sent) for ws in clients[:slow_clients]) / slow_clients
+        print(f"   {name:20s} {elapsed * 1000:8.1f} ms until delivered  "
+              f"{fast:7.0f} sends per fast client  {slow:7.0f} per slow client")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,139 @@
+"""
+Tests and benchmark for price_history candle decoding
+
+candle_store.decode_candles parses a price_history body once and reads the candles
+straight into typed NumPy columns (int64 epoch ms, float64 OHLC, int64 volume), which
+the DataFrame wraps without copying. SchwabDataFetcher uses it for every response and
+keeps the generic list-of-dicts conversion for candles in any other shape.
+
+Run tests:      python -m pytest test_candle_decoding.py
+Run benchmark:  python test_candle_decoding.py
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from candle_store import decode_candles
+from ensemble_trading_model import SchwabDataFetcher
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+def make_body(n=500, start_ms=1_700_000_000_000, step_ms=60_000, seed=0):
+    """price_history response body with n candles as the API sends them"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.5, n))
+    candles = [{'open': round(c - 0.1, 4), 'high': round(c + 0.3, 4), 'low': round(c - 0.4, 4),
+                'close': round(c, 4), 'volume': int(v), 'datetime': start_ms + i * step_ms}
+               for i, (c, v) in enumerate(zip(close, rng.integers(100, 1_000_000, n)))]
+    return json.dumps({'candles': candles, 'symbol': 'AAPL', 'empty': False}).encode()
+
+
+def list_of_dicts_frame(data):
+    """The conversion SchwabDataFetcher used before decode_candles"""
+    df = pd.DataFrame(data['candles'])
+    df['datetime'] = pd.to_datetime(df['datetime'], unit='ms', errors='coerce')
+    df = df.dropna(subset=['datetime'])
+    df.set_index('datetime', inplace=True)
+    return df[OHLCV]
+
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, body):
+        self.content = body
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeClient:
+    def __init__(self, body):
+        self.body = body
+
+    def price_history(self, symbol, **kwargs):
+        return FakeResponse(self.body)
+
+
+# ========== TESTS ==========
+
+def test_decoded_frame_matches_list_of_dicts_path():
+    body = make_body()
+    expected = list_of_dicts_frame(json.loads(body))
+    for payload in (body, body.decode(), json.loads(body)):
+        data, df = decode_candles(payload)
+        assert data['symbol'] == 'AAPL'
+        pd.testing.assert_frame_equal(df, expected)
+    assert df.dtypes.tolist() == [np.float64] * 4 + [np.int64]
+    assert df.index.dtype == 'datetime64[ms]' and df.index.name == 'datetime'
+
+
+def test_frame_wraps_decoded_columns():
+    _, df = decode_candles(make_body())
+    assert len(df._mgr.blocks) == 5                             # one block per column, nothing consolidated
+    for col in OHLCV:
+        assert df[col].to_numpy().flags['C_CONTIGUOUS']
+
+
+def test_nonstandard_candles_fall_back():
+    candles = json.loads(make_body(5))['candles']
+    candles[1]['close'] = None                                  # NaN, as in the list-of-dicts frame
+    pd.testing.assert_frame_equal(decode_candles({'candles': candles})[1], list_of_dicts_frame({'candles': candles}))
+    candles[2]['datetime'] = None                               # integer columns cannot hold nulls
+    assert decode_candles({'candles': candles})[1] is None
+    assert len(SchwabDataFetcher(None)._price_history_frame('AAPL', {'candles': candles})) == 4
+    renamed = [{'time' if k == 'datetime' else k: v for k, v in c.items()} for c in json.loads(make_body(5))['candles']]
+    assert decode_candles({'candles': renamed})[1] is None      # other field names
+    assert decode_candles({'candles': []})[1] is None
+    df = SchwabDataFetcher(None)._price_history_frame('AAPL', {'candles': renamed})
+    assert len(df) == 5 and df.columns.tolist() == OHLCV
+
+
+def test_errors_still_raised():
+    fetcher = SchwabDataFetcher(None)
+    with pytest.raises(ValueError, match='API error'):
+        fetcher._price_history_frame('AAPL', b'{"error": "invalid symbol"}')
+    with pytest.raises(ValueError, match='Empty candle data'):
+        fetcher._price_history_frame('AAPL', b'{"candles": [], "empty": true}')
+
+
+def test_fetcher_decodes_response_body():
+    body = make_body(50)
+    df = SchwabDataFetcher(FakeClient(body)).get_price_history('AAPL')
+    pd.testing.assert_frame_equal(df, list_of_dicts_frame(json.loads(body)))
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(repeats=20):
+    cases = [
+        ('20 years daily', make_body(20 * 252, step_ms=86_400_000)),
+        ('10 days 1-minute', make_body(10 * 960)),
+    ]
+    fetcher = SchwabDataFetcher(None)
+    print("price_history response body -> OHLCV DataFrame")
+    print("=" * 80)
+    for name, body in cases:
+        response = FakeResponse(body)
+
+        def per_call(convert):
+            start = time.perf_counter()
+            for _ in range(repeats):
+                convert()
+            return (time.perf_counter() - start) / repeats * 1000
+
+        old = per_call(lambda: list_of_dicts_frame(response.json()))
+        new = per_call(lambda: fetcher._price_history_frame('AAPL', response.content))
+        n = len(json.loads(body)['candles'])
+        print(f"   {name:18s} ({n:5d} candles)  json + list of dicts: {old:7.2f} ms   "
+              f"decode_candles: {new:7.2f} ms   ({old / new:4.1f}x)")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,247 @@
+"""
+Tests and benchmark for the on-disk candle store
+
+CandleStore keeps one memory-mapped structured array per (symbol, frequencyType, frequency),
+merging writes with the newest row winning on duplicate timestamps and saving atomically.
+SchwabDataFetcher(client, store=...) plans each request against it: one full fetch for
+history it has never covered, a tail-only fetch from the last stored bar when the request
+runs past what was fetched and the last fetch up to the present is older than refresh_interval,
+and no API call at all otherwise. Request bounds are local datetimes; the store and the API
+index are UTC-naive.
+
+Run tests:      python -m pytest test_candle_store.py
+Run benchmark:  python test_candle_store.py
+"""
+
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import candle_store
+from candle_store import CandleStore
+from ensemble_trading_model import SchwabDataFetcher
+
+OHLCV = ['open', 'high', 'low', 'close', 'volume']
+
+
+def make_frame(start, periods, freq='D', close=100.0):
+    """OHLCV frame with a UTC-naive datetime index, as SchwabDataFetcher returns it"""
+    index = pd.date_range(start, periods=periods, freq=freq, name='datetime').as_unit('ms')
+    c = close + np.arange(periods, dtype='f8')
+    return pd.DataFrame({'open': c - 0.5, 'high': c + 1, 'low': c - 1, 'close': c,
+                         'volume': np.arange(periods, dtype='i8') + 1000}, index=index)
+
+
+class FakeResponse:
+    status_code = 200
+    text = ''
+
+    def __init__(self, body):
+        self.content = body
+
+
+class FakeClient:
+    """
+    Serves price_history from a fixed UTC candle history; naive startDate/endDate are local
+    times, converted with .timestamp() like schwabdev's Client does
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.calls = []
+
+    def price_history(self, symbol, periodType=None, period=None, frequencyType=None, frequency=None,
+                      startDate=None, endDate=None):
+        self.calls.append(dict(periodType=periodType, period=period, frequencyType=frequencyType,
+                               frequency=frequency, startDate=startDate, endDate=endDate))
+        df = self.history
+        if startDate is not None:
+            df = df[df.index >= pd.Timestamp(startDate.timestamp(), unit='s')]
+        if endDate is not None:
+            df = df[df.index <= pd.Timestamp(endDate.timestamp(), unit='s')]
+        candles = [{'open': o, 'high': h, 'low': l, 'close': c, 'volume': int(v), 'datetime': int(t)}
+                   for t, o, h, l, c, v in zip(df.index.asi8, *(df[col] for col in OHLCV))]
+        return FakeResponse(json.dumps({'candles': candles, 'symbol': symbol, 'empty': not candles}).encode())
+
+
+@pytest.fixture
+def local_tz():
+    """Run with the process in New York time, so local and UTC request bounds differ"""
+    previous = os.environ.get('TZ')
+    os.environ['TZ'] = 'America/New_York'
+    time.tzset()
+    yield
+    if previous is None:
+        del os.environ['TZ']
+    else:
+        os.environ['TZ'] = previous
+    time.tzset()
+
+
+# ========== TESTS ==========
+
+def test_write_merges_last_duplicate_wins(tmp_path):
+    store = CandleStore(tmp_path)
+    store.write('AAPL', make_frame('2024-01-01', 5))
+    newer = make_frame('2024-01-04', 4, close=200.0)
+    store.write('AAPL', newer.iloc[::-1])                       # unsorted input is fine
+    df = store.read('AAPL')
+    assert df.index.equals(pd.date_range('2024-01-01', periods=7, freq='D', name='datetime').as_unit('ms'))
+    assert df['close'].tolist() == [100.0, 101.0, 102.0, 200.0, 201.0, 202.0, 203.0]
+    assert df.dtypes.tolist() == [np.float64] * 4 + [np.int64]
+    part = store.read('AAPL', start=datetime(2024, 1, 3), end=datetime(2024, 1, 5))
+    assert part['close'].tolist() == [102.0, 200.0, 201.0]
+    assert store.read('AAPL', start=datetime(2025, 1, 1)) is None
+    assert store.symbols() == ['AAPL'] and store.read('MSFT') is None
+
+
+def test_write_is_atomic(tmp_path, monkeypatch):
+    store = CandleStore(tmp_path)
+    store.write('AAPL', make_frame('2024-01-01', 5))
+    mapped = store.load('AAPL')
+    store.write('AAPL', make_frame('2024-01-01', 5, close=500.0))
+    assert mapped['close'][0] == 100.0                          # open maps keep the old file
+    assert store.load('AAPL')['close'][0] == 500.0
+
+    def failing_save(f, array):
+        f.write(b'partial')
+        raise OSError('disk full')
+
+    monkeypatch.setattr(candle_store.np, 'save', failing_save)
+    with pytest.raises(OSError):
+        store.write('AAPL', make_frame('2024-02-01', 5))
+    monkeypatch.undo()
+    assert store.read('AAPL')['close'].tolist() == [500.0, 501.0, 502.0, 503.0, 504.0]
+    assert sorted(os.listdir(tmp_path / 'daily_1')) == ['AAPL.json', 'AAPL.npy']
+
+
+def test_covers_and_is_fresh(tmp_path, monkeypatch):
+    store = CandleStore(tmp_path, refresh_interval=60)
+    assert not store.covers('AAPL', datetime(2024, 1, 1)) and not store.is_fresh('AAPL')
+    store.write('AAPL', make_frame('2024-01-05', 3), covered_from=datetime(2024, 1, 3), covered_to=datetime(2024, 1, 7))
+    assert not store.is_fresh('AAPL')                           # a past window says nothing about today
+    store.write('AAPL', make_frame('2024-01-07', 3), covered_from=datetime(2024, 1, 7), covered_to=datetime(2024, 1, 9),
+                refreshed=True)
+    assert store.covers('AAPL', datetime(2024, 1, 3))           # touching spans are merged
+    assert not store.covers('AAPL', datetime(2024, 1, 2))
+    assert store.covered_to('AAPL') == pd.Timestamp('2024-01-09')
+    assert store.is_fresh('AAPL') and not store.is_fresh('AAPL', 'minute', 1)
+    now = time.time()
+    monkeypatch.setattr(candle_store.time, 'time', lambda: now + 61)
+    assert not store.is_fresh('AAPL')
+
+    store.write('AAPL', make_frame('2024-03-01', 3), covered_from=datetime(2024, 3, 1), covered_to=datetime(2024, 3, 3))
+    assert not store.covers('AAPL', datetime(2024, 2, 1))       # a span with a gap is not claimed
+    assert store.covers('AAPL', datetime(2024, 3, 1)) and store.covered_to('AAPL') == pd.Timestamp('2024-03-03')
+
+
+def test_fetcher_fetches_tail_only_and_nothing_when_fresh(tmp_path):
+    client = FakeClient(make_frame(pd.Timestamp.now().normalize() - pd.Timedelta(days=99), 100))
+    fetcher = SchwabDataFetcher(client, store=CandleStore(tmp_path, refresh_interval=900))
+    first = fetcher.get_price_history('AAPL')
+    assert len(client.calls) == 1 and client.calls[0]['periodType'] == 'year' and client.calls[0]['startDate'] is None
+    assert len(first) == 100
+
+    pd.testing.assert_frame_equal(fetcher.get_price_history('AAPL'), first)
+    assert len(client.calls) == 1                               # within refresh_interval
+
+    fetcher.store.refresh_interval = 0
+    last_bar = client.history.index[-1]
+    client.history = make_frame(client.history.index[0], 100, close=100.0)
+    client.history.loc[last_bar, 'close'] = 999.0              # the refetched last bar replaces the stored one
+    latest = fetcher.get_price_history('AAPL')
+    tail = client.calls[-1]
+    assert len(client.calls) == 2 and tail['periodType'] == 'year' and tail['period'] is None
+    assert pd.Timestamp(tail['startDate'].timestamp(), unit='s') == last_bar
+    assert latest['close'].iloc[-1] == 999.0 and len(latest) == 100
+
+    fetcher.get_price_history('AAPL', period=2)                 # older than anything covered: full fetch
+    assert len(client.calls) == 3 and client.calls[-1]['period'] == 2
+
+
+def test_fetcher_converts_local_bounds_to_utc(tmp_path, local_tz):
+    client = FakeClient(make_frame('2024-01-02 14:30', 91, freq='min'))
+    fetcher = SchwabDataFetcher(client, store=CandleStore(tmp_path))
+    kwargs = dict(periodType='day', period=1, frequencyType='minute', frequency=1)
+    df = fetcher.get_price_history('SPY', startDate=datetime(2024, 1, 2, 9, 30), endDate=datetime(2024, 1, 2, 10, 0), **kwargs)
+    assert df.index[0] == pd.Timestamp('2024-01-02 14:30') and df.index[-1] == pd.Timestamp('2024-01-02 15:00')
+    assert len(df) == 31
+
+    assert fetcher.get_price_history('SPY', startDate=datetime(2024, 1, 2, 9, 45), endDate=datetime(2024, 1, 2, 10, 0), **kwargs) is not None
+    assert len(client.calls) == 1                               # inside the fetched window
+
+    df = fetcher.get_price_history('SPY', startDate=datetime(2024, 1, 2, 9, 30), endDate=datetime(2024, 1, 2, 11, 0), **kwargs)
+    refetch = client.calls[-1]
+    assert len(client.calls) == 2 and refetch['startDate'] == datetime(2024, 1, 2, 9, 30)
+    assert df.index[-1] == pd.Timestamp('2024-01-02 16:00') and len(df) == 91  # past the minute history: full fetch
+
+
+def test_fetcher_minute_tail_in_local_time(tmp_path, local_tz):
+    day = (pd.Timestamp.now().normalize() - pd.offsets.BDay(2)).to_pydatetime()
+    open_utc = pd.Timestamp(day.replace(hour=9, minute=30).timestamp(), unit='s')
+    client = FakeClient(make_frame(open_utc, 91, freq='min'))
+    fetcher = SchwabDataFetcher(client, store=CandleStore(tmp_path, refresh_interval=0))
+    kwargs = dict(periodType='day', period=1, frequencyType='minute', frequency=1, startDate=day.replace(hour=9, minute=30))
+    assert len(fetcher.get_price_history('SPY', endDate=day.replace(hour=10), **kwargs)) == 31
+    df = fetcher.get_price_history('SPY', endDate=day.replace(hour=11), **kwargs)
+    tail = client.calls[-1]
+    assert len(client.calls) == 2 and tail['periodType'] == 'day' and tail['period'] is None
+    assert tail['startDate'] == day.replace(hour=10)            # last stored bar, in local time
+    assert len(df) == 91
+
+
+def test_fetcher_historical_then_current(tmp_path):
+    today = pd.Timestamp.now().normalize()
+    client = FakeClient(make_frame('2023-01-01', (today - pd.Timestamp('2023-01-01')).days + 1))
+    fetcher = SchwabDataFetcher(client, store=CandleStore(tmp_path, refresh_interval=900))
+    old = fetcher.get_price_history('X', startDate=datetime(2023, 1, 1), endDate=datetime(2023, 6, 1))
+    assert old.index[-1] <= pd.Timestamp('2023-06-01 12:00')
+
+    current = fetcher.get_price_history('X', periodType='year', period=1)
+    assert len(client.calls) == 2                               # the old window says nothing about the last year
+    assert client.calls[-1]['startDate'] <= datetime(2023, 6, 2) and client.calls[-1]['period'] is None
+    assert current is not None and current.index[-1] == client.history.index[-1]
+    assert current.index[0] >= today - pd.Timedelta(days=367)
+
+    pd.testing.assert_frame_equal(fetcher.get_price_history('X', periodType='year', period=1), current)
+    assert len(client.calls) == 2                               # now fresh
+    mid = fetcher.get_price_history('X', startDate=datetime(2023, 3, 1), endDate=datetime(2024, 3, 1))
+    assert len(client.calls) == 2                               # inside the fetched span
+    assert mid.index[0] <= pd.Timestamp('2023-03-02') and mid.index[-1] >= pd.Timestamp('2024-02-29')
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=200, years=20):
+    history = make_frame(pd.Timestamp.now().normalize() - pd.Timedelta(days=365 * years - 1), 365 * years)
+    symbols = [f'SYM{i}' for i in range(n_symbols)]
+    with tempfile.TemporaryDirectory() as root:
+        client = FakeClient(history)
+        fetcher = SchwabDataFetcher(client, store=CandleStore(root))
+
+        start = time.perf_counter()
+        for symbol in symbols:
+            fetcher.get_price_history(symbol, period=years)
+        first = time.perf_counter() - start
+
+        calls = len(client.calls)
+        start = time.perf_counter()
+        for symbol in symbols:
+            fetcher.get_price_history(symbol, period=years)
+        cached = time.perf_counter() - start
+
+        print(f"{years} years of daily candles for {n_symbols} symbols")
+        print("=" * 80)
+        print(f"   first request (fetch + store):  {first:7.3f} s  ({first / n_symbols * 1000:6.2f} ms/symbol)")
+        print(f"   repeat request (local read):    {cached:7.3f} s  ({cached / n_symbols * 1000:6.2f} ms/symbol)  "
+              f"API calls: {len(client.calls) - calls}")
+
+
+if __name__ == '__main__':
+    benchmark()
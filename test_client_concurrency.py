@@ -0,0 +1,131 @@
+"""
+Tests and benchmark for concurrent calls over one schwabdev.Client
+
+Client._request only holds its lock while reading the auth header, so threads sharing
+a Client overlap their network round trips on a pooled requests.Session. These tests
+run the client against a local HTTP server that answers after a fixed delay.
+
+Run tests:      python -m pytest test_client_concurrency.py
+Run benchmark:  python test_client_concurrency.py
+"""
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from schwabdev import Client, RequestScheduler
+
+DELAY = 0.2
+
+
+class FakeTokens:
+    access_token = 'token-1'
+
+    def update_tokens(self, force_access_token=False, force_refresh_token=False):
+        return False
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    """Echoes the Authorization header after DELAY seconds"""
+
+    def do_GET(self):
+        time.sleep(DELAY)
+        body = json.dumps({'authorization': self.headers.get('Authorization'), 'path': self.path}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class QuoteServer(ThreadingHTTPServer):
+    request_queue_size = 128                                    # default backlog of 5 drops bursts of connects
+
+
+def start_server():
+    server = QuoteServer(('127.0.0.1', 0), QuoteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(server, pool_size=10):
+    """Client wired to the local server without touching a tokens database"""
+    client = Client.__new__(Client)
+    client.version = 'test'
+    client.timeout = 10
+    client.logger = logging.getLogger('Schwabdev')
+    client.scheduler = RequestScheduler(rate_per_minute=None)
+    client.tokens = FakeTokens()
+    client._base_api_url = f'http://127.0.0.1:{server.server_address[1]}'
+    client._init_session(pool_size)
+    return client
+
+
+def fan_out(client, n_calls, n_threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as pool:
+        responses = list(pool.map(lambda i: client.quote(f'SYM{i}'), range(n_calls)))
+    return responses, time.perf_counter() - start
+
+
+# ========== TESTS ==========
+
+def test_threads_overlap_round_trips():
+    server = start_server()
+    client = make_client(server)
+    responses, elapsed = fan_out(client, 8, 8)
+    assert all(response.ok for response in responses)
+    assert elapsed < DELAY * 3                                  # serialized would take 8 * DELAY
+    server.shutdown()
+
+
+def test_auth_header_follows_token_update():
+    server = start_server()
+    client = make_client(server)
+    assert client.quote('AAPL').json()['authorization'] == 'Bearer token-1'
+    client.tokens.access_token = 'token-2'
+    client.tokens.update_tokens = lambda *args: True
+    assert client.quote('AAPL').json()['authorization'] == 'Bearer token-2'
+    server.shutdown()
+
+
+def test_pool_size_must_be_positive():
+    server = start_server()
+    try:
+        make_client(server, pool_size=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("pool_size=0 was accepted")
+    server.shutdown()
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_calls=32, n_threads=16):
+    server = start_server()
+    client = make_client(server, pool_size=n_threads)
+
+    start = time.perf_counter()
+    for i in range(n_calls):
+        client.quote(f'SYM{i}')
+    sequential_time = time.perf_counter() - start
+
+    _, threaded_time = fan_out(client, n_calls, n_threads)
+    server.shutdown()
+
+    print(f"{n_calls} quote calls, {DELAY * 1000:.0f} ms server latency, {n_threads} threads sharing one Client")
+    print("=" * 80)
+    print(f"   sequential:          {sequential_time:6.2f} s")
+    print(f"   ThreadPoolExecutor:  {threaded_time:6.2f} s")
+    print(f"   speedup:             {sequential_time / threaded_time:6.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
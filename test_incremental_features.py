@@ -0,0 +1,134 @@
+"""
+Equivalence tests and latency benchmark for the incremental feature engine
+
+Feeding candles one at a time (from history or CHART_EQUITY messages) must give the
+same feature vector as running create_features over the full history and taking the
+last row.
+
+Run tests:      python -m pytest test_incremental_features.py
+Run benchmark:  python test_incremental_features.py
+"""
+
+import json
+import time
+import numpy as np
+import pandas as pd
+
+import schwabdev
+from ensemble_trading_model import SchwabDataFetcher
+from incremental_features import FeatureEngine, IncrementalFeatures
+from test_vectorized_features import make_ohlcv
+
+
+def make_minute_bars(n, seed=0):
+    """Minute candles indexed like get_price_history (UTC-naive, no index freq)"""
+    df = make_ohlcv(n, freq='min', seed=seed)
+    df.index = pd.DatetimeIndex(df.index.values, name='datetime')
+    return df
+
+
+def chart_equity_message(symbol, ts, row, sequence=0):
+    """CHART_EQUITY stream message for one candle"""
+    return json.dumps({'data': [{
+        'service': 'CHART_EQUITY',
+        'timestamp': int(ts.value // 1_000_000),
+        'command': 'SUBS',
+        'content': [{
+            'key': symbol, '1': sequence,
+            '2': row['open'], '3': row['high'], '4': row['low'], '5': row['close'],
+            '6': int(row['volume']), '7': int(ts.value // 1_000_000), '8': 0,
+        }],
+    }]})
+
+
+def assert_matches_batch(values, columns, history):
+    expected = SchwabDataFetcher(None).create_features(history)
+    assert list(expected.columns) == columns
+    assert expected.index[-1] == history.index[-1], "batch path dropped the last row"
+    np.testing.assert_allclose(values, expected.iloc[-1].to_numpy(dtype='f8'), rtol=1e-8, atol=1e-10)
+
+
+# ========== TESTS ==========
+
+def test_seed_matches_batch_last_row():
+    df = make_minute_bars(400)
+    engine = FeatureEngine()
+    engine.seed('AAPL', df)
+    assert engine.states['AAPL'].is_warm()
+    assert_matches_batch(engine.latest('AAPL').to_numpy(), engine.columns, df)
+
+
+def test_chart_equity_stream_matches_batch():
+    df = make_minute_bars(460, seed=3)
+    engine = FeatureEngine()
+    engine.seed('MSFT', df.iloc[:300])
+    for i in range(300, len(df)):
+        updated = engine.on_chart_equity(chart_equity_message('MSFT', df.index[i], df.iloc[i], i))
+        assert set(updated) == {'MSFT'}
+        if i % 40 == 0 or i == len(df) - 1:
+            assert_matches_batch(updated['MSFT'], engine.columns, df.iloc[:i + 1])
+
+
+def test_parsed_chart_equity_matches_raw():
+    df = make_minute_bars(320, seed=5)
+    raw, parsed = FeatureEngine(), FeatureEngine()
+    raw.seed('MSFT', df.iloc[:300])
+    parsed.seed('MSFT', df.iloc[:300])
+    for i in range(300, len(df)):
+        message = chart_equity_message('MSFT', df.index[i], df.iloc[i], i)
+        expected = raw.on_chart_equity(message)
+        updated = parsed.on_chart_equity(schwabdev.parse_message(message))
+        np.testing.assert_array_equal(updated['MSFT'], expected['MSFT'])
+
+
+def test_replayed_candles_are_ignored():
+    df = make_minute_bars(200)
+    engine = FeatureEngine()
+    engine.seed('AAPL', df)
+    before = engine.latest('AAPL').to_numpy().copy()
+    assert engine.on_chart_equity(chart_equity_message('AAPL', df.index[-1], df.iloc[-1])) == {}
+    np.testing.assert_array_equal(engine.latest('AAPL').to_numpy(), before)
+
+
+def test_warm_up_is_nan():
+    state = IncrementalFeatures()
+    df = make_minute_bars(30)
+    for ts, row in df.iterrows():
+        values = state.update(row['open'], row['high'], row['low'], row['close'], row['volume'], ts)
+    assert not state.is_warm()
+    features = pd.Series(values, index=state.columns)
+    assert np.isnan(features['return_63d'])
+    assert not np.isnan(features['rsi'])
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_history=3900, n_stream=500):
+    df = make_minute_bars(n_history + n_stream)
+    fetcher = SchwabDataFetcher(None)
+    engine = FeatureEngine()
+    engine.seed('AAPL', df.iloc[:n_history])
+    messages = [chart_equity_message('AAPL', df.index[i], df.iloc[i], i) for i in range(n_history, len(df))]
+
+    latencies = []
+    for message in messages:
+        start = time.perf_counter()
+        engine.on_chart_equity(message)
+        latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1e6
+
+    start = time.perf_counter()
+    for i in range(n_history, n_history + 20):
+        fetcher.create_features(df.iloc[:i + 1])
+    batch_time = (time.perf_counter() - start) / 20 * 1e6
+
+    print(f"Per-candle feature latency ({n_history} bars of history, {len(engine.columns)} features)")
+    print("=" * 80)
+    print(f"   incremental p50: {np.percentile(latencies, 50):10.1f} us")
+    print(f"   incremental p99: {np.percentile(latencies, 99):10.1f} us")
+    print(f"   batch rerun:     {batch_time:10.1f} us")
+    print(f"   speedup (p50):   {batch_time / np.percentile(latencies, 50):10.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
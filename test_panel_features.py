@@ -0,0 +1,125 @@
+"""
+Equivalence tests and benchmark for the panel feature builder
+
+build_panel_features computes the create_features column set for many symbols at
+once on a stacked (symbol, time) array. These tests check it against the per-symbol
+create_features output (float32 tolerance) with histories of different lengths.
+
+Run tests:      python -m pytest test_panel_features.py
+Run benchmark:  python test_panel_features.py
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from ensemble_trading_model import SchwabDataFetcher
+from panel_features import stack_ohlcv, build_panel_features, panel_to_frames, feature_columns, OHLCV_COLUMNS
+from test_vectorized_features import make_ohlcv
+
+
+def make_universe(lengths, freq='B'):
+    """One synthetic history per length (different lengths exercise the left padding)"""
+    frames = {}
+    for i, n in enumerate(lengths):
+        df = make_ohlcv(n, freq=freq, seed=i)
+        # API candles carry no index freq (a 'B' freq would make is_month_end business-aware)
+        df.index = pd.DatetimeIndex(df.index.values)
+        frames[f'SYM{i}'] = df
+    return frames
+
+
+def assert_frames_close(actual, expected):
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_index_equal(actual.index.as_unit('ns'), expected.index.as_unit('ns'), check_names=False)
+    np.testing.assert_allclose(actual.to_numpy(dtype='f8'), expected.to_numpy(dtype='f8'),
+                               rtol=2e-4, atol=1e-4)
+
+
+# ========== TESTS ==========
+
+def test_panel_matches_create_features():
+    frames = make_universe([400, 260, 180])
+    fetcher = SchwabDataFetcher(None)
+
+    symbols, ohlcv, times = stack_ohlcv(frames)
+    block, columns = build_panel_features(ohlcv, times)
+    panel = panel_to_frames(block, columns, symbols, times)
+
+    assert block.dtype == np.float32
+    assert block.shape == (3, 400, len(columns))
+    for symbol, df in frames.items():
+        assert_frames_close(panel[symbol], fetcher.create_features(df))
+
+
+def test_panel_chunking_is_invisible():
+    frames = make_universe([300, 250, 220, 200])
+    symbols, ohlcv, times = stack_ohlcv(frames)
+    block, _ = build_panel_features(ohlcv, times)
+    chunked, _ = build_panel_features(ohlcv, times, chunk_cells=1)
+    np.testing.assert_array_equal(block, chunked)
+
+
+def test_panel_without_datetime_index():
+    df = make_ohlcv(200).reset_index(drop=True)
+    symbols, ohlcv, times = stack_ohlcv({'SYM0': df})
+    block, columns = build_panel_features(ohlcv, times)
+    assert times is None
+    assert columns == feature_columns(include_time=False)
+    expected = SchwabDataFetcher(None).create_features(df)
+    actual = panel_to_frames(block, columns, symbols, times)['SYM0']
+    assert list(actual.columns) == list(expected.columns)
+    np.testing.assert_allclose(actual.to_numpy(dtype='f8'), expected.to_numpy(dtype='f8'), rtol=2e-4, atol=1e-4)
+
+
+def test_padding_rows_are_nan():
+    frames = make_universe([120, 80])
+    symbols, ohlcv, times = stack_ohlcv(frames)
+    block, columns = build_panel_features(ohlcv, times)
+    assert np.isnan(block[1, :40]).all()
+    assert not np.isnan(block[1, 40:, columns.index('close')]).any()
+    assert not np.isnan(block[1, 40:, columns.index('rsi_overbought')]).any()
+
+
+def test_screener_panel_keeps_float64():
+    from stock_screener import StockScreener
+    screener = StockScreener(None)
+    screener.stock_data = make_universe([260, 200])
+    panel = screener.calculate_indicators()
+    per_symbol = screener.calculate_indicators(panel=False)
+    for symbol, df in per_symbol.items():
+        assert panel[symbol].dtypes.tolist() == df.dtypes.tolist()
+        assert_frames_close(panel[symbol], df)
+        np.testing.assert_array_equal(panel[symbol][OHLCV_COLUMNS].to_numpy(), df[OHLCV_COLUMNS].to_numpy())
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=1000, n_bars=252):
+    frames = make_universe([n_bars] * n_symbols)
+    fetcher = SchwabDataFetcher(None)
+
+    start = time.perf_counter()
+    for df in frames.values():
+        fetcher.create_features(df)
+    per_symbol_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    symbols, ohlcv, times = stack_ohlcv(frames)
+    block, columns = build_panel_features(ohlcv, times)
+    panel_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    panel_to_frames(block, columns, symbols, times)
+    split_time = time.perf_counter() - start
+
+    print(f"{n_symbols} symbols x {n_bars} bars, {len(columns)} features")
+    print("=" * 80)
+    print(f"   create_features per symbol:  {per_symbol_time:8.2f} s")
+    print(f"   panel (stack + build):       {panel_time:8.2f} s")
+    print(f"   panel_to_frames:             {split_time:8.2f} s")
+    print(f"   speedup:                     {per_symbol_time / (panel_time + split_time):8.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
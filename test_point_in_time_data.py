@@ -0,0 +1,102 @@
+"""
+Tests and benchmark for the full-system backtest's point-in-time history
+
+PointInTimeData fetches each symbol's daily history once and hands out as_of(date)
+views: positional slices of the loaded frame holding bars in (date - lookback, date],
+so a simulated day never sees a later bar and no history is copied or refetched.
+
+Run tests:      python -m pytest test_point_in_time_data.py
+Run benchmark:  python test_point_in_time_data.py
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from backtest_full_system import PointInTimeData
+
+
+def make_history(start='2022-01-03', periods=750):
+    index = pd.bdate_range(start, periods=periods, name='datetime')
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1, periods))
+    return pd.DataFrame({'open': close, 'high': close + 1, 'low': close - 1, 'close': close,
+                         'volume': np.full(periods, 1000)}, index=index)
+
+
+class FakeFetcher:
+    def __init__(self, histories):
+        self.histories = histories
+        self.calls = []
+
+    def get_price_history(self, symbol, **kwargs):
+        self.calls.append((symbol, kwargs))
+        history = self.histories[symbol]
+        if isinstance(history, Exception):
+            raise history
+        return history
+
+
+# ========== TESTS ==========
+
+def test_as_of_never_returns_later_rows():
+    history = make_history()
+    data = PointInTimeData(FakeFetcher({'AAPL': history.iloc[::-1]}), datetime(2023, 1, 2), lookback_days=90)
+    for current in history.index[::37].append(pd.DatetimeIndex([pd.Timestamp('2023-06-03 12:00')])):
+        view = data.as_of('AAPL', current)
+        expected = history[(history.index <= current) & (history.index > current - pd.Timedelta(days=90))]
+        pd.testing.assert_frame_equal(view, expected)
+        assert view.index.max() <= current
+    assert data.as_of('AAPL', history.index[0] - pd.Timedelta(days=1)).empty
+    assert len(data.as_of('AAPL', history.index[-1], lookback_days=7)) == 5
+
+
+def test_as_of_returns_views_of_one_load():
+    fetcher = FakeFetcher({'AAPL': make_history()})
+    data = PointInTimeData(fetcher, datetime(2023, 1, 2))
+    loaded = data.load('AAPL')
+    for current in pd.bdate_range('2023-01-02', periods=50):
+        view = data.as_of('AAPL', current)
+        assert np.shares_memory(view['close'].to_numpy(), loaded['close'].to_numpy())
+    assert len(fetcher.calls) == 1 and fetcher.calls[0][1]['periodType'] == 'year'
+
+
+def test_failed_load_reported_and_cached(capsys):
+    fetcher = FakeFetcher({'BAD': RuntimeError('store unreadable'), 'EMPTY': make_history().iloc[:0]})
+    data = PointInTimeData(fetcher, datetime(2023, 1, 2))
+    assert data.as_of('BAD', datetime(2024, 1, 2)) is None and data.load('BAD') is None
+    out = capsys.readouterr().out
+    assert out.count('Failed to load history for BAD: store unreadable') == 1
+    assert data.as_of('EMPTY', datetime(2024, 1, 2)) is None
+    assert [symbol for symbol, _ in fetcher.calls] == ['BAD', 'EMPTY']
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=50, n_days=250):
+    histories = {f'SYM{i}': make_history(periods=1500) for i in range(n_symbols)}
+    data = PointInTimeData(FakeFetcher(histories), datetime(2024, 1, 2))
+    data.preload(histories)
+    days = pd.bdate_range('2024-01-02', periods=n_days)
+
+    start = time.perf_counter()
+    for current in days:
+        for symbol, history in histories.items():
+            history[(history.index <= current) & (history.index > current - pd.Timedelta(days=730))]
+    masked = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for current in days:
+        for symbol in histories:
+            data.as_of(symbol, current)
+    views = time.perf_counter() - start
+
+    print(f"{n_symbols} symbols x {n_days} simulated days, 730-day window")
+    print("=" * 80)
+    print(f"   boolean-mask copy:   {masked:7.3f} s")
+    print(f"   as_of view:          {views:7.3f} s  ({masked / views:4.1f}x)")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,192 @@
+"""
+Tests and benchmark for concurrent price history fetching
+
+ClientAsync.price_history_many runs many pricehistory calls on one aiohttp session,
+bounded by a semaphore, retrying 5xx and connection errors with Retry-After or jittered
+exponential backoff and yielding (key, data | exception) in completion order.
+SchwabDataFetcher.get_price_history_many / iter_price_history_requests run it for
+synchronous callers through ClientAsync.from_client. The tests use a local HTTP server
+that counts requests in flight and fails chosen symbols.
+
+Run tests:      python -m pytest test_price_history_many.py
+Run benchmark:  python test_price_history_many.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import aiohttp
+
+from schwabdev import ClientAsync
+from ensemble_trading_model import SchwabDataFetcher
+from test_client_concurrency import make_client
+
+
+class PriceHistoryHandler(BaseHTTPRequestHandler):
+    """
+    Answers pricehistory after server.delay seconds: 400 for symbols starting with BAD, 503 while
+    server.failures[symbol] > 0 (with server.retry_after if set), otherwise three daily candles
+    """
+
+    def do_GET(self):
+        server = self.server
+        symbol = parse_qs(urlparse(self.path).query)['symbol'][0]
+        with server.lock:
+            server.calls.append(symbol)
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            time.sleep(server.delay)
+            headers = {}
+            with server.lock:
+                if symbol.startswith('BAD'):
+                    status, payload = 400, {'errors': [{'detail': 'invalid symbol'}]}
+                elif server.failures.get(symbol, 0) > 0:
+                    server.failures[symbol] -= 1
+                    status, payload = 503, {'errors': [{'detail': 'unavailable'}]}
+                    if server.retry_after is not None:
+                        headers['Retry-After'] = server.retry_after
+                else:
+                    status, payload = 200, {'symbol': symbol, 'empty': False, 'candles': [
+                        {'open': 10.0 + i, 'high': 11.0 + i, 'low': 9.0 + i, 'close': 10.5 + i, 'volume': 1000 + i,
+                         'datetime': 1_700_000_000_000 + i * 86_400_000} for i in range(3)]}
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+class PriceHistoryServer(ThreadingHTTPServer):
+    request_queue_size = 128
+
+
+def start_server(delay=0.0, failures=None, retry_after=None):
+    server = PriceHistoryServer(('127.0.0.1', 0), PriceHistoryHandler)
+    server.lock = threading.Lock()
+    server.calls = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.delay = delay
+    server.failures = dict(failures or {})
+    server.retry_after = retry_after
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def fetch_many(server, requests, **kwargs):
+    """Run price_history_many on a ClientAsync made from a sync client, returning {key: result} and completion order"""
+
+    async def main():
+        async with ClientAsync.from_client(make_client(server)) as client:
+            return [item async for item in client.price_history_many(requests, **kwargs)]
+
+    results = asyncio.run(main())
+    return dict(results), [key for key, _ in results]
+
+
+# ========== TESTS ==========
+
+def test_semaphore_bounds_requests_in_flight():
+    server = start_server(delay=0.05)
+    symbols = [f'SYM{i}' for i in range(12)]
+    results, _ = fetch_many(server, symbols, max_concurrency=3)
+    assert server.max_in_flight == 3 and len(server.calls) == 12
+    assert all(results[s]['symbol'] == s for s in symbols)
+    server.shutdown()
+
+
+def test_5xx_retried_with_retry_after_and_backoff():
+    server = start_server(failures={'FLAKY': 2, 'DOWN': 10}, retry_after='0.2')
+    start = time.perf_counter()
+    results, order = fetch_many(server, ['FLAKY', 'AAPL'], retries=3)
+    assert results['FLAKY']['symbol'] == 'FLAKY' and server.calls.count('FLAKY') == 3
+    assert time.perf_counter() - start >= 0.4                   # Retry-After honored twice
+    assert order == ['AAPL', 'FLAKY']                           # completion order
+    server.retry_after = None                                   # jittered exponential backoff from here
+    results, _ = fetch_many(server, ['DOWN'], retries=2, backoff=0.01)
+    error = results['DOWN']
+    assert isinstance(error, aiohttp.ClientResponseError) and error.status == 503
+    assert server.calls.count('DOWN') == 3                      # first try + 2 retries
+    server.shutdown()
+
+
+def test_client_errors_not_retried_and_isolated():
+    server = start_server()
+    results, _ = fetch_many(server, {'bad': {'symbol': 'BAD1'}, 'daily': {'symbol': 'AAPL'},
+                                     'weekly': {'symbol': 'AAPL', 'frequencyType': 'weekly'}})
+    assert isinstance(results['bad'], aiohttp.ClientResponseError) and results['bad'].status == 400
+    assert server.calls.count('BAD1') == 1
+    assert results['daily']['symbol'] == results['weekly']['symbol'] == 'AAPL'
+    server.shutdown()
+
+
+def test_connection_errors_returned_per_key():
+    server = start_server()
+    server.shutdown()
+    server.server_close()                                       # nothing listening anymore
+    results, _ = fetch_many(server, ['AAPL'], retries=1, backoff=0.01)
+    assert isinstance(results['AAPL'], aiohttp.ClientConnectionError)
+
+
+def test_fetcher_get_price_history_many():
+    server = start_server(failures={'FLAKY': 1}, retry_after='0')
+    fetcher = SchwabDataFetcher(make_client(server))
+    frames = fetcher.get_price_history_many(['AAPL', 'BAD1', 'FLAKY'], max_concurrency=2)
+    assert sorted(frames) == ['AAPL', 'FLAKY']                  # the failed symbol is left out
+    assert frames['AAPL'].columns.tolist() == ['open', 'high', 'low', 'close', 'volume'] and len(frames['AAPL']) == 3
+    results = dict(fetcher.iter_price_history_requests({'bad': {'symbol': 'BAD2'}, 'aapl': {'symbol': 'AAPL'}}))
+    assert results['bad'] is None and len(results['aapl']) == 3
+    server.shutdown()
+
+
+def test_from_client_shares_client_state():
+    sync_client = make_client(start_server())
+    sync_client.cache = object()
+    async def main():
+        async with ClientAsync.from_client(sync_client, parsed=True) as client:
+            return client
+    client = asyncio.run(main())
+    for name in ('timeout', 'logger', 'scheduler', 'tokens', 'cache', '_base_api_url'):
+        assert getattr(client, name) is getattr(sync_client, name), name
+    assert client._parsed is True and client.version.startswith('Schwabdev')
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=100, delay=0.05):
+    server = start_server(delay=delay)
+    symbols = [f'SYM{i}' for i in range(n_symbols)]
+    fetcher = SchwabDataFetcher(make_client(server))
+
+    start = time.perf_counter()
+    for symbol in symbols:
+        fetcher.get_price_history(symbol)
+    sequential = time.perf_counter() - start
+
+    print(f"Price history for {n_symbols} symbols, {delay * 1000:.0f} ms per request")
+    print("=" * 80)
+    print(f"   get_price_history one by one:           {sequential:6.2f} s")
+    for max_concurrency in (4, 8, 16):
+        start = time.perf_counter()
+        frames = fetcher.get_price_history_many(symbols, max_concurrency=max_concurrency)
+        elapsed = time.perf_counter() - start
+        print(f"   get_price_history_many (concurrency {max_concurrency:2d}): {elapsed:6.2f} s  ({len(frames)} frames)")
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,129 @@
+"""
+Tests and benchmark for the quote book
+
+QuoteBook merges LEVELONE deltas in place into one preallocated row per symbol, so
+the current value of every field is kept and whole-universe columns are NumPy views.
+
+Run tests:      python -m pytest test_quote_book.py
+Run benchmark:  python test_quote_book.py
+"""
+
+import json
+import time
+
+import numpy as np
+
+import schwabdev
+from quote_book import QuoteBook
+from schwabdev.records import loads
+from test_stream_parsing import level_one_burst
+
+
+def level_one(content, timestamp=1, service='LEVELONE_EQUITIES'):
+    return json.dumps({'data': [{'service': service, 'timestamp': timestamp, 'command': 'SUBS', 'content': content}]})
+
+
+# ========== TESTS ==========
+
+def test_deltas_merge_into_full_quote():
+    book = QuoteBook()
+    book.apply(level_one([{'key': 'AAPL', '1': 100.0, '2': 100.1, '3': 100.05, '15': 'Apple Inc'}], timestamp=1))
+    book.apply(level_one([{'key': 'AAPL', '3': 100.2, '8': 5000}], timestamp=2))
+    assert book.get('AAPL', 'bid_price') == 100.0                       # kept from the first message
+    assert book.get('AAPL', 'last_price') == 100.2 and book.get('AAPL', '8') == 5000
+    assert book.get('AAPL', 'description') == 'Apple Inc'
+    assert book.get('AAPL', 'ask_size') is None and book.get('MSFT', 'bid_price', 0.0) == 0.0
+    assert book.snapshot('AAPL') == {'bid_price': 100.0, 'ask_price': 100.1, 'last_price': 100.2,
+                                     'total_volume': 5000.0, 'description': 'Apple Inc'}
+    assert book.updated[book.slot('AAPL')] == 2 and book.updates == 2
+
+
+def test_columns_are_aligned_views():
+    book = QuoteBook(capacity=4)
+    book.apply(level_one([{'key': s, '3': float(i)} for i, s in enumerate(['A', 'B', 'C'])]))
+    last = book.column('last_price')
+    assert book.symbols == ['A', 'B', 'C'] and last.tolist() == [0.0, 1.0, 2.0]
+    book.apply(level_one([{'key': 'B', '3': 10.0}]))
+    assert last[1] == 10.0                                              # views see later updates
+    assert book.array(['last_price', 'bid_price']).shape == (3, 2)
+    frame = book.frame()
+    assert list(frame.columns) == ['last_price'] and frame.loc['B', 'last_price'] == 10.0
+
+
+def test_grows_past_capacity():
+    book = QuoteBook(capacity=2)
+    book.apply(level_one([{'key': f'S{i}', '1': float(i)} for i in range(5)]))
+    assert len(book) == 5 and book.values.shape[0] >= 5
+    assert book.column('bid_price').tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+
+
+def test_ignores_other_services_and_accepts_parsed():
+    book = QuoteBook('LEVELONE_FUTURES')
+    equities = level_one([{'key': 'AAPL', '3': 1.0}])
+    futures = level_one([{'key': '/ES', '3': 5000.25, '10': 1700000000000}], service='LEVELONE_FUTURES')
+    assert book.apply(equities) == []
+    assert book.apply(schwabdev.parse_message(futures)) == ['/ES']
+    assert book.get('/ES', 'last_price') == 5000.25 and book.get('/ES', 'quote_time') == 1700000000000
+    try:
+        QuoteBook('CHART_EQUITY')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("non LEVELONE service was accepted")
+
+
+def test_wrap_calls_receiver_after_merge():
+    book = QuoteBook()
+    seen = []
+    receiver = book.wrap(lambda message: seen.append(book.get('AAPL', 'last_price')))
+    receiver(level_one([{'key': 'AAPL', '3': 7.0}]))
+    assert seen == [7.0]
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=2000, n_messages=2000, n_reads=1000):
+    rng = np.random.default_rng(0)
+    universe = [f'U{i:04d}' for i in range(n_symbols)]
+    messages = []
+    for i in range(n_messages):
+        burst = json.loads(level_one_burst(20, seed=i))
+        for content, symbol in zip(burst['data'][0]['content'], rng.choice(universe, 20, replace=False)):
+            content['key'] = str(symbol)
+        messages.append(json.dumps(burst))
+
+    latest = {}
+    start = time.perf_counter()
+    for message in messages:
+        for item in loads(message)['data']:
+            for content in item['content']:
+                latest.setdefault(content['key'], {}).update(content)
+    dict_merge = (time.perf_counter() - start) / (n_messages * 20) * 1e6
+
+    book = QuoteBook(capacity=n_symbols)
+    start = time.perf_counter()
+    for message in messages:
+        book.apply(message)
+    book_merge = (time.perf_counter() - start) / (n_messages * 20) * 1e6
+
+    symbols = list(latest)
+    start = time.perf_counter()
+    for _ in range(n_reads):
+        spread = np.array([latest[s].get('2', np.nan) for s in symbols]) - np.array([latest[s].get('1', np.nan) for s in symbols])
+    dict_read = (time.perf_counter() - start) / n_reads * 1e6
+
+    start = time.perf_counter()
+    for _ in range(n_reads):
+        spread = book.column('ask_price') - book.column('bid_price')
+    book_read = (time.perf_counter() - start) / n_reads * 1e6
+
+    print(f"{n_messages} LEVELONE_EQUITIES messages x 20 symbols over a {len(symbols)}-symbol universe")
+    print("=" * 80)
+    print(f"   merge, dict of dicts:     {dict_merge:8.2f} us per symbol update")
+    print(f"   merge, QuoteBook:         {book_merge:8.2f} us per symbol update")
+    print(f"   spread for all symbols, dict walk:   {dict_read:8.1f} us")
+    print(f"   spread for all symbols, QuoteBook:   {book_read:8.1f} us")
+
+
+if __name__ == '__main__':
+    benchmark()
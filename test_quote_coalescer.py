@@ -0,0 +1,145 @@
+"""
+Tests and benchmark for the schwabdev quote coalescer
+
+QuoteCoalescer collects single-symbol quote requests that arrive within a few
+milliseconds and sends them as one Client.quotes call, split to fit the URL length.
+These tests use a fake client that records each quotes call.
+
+Run tests:      python -m pytest test_quote_coalescer.py
+Run benchmark:  python test_quote_coalescer.py
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from schwabdev import QuoteCoalescer
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+        self.text = str(data)
+
+    def json(self):
+        return self._data
+
+
+class FakeClient:
+    """Client.quotes stand-in: one call per batch, optional latency, unknown symbols left out"""
+
+    def __init__(self, latency=0.0, fail=()):
+        self.latency = latency
+        self.fail = set(fail)
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def quotes(self, symbols, fields=None, indicative=False):
+        with self._lock:
+            self.calls.append(list(symbols))
+        time.sleep(self.latency)
+        if self.fail & set(symbols):
+            return FakeResponse({'errors': 'bad request'}, 400)
+        return FakeResponse({s: {'symbol': s, 'quote': {'lastPrice': len(s)}} for s in symbols if not s.startswith('X')})
+
+    def quote(self, symbol, fields=None):
+        return self.quotes([symbol], fields)
+
+
+def make_symbols(n):
+    return [f'S{i:04d}' for i in range(n)]
+
+
+# ========== TESTS ==========
+
+def test_concurrent_requests_share_one_call():
+    client = FakeClient(latency=0.01)
+    coalescer = QuoteCoalescer(client, window=0.02)
+    symbols = make_symbols(50)
+    with ThreadPoolExecutor(50) as pool:
+        results = list(pool.map(coalescer.quote, symbols))
+    assert [r['symbol'] for r in results] == symbols
+    assert len(client.calls) == 1
+    assert coalescer.requests_sent == 1 and coalescer.symbols_requested == 50
+
+
+def test_quotes_split_by_url_length_and_count():
+    client = FakeClient()
+    coalescer = QuoteCoalescer(client, max_symbols=100, max_url_length=400)
+    symbols = make_symbols(250)
+    results = coalescer.quotes(symbols)
+    assert set(results) == set(symbols)
+    assert all(len(call) <= 100 for call in client.calls)
+    assert all(sum(len(s) + 3 for s in call) <= 400 for call in client.calls)
+    assert sorted(s for call in client.calls for s in call) == sorted(symbols)
+
+
+def test_missing_symbols_and_duplicates():
+    client = FakeClient()
+    coalescer = QuoteCoalescer(client)
+    futures = [coalescer.submit(s) for s in ['AAPL', 'XBAD', 'AAPL']]
+    coalescer.flush()
+    assert futures[0].result()['symbol'] == 'AAPL'
+    assert futures[1].result() == {}
+    assert futures[2].result() == futures[0].result()
+    assert client.calls == [['AAPL', 'XBAD']]
+
+
+def test_failed_batch_reaches_its_callers_only():
+    client = FakeClient(fail={'S0001'})
+    coalescer = QuoteCoalescer(client, max_symbols=2)
+    results = coalescer.quotes(make_symbols(4))
+    assert set(results) == {'S0002', 'S0003'}
+    future = coalescer.submit('S0001')
+    try:
+        future.result(timeout=1)
+    except ValueError as e:
+        assert '400' in str(e)
+    else:
+        raise AssertionError("failed batch did not raise")
+
+
+def test_fields_are_batched_separately():
+    client = FakeClient()
+    coalescer = QuoteCoalescer(client)
+    a = coalescer.submit('AAPL', fields='quote')
+    b = coalescer.submit('MSFT', fields='fundamental')
+    coalescer.flush()
+    assert a.result() and b.result()
+    assert len(client.calls) == 2
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=400, latency=0.05, n_threads=32):
+    symbols = make_symbols(n_symbols)
+
+    client = FakeClient(latency=latency)
+    start = time.perf_counter()
+    for symbol in symbols[:40]:
+        client.quote(symbol)
+    per_symbol_time = (time.perf_counter() - start) * n_symbols / 40
+
+    client = FakeClient(latency=latency)
+    coalescer = QuoteCoalescer(client, window=0.01)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_threads) as pool:
+        list(pool.map(coalescer.quote, symbols))
+    threaded_time = time.perf_counter() - start
+    threaded_calls = len(client.calls)
+
+    client = FakeClient(latency=latency)
+    start = time.perf_counter()
+    QuoteCoalescer(client).quotes(symbols)
+    bulk_time = time.perf_counter() - start
+
+    print(f"{n_symbols} quotes, {latency * 1000:.0f} ms per API call")
+    print("=" * 80)
+    print(f"   one call per symbol:            {per_symbol_time:6.2f} s, {n_symbols:4d} calls (extrapolated)")
+    print(f"   coalesced ({n_threads} threads):         {threaded_time:6.2f} s, {threaded_calls:4d} calls")
+    print(f"   coalescer.quotes(symbols):      {bulk_time:6.2f} s, {len(client.calls):4d} calls")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,172 @@
+"""
+Tests and benchmark for the schwabdev request scheduler
+
+RequestScheduler is the token bucket shared by Client and ClientAsync: priority lanes
+(orders before bulk history), a 429 pause with adaptive rate, and queue counters.
+These tests drive it directly with fake responses, no network access is needed.
+
+Run tests:      python -m pytest test_request_scheduler.py
+Run benchmark:  python test_request_scheduler.py
+"""
+
+import asyncio
+import threading
+import time
+
+from schwabdev import Priority, RequestScheduler
+from schwabdev.scheduler import priority_for
+
+
+class FakeResponse:
+    """Minimal requests.Response / aiohttp.ClientResponse stand-in"""
+
+    def __init__(self, status=200, retry_after=None):
+        self.status_code = self.status = status
+        self.headers = {} if retry_after is None else {'Retry-After': str(retry_after)}
+
+    def close(self):
+        pass
+
+    def release(self):
+        pass
+
+
+# ========== TESTS ==========
+
+def test_priority_for_paths():
+    assert priority_for('POST', '/trader/v1/accounts/abc/orders') == Priority.ORDER
+    assert priority_for('DELETE', '/trader/v1/accounts/abc/orders/1') == Priority.ORDER
+    assert priority_for('GET', '/trader/v1/accounts/abc/orders') == Priority.ACCOUNT
+    assert priority_for('GET', '/marketdata/v1/quotes') == Priority.MARKET_DATA
+    assert priority_for('GET', '/marketdata/v1/pricehistory') == Priority.BULK
+    assert priority_for('GET', '/marketdata/v1/chains') == Priority.BULK
+
+
+def test_burst_then_rate_limited():
+    scheduler = RequestScheduler(rate_per_minute=600, burst=3)   # 10 per second after the burst
+    start = time.perf_counter()
+    for _ in range(5):
+        scheduler.call(lambda: FakeResponse())
+    elapsed = time.perf_counter() - start
+    assert 0.15 <= elapsed < 0.6
+    stats = scheduler.stats()
+    assert stats['completed'] == 5 and stats['in_flight'] == 0 and stats['queued'] == 0
+
+
+def test_orders_jump_the_queue():
+    scheduler = RequestScheduler(rate_per_minute=1200, burst=1)
+    scheduler.call(lambda: FakeResponse())                      # drain the bucket
+    order = []
+    lock = threading.Lock()
+
+    def worker(priority, name):
+        scheduler.acquire(priority)
+        with lock:
+            order.append(name)
+        scheduler.release(200)
+
+    threads = [threading.Thread(target=worker, args=(Priority.BULK, f'bulk{i}')) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    while scheduler.stats()['queued'] < 4:
+        time.sleep(0.001)
+    assert scheduler.stats()['queued_by_priority']['BULK'] == 4
+    urgent = threading.Thread(target=worker, args=(Priority.ORDER, 'order'))
+    urgent.start()
+    for thread in threads + [urgent]:
+        thread.join()
+    assert order.index('order') <= 1                            # at most one bulk request was already granted
+
+
+def test_429_pauses_and_retries():
+    scheduler = RequestScheduler(rate_per_minute=6000, burst=5, cooldown=0.1)
+    responses = iter([FakeResponse(429), FakeResponse(429, retry_after=0.2), FakeResponse(200)])
+    start = time.perf_counter()
+    response = scheduler.call(lambda: next(responses))
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    assert elapsed >= 0.3                                       # 0.1 s cooldown + 0.2 s Retry-After
+    stats = scheduler.stats()
+    assert stats['throttled'] == 2 and stats['retried'] == 2
+    assert stats['rate_per_minute'] < 6000                      # halved twice, one success back
+
+
+def test_429_returned_when_retries_exhausted():
+    scheduler = RequestScheduler(rate_per_minute=None, max_retries=1, cooldown=0.01)
+    response = scheduler.call(lambda: FakeResponse(429))
+    assert response.status_code == 429
+    assert scheduler.stats()['throttled'] == 2
+
+
+def test_async_callers_share_the_bucket():
+    scheduler = RequestScheduler(rate_per_minute=1200, burst=2)   # 20 per second after the burst
+
+    async def send():
+        return FakeResponse()
+
+    async def run():
+        await asyncio.gather(*(scheduler.call_async(send) for _ in range(6)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - start >= 0.18
+    assert scheduler.stats()['completed'] == 6
+
+
+def test_cancelled_waiter_leaves_queue():
+    scheduler = RequestScheduler(rate_per_minute=60, burst=1)
+    scheduler.call(lambda: FakeResponse())
+
+    async def run():
+        task = asyncio.create_task(scheduler.acquire_async(Priority.BULK))
+        await asyncio.sleep(0.05)
+        assert scheduler.stats()['queued'] == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(run())
+    stats = scheduler.stats()
+    assert stats['queued'] == 0 and stats['in_flight'] == 0
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_bulk=100, rate_per_second=100):
+    """Latency of an order placed behind a backlog of bulk history requests"""
+
+    def order_wait(order_priority):
+        scheduler = RequestScheduler(rate_per_minute=rate_per_second * 60, burst=1)
+        waits = {}
+
+        def worker(priority, name):
+            queued = time.perf_counter()
+            scheduler.acquire(priority)
+            waits[name] = time.perf_counter() - queued
+            scheduler.release(200)
+
+        threads = [threading.Thread(target=worker, args=(Priority.BULK, i)) for i in range(n_bulk)]
+        for thread in threads:
+            thread.start()
+        while True:
+            stats = scheduler.stats()
+            if stats['queued'] + stats['in_flight'] + stats['completed'] >= n_bulk:
+                break
+            time.sleep(0.001)
+        order = threading.Thread(target=worker, args=(order_priority, 'order'))
+        order.start()
+        for thread in threads + [order]:
+            thread.join()
+        return waits['order']
+
+    fifo = order_wait(Priority.BULK)
+    lane = order_wait(Priority.ORDER)
+
+    print(f"Order latency behind {n_bulk} queued history requests ({rate_per_second}/s bucket)")
+    print("=" * 80)
+    print(f"   single FIFO lane:   {fifo * 1000:8.1f} ms")
+    print(f"   ORDER lane:         {lane * 1000:8.1f} ms")
+    print(f"   speedup:            {fifo / lane:8.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,279 @@
+"""
+Tests and benchmark for the schwabdev response cache
+
+ResponseCache (Client(..., cache=ResponseCache())) reuses successful responses of the
+reference endpoints (market hours, instruments, option expirations, preferences, linked
+accounts, streamer info) for a per-endpoint TTL, bounded by an LRU and optionally
+persisted to a sqlite file as (optionally encrypted) JSON. The tests run the clients against a local HTTP server that
+counts requests.
+
+Run tests:      python -m pytest test_response_cache.py
+Run benchmark:  python test_response_cache.py
+"""
+
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.fernet import Fernet
+
+from schwabdev import Client, ClientAsync, RequestScheduler, ResponseCache, Stream
+from test_client_concurrency import FakeTokens
+from test_tokens import APP_KEY, APP_SECRET, tokens_db
+from test_stream_reconnect import run_reconnect_streamer, stop_reconnect_streamer, wait_for
+
+
+class ReferenceHandler(BaseHTTPRequestHandler):
+    """Answers every GET with its path after server.delay seconds (404 for paths containing 'missing')"""
+
+    def do_GET(self):
+        self.server.hits.append(self.path)
+        time.sleep(self.server.delay)
+        status = 404 if 'missing' in self.path else 200
+        payload = {'path': self.path, 'hit': len(self.server.hits)}
+        if self.path.startswith('/trader/v1/accounts/accountNumbers'):
+            payload['accountNumber'] = '87654321'
+        if self.path.startswith('/trader/v1/userPreference'):
+            payload['streamerInfo'] = [{'streamerSocketUrl': self.server.socket_url, 'hit': len(self.server.hits),
+                                        'schwabClientChannel': 'N9', 'schwabClientFunctionId': 'APIAPP'}]
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server(delay=0.0):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), ReferenceHandler)
+    server.hits = []
+    server.delay = delay
+    server.socket_url = 'wss://example'
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def make_client(server, cache):
+    """Client wired to the local server without touching a tokens database"""
+    client = Client.__new__(Client)
+    client.version = 'test'
+    client.timeout = 10
+    client.logger = logging.getLogger('Schwabdev')
+    client.scheduler = RequestScheduler(rate_per_minute=None)
+    client.tokens = FakeTokens()
+    client.cache = cache
+    client._base_api_url = f'http://127.0.0.1:{server.server_address[1]}'
+    client._init_session(4)
+    return client
+
+
+# ========== TESTS ==========
+
+def test_reference_endpoints_served_from_cache():
+    server = start_server()
+    client = make_client(server, ResponseCache())
+    first = client.instruments('AAPL', 'fundamental')
+    for _ in range(5):
+        assert client.instruments('AAPL', 'fundamental').json() == first.json()
+    client.instruments('MSFT', 'fundamental')
+    client.market_hours(['equity', 'option'], '2026-10-19')
+    client.market_hours(['equity', 'option'], '2026-10-19')
+    client.linked_accounts()
+    client.linked_accounts()
+    client.quote('AAPL')
+    client.quote('AAPL')                                        # not a reference endpoint
+    assert len(server.hits) == 6
+    assert client.cache.stats() == {'entries': 4, 'hits': 7, 'misses': 4}
+    server.shutdown()
+
+
+def test_ttl_lru_bypass_and_errors():
+    server = start_server()
+    market_open = [False]
+    cache = ResponseCache(ttl={'instruments': 0.05, 'preferences': 0}, max_entries=2,
+                          bypass=lambda endpoint, params: endpoint == 'market_hour' and market_open[0])
+    client = make_client(server, cache)
+    client.instruments('A', 'symbol-search')
+    time.sleep(0.1)
+    client.instruments('A', 'symbol-search')                    # expired
+    client.preferences()
+    client.preferences()                                        # TTL 0: not cached
+    client.instrument_cusip('037833100')
+    client.instrument_cusip('594918104')                        # evicts instruments A
+    client.instruments('A', 'symbol-search')
+    assert len(server.hits) == 7
+    client.market_hour('equity')
+    market_open[0] = True
+    client.market_hour('equity')                                # bypassed
+    client.instrument_cusip('missing')
+    client.instrument_cusip('missing')                          # 404s are not cached
+    assert len(server.hits) == 11
+    cache.invalidate('instrument_cusip')
+    client.instrument_cusip('594918104')
+    assert len(server.hits) == 12
+    server.shutdown()
+
+
+def test_persisted_cache_shared_between_processes():
+    server = start_server()
+    path = os.path.join(tempfile.mkdtemp(), 'responses.db')
+    first = make_client(server, ResponseCache(path=path))
+    second = make_client(server, ResponseCache(path=path))      # opened before the first one stored anything
+    first.option_expiration_chain('AAPL')
+    assert second.option_expiration_chain('AAPL').json()['hit'] == 1
+    later = make_client(server, ResponseCache(path=path))       # a later run
+    assert later.option_expiration_chain('AAPL').json()['hit'] == 1 and len(server.hits) == 1
+    assert os.stat(path).st_mode & 0o777 == 0o600
+    with open(path, 'rb') as file:
+        assert b'token-1' not in file.read()                    # the request (with the access token) is not stored
+    server.shutdown()
+
+
+def test_persisted_as_plain_data():
+    server = start_server()
+    path = os.path.join(tempfile.mkdtemp(), 'responses.db')
+    first = make_client(server, ResponseCache(path=path)).market_hours(['equity'])
+    conn = sqlite3.connect(path)
+    key, value = conn.execute("SELECT key, value FROM responses").fetchone()
+    assert json.loads(key)[0] == 'market_hours' and json.loads(value)['status'] == 200
+    conn.execute("INSERT INTO responses VALUES (?, 'market_hour', 1e12, ?)",             # pickled row of an older version
+                 (pickle.dumps(('market_hour',)), pickle.dumps(os.system)))
+    conn.commit()
+    cached = make_client(server, ResponseCache(path=path)).market_hours(['equity'])     # rebuilt from the file
+    assert (cached.status_code, cached.ok, cached.url, cached.json()) == (200, True, first.url, first.json())
+    assert cached.headers['content-type'] == 'application/json' and cached.content == first.content
+    assert conn.execute("SELECT COUNT(*) FROM responses").fetchone() == (1,)            # the pickled row was dropped unread
+    assert len(server.hits) == 1
+    server.shutdown()
+
+
+def test_persisted_encrypted_with_client_key():
+    server = start_server()
+    path = os.path.join(tempfile.mkdtemp(), 'responses.db')
+    key = Fernet.generate_key().decode()
+    client = Client(APP_KEY, APP_SECRET, tokens_db=tokens_db(), encryption=key, cache=ResponseCache(path=path))
+    assert client.cache.encrypted                               # the tokens' key is used for the cache file too
+    client._base_api_url = f'http://127.0.0.1:{server.server_address[1]}'
+    assert client.linked_accounts().json()['accountNumber'] == '87654321'
+    with open(path, 'rb') as file:
+        assert b'87654321' not in file.read()
+    assert make_client(server, ResponseCache(path=path, encryption=key)).linked_accounts().json()['hit'] == 1
+    assert make_client(server, ResponseCache(path=path)).linked_accounts().json()['hit'] == 2     # no key: not readable
+    server.shutdown()
+
+
+def test_streamer_info_cached():
+    server = start_server()
+    client = make_client(server, ResponseCache())
+    info = client._get_streamer_info()
+    assert client._get_streamer_info() == info and info['hit'] == 1
+    assert len(server.hits) == 1
+    server.shutdown()
+
+
+def test_failed_streamer_login_refetches_past_cache():
+    rejecting, accepting = run_reconnect_streamer(login_code=3), run_reconnect_streamer()
+    server = start_server()
+    server.socket_url = rejecting['url']
+    path = os.path.join(tempfile.mkdtemp(), 'responses.db')
+    make_client(server, ResponseCache(path=path))._get_streamer_info()   # stored by an earlier run
+    server.socket_url = accepting['url']                        # the streamer info has changed since
+    client = make_client(server, ResponseCache(path=path))
+    stream = Stream(client)
+    stream.start(lambda message: None)
+    assert wait_for(lambda: not stream._thread.is_alive())      # login rejected with the cached info
+    assert len(rejecting['connections']) == 1 and len(server.hits) == 1
+    stream.start(lambda message: None)
+    assert wait_for(lambda: stream.active)
+    stream.stop()
+    assert len(accepting['connections']) == 1 and len(server.hits) == 2
+    assert make_client(server, ResponseCache(path=path))._get_streamer_info()['streamerSocketUrl'] == accepting['url']
+    for streamer in (rejecting, accepting):
+        stop_reconnect_streamer(streamer)
+    server.shutdown()
+
+
+def test_failed_streamer_connect_refetches_past_cache():
+    accepting = run_reconnect_streamer()
+    server = start_server()
+    server.socket_url = 'ws://127.0.0.1:9'                      # nothing listening
+    client = make_client(server, ResponseCache())
+    client._get_streamer_info()
+    server.socket_url = accepting['url']
+    stream = Stream(client)
+    stream._backoff_time = 0.01
+    stream.start(lambda message: None)
+    assert wait_for(lambda: stream.active)                      # reconnected with fresh info, no restart
+    stream.stop()
+    assert len(server.hits) == 2 and client.cache.stats()['entries'] == 1
+    stop_reconnect_streamer(accepting)
+    server.shutdown()
+
+
+def test_async_parsed_calls_cached():
+    server = start_server()
+
+    async def main():
+        client = ClientAsync.__new__(ClientAsync)
+        client.timeout = 10
+        client.logger = logging.getLogger('Schwabdev')
+        client.scheduler = RequestScheduler(rate_per_minute=None)
+        client.tokens = FakeTokens()
+        client.cache = ResponseCache()
+        client._base_api_url = f'http://127.0.0.1:{server.server_address[1]}'
+        client._init_session(parsed=True)
+        first = await client.instruments('AAPL', 'fundamental')
+        first['mutated'] = True
+        second = await client.instruments('AAPL', 'fundamental')
+        raw = await client.instruments('AAPL', 'fundamental', parsed=False)   # responses are not cached
+        assert raw.status == 200
+        await client.market_hours('equity,option')
+        await client.market_hours('equity,option')
+        await client._session.close()
+        return second
+
+    second = asyncio.run(main())
+    assert 'mutated' not in second and second['hit'] == 1
+    assert len(server.hits) == 3
+    server.shutdown()
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(startups=3, delay=0.05):
+    """Startups of a script crawling instruments letter by letter (as get_stock_universe does) plus its reference calls"""
+    letters = [chr(c) for c in range(ord('A'), ord('Z') + 1)]
+
+    def startup(client):
+        for letter in letters:
+            client.instruments(f'{letter}.*', 'symbol-regex')
+        client.market_hours(['equity', 'option'])
+        client.linked_accounts()
+        client.preferences()
+        client._get_streamer_info()
+
+    path = os.path.join(tempfile.mkdtemp(), 'responses.db')
+    print(f"{startups} startups: {len(letters)} instruments calls + 4 reference calls, {delay * 1000:.0f} ms per request")
+    print("=" * 80)
+    for name, cache in (('no cache:', lambda: None), ('ResponseCache(path=...):', lambda: ResponseCache(path=path))):
+        server = start_server(delay)
+        start = time.perf_counter()
+        for _ in range(startups):
+            startup(make_client(server, cache()))
+        elapsed = time.perf_counter() - start
+        print(f"   {name:26s} {len(server.hits):4d} requests  {elapsed / startups * 1000:7.0f} ms per startup")
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    benchmark()
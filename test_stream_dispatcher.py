@@ -0,0 +1,220 @@
+"""
+Tests and benchmark for the schwabdev stream dispatcher
+
+StreamDispatcher puts a bounded queue and worker threads between the websocket receive
+loop and the receiver, with drop_oldest / coalesce / block overflow policies. The unit
+tests drive the queue directly; the stream test runs schwabdev.Stream against a local
+websocket server that imitates the Schwab streamer.
+
+Run tests:      python -m pytest test_stream_dispatcher.py
+Run benchmark:  python test_stream_dispatcher.py
+"""
+
+import asyncio
+import json
+import logging
+import threading
+import time
+
+import websockets
+import websockets.exceptions
+
+import schwabdev
+from schwabdev import StreamDispatcher
+
+
+def level_one(symbol, seq, last=100.0):
+    return json.dumps({'data': [{'service': 'LEVELONE_EQUITIES', 'timestamp': seq, 'command': 'SUBS',
+                                 'content': [{'key': symbol, '3': last + seq}]}]})
+
+
+class Collector:
+    """Receiver that records messages, optionally slow"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.messages = []
+        self.done = threading.Event()
+        self.expected = None
+
+    def __call__(self, message):
+        time.sleep(self.delay)
+        self.messages.append(message)
+        if self.expected is not None and len(self.messages) >= self.expected:
+            self.done.set()
+
+
+# ========== TESTS ==========
+
+def test_in_order_delivery():
+    collector = Collector()
+    dispatcher = StreamDispatcher(maxsize=100)
+    dispatcher.start(collector)
+    messages = [level_one('AAPL', i) for i in range(50)]
+    for message in messages:
+        dispatcher.put(message)
+    dispatcher.stop()
+    assert collector.messages == messages
+    stats = dispatcher.stats()
+    assert stats['received'] == stats['dispatched'] == 50 and stats['depth'] == 0
+
+
+def test_drop_oldest_when_full():
+    dispatcher = StreamDispatcher(maxsize=3)
+    for i in range(5):
+        dispatcher.put(level_one('AAPL', i))
+    stats = dispatcher.stats()
+    assert stats['depth'] == 3 and stats['dropped'] == 2 and stats['high_water'] == 3
+    collector = Collector()
+    dispatcher.start(collector)
+    dispatcher.stop()
+    assert [json.loads(m)['data'][0]['timestamp'] for m in collector.messages] == [2, 3, 4]
+
+
+def test_coalesce_keeps_latest_per_symbol():
+    dispatcher = StreamDispatcher(maxsize=100, overflow='coalesce')
+    for i in range(10):
+        dispatcher.put(level_one('AAPL', i))
+        dispatcher.put(level_one('MSFT', i))
+    dispatcher.put(json.dumps({'notify': [{'heartbeat': '1'}]}))
+    assert dispatcher.stats()['depth'] == 3 and dispatcher.stats()['coalesced'] == 18
+    collector = Collector()
+    dispatcher.start(collector)
+    dispatcher.stop()
+    latest = [json.loads(m)['data'][0] for m in collector.messages[:2]]
+    assert [(d['content'][0]['key'], d['timestamp']) for d in latest] == [('AAPL', 9), ('MSFT', 9)]
+
+
+def test_block_waits_for_space():
+    collector = Collector(delay=0.01)
+    dispatcher = StreamDispatcher(maxsize=2, overflow='block')
+    dispatcher.start(collector)
+    for i in range(10):
+        dispatcher.put(level_one('AAPL', i))
+    dispatcher.stop()
+    stats = dispatcher.stats()
+    assert len(collector.messages) == 10 and stats['dropped'] == 0 and stats['blocked'] > 0
+    assert stats['max_lag'] > 0
+
+
+def test_receiver_errors_are_counted():
+    def receiver(message):
+        raise RuntimeError("boom")
+    dispatcher = StreamDispatcher()
+    dispatcher.start(receiver)
+    dispatcher.put(level_one('AAPL', 0))
+    dispatcher.stop()
+    assert dispatcher.stats()['errors'] == 1
+
+
+# ========== LOCAL STREAMER ==========
+
+class FakeTokens:
+    access_token = 'token'
+
+    def update_tokens(self, force_access_token=False, force_refresh_token=False):
+        return False
+
+
+class FakeClient:
+    """What Stream needs from a Client, pointed at a local websocket server"""
+
+    def __init__(self, url):
+        self.tokens = FakeTokens()
+        self.logger = logging.getLogger('Schwabdev')
+        self._url = url
+
+    def _get_streamer_info(self, refresh=False):
+        return {'streamerSocketUrl': self._url, 'schwabClientCustomerId': 'c', 'schwabClientCorrelId': 'c',
+                'schwabClientChannel': 'N9', 'schwabClientFunctionId': 'APIAPP'}
+
+
+def run_local_streamer(n_messages):
+    """Websocket server that answers the login and then sends n_messages quotes as fast as it can"""
+    ready = threading.Event()
+    state = {}
+
+    async def handler(websocket):
+        await websocket.recv()                                              # LOGIN
+        await websocket.send(json.dumps({'response': [{'service': 'ADMIN', 'command': 'LOGIN', 'content': {'code': 0}}]}))
+        start = time.perf_counter()
+        for i in range(n_messages):
+            await websocket.send(level_one('AAPL', i))
+        state['send_time'] = time.perf_counter() - start
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(await websocket.ping(), 30)             # answered only once the client reads again
+            state['ping_time'] = time.perf_counter() - start
+        except (asyncio.TimeoutError, websockets.exceptions.ConnectionClosed):
+            pass
+        await websocket.wait_closed()
+
+    async def main():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            state['url'] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            state['stop'] = asyncio.get_running_loop().create_future()
+            state['loop'] = asyncio.get_running_loop()
+            ready.set()
+            await state['stop']
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait(5)
+    return state
+
+
+def stop_local_streamer(state):
+    state['loop'].call_soon_threadsafe(state['stop'].set_result, None)
+
+
+def stream_through(n_messages, delay, dispatcher):
+    server = run_local_streamer(n_messages)
+    collector = Collector(delay)
+    collector.expected = n_messages + 1                                     # + login response
+    stream = schwabdev.Stream(FakeClient(server['url']))
+    stream.start(collector, dispatcher=dispatcher)
+    collector.done.wait(30)
+    stream.stop()
+    stop_local_streamer(server)
+    return collector
+
+
+def test_stream_delivers_through_dispatcher():
+    dispatcher = StreamDispatcher(maxsize=1000)
+    collector = stream_through(200, 0.0, dispatcher)
+    assert len(collector.messages) == 201
+    assert json.loads(collector.messages[-1])['data'][0]['timestamp'] == 199
+    assert dispatcher.stats()['dispatched'] == 201
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_messages=2000, delay=0.001):
+    """How long the client takes to answer a ping sent behind a burst, with a 1 ms receiver inline vs behind the dispatcher"""
+
+    def ping_time(dispatcher):
+        server = run_local_streamer(n_messages)
+        collector = Collector(delay)
+        collector.expected = n_messages + 1
+        stream = schwabdev.Stream(FakeClient(server['url']))
+        stream.start(collector, dispatcher=dispatcher)
+        collector.done.wait(60)
+        deadline = time.time() + 5
+        while 'ping_time' not in server and time.time() < deadline:
+            time.sleep(0.01)
+        stats = dispatcher.stats() if dispatcher is not None else None
+        stream.stop()
+        stop_local_streamer(server)
+        return server.get('ping_time', float('nan')), stats
+
+    inline_time, _ = ping_time(None)
+    dispatched_time, stats = ping_time(StreamDispatcher(maxsize=n_messages * 2))
+
+    print(f"Ping after a burst of {n_messages} messages, receiver takes {delay * 1000:.0f} ms per message")
+    print("=" * 80)
+    print(f"   receiver inline:      {inline_time * 1000:8.1f} ms to pong")
+    print(f"   StreamDispatcher:     {dispatched_time * 1000:8.1f} ms to pong")
+    print(f"   dispatcher high water {stats['high_water']}, max lag {stats['max_lag'] * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,176 @@
+"""
+Tests and benchmark for the schwabdev stream latency histograms
+
+StreamLatency wraps the stream receiver and records, per service, message latency
+(arrival in the stream's receive loop minus the message timestamp) and quote latency
+(arrival minus the quote time field), plus queue, decode and receiver time, into
+log-linear LatencyHistograms. Messages are decoded to read the timestamps: with parsed=False
+a receiver that decodes the raw message again pays twice (see the benchmark), so use
+parsed=True or StreamLatency(decoded=True), which hands the receiver the decoded dict.
+
+Run tests:      python -m pytest test_stream_latency.py
+Run benchmark:  python test_stream_latency.py
+"""
+
+import asyncio
+import json
+import random
+import time
+
+import schwabdev
+from schwabdev import LatencyHistogram, StreamLatency
+from schwabdev.records import loads, parsed_receiver
+from test_stream_dispatcher import Collector, FakeClient, run_local_streamer, stop_local_streamer
+from test_stream_parsing import level_one_burst
+
+
+def quote(symbol, age_ms, quote_age_ms, service='LEVELONE_EQUITIES', quote_field='34'):
+    now = time.time_ns() // 1_000_000
+    return json.dumps({'data': [{'service': service, 'timestamp': now - age_ms, 'command': 'SUBS',
+                                 'content': [{'key': symbol, '3': 100.0, quote_field: now - quote_age_ms}]}]})
+
+
+# ========== TESTS ==========
+
+def test_histogram_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    values = list(range(1, 100_001))
+    random.Random(0).shuffle(values)
+    for value in values:
+        histogram.record(value)
+    for q in (1, 50, 90, 99, 99.9):
+        exact = q * 1000
+        assert abs(histogram.percentile(q) - exact) <= exact * 0.032
+    summary = histogram.to_dict()
+    assert summary['count'] == 100_000 and summary['min'] == 1 and summary['max'] == 100_000
+    assert abs(summary['mean'] - 50_000.5) < 1e-6
+
+
+def test_histogram_small_values_exact_negative_and_merge():
+    a, b = LatencyHistogram(), LatencyHistogram()
+    for value in (3, 3, 7, 40):
+        a.record(value)
+    b.record(-5)
+    b.record(10 ** 15)
+    assert [a.percentile(q) for q in (25, 50, 75, 100)] == [3, 3, 7, 40]
+    a.merge(b)
+    assert a.count == 6 and a.negative == 1 and a.min == 0 and a.max == LatencyHistogram.MAX_VALUE
+    assert LatencyHistogram().to_dict()['p50'] is None
+
+
+def test_raw_receiver_measured_per_service():
+    latency = StreamLatency()
+    received = []
+    receiver = latency.wrap(lambda message: (received.append(message), time.sleep(0.002)))
+    for _ in range(5):
+        receiver(quote('AAPL', age_ms=50, quote_age_ms=200))
+        receiver(quote('/ESZ26', age_ms=10, quote_age_ms=30, service='LEVELONE_FUTURES', quote_field='10'))
+    assert all(isinstance(message, str) for message in received)
+    snapshot = latency.snapshot()
+    equities, futures = snapshot['services']['LEVELONE_EQUITIES'], snapshot['services']['LEVELONE_FUTURES']
+    assert equities['message']['count'] == 5 and 49_000 <= equities['message']['p50'] <= 60_000
+    assert 199_000 <= equities['quote']['p50'] <= 215_000 and 29_000 <= futures['quote']['p50'] <= 40_000
+    assert snapshot['receiver']['count'] == 10 and snapshot['receiver']['p50'] >= 2_000
+    assert json.loads(latency.to_json()) == snapshot
+    latency.reset()
+    assert latency.snapshot()['services'] == {}
+
+
+def test_decoded_receiver_gets_the_measured_decode(monkeypatch):
+    decodes = []
+    monkeypatch.setattr(schwabdev.latency, 'loads', lambda message: decodes.append(message) or json.loads(message))
+    latency = StreamLatency(decoded=True)
+    received = []
+    receiver = latency.wrap(received.append)
+    message = quote('AAPL', age_ms=5, quote_age_ms=5)
+    receiver(message)
+    assert received == [json.loads(message)] and decodes == [message]      # decoded once, for both
+    assert latency.snapshot()['services']['LEVELONE_EQUITIES']['quote']['count'] == 1
+    parsed = []
+    latency.wrap(parsed.append, parsed=True)(message)
+    assert isinstance(parsed[0], schwabdev.StreamMessage)
+
+
+def test_parsed_and_async_receivers():
+    latency = StreamLatency()
+    received = []
+
+    async def receiver(message):
+        received.append(message)
+
+    wrapped = latency.wrap(receiver, parsed=True)
+    asyncio.run(wrapped(quote('AAPL', age_ms=5, quote_age_ms=5)))
+    asyncio.run(wrapped(json.dumps({'notify': [{'heartbeat': '1'}]})))
+    assert isinstance(received[0], schwabdev.StreamMessage) and received[0].data[0].key == 'AAPL'
+    snapshot = latency.snapshot()
+    assert snapshot['decode']['count'] == 2 and snapshot['services']['LEVELONE_EQUITIES']['quote']['count'] == 1
+
+
+def test_dispatcher_queue_time_kept_out_of_feed_latency():
+    latency = StreamLatency()
+    dispatcher = schwabdev.StreamDispatcher()
+    dispatcher.start(latency.wrap(lambda message: time.sleep(0.02)))
+    for _ in range(10):                                         # a burst the receiver falls behind on
+        dispatcher.put(quote('AAPL', age_ms=5, quote_age_ms=5), latency.stamp())
+    dispatcher.stop()
+    snapshot = latency.snapshot()
+    assert snapshot['queue']['count'] == 10 and snapshot['queue']['max'] >= 150_000
+    assert snapshot['services']['LEVELONE_EQUITIES']['message']['max'] < 50_000
+
+
+def test_stream_records_latency():
+    server = run_local_streamer(100)
+    collector = Collector()
+    collector.expected = 101
+    latency = StreamLatency()
+    stream = schwabdev.Stream(FakeClient(server['url']))
+    stream.start(collector, latency=latency, dispatcher=schwabdev.StreamDispatcher())
+    assert collector.done.wait(10)
+    stream.stop()
+    stop_local_streamer(server)
+    snapshot = latency.snapshot()
+    assert snapshot['receiver']['count'] == 101 and snapshot['services']['LEVELONE_EQUITIES']['message']['count'] == 100
+    assert snapshot['queue']['count'] == 101
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_messages=20000, n_symbols=20):
+    messages = [level_one_burst(n_symbols, seed=i % 100) for i in range(n_messages)]
+
+    def run(receiver):
+        start = time.perf_counter()
+        for message in messages:
+            receiver(message)
+        return (time.perf_counter() - start) / n_messages * 1e6
+
+    latency = StreamLatency()
+    raw = run(lambda message: None)
+    raw_measured = run(latency.wrap(lambda message: None))
+    decoding = run(loads)
+    decoding_measured = run(latency.wrap(loads))
+    decoded_measured = run(StreamLatency(decoded=True).wrap(lambda message: None))
+    parsed = run(parsed_receiver(lambda message: None))
+    parsed_measured = run(latency.wrap(lambda message: None, parsed=True))
+
+    histogram = LatencyHistogram()
+    values = [random.randrange(1, 10_000_000) for _ in range(200_000)]
+    start = time.perf_counter()
+    for value in values:
+        histogram.record(value)
+    record = (time.perf_counter() - start) / len(values) * 1e9
+
+    print(f"{n_messages} LEVELONE_EQUITIES messages x {n_symbols} symbols through a no-op receiver")
+    print("=" * 80)
+    print(f"   raw receiver:                 {raw:7.2f} us per message")
+    print(f"   raw receiver + latency:       {raw_measured:7.2f} us per message (decodes to read timestamps)")
+    print(f"   decoding receiver:            {decoding:7.2f} us per message")
+    print(f"   decoding receiver + latency:  {decoding_measured:7.2f} us per message (decoded twice)")
+    print(f"   decoded=True + latency:       {decoded_measured:7.2f} us per message (decoded once)")
+    print(f"   parsed receiver:              {parsed:7.2f} us per message")
+    print(f"   parsed receiver + latency:    {parsed_measured:7.2f} us per message")
+    print(f"   LatencyHistogram.record:      {record:7.0f} ns per value")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,146 @@
+"""
+Tests and benchmark for parsed stream messages
+
+With parsed=True the stream decodes each message once (orjson when installed) and the
+receiver gets a StreamMessage whose data records have the translate.stream_fields names
+as attributes. The stream test reuses the local websocket streamer from
+test_stream_dispatcher.
+
+Run tests:      python -m pytest test_stream_parsing.py
+Run benchmark:  python test_stream_parsing.py
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+
+import schwabdev
+from schwabdev import StreamDispatcher, StreamMessage, StreamRecord, parse_message
+from schwabdev.records import parsed_receiver, record_types
+from test_stream_dispatcher import Collector, FakeClient, level_one, run_local_streamer, stop_local_streamer
+
+
+def level_one_burst(n_symbols, n_fields=12, seed=0):
+    """One LEVELONE_EQUITIES message updating n_fields random fields for each symbol"""
+    rng = random.Random(seed)
+    content = []
+    for i in range(n_symbols):
+        item = {'key': f'S{i:03d}', 'delayed': False, 'assetMainType': 'EQUITY', 'cusip': '000000000'}
+        for field in rng.sample(range(1, 52), n_fields):
+            item[str(field)] = round(rng.uniform(1, 500), 2)
+        content.append(item)
+    return json.dumps({'data': [{'service': 'LEVELONE_EQUITIES', 'timestamp': 1700000000000, 'command': 'SUBS', 'content': content}]})
+
+
+# ========== TESTS ==========
+
+def test_record_types_follow_stream_fields():
+    for service, mapping in schwabdev.stream_fields.items():
+        record_type = record_types[service]
+        assert issubclass(record_type, StreamRecord) and record_type.service == service
+        assert all(name.isidentifier() for name in record_type.fields)
+    equities = record_types['LEVELONE_EQUITIES']
+    assert equities.fields[:4] == ('symbol', 'bid_price', 'ask_price', 'last_price')
+    assert 'week_high_52' in equities.fields and 'post_market_percent_change' in equities.fields
+    assert 'is_penny_pilot' in record_types['LEVELONE_OPTIONS'].fields
+    assert record_types['CHART_EQUITY'].fields[:3] == ('sequence', 'open_price', 'high_price')
+
+
+def test_parse_level_one():
+    message = parse_message(json.dumps({'data': [{'service': 'LEVELONE_EQUITIES', 'timestamp': 5, 'command': 'SUBS',
+                                                  'content': [{'key': 'AMD', 'delayed': False, '1': 160.1, '2': 160.2, '3': 160.15}]}]}))
+    assert isinstance(message, StreamMessage) and message.response == [] and message.notify == []
+    record = message.data[0]
+    assert (record.key, record.timestamp, record.bid_price, record.ask_price, record.last_price) == ('AMD', 5, 160.1, 160.2, 160.15)
+    assert record.total_volume is None and record.delayed is False
+    assert record.to_dict() == {'key': 'AMD', 'timestamp': 5, 'bid_price': 160.1, 'ask_price': 160.2, 'last_price': 160.15, 'delayed': False}
+    assert not hasattr(record, '__dict__')
+    try:
+        record.not_a_field
+    except AttributeError:
+        pass
+    else:
+        raise AssertionError("unknown attribute did not raise")
+
+
+def test_parse_chart_book_and_unknown_services():
+    message = parse_message({'data': [
+        {'service': 'CHART_EQUITY', 'timestamp': 1, 'content': [{'key': 'AMD', '1': 7, '2': 1.0, '3': 2.0, '4': 0.5, '5': 1.5, '6': 100, '7': 60000, '8': 1}]},
+        {'service': 'NYSE_BOOK', 'timestamp': 2, 'content': [{'key': 'F', '1': 123, '2': [{'0': 11.0}], '3': []}]},
+        {'service': 'NEW_SERVICE', 'timestamp': 3, 'content': [{'key': 'X', '1': 'a'}]},
+    ], 'notify': [{'heartbeat': '1'}]})
+    candle, book, unknown = message.data
+    assert (candle.sequence, candle.open_price, candle.close_price, candle.volume, candle.chart_time) == (7, 1.0, 1.5, 100, 60000)
+    assert book.market_snapshot_time == 123 and book.bid_side_levels == [{'0': 11.0}]
+    assert unknown.service == 'NEW_SERVICE' and unknown.content == {'key': 'X', '1': 'a'}
+    assert message.notify == [{'heartbeat': '1'}]
+
+
+def test_parsed_receiver_sync_and_async():
+    received = []
+    parsed_receiver(lambda message, tag: received.append((message, tag)))(level_one('AMD', 1), tag='sync')
+
+    async def receiver(message, tag):
+        received.append((message, tag))
+    asyncio.run(parsed_receiver(receiver)(level_one('AMD', 2), tag='async'))
+
+    assert [(m.data[0].timestamp, tag) for m, tag in received] == [(1, 'sync'), (2, 'async')]
+
+
+def test_stream_delivers_parsed_messages():
+    for dispatcher in (None, StreamDispatcher()):
+        server = run_local_streamer(50)
+        collector = Collector()
+        collector.expected = 51                                         # + login response
+        stream = schwabdev.Stream(FakeClient(server['url']))
+        stream.start(collector, dispatcher=dispatcher, parsed=True)
+        collector.done.wait(30)
+        stream.stop()
+        stop_local_streamer(server)
+        login, *quotes = collector.messages
+        assert login.response[0]['command'] == 'LOGIN' and login.data == []
+        assert [m.data[0].timestamp for m in quotes] == list(range(50))
+        assert quotes[-1].data[0].last_price == 149.0
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_messages=2000, n_symbols=20):
+    messages = [level_one_burst(n_symbols, seed=i) for i in range(n_messages)]
+    positions = {'bid': '1', 'ask': '2', 'last': '3', 'bidSize': '4', 'askSize': '5', 'volume': '8', 'lastSize': '9',
+                 'change': '18', 'changePercent': '42', 'timestamp': '34'}
+
+    def by_hand(raw):
+        quotes = []
+        for item in json.loads(raw)['data']:
+            for content in item['content']:
+                quote = {'symbol': content.get('key')}
+                quote.update((name, content.get(field)) for name, field in positions.items())
+                quotes.append(quote)
+        return quotes
+
+    def parsed(raw):
+        return [(r.key, r.bid_price, r.ask_price, r.last_price, r.bid_size, r.ask_size, r.total_volume, r.last_size,
+                 r.net_change, r.net_percent_change, r.quote_time_in_long) for r in parse_message(raw).data]
+
+    timings = {}
+    for name, handler in (('json.loads + dict remap', by_hand), ('parse_message', parsed)):
+        start = time.perf_counter()
+        for raw in messages:
+            handler(raw)
+        timings[name] = (time.perf_counter() - start) / (n_messages * n_symbols) * 1e6
+
+    record = parse_message(messages[0]).data[0]
+    as_dict = json.loads(messages[0])['data'][0]['content'][0]
+    decoder = 'orjson' if schwabdev.records.orjson is not None else 'json'
+    print(f"{n_messages} LEVELONE_EQUITIES messages x {n_symbols} symbols, 12 changed fields each (decoder: {decoder})")
+    print("=" * 80)
+    for name, per_item in timings.items():
+        print(f"   {name:26s} {per_item:8.2f} us per symbol update")
+    print(f"   size: record {sys.getsizeof(record)} bytes vs content dict {sys.getsizeof(as_dict)} bytes")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,230 @@
+"""
+Tests and benchmark for the schwabdev stream pool
+
+StreamPool shards subscriptions across several stream sessions, merges their messages
+into one ordered receiver and restarts each shard on its own. The stream tests run the
+pool against a local websocket server that imitates the Schwab streamer: it answers
+every request and sends quotes for the keys each connection subscribes.
+
+Run tests:      python -m pytest test_stream_pool.py
+Run benchmark:  python test_stream_pool.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import websockets
+import websockets.exceptions
+
+import schwabdev
+from schwabdev import StreamPool
+from test_stream_dispatcher import FakeClient
+from test_stream_parsing import level_one_burst
+
+
+class KeyCollector:
+    """Receiver that records messages and the thread it is called on, done once every key has sent data"""
+
+    def __init__(self, keys, per_key=1):
+        self.expected = {key: per_key for key in keys}
+        self.messages = []
+        self.threads = set()
+        self.done = threading.Event()
+
+    def __call__(self, message):
+        self.messages.append(message)
+        self.threads.add(threading.get_ident())
+        if isinstance(message, str):
+            data = json.loads(message).get('data', [])
+            keys = [content['key'] for service in data for content in service['content']]
+        else:
+            keys = [record.key for record in message.data]
+        for key in keys:
+            if key in self.expected:
+                self.expected[key] -= 1
+                if self.expected[key] == 0:
+                    del self.expected[key]
+        if not self.expected:
+            self.done.set()
+
+
+def run_pool_streamer(per_key=1, drop_key=None):
+    """
+    Websocket server that answers every request and sends per_key quotes for each key a connection adds.
+    The connection that adds drop_key is closed (once) right after its quotes.
+    """
+    ready = threading.Event()
+    state = {'connections': [], 'drop_key': drop_key}
+
+    async def handler(websocket):
+        connection = {'keys': set(), 'requests': []}
+        state['connections'].append(connection)
+        try:
+            await websocket.recv()                                          # LOGIN
+            await websocket.send(json.dumps({'response': [{'service': 'ADMIN', 'command': 'LOGIN', 'content': {'code': 0}}]}))
+            async for raw in websocket:
+                for request in json.loads(raw)['requests']:
+                    connection['requests'].append(request)
+                    await websocket.send(json.dumps({'response': [{'service': request['service'], 'command': request['command'],
+                                                                   'requestid': request['requestid'], 'content': {'code': 0}}]}))
+                    keys = request.get('parameters', {}).get('keys', '').split(',')
+                    if request['command'] == 'UNSUBS':
+                        connection['keys'].difference_update(keys)
+                    elif request['command'] in ('ADD', 'SUBS'):
+                        connection['keys'].update(keys)
+                        for key in keys:
+                            for i in range(per_key):
+                                await websocket.send(level_one_burst(1, seed=i).replace('"S000"', json.dumps(key)))
+                        if state['drop_key'] in keys:
+                            state['drop_key'] = None
+                            await websocket.close()
+                            return
+        except websockets.exceptions.ConnectionClosed:                  # client stopped
+            pass
+
+    async def main():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            state['url'] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            state['stop'] = asyncio.get_running_loop().create_future()
+            state['loop'] = asyncio.get_running_loop()
+            ready.set()
+            await state['stop']
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait(5)
+    return state
+
+
+def stop_pool_streamer(state):
+    state['loop'].call_soon_threadsafe(state['stop'].set_result, None)
+
+
+def shard_keys(pool, service='LEVELONE_EQUITIES'):
+    return [set(shard.subscriptions.get(service, {})) for shard in pool.shards]
+
+
+# ========== TESTS ==========
+
+def test_keys_are_balanced_and_sticky():
+    pool = StreamPool(FakeClient('ws://127.0.0.1:1'), shards=3)
+    symbols = [f'S{i:03d}' for i in range(30)]
+    pool.send(pool.level_one_equities(symbols, '0,1,2,3'))
+    pool.send(pool.chart_equity(['S000', 'S001'], '0,1,2,3,4,5,6,7,8'))
+    equities = shard_keys(pool)
+    assert set().union(*equities) == set(symbols) and sum(map(len, equities)) == 30
+    assert sorted(s['keys'] for s in pool.stats()['shards']) == [10, 11, 11]
+    owner = next(i for i, keys in enumerate(equities) if 'S005' in keys)
+    pool.send(pool.level_one_equities('S005', '0,1,2,3,8'))
+    assert shard_keys(pool) == equities
+    assert sorted(pool.shards[owner].subscriptions['LEVELONE_EQUITIES']['S005']) == ['0', '1', '2', '3', '8']
+    assert set(pool.subscriptions['LEVELONE_EQUITIES']) == set(symbols)
+
+
+def test_subs_and_unsubs_release_keys():
+    pool = StreamPool(FakeClient('ws://127.0.0.1:1'), shards=2)
+    pool.send(pool.level_one_equities(['A', 'B', 'C', 'D'], '0,1'))
+    kept = next(iter(shard_keys(pool)[0]))
+    parts = pool._route(pool.level_one_equities(kept, '0,1', command='SUBS'))
+    assert sorted((i, p['command'], p['parameters']['keys']) for i, p in parts) == \
+        [(0, 'SUBS', kept), (1, 'UNSUBS', ','.join(sorted(shard_keys(pool)[1], key='ABCD'.index)))]
+    pool.send(pool.level_one_equities(['E', 'F'], '0,1'))                 # the shard left empty takes new keys first
+    assert pool._load == [1, 2] or pool._load == [2, 1]
+    pool.send(pool.level_one_equities(['A', 'B', 'C', 'D', 'E', 'F'], '0,1', command='UNSUBS'))
+    assert pool._load == [0, 0] and pool._assigned['LEVELONE_EQUITIES'] == {}
+
+
+def test_merged_delivery_from_shards():
+    server = run_pool_streamer()
+    symbols = [f'S{i:03d}' for i in range(30)]
+    collector = KeyCollector(symbols)
+    pool = StreamPool(FakeClient(server['url']), shards=3, check_interval=0.05)
+    pool.send(pool.level_one_equities(symbols[:15], '0,1,2,3'))           # queued before start
+    pool.start(collector)
+    pool.send(pool.level_one_equities(symbols[15:], '0,1,2,3'))           # sent live
+    assert collector.done.wait(15)
+    pool.stop()
+    stop_pool_streamer(server)
+    connections = server['connections']
+    assert len(connections) == 3 and len(collector.threads) == 1
+    assert set().union(*(c['keys'] for c in connections)) == set(symbols)
+    assert sum(len(c['keys']) for c in connections) == 30
+
+
+def test_shard_restarts_alone_with_its_keys():
+    server = run_pool_streamer(drop_key='S004')
+    symbols = [f'S{i:03d}' for i in range(12)]
+    collector = KeyCollector(symbols)
+    pool = StreamPool(FakeClient(server['url']), shards=3, check_interval=0.05)
+    pool.send(pool.level_one_equities(symbols, '0,1,2,3'))
+    owner = next(i for i, keys in enumerate(shard_keys(pool)) if 'S004' in keys)
+    pool.start(collector)
+    assert collector.done.wait(15)
+    deadline = time.time() + 10
+    while len(server['connections']) < 4 and time.time() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.2)
+    restarts = pool.stats()['shards']
+    pool.stop()
+    stop_pool_streamer(server)
+    assert [s['restarts'] for s in restarts] == [int(i == owner) for i in range(3)]
+    first, reconnected = [c for c in server['connections'] if 'S004' in c['keys']]
+    assert reconnected['keys'] == shard_keys_snapshot(first)
+    assert all(len(c['requests']) <= 2 for c in server['connections'])      # ADD (+ LOGOUT on stop), nothing re-sent elsewhere
+
+
+def shard_keys_snapshot(connection):
+    return {key for request in connection['requests'] if request['command'] == 'ADD'
+            for key in request['parameters']['keys'].split(',')}
+
+
+def test_parsed_messages_are_decoded_on_shards():
+    server = run_pool_streamer()
+    symbols = [f'S{i:03d}' for i in range(8)]
+    collector = KeyCollector(symbols)
+    pool = StreamPool(FakeClient(server['url']), shards=2, check_interval=0.05)
+    pool.send(pool.level_one_equities(symbols, '0,1,2,3'))
+    pool.start(collector, parsed=True)
+    assert collector.done.wait(15)
+    pool.stop()
+    stop_pool_streamer(server)
+    records = [r for m in collector.messages for r in m.data]
+    assert all(isinstance(m, schwabdev.StreamMessage) for m in collector.messages)
+    assert {r.key for r in records} == set(symbols) and all(r.service == 'LEVELONE_EQUITIES' and len(r.to_dict()) > 2 for r in records)
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_symbols=200, per_key=100):
+    """
+    Time until every quote reaches the receiver (parsed) through 1 session vs sharded sessions, and how many
+    keys one session re-sends when it reconnects. The local server shares the process (and GIL) with the pool,
+    so throughput here is bounded by the server; the gains from sharding are per-socket read and reconnect isolation.
+    """
+    symbols = [f'S{i:03d}' for i in range(n_symbols)]
+
+    def run(shards):
+        server = run_pool_streamer(per_key=per_key)
+        collector = KeyCollector(symbols, per_key)
+        pool = StreamPool(FakeClient(server['url']), shards=shards, check_interval=0.05)
+        pool.send(pool.level_one_equities(symbols, '0,1,2,3,4,5,8,10,11,12,17,18'))
+        start = time.perf_counter()
+        pool.start(lambda message: collector(message), parsed=True, dispatcher=schwabdev.StreamDispatcher(maxsize=1_000_000))
+        collector.done.wait(120)
+        elapsed = time.perf_counter() - start
+        largest = max(shard['keys'] for shard in pool.stats()['shards'])
+        pool.stop()
+        stop_pool_streamer(server)
+        return elapsed, largest
+
+    print(f"{n_symbols} symbols x {per_key} quotes, parsed, merged into one receiver")
+    print("=" * 80)
+    for shards in (1, 2, 4):
+        elapsed, largest = run(shards)
+        print(f"   {shards} session(s):   {elapsed:6.2f} s   {n_symbols * per_key / elapsed:9,.0f} msg/s   "
+              f"keys re-sent per reconnect: {largest}")
+
+
+if __name__ == '__main__':
+    benchmark()
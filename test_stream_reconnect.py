@@ -0,0 +1,198 @@
+"""
+Tests and benchmark for the stream reconnect path
+
+A dropped stream reconnects with the cached streamer info (fetched again only after a
+failed connect or login, and always off the event loop) and re-sends every service's
+subscriptions in one frame. The tests run schwabdev.Stream against a local websocket
+server that imitates the Schwab streamer and can drop connections.
+
+Run tests:      python -m pytest test_stream_reconnect.py
+Run benchmark:  python test_stream_reconnect.py
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import websockets
+import websockets.exceptions
+
+import schwabdev
+from test_stream_dispatcher import FakeClient, level_one
+
+
+class CountingClient(FakeClient):
+    """FakeClient counting (and optionally slowing) streamer info requests, which the real Client makes over HTTP"""
+
+    def __init__(self, url, info_delay=0.0):
+        super().__init__(url)
+        self.info_delay = info_delay
+        self.info_calls = 0
+        self.info_threads = []
+
+    def _get_streamer_info(self, refresh=False):
+        self.info_calls += 1
+        self.info_threads.append(threading.current_thread())
+        time.sleep(self.info_delay)
+        return super()._get_streamer_info(refresh)
+
+
+def run_reconnect_streamer(drops=1, login_code=0, rtt=0.0):
+    """
+    Websocket server that logs in, answers subscription frames (after rtt seconds) with a quote per key,
+    and aborts the first `drops` connections (no close frame) after their first quotes
+    """
+    ready = threading.Event()
+    state = {'connections': [], 'drops': drops}
+
+    async def handler(websocket):
+        connection = {'frames': [], 'opened': time.perf_counter(), 'first_quote': None}
+        state['connections'].append(connection)
+        try:
+            await websocket.recv()                                          # LOGIN
+            await asyncio.sleep(rtt)
+            await websocket.send(json.dumps({'response': [{'service': 'ADMIN', 'command': 'LOGIN', 'content': {'code': login_code}}]}))
+            if login_code != 0:
+                await websocket.close()
+                return
+            async for raw in websocket:
+                requests = json.loads(raw)['requests']
+                connection['frames'].append(requests)
+                await asyncio.sleep(rtt)
+                for request in requests:
+                    await websocket.send(json.dumps({'response': [{'service': request['service'], 'command': request['command'],
+                                                                   'content': {'code': 0}}]}))
+                for request in requests:
+                    for key in request.get('parameters', {}).get('keys', '').split(','):
+                        await websocket.send(level_one(key, len(state['connections'])))
+                connection['first_quote'] = connection['first_quote'] or time.perf_counter()
+                if state['drops'] > 0:
+                    state['drops'] -= 1
+                    connection['dropped'] = time.perf_counter()
+                    websocket.transport.abort()                             # lost connection, no close frame
+                    return
+        except websockets.exceptions.ConnectionClosed:
+            pass
+
+    async def main():
+        async with websockets.serve(handler, '127.0.0.1', 0) as server:
+            state['url'] = f"ws://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+            state['stop'] = asyncio.get_running_loop().create_future()
+            state['loop'] = asyncio.get_running_loop()
+            ready.set()
+            await state['stop']
+
+    threading.Thread(target=lambda: asyncio.run(main()), daemon=True).start()
+    ready.wait(5)
+    return state
+
+
+def stop_reconnect_streamer(state):
+    state['loop'].call_soon_threadsafe(state['stop'].set_result, None)
+
+
+def subscribed_stream(client, n_services=3):
+    stream = schwabdev.Stream(client)
+    stream._min_session_time = 0                                            # reconnect sessions of any length
+    stream.send(stream.level_one_equities('AAPL,MSFT', '0,1,2,3'))
+    stream.send(stream.level_one_equities('SPY', '0,1'))
+    stream.send(stream.chart_equity('AAPL', '0,1,2,3,4,5,6,7,8'))
+    if n_services > 2:
+        stream.send(stream.level_one_futures('/ESZ26', '0,1,2,3'))
+    return stream
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+# ========== TESTS ==========
+
+def test_reconnect_reuses_streamer_info_and_sends_one_frame():
+    server = run_reconnect_streamer(drops=1)
+    client = CountingClient(server['url'])
+    stream = subscribed_stream(client)
+    info_calls = client.info_calls                                          # basic_request fetched it for the requests above
+    messages = []
+    stream.start(messages.append)
+    assert wait_for(lambda: len(server['connections']) == 2 and server['connections'][1]['first_quote'])
+    stream.stop()
+    stop_reconnect_streamer(server)
+    assert client.info_calls == info_calls
+    for connection in server['connections']:
+        frames = [frame for frame in connection['frames'] if frame[0]['service'] != 'ADMIN']   # not the LOGOUT on stop
+        assert len(frames) == 1                                             # all services in one frame
+        assert sorted((r['service'], r['parameters']['keys']) for r in frames[0]) == \
+            [('CHART_EQUITY', 'AAPL'), ('LEVELONE_EQUITIES', 'AAPL,MSFT'), ('LEVELONE_EQUITIES', 'SPY'),
+             ('LEVELONE_FUTURES', '/ESZ26')]
+    assert sum(1 for m in messages if '"data"' in m) == 10                 # 5 keys on each connection
+
+
+def test_streamer_info_fetched_off_loop_and_after_failed_login():
+    server = run_reconnect_streamer(drops=0, login_code=3)
+    client = CountingClient(server['url'])
+    stream = schwabdev.Stream(client)
+    stream.start(lambda message: None)
+    assert wait_for(lambda: stream._thread is not None and not stream._thread.is_alive())
+    assert stream._streamer_info is None                                    # login failed, cache dropped
+    stream._thread.join()
+    stream.start(lambda message: None)
+    assert wait_for(lambda: not stream._thread.is_alive())
+    stream.stop()
+    stop_reconnect_streamer(server)
+    assert client.info_calls == 2
+    assert all(thread.name.startswith('asyncio') for thread in client.info_threads)  # to_thread workers, not the loop
+
+
+def test_healthy_session_drop_reconnects_without_backoff():
+    server = run_reconnect_streamer(drops=1)
+    stream = subscribed_stream(CountingClient(server['url']))
+    stream._backoff_time = 30                                               # would stall the test if used
+    stream.start(lambda message: None)
+    assert wait_for(lambda: len(server['connections']) == 2, timeout=5)
+    stream.stop()
+    stop_reconnect_streamer(server)
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(info_delay=0.3, rtt=0.03, repeats=5):
+    """
+    Gap between a dropped connection and the first quote on the new one, with a 300 ms streamer info
+    request (userPreference over HTTP) and a 30 ms round trip to the streamer
+    """
+
+    class Uncached(schwabdev.Stream):
+        """Reconnects the way it used to: fetches streamer info every time"""
+        async def _run_streamer(self, *args, **kwargs):
+            self._login_succeeded = lambda response: False
+            await super()._run_streamer(*args, **kwargs)
+
+    def gap(stream_type):
+        gaps = []
+        for _ in range(repeats):
+            server = run_reconnect_streamer(drops=1, rtt=rtt)
+            client = CountingClient(server['url'], info_delay=info_delay)
+            stream = stream_type(client)
+            stream._min_session_time = 0
+            for service in ('level_one_equities', 'level_one_futures', 'chart_equity', 'level_one_options'):
+                stream.send(getattr(stream, service)('A,B', '0,1,2,3'))
+            stream.start(lambda message: None)
+            wait_for(lambda: len(server['connections']) == 2 and server['connections'][1]['first_quote'])
+            gaps.append(server['connections'][1]['first_quote'] - server['connections'][0]['dropped'])
+            stream.stop()
+            stop_reconnect_streamer(server)
+        return sorted(gaps)[len(gaps) // 2]
+
+    print(f"Reconnect gap, 4 services, {info_delay * 1000:.0f} ms streamer info request, {rtt * 1000:.0f} ms round trip")
+    print("=" * 80)
+    print(f"   streamer info fetched on reconnect:   {gap(Uncached) * 1000:7.1f} ms")
+    print(f"   cached streamer info:                 {gap(schwabdev.Stream) * 1000:7.1f} ms")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,135 @@
+"""
+Tests and benchmark for the stream replay engine
+
+ReplayStream feeds captured frames (a list, or a TickRecorder day) to stream receivers
+through the same start / send / stop surface as schwabdev.Stream, at the recorded pace,
+accelerated, or at max speed.
+
+Run tests:      python -m pytest test_stream_replay.py
+Run benchmark:  python test_stream_replay.py
+"""
+
+import asyncio
+import json
+import tempfile
+import time
+
+import schwabdev
+from stream_replay import ReplayStream
+from tick_recorder import TickRecorder
+from test_stream_dispatcher import Collector, level_one
+from test_stream_parsing import level_one_burst
+from test_tick_recorder import DAY_MS, chart_equity
+
+
+def record_session(root, n_messages=50):
+    """Record alternating quote bursts and candles 10 ms apart; returns the raw messages"""
+    messages = []
+    with TickRecorder(root) as recorder:
+        for i in range(n_messages):
+            message = level_one_burst(5, seed=i) if i % 2 == 0 else chart_equity('S000', i, 100.0 + i)
+            recorder.record(message, received=DAY_MS + 10 * i)
+            messages.append(message)
+    return messages
+
+
+# ========== TESTS ==========
+
+def test_replays_frames_in_order():
+    frames = [level_one('AAPL', i) for i in range(20)]
+    replay = ReplayStream(frames)
+    collector = Collector()
+    replay.start(collector, speed=None)
+    assert replay.join(5)
+    login, *messages = collector.messages
+    assert json.loads(login)['response'][0]['command'] == 'LOGIN'
+    assert messages == frames and replay.delivered == 20
+
+
+def test_paced_by_received_time():
+    frames = [(1000 + 200 * i, level_one('AAPL', i)) for i in range(3)]
+    replay = ReplayStream(frames)
+    start = time.perf_counter()
+    replay.start(Collector(), speed=4)                                  # 400 ms recorded -> 100 ms
+    replay.join(5)
+    elapsed = time.perf_counter() - start
+    assert 0.09 <= elapsed < 0.5
+
+
+def test_from_ticks_round_trip():
+    with tempfile.TemporaryDirectory() as root:
+        messages = record_session(root)
+        collector = Collector()
+        replay = ReplayStream.from_ticks(root, '2026-10-15')
+        replay.start(collector, speed=None, parsed=True)
+        assert replay.join(5)
+    replayed = [m for m in collector.messages if m.data]
+    assert len(replayed) == len(messages)
+    for original, message in zip(messages, replayed):
+        expected = schwabdev.parse_message(original).data
+        assert [r.service for r in message.data] == [r.service for r in expected]
+        for got, want in zip(message.data, expected):
+            want = {k: v for k, v in want.to_dict().items() if k in got.to_dict()}
+            assert got.to_dict() == want
+
+
+def test_send_answers_and_filters_subscriptions():
+    with tempfile.TemporaryDirectory() as root:
+        record_session(root)
+        replay = ReplayStream.from_ticks(root, '2026-10-15')
+        replay.send(replay.level_one_equities('S001,S003', '0,1,2,3'))
+        collector = Collector()
+        replay.start(collector, speed=None, parsed=True)
+        assert replay.join(5)
+    responses = [r for m in collector.messages for r in m.response]
+    assert [r['command'] for r in responses] == ['ADD', 'LOGIN']
+    records = [r for m in collector.messages for r in m.data]
+    assert records and {(r.service, r.key) for r in records} == {('LEVELONE_EQUITIES', 'S001'), ('LEVELONE_EQUITIES', 'S003')}
+
+
+def test_async_receiver_through_dispatcher():
+    received = []
+
+    async def receiver(message):
+        await asyncio.sleep(0)
+        received.append(message)
+
+    replay = ReplayStream([level_one('AAPL', i) for i in range(10)])
+    replay.start(receiver, speed=None, dispatcher=schwabdev.StreamDispatcher())
+    assert replay.join(5)
+    assert len(received) == 11
+
+
+def test_benchmark_reports_throughput_and_latency():
+    replay = ReplayStream([level_one('AAPL', i) for i in range(100)])
+    stats = replay.benchmark(lambda message: time.sleep(0.0005), parsed=True)
+    assert stats['messages'] == 101 and stats['messages_per_second'] > 0
+    assert 400 <= stats['latency_us']['p50'] <= stats['latency_us']['p99'] <= stats['latency_us']['max']
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_messages=20000, n_symbols=20):
+    from incremental_features import FeatureEngine
+
+    with tempfile.TemporaryDirectory() as root:
+        with TickRecorder(root) as recorder:
+            for i in range(n_messages):
+                recorder.record(level_one_burst(n_symbols, seed=i % 100), received=DAY_MS + i)
+            for minute in range(500):
+                recorder.record(chart_equity(f'S{minute % n_symbols:03d}', minute, 100.0 + minute % 7), received=DAY_MS + minute * 40)
+
+        engine = FeatureEngine()
+        runs = [('no-op receiver', None, False), ('no-op receiver, parsed', None, True),
+                ('FeatureEngine.on_chart_equity, parsed', engine.on_chart_equity, True)]
+        print(f"Replay of {n_messages} LEVELONE_EQUITIES frames x {n_symbols} symbols + 500 candles at max speed")
+        print("=" * 80)
+        for name, receiver, parsed in runs:
+            stats = ReplayStream.from_ticks(root, '2026-10-15').benchmark(receiver, parsed=parsed)
+            latency = stats['latency_us']
+            print(f"   {name:40s} {stats['messages_per_second']:9,.0f} msg/s   "
+                  f"p50 {latency['p50']:6.1f} us  p99 {latency['p99']:7.1f} us")
+
+
+if __name__ == '__main__':
+    benchmark()
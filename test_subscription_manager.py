@@ -0,0 +1,166 @@
+"""
+Tests and benchmark for the schwabdev subscription manager
+
+SubscriptionManager holds subscription changes for a short window, compares the result
+with the stream's recorded subscriptions and sends the fewest grouped requests in one
+frame, so add/remove churn on the same symbols never reaches the streamer.
+
+Run tests:      python -m pytest test_subscription_manager.py
+Run benchmark:  python test_subscription_manager.py
+"""
+
+import random
+import time
+
+import schwabdev
+from schwabdev import SubscriptionManager
+from test_stream_dispatcher import FakeClient
+
+EQUITY_FIELDS = '0,1,2,3,4,5,8'
+CHART_FIELDS = '0,1,2,3,4,5,6,7,8'
+
+
+def recording_stream():
+    """Unstarted Stream whose sends (frames) are recorded; requests are still recorded into stream.subscriptions"""
+    stream = schwabdev.Stream(FakeClient('ws://127.0.0.1:1'))
+    stream.frames = []
+    send = stream.send
+
+    def recorded_send(requests, record=True):
+        stream.frames.append(requests if isinstance(requests, list) else [requests])
+        send(requests, record=record)
+    stream.send = recorded_send
+    return stream
+
+
+def summary(requests):
+    return [(r['service'], r['command'], r['parameters']['keys'], r['parameters'].get('fields')) for r in requests]
+
+
+# ========== TESTS ==========
+
+def test_churn_cancels_out():
+    stream = recording_stream()
+    manager = SubscriptionManager(stream, window=10)
+    manager.add('LEVELONE_EQUITIES', 'AAPL', EQUITY_FIELDS)
+    manager.remove('LEVELONE_EQUITIES', 'AAPL')
+    manager.send(stream.level_one_equities('MSFT', '0,1,2'))
+    manager.send(stream.level_one_equities('MSFT', '3'))
+    manager.send(stream.level_one_equities('TSLA', '0,1'))
+    manager.send(stream.level_one_equities('TSLA', '0,1', command='UNSUBS'))
+    assert summary(manager.flush()) == [('LEVELONE_EQUITIES', 'ADD', 'MSFT', '0,1,2,3')]
+    assert len(stream.frames) == 1 and list(stream.subscriptions['LEVELONE_EQUITIES']) == ['MSFT']
+    assert manager.flush() == [] and manager.stats() == {'received': 6, 'sent': 1, 'frames': 1, 'pending': 0}
+
+
+def test_changes_are_grouped_into_one_frame():
+    stream = recording_stream()
+    manager = SubscriptionManager(stream, window=10)
+    symbols = [f'S{i:03d}' for i in range(50)]
+    for symbol in symbols:
+        manager.send([stream.level_one_equities(symbol, EQUITY_FIELDS), stream.chart_equity(symbol, CHART_FIELDS)])
+    requests = manager.flush()
+    assert [(s, c, f) for s, c, _, f in summary(requests)] == [('LEVELONE_EQUITIES', 'ADD', EQUITY_FIELDS),
+                                                               ('CHART_EQUITY', 'ADD', CHART_FIELDS)]
+    assert len(stream.frames) == 1 and set(stream.subscriptions['CHART_EQUITY']) == set(symbols)
+    manager.send(stream.level_one_equities(symbols[:10], EQUITY_FIELDS))   # already subscribed
+    assert manager.flush() == [] and len(stream.frames) == 1
+
+
+def test_removals_and_narrowed_fields():
+    stream = recording_stream()
+    manager = SubscriptionManager(stream, window=10)
+    manager.add('LEVELONE_EQUITIES', ['A', 'B', 'C'], '0,1,2,3')
+    manager.add('LEVELONE_EQUITIES', 'D', '0,1')
+    manager.flush()
+    manager.remove('LEVELONE_EQUITIES', 'A')
+    manager.send(stream.level_one_equities('B', '0,1,2,3,8'))                # widened: ADD alone
+    manager.send(stream.basic_request('LEVELONE_EQUITIES', 'UNSUBS', parameters={'keys': 'C'}))
+    manager.add('LEVELONE_EQUITIES', 'C', '0,1')                             # narrowed: removed, then added
+    assert summary(manager.flush()) == [('LEVELONE_EQUITIES', 'UNSUBS', 'A,C', None),
+                                        ('LEVELONE_EQUITIES', 'ADD', 'B', '0,1,2,3,8'),
+                                        ('LEVELONE_EQUITIES', 'ADD', 'C', '0,1')]
+    assert {k: sorted(v, key=int) for k, v in stream.subscriptions['LEVELONE_EQUITIES'].items()} == \
+        {'B': ['0', '1', '2', '3', '8'], 'C': ['0', '1'], 'D': ['0', '1']}
+
+
+def test_subs_used_when_smaller():
+    stream = recording_stream()
+    manager = SubscriptionManager(stream, window=10)
+    manager.add('LEVELONE_EQUITIES', [f'OLD{i}' for i in range(20)], '0,1')
+    manager.flush()
+    manager.send(stream.level_one_equities(['NEW1', 'NEW2'], '0,1', command='SUBS'))
+    assert summary(manager.flush()) == [('LEVELONE_EQUITIES', 'SUBS', 'NEW1,NEW2', '0,1')]
+    assert list(stream.subscriptions['LEVELONE_EQUITIES']) == ['NEW1', 'NEW2']
+
+
+def test_window_debounces():
+    stream = recording_stream()
+    manager = SubscriptionManager(stream, window=0.05)
+    for symbol in ['A', 'B', 'C', 'A']:
+        manager.add('CHART_EQUITY', symbol, CHART_FIELDS)
+    manager.remove('CHART_EQUITY', 'B')
+    assert stream.frames == []
+    time.sleep(0.2)
+    assert [summary(frame) for frame in stream.frames] == [[('CHART_EQUITY', 'ADD', 'A,C', CHART_FIELDS)]]
+
+
+def test_works_with_stream_pool():
+    pool = schwabdev.StreamPool(FakeClient('ws://127.0.0.1:1'), shards=2)
+    manager = SubscriptionManager(pool, window=10)
+    manager.add('LEVELONE_EQUITIES', ['A', 'B', 'C', 'D'], '0,1')
+    manager.remove('LEVELONE_EQUITIES', 'D')
+    manager.flush()
+    assert set(pool.subscriptions['LEVELONE_EQUITIES']) == {'A', 'B', 'C'}
+    assert sum(len(shard.subscriptions['LEVELONE_EQUITIES']) for shard in pool.shards) == 3
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_toggles=2000, n_symbols=20, toggles_per_window=25):
+    """A dashboard flipping symbols on and off: frames and requests sent directly vs through the manager"""
+    rng = random.Random(0)
+    symbols = [f'S{i:03d}' for i in range(n_symbols)]
+    toggles = [rng.choice(symbols) for _ in range(n_toggles)]
+
+    direct = recording_stream()
+    on = set()
+    start = time.perf_counter()
+    for symbol in toggles:
+        command = 'UNSUBS' if symbol in on else 'ADD'
+        on ^= {symbol}
+        direct.send(direct.level_one_equities(symbol, EQUITY_FIELDS, command=command))
+        direct.send(direct.chart_equity(symbol, CHART_FIELDS, command=command))
+    direct_time = time.perf_counter() - start
+
+    managed = recording_stream()
+    manager = SubscriptionManager(managed, window=10)
+    on = set()
+    start = time.perf_counter()
+    for i, symbol in enumerate(toggles):
+        if symbol in on:
+            manager.remove('LEVELONE_EQUITIES', symbol)
+            manager.remove('CHART_EQUITY', symbol)
+        else:
+            manager.add('LEVELONE_EQUITIES', symbol, EQUITY_FIELDS)
+            manager.add('CHART_EQUITY', symbol, CHART_FIELDS)
+        on ^= {symbol}
+        if (i + 1) % toggles_per_window == 0:                            # the window closing
+            manager.flush()
+    manager.flush()
+    managed_time = time.perf_counter() - start
+
+    assert {s: set(v) for s, v in direct.subscriptions.items() if v} == {s: set(v) for s, v in managed.subscriptions.items() if v}
+    direct_requests = sum(map(len, direct.frames))
+    managed_requests = sum(map(len, managed.frames))
+    print(f"{n_toggles} symbol toggles over {n_symbols} symbols (LEVELONE_EQUITIES + CHART_EQUITY), "
+          f"{toggles_per_window} toggles per window")
+    print("=" * 80)
+    print(f"   Stream.send directly:    {len(direct.frames):6d} frames  {direct_requests:6d} requests  "
+          f"{direct_time / n_toggles * 1e6:7.1f} us per toggle")
+    print(f"   SubscriptionManager:     {len(managed.frames):6d} frames  {managed_requests:6d} requests  "
+          f"{managed_time / n_toggles * 1e6:7.1f} us per toggle")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,137 @@
+"""
+Tests and benchmark for the tick recorder
+
+TickRecorder is a stream receiver that queues LEVELONE_EQUITIES and CHART_EQUITY
+updates as fixed-width rows and appends them to per-day, per-service files from a
+background writer thread.
+
+Run tests:      python -m pytest test_tick_recorder.py
+Run benchmark:  python test_tick_recorder.py
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import schwabdev
+from tick_recorder import TickRecorder, load_ticks, row_dtype
+from test_stream_parsing import level_one_burst
+
+DAY_MS = 1_792_095_960_000      # 2026-10-15 16:26 New York time
+
+
+def level_one(symbol, fields, timestamp=1):
+    return json.dumps({'data': [{'service': 'LEVELONE_EQUITIES', 'timestamp': timestamp, 'command': 'SUBS',
+                                 'content': [{'key': symbol, **fields}]}]})
+
+
+def chart_equity(symbol, minute, close):
+    return json.dumps({'data': [{'service': 'CHART_EQUITY', 'timestamp': minute * 60000, 'command': 'SUBS',
+                                 'content': [{'key': symbol, '1': minute, '2': close - 1, '3': close + 1, '4': close - 2,
+                                              '5': close, '6': 1000, '7': minute * 60000, '8': 20000}]}]})
+
+
+# ========== TESTS ==========
+
+def test_records_and_reads_back():
+    with tempfile.TemporaryDirectory() as root:
+        recorder = TickRecorder(root)
+        recorder.record(level_one('AAPL', {'1': 100.0, '2': 100.1, '3': 100.05}), received=DAY_MS)
+        recorder.record(level_one('MSFT', {'3': 400.0}), received=DAY_MS + 1)
+        recorder.record(level_one('AAPL', {'3': 100.2, '8': 12345}), received=DAY_MS + 2)
+        for minute in range(3):
+            recorder.record(chart_equity('AAPL', minute, 100 + minute), received=DAY_MS + 3)
+        recorder.record(json.dumps({'notify': [{'heartbeat': '1'}]}), received=DAY_MS + 4)
+        recorder.close()
+
+        assert recorder.days() == ['2026-10-15']
+        quotes = recorder.read('LEVELONE_EQUITIES', '2026-10-15')
+        assert list(quotes['symbol']) == ['AAPL', 'MSFT', 'AAPL']
+        assert quotes['last_price'].tolist() == [100.05, 400.0, 100.2]
+        assert np.isnan(quotes['bid_price'].iloc[1]) and quotes['total_volume'].iloc[2] == 12345
+        aapl = recorder.read('LEVELONE_EQUITIES', '2026-10-15', symbol='AAPL')
+        assert len(aapl) == 2 and aapl['received'].iloc[0].value // 1_000_000 == DAY_MS
+        candles = recorder.read('CHART_EQUITY', '2026-10-15')
+        assert candles['close_price'].tolist() == [100.0, 101.0, 102.0] and candles['sequence'].tolist() == [0, 1, 2]
+        assert recorder.stats()['written'] == 6
+
+
+def test_parsed_messages_match_raw():
+    message = level_one_burst(20)
+    with tempfile.TemporaryDirectory() as raw_root, tempfile.TemporaryDirectory() as parsed_root:
+        with TickRecorder(raw_root) as raw, TickRecorder(parsed_root) as parsed:
+            raw.record(message, received=DAY_MS)
+            parsed.record(schwabdev.parse_message(message), received=DAY_MS)
+        a = load_ticks(raw_root, 'LEVELONE_EQUITIES', '2026-10-15')
+        b = load_ticks(parsed_root, 'LEVELONE_EQUITIES', '2026-10-15')
+        assert len(a) == 20 and a.tobytes() == b.tobytes()
+
+
+def test_days_are_split_in_new_york_time():
+    with tempfile.TemporaryDirectory() as root:
+        with TickRecorder(root) as recorder:
+            recorder.record(level_one('AAPL', {'3': 1.0}), received=DAY_MS)
+            recorder.record(level_one('AAPL', {'3': 2.0}), received=DAY_MS + 8 * 3600 * 1000)  # 00:26 next day
+        assert recorder.days() == ['2026-10-15', '2026-10-16']
+
+
+def test_background_flush_and_bounded_memory():
+    with tempfile.TemporaryDirectory() as root:
+        recorder = TickRecorder(root, flush_interval=0.05)
+        recorder.record(level_one('AAPL', {'3': 1.0}))
+        deadline = time.time() + 5
+        while recorder.stats()['written'] == 0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert recorder.stats()['written'] == 1                             # flushed without flush()/close()
+        recorder.close()
+
+        recorder = TickRecorder(root, flush_interval=60, batch_rows=10**6, max_pending_rows=30)
+        recorder.record(level_one_burst(50))
+        assert recorder.stats()['pending'] == 30 and recorder.stats()['dropped'] == 20
+        recorder.close()
+
+
+def test_partial_trailing_row_is_ignored():
+    with tempfile.TemporaryDirectory() as root:
+        with TickRecorder(root) as recorder:
+            recorder.record(level_one('AAPL', {'3': 1.0}), received=DAY_MS)
+        path = os.path.join(root, '2026-10-15', 'LEVELONE_EQUITIES.ticks')
+        with open(path, 'ab') as f:
+            f.write(b'\x00' * 7)
+        rows = load_ticks(root, 'LEVELONE_EQUITIES', '2026-10-15')
+        assert len(rows) == 1 and rows.dtype == row_dtype('LEVELONE_EQUITIES')
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_messages=5000, n_symbols=20):
+    messages = [level_one_burst(n_symbols, seed=i) for i in range(200)]
+    with tempfile.TemporaryDirectory() as root:
+        recorder = TickRecorder(root)
+        latencies = []
+        start = time.perf_counter()
+        for i in range(n_messages):
+            t = time.perf_counter()
+            recorder.record(messages[i % len(messages)])
+            latencies.append(time.perf_counter() - t)
+        record_time = time.perf_counter() - start
+        start = time.perf_counter()
+        recorder.close()
+        drain_time = time.perf_counter() - start
+        stats = recorder.stats()
+
+    latencies = np.array(latencies) * 1e6
+    updates = n_messages * n_symbols
+    print(f"{n_messages} LEVELONE_EQUITIES messages x {n_symbols} symbols recorded")
+    print("=" * 80)
+    print(f"   throughput:          {updates / record_time:12,.0f} updates/s on the stream thread")
+    print(f"   record() p50 / p99:  {np.percentile(latencies, 50):8.1f} / {np.percentile(latencies, 99):8.1f} us per message")
+    print(f"   final drain:         {drain_time * 1000:8.1f} ms")
+    print(f"   written:             {stats['written']:,} rows, {stats['bytes_written'] / stats['written']:.0f} bytes/row, {stats['dropped']} dropped")
+
+
+if __name__ == '__main__':
+    benchmark()
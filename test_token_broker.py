@@ -0,0 +1,148 @@
+"""
+Tests and benchmark for the schwabdev token broker
+
+One TokenBroker process owns the tokens database and the OAuth calls; worker processes
+connect with BrokerTokens (Client(..., token_broker=path)) over a Unix socket and get
+every new access token pushed. The tests run the broker and its subscribers in one
+process against a temporary tokens database and a fake OAuth endpoint.
+
+Run tests:      python -m pytest test_token_broker.py
+Run benchmark:  python test_token_broker.py
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from schwabdev import BrokerTokens, Client, TokenBroker
+from test_tokens import APP_KEY, APP_SECRET, FakeOAuthTokens, make_tokens, tokens_db, wait_for
+
+
+def socket_path():
+    return os.path.join(tempfile.mkdtemp(), 'tokens.sock')
+
+
+def start_broker(access_age=0, path=None):
+    broker = TokenBroker(make_tokens(access_age), path or socket_path())
+    broker.start()
+    return broker
+
+
+# ========== TESTS ==========
+
+def test_renewal_pushed_to_every_subscriber():
+    broker = start_broker(access_age=1800 - 120)               # inside the refresher's 5 minute lead
+    subscribers = [BrokerTokens(broker.socket_path) for _ in range(5)]
+    assert all(s.access_token == 'access-1' for s in subscribers)
+    assert os.stat(broker.socket_path).st_mode & 0o777 == 0o600
+    broker.tokens.start_refresher()
+    assert wait_for(lambda: all(s.access_token == 'access-2' for s in subscribers))
+    assert len(broker.tokens.posts) == 1 and broker.stats()['subscribers'] == 5
+    assert all(1700 < s.access_token_expires_in() <= 1800 for s in subscribers)
+    assert all(s.update_tokens() is False for s in subscribers)
+    broker.tokens.stop_refresher()
+    broker.stop()
+
+
+def test_forced_renewals_collapse_to_one_oauth_call():
+    broker = start_broker()
+    broker.tokens.delay = 0.2
+    subscribers = [BrokerTokens(broker.socket_path) for _ in range(20)]
+    with ThreadPoolExecutor(20) as pool:
+        results = list(pool.map(lambda s: s.update_tokens(force_access_token=True), subscribers))
+    assert all(results) and all(s.access_token == 'access-2' for s in subscribers)
+    assert len(broker.tokens.posts) == 1 and broker.stats()['refreshes'] == 1
+    broker.stop()
+
+
+def test_subscriber_keeps_token_and_reconnects():
+    broker = start_broker()
+    subscriber = BrokerTokens(broker.socket_path)
+    broker.stop()
+    assert not os.path.exists(broker.socket_path)
+    assert subscriber.access_token == 'access-1'
+    replacement = TokenBroker(make_tokens(), broker.socket_path)
+    replacement.tokens.update_tokens(force_access_token=True)   # the new broker's token differs
+    replacement.start()
+    assert wait_for(lambda: subscriber.access_token == 'access-2', timeout=10)
+    subscriber.close()
+    replacement.stop()
+
+
+def test_one_broker_per_socket():
+    path = socket_path()
+    open(path, 'w').close()                                     # left behind by a crashed broker
+    broker = start_broker(path=path)
+    with pytest.raises(RuntimeError):
+        TokenBroker(make_tokens(), path).start()
+    broker.stop()
+    with pytest.raises(ConnectionError):
+        BrokerTokens(path)
+
+
+def test_client_uses_broker_tokens():
+    broker = start_broker(access_age=1800 - 120)
+    client = Client(APP_KEY, APP_SECRET, token_broker=broker.socket_path)
+    assert isinstance(client.tokens, BrokerTokens) and client._auth_headers == {'Authorization': 'Bearer access-1'}
+    broker.tokens.start_refresher()
+    assert wait_for(lambda: client.tokens.access_token == 'access-2')
+    assert client.update_tokens() is True and client._auth_headers == {'Authorization': 'Bearer access-2'}
+    broker.tokens.stop_refresher()
+    broker.stop()
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_workers=30, oauth_delay=0.3):
+    """
+    Workers all finding the access token due at the same moment: each with its own Tokens on the shared
+    database (the previous setup) against one broker and BrokerTokens subscribers
+    """
+
+    class CountingTokens(FakeOAuthTokens):
+        transactions = 0
+
+        def _update_access_token(self, overwrite=False):
+            CountingTokens.transactions += 1
+            super()._update_access_token(overwrite)
+
+    path = tokens_db()
+    workers = [CountingTokens(APP_KEY, APP_SECRET, 'https://127.0.0.1', make_tokens()._logger, path, background_refresh=False)
+               for _ in range(n_workers)]
+    for worker in workers:
+        worker.delay = oauth_delay
+        worker._access_threshold = 1800                     # due now
+        worker._set_deadlines()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_workers) as pool:
+        list(pool.map(lambda worker: worker.update_tokens(), workers))
+    direct_time = time.perf_counter() - start
+    direct_posts = sum(len(getattr(worker, 'posts', [])) for worker in workers)
+
+    broker = start_broker()
+    broker.tokens.delay = oauth_delay
+    subscribers = [BrokerTokens(broker.socket_path) for _ in range(n_workers)]
+    done = threading.Event()
+    start = time.perf_counter()
+    threading.Thread(target=lambda: (broker.tokens.update_tokens(force_access_token=True), done.set())).start()
+    wait_for(lambda: all(s.access_token == 'access-2' for s in subscribers))
+    broker_time = time.perf_counter() - start
+    done.wait()
+    for subscriber in subscribers:
+        subscriber.close()
+    broker.stop()
+
+    print(f"{n_workers} workers with the access token due at once, {oauth_delay * 1000:.0f} ms OAuth round trip")
+    print("=" * 80)
+    print(f"   Tokens per worker on one database:  {direct_time * 1000:7.1f} ms until all updated  "
+          f"{CountingTokens.transactions:3d} exclusive transactions  {direct_posts:3d} OAuth calls")
+    print(f"   TokenBroker + BrokerTokens:         {broker_time * 1000:7.1f} ms until all updated  "
+          f"{1:3d} exclusive transactions  {len(broker.tokens.posts):3d} OAuth calls")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,228 @@
+"""
+Tests and benchmark for the schwabdev token fast path and background refresher
+
+Tokens.update_tokens compares time.monotonic() with a precomputed deadline and only
+does datetime, lock and SQLite work once a token is near expiry. A background thread
+renews the access token ahead of expiry, so requests pick up the new token without
+waiting on the OAuth round trip. Reloads from the database skip the SELECT when SQLite's
+data_version shows no other writer, and only decrypt tokens whose ciphertext changed.
+The tests use a temporary tokens database and a fake OAuth endpoint.
+
+Run tests:      python -m pytest test_tokens.py
+Run benchmark:  python test_tokens.py
+"""
+
+import datetime
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from cryptography.fernet import Fernet
+
+from schwabdev import Client
+from schwabdev.tokens import Tokens
+
+APP_KEY = 'k' * 32
+APP_SECRET = 's' * 16
+
+
+class FakeResponse:
+    ok = True
+    text = ''
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeOAuthTokens(Tokens):
+    """Tokens whose OAuth endpoint returns access-2, access-3, ... after `delay` seconds"""
+
+    delay = 0.0
+
+    def _post_oauth_token(self, grant_type, code):
+        self.posts = getattr(self, 'posts', [])
+        self.posts.append((grant_type, threading.current_thread().name))
+        time.sleep(self.delay)
+        return FakeResponse({'access_token': f'access-{len(self.posts) + 1}', 'expires_in': 1800})
+
+
+def tokens_db(access_age=0, expires_in=1800):
+    """Temporary tokens database holding an access token issued access_age seconds ago"""
+    path = os.path.join(tempfile.mkdtemp(), 'tokens.db')
+    now = datetime.datetime.now(datetime.timezone.utc)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE schwabdev (access_token_issued TEXT NOT NULL, refresh_token_issued TEXT NOT NULL, "
+                 "access_token TEXT NOT NULL, refresh_token TEXT NOT NULL, id_token TEXT NOT NULL, expires_in INTEGER, "
+                 "token_type TEXT, scope TEXT)")
+    conn.execute("INSERT INTO schwabdev VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                 ((now - datetime.timedelta(seconds=access_age)).isoformat(), now.isoformat(),
+                  'access-1', 'refresh-1', 'id-1', expires_in, 'Bearer', 'api'))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def make_tokens(access_age=0, background_refresh=False, encryption=None, path=None, **kwargs):
+    return FakeOAuthTokens(APP_KEY, APP_SECRET, 'https://127.0.0.1', logging.getLogger('Schwabdev'),
+                           path or tokens_db(access_age, **kwargs), encryption, background_refresh=background_refresh)
+
+
+class CountingCipher:
+    """Wraps a Fernet cipher counting encrypt and decrypt calls"""
+
+    def __init__(self, cipher):
+        self.cipher = cipher
+        self.encrypts = 0
+        self.decrypts = 0
+
+    def encrypt(self, data):
+        self.encrypts += 1
+        return self.cipher.encrypt(data)
+
+    def decrypt(self, data):
+        self.decrypts += 1
+        return self.cipher.decrypt(data)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+# ========== TESTS ==========
+
+def test_fast_path_skips_token_work():
+    tokens = make_tokens()
+    calls = []
+    tokens._update_access_token = lambda *args: calls.append(args)
+    for _ in range(1000):
+        assert tokens.update_tokens() is False
+    assert calls == [] and tokens.access_token == 'access-1'
+    assert tokens.update_tokens(force_access_token=True) is True and len(calls) == 1
+
+
+def test_request_path_updates_near_expiry():
+    tokens = make_tokens(access_age=1800 - 30)                  # 30 seconds left, inside the 61 second threshold
+    assert tokens.access_token == 'access-2'                    # updated by update_tokens() in __init__
+    assert tokens.update_tokens() is False
+    assert tokens.posts == [('refresh_token', threading.current_thread().name)]
+
+
+def test_background_refresher_renews_ahead_of_expiry():
+    tokens = make_tokens(access_age=1800 - 120)                 # 2 minutes left, inside the 5 minute lead
+    assert not hasattr(tokens, 'posts') and tokens.access_token == 'access-1'
+    tokens.start_refresher()
+    assert wait_for(lambda: tokens.access_token == 'access-2')
+    assert tokens.posts == [('refresh_token', 'Schwabdev-TokenRefresher')]
+    assert tokens._access_expiry - time.monotonic() > 1700      # next renewal is a token lifetime away
+    row = tokens._conn.execute("SELECT access_token FROM schwabdev").fetchone()
+    assert row == ('access-2',)
+    tokens.stop_refresher()
+    tokens._refresher.join(2)
+    assert not tokens._refresher.is_alive()
+
+
+def test_client_headers_follow_background_refresh():
+    tokens = make_tokens(access_age=1800 - 120)
+    client = Client.__new__(Client)
+    client.tokens = tokens
+    client._init_session(1)
+    assert client._auth_headers == {'Authorization': 'Bearer access-1'}
+    tokens.start_refresher()
+    assert wait_for(lambda: tokens.access_token == 'access-2')
+    assert client.update_tokens() is True
+    assert client._auth_headers == {'Authorization': 'Bearer access-2'}
+    assert client.update_tokens() is False
+    tokens.stop_refresher()
+
+
+def test_encrypted_reload_only_decrypts_changed_tokens():
+    key = Fernet.generate_key().decode()
+    path = tokens_db()
+    writer = make_tokens(encryption=key, path=path)
+    writer.update_tokens(force_access_token=True)               # row now holds encrypted access-2 / refresh-1
+    reader = make_tokens(encryption=key, path=path)             # another instance on the same database
+    assert (reader.access_token, reader.refresh_token) == ('access-2', 'refresh-1')
+    writer._cipher_suite = CountingCipher(writer._cipher_suite)
+    reader._cipher_suite = CountingCipher(reader._cipher_suite)
+
+    assert reader._load_tokens_from_db() and reader._cipher_suite.decrypts == 0   # unchanged row: not even read
+    writer.update_tokens(force_access_token=True)
+    assert writer._cipher_suite.encrypts == 1                   # the refresh token keeps its ciphertext
+    assert reader._load_tokens_from_db() and reader._cipher_suite.decrypts == 1
+    assert (reader.access_token, reader.refresh_token) == ('access-3', 'refresh-1')
+    assert writer._cipher_suite.decrypts == 0 and writer._load_tokens_from_db()   # own write, nothing to reload
+    stored = writer._conn.execute("SELECT access_token FROM schwabdev").fetchone()[0]
+    assert stored.startswith('enc:') and 'access-3' not in stored
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_calls=200_000, oauth_delay=0.3):
+    tokens = make_tokens()
+
+    def per_call(update):
+        start = time.perf_counter()
+        for _ in range(n_calls):
+            update()
+        return (time.perf_counter() - start) / n_calls * 1e9
+
+    fast = per_call(tokens.update_tokens)
+    tokens._update_due = 0.0                                    # the datetime checks update_tokens used to run on every call
+    slow = per_call(lambda: (tokens.update_tokens(), setattr(tokens, '_update_due', 0.0)))
+
+    inline = make_tokens(access_age=1800 - 90)
+    inline.delay = oauth_delay
+    inline._access_threshold = 120                              # now due on the request path
+    inline._set_deadlines()
+    start = time.perf_counter()
+    inline.update_tokens()
+    inline_wait = time.perf_counter() - start
+
+    background = make_tokens(access_age=1800 - 120)
+    background.delay = oauth_delay
+    background.start_refresher()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    background.update_tokens()
+    background_wait = time.perf_counter() - start
+    background.stop_refresher()
+
+    key = Fernet.generate_key().decode()
+    path = tokens_db()
+    make_tokens(encryption=key, path=path).update_tokens(force_access_token=True)
+    reader = make_tokens(encryption=key, path=path)
+    n_loads = 2000
+
+    def reload(uncached):
+        start = time.perf_counter()
+        for _ in range(n_loads):
+            if uncached:
+                reader._data_version, reader._dec_memo = None, {}
+            reader._load_tokens_from_db()
+        return (time.perf_counter() - start) / n_loads * 1e6
+
+    full_reload, cached_reload = reload(True), reload(False)
+
+    print(f"Tokens.update_tokens with valid tokens, {n_calls} calls")
+    print("=" * 80)
+    print(f"   datetime checks on every call:       {slow:8.0f} ns per call")
+    print(f"   monotonic deadline fast path:        {fast:8.0f} ns per call")
+    print(f"Request arriving when the access token is due, {oauth_delay * 1000:.0f} ms OAuth round trip")
+    print(f"   renewed on the request path:         {inline_wait * 1000:8.1f} ms")
+    print(f"   renewed by the background refresher: {background_wait * 1000:8.1f} ms")
+    print(f"Encrypted tokens database reload (each contended refresh), {n_loads} loads")
+    print(f"   SELECT + decrypt every time:         {full_reload:8.1f} us per load")
+    print(f"   data_version check, unchanged row:   {cached_reload:8.1f} us per load")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,150 @@
+"""
+Equivalence tests and benchmark for the vectorized rolling features in create_features
+
+The ts_rank, rolling quantile and CCI mean-absolute-deviation columns used to be built
+with rolling(...).apply(lambda ...). These tests keep the original lambdas as the
+reference and check the vectorized helpers produce the same numbers.
+
+Run tests:      python -m pytest test_vectorized_features.py
+Run benchmark:  python test_vectorized_features.py
+"""
+
+import time
+import numpy as np
+import pandas as pd
+
+from ensemble_trading_model import (
+    SchwabDataFetcher,
+    _rolling_rank_pct,
+    _rolling_median,
+    _rolling_mean_abs_dev,
+)
+
+
+def make_ohlcv(n, freq='B', seed=0):
+    """Synthetic OHLCV bars (random walk, integer volume with ties)"""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    open_ = close * (1 + rng.normal(0, 0.002, n))
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.003, n)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.003, n)))
+    volume = rng.integers(1, 50, n) * 1000  # coarse buckets so rank ties occur
+    index = pd.date_range('2005-01-03', periods=n, freq=freq)
+    return pd.DataFrame({'open': open_, 'high': high, 'low': low, 'close': close, 'volume': volume}, index=index)
+
+
+# ========== REFERENCE (original rolling.apply implementations) ==========
+
+def reference_rank_pct(series, window):
+    return series.rolling(window=window).apply(lambda x: pd.Series(x).rank(pct=True).iloc[-1], raw=False)
+
+
+def reference_median(series, window):
+    return series.rolling(window=window).apply(lambda x: pd.Series(x).quantile(0.5), raw=False)
+
+
+def reference_mean_abs_dev(series, window):
+    return series.rolling(window=window).apply(lambda x: np.abs(x - x.mean()).mean())
+
+
+def assert_same(actual, expected):
+    pd.testing.assert_index_equal(actual.index, expected.index)
+    np.testing.assert_allclose(actual.to_numpy(), expected.to_numpy(), rtol=1e-12, atol=0, equal_nan=True)
+
+
+# ========== TESTS ==========
+
+def test_rank_pct_matches_reference():
+    df = make_ohlcv(600)
+    returns = df['close'].pct_change()
+    for period in [5, 10, 20]:
+        assert_same(_rolling_rank_pct(df['close'], period), reference_rank_pct(df['close'], period))
+        assert_same(_rolling_rank_pct(df['volume'], period), reference_rank_pct(df['volume'], period))
+        assert_same(_rolling_rank_pct(returns, period), reference_rank_pct(returns, period))
+
+
+def test_rank_pct_with_ties_and_gaps():
+    series = pd.Series([1.0, 1.0, 2.0, np.nan, 2.0, 2.0, 2.0, 1.0, 3.0, 3.0, 0.0, 1.0])
+    for period in [2, 3, 4]:
+        assert_same(_rolling_rank_pct(series, period), reference_rank_pct(series, period))
+
+
+def test_median_matches_reference():
+    df = make_ohlcv(600)
+    for period in [10, 20]:
+        assert_same(_rolling_median(df['close'], period), reference_median(df['close'], period))
+
+
+def test_mean_abs_dev_matches_reference():
+    df = make_ohlcv(600)
+    tp = (df['high'] + df['low'] + df['close']) / 3
+    assert_same(_rolling_mean_abs_dev(tp, 20), reference_mean_abs_dev(tp, 20))
+
+
+def test_short_series():
+    series = pd.Series([1.0, 2.0, 3.0])
+    assert _rolling_rank_pct(series, 5).isna().all()
+    assert _rolling_median(series, 5).isna().all()
+    assert _rolling_mean_abs_dev(series, 5).isna().all()
+
+
+def test_create_features_columns_unchanged():
+    df = make_ohlcv(400)
+    features = SchwabDataFetcher(None).create_features(df)
+    close = df['close']
+    expected = reference_rank_pct(close, 10).loc[features.index]
+    assert_same(features['alpha_ts_rank_close_10'], expected)
+    expected = (reference_median(close, 20) / (close + 1e-10)).loc[features.index]
+    assert_same(features['alpha_quantile_close_20'], expected)
+
+
+# ========== BENCHMARK ==========
+
+def benchmark():
+    fetcher = SchwabDataFetcher(None)
+    datasets = {
+        '20 years daily': make_ohlcv(252 * 20),
+        '10 days 1-minute': make_ohlcv(390 * 10, freq='min'),
+    }
+
+    print("Per-symbol feature time")
+    print("=" * 80)
+    for name, df in datasets.items():
+        start = time.perf_counter()
+        fetcher.create_features(df)
+        features_time = time.perf_counter() - start
+
+        returns = df['close'].pct_change()
+        tp = (df['high'] + df['low'] + df['close']) / 3
+        start = time.perf_counter()
+        for period in [5, 10, 20]:
+            reference_rank_pct(df['close'], period)
+            reference_rank_pct(df['volume'], period)
+            reference_rank_pct(returns, period)
+        for period in [10, 20]:
+            reference_median(df['close'], period)
+        reference_rank_pct(df['volume'], 20)
+        reference_rank_pct(df['volume'], 20)
+        reference_mean_abs_dev(tp, 20)
+        reference_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for period in [5, 10, 20]:
+            _rolling_rank_pct(df['close'], period)
+            _rolling_rank_pct(df['volume'], period)
+            _rolling_rank_pct(returns, period)
+        for period in [10, 20]:
+            _rolling_median(df['close'], period)
+        _rolling_rank_pct(df['volume'], 20)
+        _rolling_mean_abs_dev(tp, 20)
+        vectorized_time = time.perf_counter() - start
+
+        print(f"\n{name} ({len(df)} bars)")
+        print(f"   create_features total:        {features_time * 1000:8.1f} ms")
+        print(f"   rolling columns (lambdas):    {reference_time * 1000:8.1f} ms")
+        print(f"   rolling columns (vectorized): {vectorized_time * 1000:8.1f} ms")
+        print(f"   speedup:                      {reference_time / vectorized_time:8.1f}x")
+
+
+if __name__ == '__main__':
+    benchmark()
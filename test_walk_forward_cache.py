@@ -0,0 +1,85 @@
+"""
+Tests and benchmark for the full-system backtest's walk-forward model cache
+
+WalkForwardModelCache refits a symbol's model only after its training window has gained
+retrain_every new bars, reuses the last fit in between, answers a repeated window from
+the memo, and never hands out a model fit on data later than the requested window.
+
+Run tests:      python -m pytest test_walk_forward_cache.py
+Run benchmark:  python test_walk_forward_cache.py
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from backtest_full_system import WalkForwardModelCache
+
+
+class FakeModel:
+    fit_delay = 0.0
+
+    def fit(self, X, y):
+        time.sleep(self.fit_delay)
+        self.train_end = X.index[-1]
+        return self
+
+
+def windows(n_days, train_size=100):
+    """Training windows of a daily walk-forward: (X, y, index) ending one bar later each day"""
+    index = pd.bdate_range('2023-01-02', periods=n_days + train_size, name='datetime')
+    X = pd.DataFrame({'f': np.arange(len(index), dtype='f8')}, index=index)
+    y = pd.Series(np.arange(len(index)) % 2, index=index)
+    for day in range(n_days):
+        rows = slice(day, day + train_size)
+        yield X.iloc[rows], y.iloc[rows], index[rows]
+
+
+# ========== TESTS ==========
+
+def test_refits_after_retrain_every_and_reuses_between():
+    cache = WalkForwardModelCache(FakeModel, retrain_every=5)
+    models = [cache.get_model('AAPL', X, y, idx) for X, y, idx in windows(12)]
+    assert cache.fits == 3 and cache.reuses == 9
+    assert [len({id(m) for m in models[i:i + 5]}) for i in (0, 5, 10)] == [1, 1, 1]
+    assert models[0] is not models[5] is not models[10]
+    for model, (X, _, idx) in zip(models, windows(12)):
+        assert model.train_end <= idx[-1]
+
+
+def test_same_key_hit_and_symbols_independent():
+    cache = WalkForwardModelCache(FakeModel, retrain_every=1)
+    X, y, idx = next(windows(1))
+    model = cache.get_model('AAPL', X, y, idx)
+    assert cache.get_model('AAPL', X, y, idx) is model and cache.reuses == 1
+    assert cache.get_model('MSFT', X, y, idx) is not model and cache.fits == 2
+
+
+def test_never_reuses_a_model_fit_on_later_data():
+    cache = WalkForwardModelCache(FakeModel, retrain_every=5)
+    all_windows = list(windows(10))
+    later = cache.get_model('AAPL', *all_windows[8])
+    earlier = cache.get_model('AAPL', *all_windows[6])          # ends before the kept fit
+    assert earlier is not later and earlier.train_end == all_windows[6][2][-1]
+    assert cache.fits == 2 and cache.reuses == 0
+    assert len(cache._models) == 1                              # only the latest fit per symbol is kept
+
+
+# ========== BENCHMARK ==========
+
+def benchmark(n_days=60, fit_delay=0.02):
+    FakeModel.fit_delay = fit_delay
+    print(f"{n_days} simulated days, {fit_delay * 1000:.0f} ms per fit")
+    print("=" * 80)
+    for retrain_every in (1, 5, 20):
+        cache = WalkForwardModelCache(FakeModel, retrain_every=retrain_every)
+        start = time.perf_counter()
+        for X, y, idx in windows(n_days):
+            cache.get_model('AAPL', X, y, idx)
+        elapsed = time.perf_counter() - start
+        print(f"   retrain_every={retrain_every:2d}:  {elapsed:6.2f} s  ({cache.fits} fits, {cache.reuses} reuses)")
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,294 @@
+"""
+Tick Recorder
+Persists LEVELONE_EQUITIES and CHART_EQUITY stream updates to per-day, per-service files
+
+The recorder is a stream receiver. Each update becomes one fixed-width row (receive
+time, message time, symbol and the numeric fields) appended to an in-memory batch; a
+background writer thread turns the batches into structured NumPy arrays and appends
+them to disk, so the stream loop never waits on the file system. Pending rows are
+capped and counted as dropped when the writer cannot keep up.
+
+Level one messages only carry the fields that changed, so fields that were not sent
+are stored as NaN.
+
+Layout:
+    <root>/<YYYY-MM-DD>/<SERVICE>.ticks    rows (appended, fixed width, see SCHEMAS)
+    <root>/<YYYY-MM-DD>/<SERVICE>.json     dtype of the rows
+
+Usage:
+    recorder = TickRecorder()
+    stream.start(recorder)                    # or call recorder(message) from a handler
+    ...
+    recorder.close()
+    recorder.read('LEVELONE_EQUITIES', '2026-10-16', symbol='AAPL')
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from itertools import repeat
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from schwabdev.records import loads
+
+
+MARKET_TZ = ZoneInfo('America/New_York')
+NAN = float('nan')
+SYMBOL_LENGTH = 24
+
+# Recorded columns per service: (column, stream field number). Column names follow
+# the schwabdev parsed record attributes.
+SCHEMAS = {
+    'LEVELONE_EQUITIES': [
+        ('bid_price', '1'), ('ask_price', '2'), ('last_price', '3'), ('bid_size', '4'), ('ask_size', '5'),
+        ('total_volume', '8'), ('last_size', '9'), ('high_price', '10'), ('low_price', '11'),
+        ('close_price', '12'), ('open_price', '17'), ('net_change', '18'), ('mark_price', '33'),
+        ('quote_time_in_long', '34'), ('trade_time_in_long', '35'), ('net_percent_change', '42'),
+    ],
+    'CHART_EQUITY': [
+        ('sequence', '1'), ('open_price', '2'), ('high_price', '3'), ('low_price', '4'),
+        ('close_price', '5'), ('volume', '6'), ('chart_time', '7'), ('chart_day', '8'),
+    ],
+}
+
+
+def row_dtype(service):
+    """Structured dtype of one recorded row for a service"""
+    return np.dtype([('received', '<i8'), ('timestamp', '<i8'), ('symbol', f'S{SYMBOL_LENGTH}')]
+                    + [(column, '<f8') for column, _ in SCHEMAS[service]])
+
+
+class TickRecorder:
+    """
+    Stream receiver that records updates through batched background writes
+    """
+
+    def __init__(self, root='~/.schwabdev/ticks', services=None, flush_interval=1.0,
+                 batch_rows=20000, max_pending_rows=1_000_000):
+        """
+        Initialize the recorder and start its writer thread
+
+        Args:
+            root: Directory holding the recorded days
+            services: Services to record (default: every service in SCHEMAS)
+            flush_interval: Seconds between background flushes
+            batch_rows: Pending rows that wake the writer before flush_interval
+            max_pending_rows: Rows held in memory before new updates are dropped
+        """
+        self.root = os.path.expanduser(root)
+        self.services = list(services or SCHEMAS)
+        unknown = set(self.services) - set(SCHEMAS)
+        if unknown:
+            raise ValueError(f"No schema for services: {sorted(unknown)}")
+        self.flush_interval = flush_interval
+        self.batch_rows = batch_rows
+        self.max_pending_rows = max_pending_rows
+        os.makedirs(self.root, exist_ok=True)
+
+        self._fields = {service: [field for _, field in SCHEMAS[service]] for service in self.services}
+        self._dtypes = {service: row_dtype(service) for service in self.services}
+        self._pending = {}                      # (day, service) -> list of row tuples
+        self._pending_rows = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._write_lock = threading.Lock()     # one writer at a time (thread or flush())
+        self._day = None
+        self._day_end_ms = 0
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.bytes_written = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._writer, name='TickRecorder', daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # ========== RECEIVER ==========
+
+    def __call__(self, message, **kwargs):
+        self.record(message)
+
+    def record(self, message, received=None):
+        """
+        Queue the recorded services' updates from one stream message
+
+        Args:
+            message: Raw stream message (JSON string), the decoded dict, or a
+                     schwabdev.StreamMessage (stream started with parsed=True)
+            received: Receive time in epoch ms (default: now)
+
+        Returns:
+            Number of rows queued
+        """
+        if received is None:
+            received = time.time_ns() // 1_000_000
+        if isinstance(message, (str, bytes)):
+            message = loads(message)
+        if isinstance(message, dict):
+            items = [(item.get('service'), item.get('timestamp'), item.get('content', ()))
+                     for item in message.get('data', ())]
+        else:
+            items = [(record.service, record.timestamp, (record.content,)) for record in message.data]
+
+        day = self._day_for(received)
+        queued = 0
+        with self._lock:
+            for service, timestamp, contents in items:
+                fields = self._fields.get(service)
+                if fields is None:
+                    continue
+                rows = self._pending.setdefault((day, service), [])
+                timestamp = timestamp if timestamp is not None else received
+                for content in contents:
+                    if self._pending_rows >= self.max_pending_rows:
+                        self.dropped += 1
+                        continue
+                    rows.append((received, timestamp, str(content.get('key', '')).encode()[:SYMBOL_LENGTH],
+                                 *map(content.get, fields, repeat(NAN))))
+                    self._pending_rows += 1
+                    queued += 1
+            self.recorded += queued
+            if self._pending_rows >= self.batch_rows:
+                self._wake.notify()
+        return queued
+
+    def _day_for(self, received):
+        """Trading day (New York date) of a receive time, recomputed once per day"""
+        if received >= self._day_end_ms or self._day is None:
+            now = datetime.fromtimestamp(received / 1000, tz=MARKET_TZ)
+            self._day = now.strftime('%Y-%m-%d')
+            next_midnight = pd.Timestamp(now.date(), tz=MARKET_TZ) + pd.Timedelta(days=1)
+            self._day_end_ms = int(next_midnight.value // 1_000_000)
+        return self._day
+
+    # ========== WRITER ==========
+
+    def _writer(self):
+        while True:
+            with self._lock:
+                if self._running and self._pending_rows < self.batch_rows:
+                    self._wake.wait(self.flush_interval)
+                running = self._running
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Warning: Tick recorder write failed ({e})")
+            if not running:
+                return
+
+    def flush(self):
+        """Write all pending rows now (also called by the writer thread)"""
+        with self._write_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._pending_rows = 0
+            for (day, service), rows in pending.items():
+                if rows:
+                    self._append(day, service, np.array(rows, dtype=self._dtypes[service]))
+
+    def _append(self, day, service, rows):
+        data_path, schema_path = self._paths(day, service)
+        if not os.path.exists(schema_path):
+            os.makedirs(os.path.dirname(data_path), exist_ok=True)
+            with open(schema_path, 'w') as f:
+                json.dump({'service': service, 'dtype': rows.dtype.descr}, f)
+        with open(data_path, 'ab') as f:
+            rows.tofile(f)
+        self.written += len(rows)
+        self.bytes_written += rows.nbytes
+
+    def close(self):
+        """Flush what is pending and stop the writer thread"""
+        with self._lock:
+            self._running = False
+            self._wake.notify()
+        self._thread.join()
+
+    def stats(self):
+        """Counters: recorded, written, dropped, pending rows and bytes written"""
+        with self._lock:
+            return {'recorded': self.recorded, 'written': self.written, 'dropped': self.dropped,
+                    'pending': self._pending_rows, 'bytes_written': self.bytes_written}
+
+    # ========== READ ==========
+
+    def _paths(self, day, service):
+        day_dir = os.path.join(self.root, day)
+        return os.path.join(day_dir, f"{service}.ticks"), os.path.join(day_dir, f"{service}.json")
+
+    def days(self):
+        """List recorded days"""
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def load(self, service, day):
+        """
+        Load the raw rows of a service for a day (memory-mapped, read-only)
+
+        Returns:
+            Structured ndarray (see row_dtype), or None if nothing is recorded
+        """
+        return load_ticks(self.root, service, day)
+
+    def read(self, service, day, symbol=None):
+        """
+        Read recorded rows as a DataFrame
+
+        Args:
+            service: 'LEVELONE_EQUITIES' or 'CHART_EQUITY'
+            day: Trading day ('YYYY-MM-DD')
+            symbol: Optional symbol to keep
+
+        Returns:
+            DataFrame with received/timestamp (datetime), symbol and the field columns, or None
+        """
+        rows = self.load(service, day)
+        if rows is None or len(rows) == 0:
+            return None
+        if symbol is not None:
+            rows = rows[rows['symbol'] == symbol.encode()]
+        return ticks_to_frame(rows)
+
+
+# ========== CONVERSIONS ==========
+
+def load_ticks(root, service, day):
+    """Memory-map a recorded .ticks file (a partially written last row is ignored)"""
+    day_dir = os.path.join(os.path.expanduser(root), day)
+    data_path = os.path.join(day_dir, f"{service}.ticks")
+    schema_path = os.path.join(day_dir, f"{service}.json")
+    if not os.path.exists(data_path):
+        return None
+    try:
+        with open(schema_path) as f:
+            dtype = np.dtype([tuple(field) for field in json.load(f)['dtype']])
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Warning: Missing or corrupt tick schema for {service} on {day} ({e}), ignoring")
+        return None
+    n_rows = os.path.getsize(data_path) // dtype.itemsize
+    if n_rows == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(data_path, dtype=dtype, mode='r', shape=(n_rows,))
+
+
+def ticks_to_frame(rows):
+    """Convert recorded rows to a DataFrame"""
+    frame = {
+        'received': np.asarray(rows['received']).astype('datetime64[ms]'),
+        'timestamp': np.asarray(rows['timestamp']).astype('datetime64[ms]'),
+        'symbol': np.char.decode(np.asarray(rows['symbol']), 'ascii'),
+    }
+    for column in rows.dtype.names[3:]:
+        frame[column] = np.asarray(rows[column])
+    return pd.DataFrame(frame)
@@ -244,7 +244,8 @@ def scan_momentum_stocks(filters, custom_symbols=None):
         client = schwabdev.Client(
             os.getenv('app_key'),
             os.getenv('app_secret'),
-            os.getenv('callback_url', 'https://127.0.0.1')
+            os.getenv('callback_url', 'https://127.0.0.1'),
+            cache=schwabdev.ResponseCache(path='~/.schwabdev/responses.db')  # reference data reused across runs
         )
         
         # Get stock universe (use custom symbols if provided, otherwise fetch all)
@@ -256,20 +257,12 @@ def scan_momentum_stocks(filters, custom_symbols=None):
         print(f"Scanning {len(stock_universe)} stocks for momentum...", file=sys.stderr)
         
         # Fetch quotes for all symbols (Schwab API can handle batch requests)
-        # Split into chunks of 500 to avoid URL length limits
-        chunk_size = 500
-        all_quotes_data = {}
-        
-        for i in range(0, len(stock_universe), chunk_size):
-            chunk = stock_universe[i:i+chunk_size]
-            symbols_str = ','.join(chunk)
-            try:
-                response = client.quotes(symbols_str)
-                quotes_data = response.json()
-                all_quotes_data.update(quotes_data)
-            except Exception as e:
-                print(f"Error fetching quotes for chunk {i//chunk_size + 1}: {e}", file=sys.stderr)
-                continue
+        # The coalescer splits them into batches that fit the URL length limit
+        try:
+            all_quotes_data = schwabdev.QuoteCoalescer(client).quotes(stock_universe)
+        except Exception as e:
+            print(f"Error fetching quotes: {e}", file=sys.stderr)
+            all_quotes_data = {}
         
         results = []
         
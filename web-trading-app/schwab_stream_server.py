@@ -6,8 +6,10 @@ Streams real-time market data from Schwab API to connected clients
 
 import asyncio
 import json
+import math
 import os
 import websockets
+import pandas as pd
 from pathlib import Path
 from dotenv import load_dotenv
 import sys
@@ -21,128 +23,152 @@ env_path = project_root / '.env'
 load_dotenv(env_path)
 
 import schwabdev
+from incremental_features import FeatureEngine
+from broadcast_hub import BroadcastHub
+from quote_book import QuoteBook
+from tick_recorder import TickRecorder
 
-# Connected WebSocket clients
-connected_clients = set()
+# Connected WebSocket clients: per-client queues (latest quote per symbol for slow clients) and symbol filters
+hub = BroadcastHub(max_queue=2000)
 
 # Current subscriptions
 current_symbols = set()
 
-# Latest data cache
-latest_quotes = {}
+# Default watchlist, subscribed at startup and kept whatever clients unsubscribe
+DEFAULT_SYMBOLS = ["AAPL", "MSFT", "SPY", "TSLA", "NVDA", "AMD"]
 
-def handle_stream_data(data):
-    """Process incoming data from Schwab stream"""
+# Latest quote per symbol, merged from the level one deltas
+quote_book = QuoteBook('LEVELONE_EQUITIES')
+
+# Quote message key -> QuoteBook field
+QUOTE_FIELDS = {'bid': 'bid_price', 'ask': 'ask_price', 'last': 'last_price', 'bidSize': 'bid_size',
+                'askSize': 'ask_size', 'volume': 'total_volume', 'lastSize': 'last_size', 'change': 'net_change',
+                'changePercent': 'net_percent_change', 'timestamp': 'quote_time_in_long'}
+QUOTE_INTEGER_KEYS = {'bidSize', 'askSize', 'volume', 'lastSize', 'timestamp'}
+
+# Optional tick recording (set TICK_DIR to persist LEVELONE_EQUITIES / CHART_EQUITY updates)
+tick_recorder = TickRecorder(os.getenv('TICK_DIR')) if os.getenv('TICK_DIR') else None
+
+# Per-service tick latency, decode and handler time histograms
+stream_latency = schwabdev.StreamLatency()
+
+# Incremental indicator state per symbol (updated O(1) per CHART_EQUITY candle)
+feature_engine = FeatureEngine()
+
+# Indicators attached to each candle broadcast
+CANDLE_INDICATORS = ['rsi', 'macd', 'macd_signal', 'macd_hist', 'ema_12', 'ema_26',
+                     'ma_20', 'bb_upper_20', 'bb_lower_20', 'atr', 'stoch_k', 'volume_ratio_20']
+INDICATOR_POSITIONS = {name: feature_engine.columns.index(name) for name in CANDLE_INDICATORS}
+
+def handle_stream_data(message):
+    """Process incoming data from Schwab stream (a schwabdev.StreamMessage, the stream runs with parsed=True)"""
     try:
-        message = json.loads(data)
+        if tick_recorder is not None:
+            tick_recorder(message)
+        updates = []
         
-        # Handle different message types
-        if 'data' in message:
-            for item in message['data']:
-                service = item.get('service')
+        # Full current quote per updated symbol (the message only carries the fields that changed)
+        for symbol in dict.fromkeys(quote_book.apply(message)):
+            updates.append((quote_message(symbol), ('quote', symbol), symbol))
+        
+        for record in message.data:
+            if record.service == 'CHART_EQUITY':
+                # Real-time candle data
+                candle = {
+                    'type': 'candle',
+                    'symbol': record.key,
+                    'sequence': record.sequence,
+                    'open': record.open_price,
+                    'high': record.high_price,
+                    'low': record.low_price,
+                    'close': record.close_price,
+                    'volume': record.volume,
+                    'timestamp': record.chart_time,  # milliseconds
+                    'chartDay': record.chart_day
+                }
+                
+                candle = {k: v for k, v in candle.items() if v is not None}
                 
-                if service == 'LEVELONE_EQUITIES':
-                    # Real-time quote data - correct field mappings from translate.py
-                    content = item.get('content', [])
-                    for quote_data in content:
-                        symbol = quote_data.get('key')
-                        
-                        # Build quote object with CORRECT field numbers (0-indexed)
-                        # 0=Symbol, 1=Bid, 2=Ask, 3=Last, 4=BidSize, 5=AskSize, 8=Volume
-                        # 18=NetChange, 43=NetPercentChange, 34=QuoteTimeInLong
-                        quote = {
-                            'type': 'quote',
-                            'symbol': symbol,
-                            'bid': quote_data.get('1'),   # Bid Price
-                            'ask': quote_data.get('2'),   # Ask Price
-                            'last': quote_data.get('3'),  # Last Price
-                            'bidSize': quote_data.get('4'),
-                            'askSize': quote_data.get('5'),
-                            'volume': quote_data.get('8'),  # Total Volume
-                            'lastSize': quote_data.get('9'),
-                            'change': quote_data.get('18'),  # Net Change
-                            'changePercent': quote_data.get('43'),  # Net Percent Change
-                            'timestamp': quote_data.get('34')  # Quote Time in Long (milliseconds)
-                        }
-                        
-                        # Remove None values
-                        quote = {k: v for k, v in quote.items() if v is not None}
-                        
-                        # Cache latest quote
-                        latest_quotes[symbol] = quote
-                        
-                        # Broadcast to all connected clients
-                        asyncio.create_task(broadcast(json.dumps(quote)))
+                # Update rolling indicator state with the new candle
+                features = feature_engine.on_chart_record(record)
+                if features is not None:
+                    candle['indicators'] = {
+                        name: (None if math.isnan(features[i]) else float(features[i]))
+                        for name, i in INDICATOR_POSITIONS.items()
+                    }
                 
-                elif service == 'CHART_EQUITY':
-                    # Real-time candle data - correct field mappings
-                    # 0=key, 1=Sequence, 2=Open, 3=High, 4=Low, 5=Close, 6=Volume, 7=ChartTime, 8=ChartDay
-                    content = item.get('content', [])
-                    for candle_data in content:
-                        symbol = candle_data.get('key')
-                        
-                        candle = {
-                            'type': 'candle',
-                            'symbol': symbol,
-                            'sequence': candle_data.get('1'),  # Sequence number
-                            'open': candle_data.get('2'),      # Open Price
-                            'high': candle_data.get('3'),      # High Price
-                            'low': candle_data.get('4'),       # Low Price
-                            'close': candle_data.get('5'),     # Close Price
-                            'volume': candle_data.get('6'),    # Volume
-                            'timestamp': candle_data.get('7'), # Chart Time (milliseconds)
-                            'chartDay': candle_data.get('8')   # Chart Day
-                        }
-                        
-                        candle = {k: v for k, v in candle.items() if v is not None}
-                        
-                        # Broadcast candle update
-                        asyncio.create_task(broadcast(json.dumps(candle)))
+                updates.append((candle, None, record.key))
+        
+        # Encoded once, handed to the server loop in one call (this runs on the dispatcher thread)
+        hub.publish_many(updates)
         
     except Exception as e:
         print(f"Error processing stream data: {e}")
 
-async def broadcast(message):
-    """Broadcast message to all connected clients"""
-    if connected_clients:
-        await asyncio.gather(
-            *[client.send(message) for client in connected_clients],
-            return_exceptions=True
-        )
+def quote_message(symbol):
+    """Quote message for clients from the symbol's merged state in the quote book"""
+    snapshot = quote_book.snapshot(symbol, QUOTE_FIELDS.values()) or {}
+    quote = {'type': 'quote', 'symbol': symbol}
+    for key, field in QUOTE_FIELDS.items():
+        if field in snapshot:
+            quote[key] = int(snapshot[field]) if key in QUOTE_INTEGER_KEYS else snapshot[field]
+    return quote
+
+def send_snapshot(websocket, symbols=None):
+    """Queue the current quote of each symbol (default: every symbol in the quote book) for one client"""
+    for symbol in list(quote_book.symbols) if symbols is None else symbols:
+        if symbol in quote_book:
+            hub.send_to(websocket, quote_message(symbol), key=('quote', symbol))
+
+async def handle_client_message(websocket, message):
+    """Handle one message from a WebSocket client"""
+    try:
+        data = json.loads(message)
+        msg_type = data.get('type')
+        
+        if msg_type == 'subscribe':
+            # Subscribe to symbols (this client then only receives its symbols)
+            symbols = data.get('symbols', [])
+            hub.add_symbols(websocket, symbols)
+            send_snapshot(websocket, symbols)
+            await subscribe_symbols(symbols)
+            
+        elif msg_type == 'unsubscribe':
+            # Unsubscribe from symbols no other client (nor the default watchlist) still wants
+            symbols = data.get('symbols', [])
+            hub.remove_symbols(websocket, symbols)
+            await unsubscribe_symbols(hub.unwanted(symbols, keep=DEFAULT_SYMBOLS))
+            
+        elif msg_type == 'latency':
+            # Tick latency / handler time percentiles (microseconds)
+            hub.send_to(websocket, {'type': 'latency', 'data': stream_latency.snapshot()})
+            
+    except json.JSONDecodeError:
+        print(f"Invalid JSON from client: {message}")
 
 async def handle_client(websocket):
     """Handle incoming WebSocket connections from clients"""
-    connected_clients.add(websocket)
-    print(f"Client connected. Total clients: {len(connected_clients)}")
+    print(f"Client connected. Total clients: {len(hub.clients) + 1}")
+    
+    # Send cached quotes to new client, then serve it from its own queue
+    symbols = await hub.serve(websocket, handle_client_message, on_connect=send_snapshot)
+    print(f"Client disconnected. Total clients: {len(hub.clients)}")
     
+    # Release the symbols only this client wanted
+    await unsubscribe_symbols(hub.unwanted(symbols or (), keep=DEFAULT_SYMBOLS))
+
+def seed_features(symbol):
+    """Warm a symbol's indicator state with recent minute candles so streamed candles carry indicators"""
     try:
-        # Send cached quotes to new client
-        for quote in latest_quotes.values():
-            await websocket.send(json.dumps(quote))
-        
-        async for message in websocket:
-            try:
-                data = json.loads(message)
-                msg_type = data.get('type')
-                
-                if msg_type == 'subscribe':
-                    # Subscribe to symbols
-                    symbols = data.get('symbols', [])
-                    await subscribe_symbols(symbols)
-                    
-                elif msg_type == 'unsubscribe':
-                    # Unsubscribe from symbols
-                    symbols = data.get('symbols', [])
-                    await unsubscribe_symbols(symbols)
-                    
-            except json.JSONDecodeError:
-                print(f"Invalid JSON from client: {message}")
-                
-    except websockets.exceptions.ConnectionClosed:
-        pass
-    finally:
-        connected_clients.remove(websocket)
-        print(f"Client disconnected. Total clients: {len(connected_clients)}")
+        response = schwab_client.price_history(symbol, periodType='day', period=2,
+                                               frequencyType='minute', frequency=1)
+        candles = response.json().get('candles', []) if response.ok else []
+        if candles:
+            df = pd.DataFrame(candles)
+            df.index = pd.to_datetime(df.pop('datetime'), unit='ms')
+            feature_engine.seed(symbol, df)
+    except Exception as e:
+        print(f"Could not seed indicators for {symbol}: {e}")
 
 async def subscribe_symbols(symbols):
     """Subscribe to symbols in Schwab stream"""
@@ -152,24 +178,18 @@ async def subscribe_symbols(symbols):
     if new_symbols and schwab_stream:
         print(f"Subscribing to: {new_symbols}")
         
+        # Replay history into the indicator state before live candles arrive
+        if schwab_client:
+            await asyncio.gather(*[asyncio.to_thread(seed_features, s) for s in new_symbols])
+        
         # Subscribe to level one quotes with CORRECT field numbers
         # 0=Symbol, 1=Bid, 2=Ask, 3=Last, 4=BidSize, 5=AskSize, 8=Volume, 
-        # 9=LastSize, 18=NetChange, 43=NetPercentChange, 34=QuoteTime
-        request = schwab_stream.level_one_equities(
-            keys=list(new_symbols),
-            fields="0,1,2,3,4,5,8,9,10,11,17,18,34,35,43",  # All key fields
-            command="SUBS"
-        )
-        schwab_stream.send(request)
+        # 9=LastSize, 18=NetChange, 42=NetPercentChange, 34=QuoteTime
+        subscriptions.add('LEVELONE_EQUITIES', list(new_symbols), "0,1,2,3,4,5,8,9,10,11,17,18,34,35,42,43")
         
         # Subscribe to chart data with CORRECT field numbers
         # 0=key, 1=Sequence, 2=Open, 3=High, 4=Low, 5=Close, 6=Volume, 7=ChartTime
-        chart_request = schwab_stream.chart_equity(
-            keys=list(new_symbols),
-            fields="0,1,2,3,4,5,6,7,8",  # All candle fields
-            command="SUBS"
-        )
-        schwab_stream.send(chart_request)
+        subscriptions.add('CHART_EQUITY', list(new_symbols), "0,1,2,3,4,5,6,7,8")
         
         current_symbols.update(new_symbols)
 
@@ -181,37 +201,37 @@ async def unsubscribe_symbols(symbols):
     if to_remove and schwab_stream:
         print(f"Unsubscribing from: {to_remove}")
         
-        request = schwab_stream.level_one_equities(
-            keys=list(to_remove),
-            command="UNSUBS"
-        )
-        schwab_stream.send(request)
-        
-        chart_request = schwab_stream.chart_equity(
-            keys=list(to_remove),
-            command="UNSUBS"
-        )
-        schwab_stream.send(chart_request)
+        subscriptions.remove('LEVELONE_EQUITIES', list(to_remove))
+        subscriptions.remove('CHART_EQUITY', list(to_remove))
         
         current_symbols -= to_remove
 
-# Global Schwab stream object
+# Global Schwab client and stream objects
+schwab_client = None
 schwab_stream = None
+subscriptions = None  # schwabdev.SubscriptionManager, one grouped frame of net changes per 100 ms
 
 async def start_servers():
     """Start both Schwab stream and WebSocket server"""
-    global schwab_stream
+    global schwab_client, schwab_stream, subscriptions
     
     print("Initializing Schwab client...")
-    client = schwabdev.Client(
+    client = schwab_client = schwabdev.Client(
         os.getenv('app_key'),
         os.getenv('app_secret'),
-        os.getenv('callback_url', 'https://127.0.0.1')
+        os.getenv('callback_url', 'https://127.0.0.1'),
+        cache=schwabdev.ResponseCache(path='~/.schwabdev/responses.db')  # reference data reused across runs
     )
     
+    hub.attach(asyncio.get_running_loop())
+    
     print("Starting Schwab stream...")
     schwab_stream = schwabdev.Stream(client)
-    schwab_stream.start(receiver=handle_stream_data)
+    # Feature updates and broadcasts run on a dispatcher thread so they never stall websocket reads
+    schwab_stream.start(receiver=handle_stream_data, dispatcher=schwabdev.StreamDispatcher(maxsize=50000), parsed=True,
+                        latency=stream_latency)
+    # Clients flipping symbols quickly only send the net change to Schwab
+    subscriptions = schwabdev.SubscriptionManager(schwab_stream, window=0.1)
     
     # Wait for stream to be active
     await asyncio.sleep(2)
@@ -223,8 +243,7 @@ async def start_servers():
     print("✅ Schwab stream active")
     
     # Subscribe to default watchlist symbols
-    default_symbols = ["AAPL", "MSFT", "SPY", "TSLA", "NVDA", "AMD"]
-    await subscribe_symbols(default_symbols)
+    await subscribe_symbols(DEFAULT_SYMBOLS)
     
     # Start WebSocket server for clients
     print("Starting WebSocket server on ws://localhost:8765")
@@ -240,4 +259,6 @@ if __name__ == "__main__":
         print("\nShutting down...")
         if schwab_stream:
             schwab_stream.stop()
+        if tick_recorder is not None:
+            tick_recorder.close()
 